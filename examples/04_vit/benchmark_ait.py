@@ -126,8 +126,7 @@ def benchmark(model_name, batch_size, mod=None, graph_mode=True):
             params_ait[f"{prefix}_{ait_key}"] = torch.from_numpy(cu_len).cuda()
 
     # set weights
-    for name, weight in params_ait.items():
-        mod.set_constant_with_tensor(name, weight)
+    mod.set_many_constants_with_tensors(params_ait)
 
     # prepare input/output tensor
     inputs = [torch.randn([batch_size, img_size, img_size, 3]).cuda().half()]
@@ -21,6 +21,7 @@ from . import (  # noqa
     codegen,
     cuda,
     profiler_runner,
+    profiler_store,
     registry,
     rocm,
     target,
@@ -31,6 +32,7 @@ __all__ = [
     "codegen",
     "cuda",
     "profiler_runner",
+    "profiler_store",
     "registry",
     "rocm",
     "target",
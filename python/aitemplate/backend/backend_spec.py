@@ -26,6 +26,15 @@ from ..compiler.ops.common.epilogue import FuncEnum
 from .target import Target
 
 
+BF16_FUNC_ENUM_TO_FUNC_NAME: Dict[FuncEnum, Dict[str, str]] = {
+    FuncEnum.ADD: {"__nv_bfloat162": "__hadd2", "__nv_bfloat16": "__hadd"},
+    FuncEnum.SUB: {"__nv_bfloat162": "__hsub2", "__nv_bfloat16": "__hsub"},
+    FuncEnum.MUL: {"__nv_bfloat162": "__hmul2", "__nv_bfloat16": "__hmul"},
+    FuncEnum.DIV: {"__nv_bfloat162": "__h2div", "__nv_bfloat16": "__hdiv"},
+    FuncEnum.ABS: {"__nv_bfloat162": "__habs2", "__nv_bfloat16": "__habs"},
+}
+
+
 @dataclass
 class BackendSpec:
     dtype_to_backend_fp16_dtype: Dict[str, str] = field(
@@ -183,7 +192,7 @@ class BackendSpec:
         dtype: str,
         num_elements_to_backend_type_list: List[Tuple[int, str]],
     ) -> str:
-        if dtype != "float16":
+        if dtype not in self.dtype_to_backend_fp16_dtype:
             raise NotImplementedError("Unsupported dtype {}!".format(dtype))
         for num, backend_type in num_elements_to_backend_type_list:
             if num_elements % num == 0:
@@ -194,10 +203,29 @@ class BackendSpec:
             )
         )
 
+    def get_read_num_elements_to_backend_type(
+        self, dtype: str
+    ) -> List[Tuple[int, str]]:
+        """Returns the read types of dtype. Vector read types only depend on
+        the size of dtype, the scalar read type is the dtype itself."""
+        scalar_type = self.get_fp16_dtype(dtype)
+        return [
+            (num, backend_type if num > 1 else scalar_type)
+            for num, backend_type in self.read_num_elements_to_backend_type
+        ]
+
+    def get_op_num_elements_to_backend_type(self, dtype: str) -> List[Tuple[int, str]]:
+        if dtype != "float16":
+            raise NotImplementedError("Unsupported dtype {}!".format(dtype))
+        return self.op_num_elements_to_backend_type
+
+    def get_op_type_priority_list(self, op_t: str) -> List[str]:
+        return self.op_type_priority_list
+
     def get_candidate_op_types(self, op_t: str) -> List[str]:
         res = []
         found = False
-        for t in self.op_type_priority_list:
+        for t in self.get_op_type_priority_list(op_t):
             if t == op_t:
                 found = True
             if found:
@@ -264,6 +292,7 @@ class CUDASpec(BackendSpec):
     header_src_template = jinja2.Template(
         """
 #include <cuda_fp16.h>
+#include <cuda_bf16.h>
 {{extra_header}}
         """
     )
@@ -272,9 +301,67 @@ class CUDASpec(BackendSpec):
     dtype_to_cutlass_type: Dict[str, str] = field(
         default_factory=lambda: {
             "float16": "cutlass::half_t",
+            "bfloat16": "cutlass::bfloat16_t",
             "float": "float",
         }
     )
 
+    dtype_to_backend_fp16_dtype: Dict[str, str] = field(
+        default_factory=lambda: {
+            "float16": "half",
+            "bfloat16": "__nv_bfloat16",
+        }
+    )
+
+    dtype_to_backend_dtype: Dict[str, str] = field(
+        default_factory=lambda: {
+            "float16": "half",
+            "bfloat16": "__nv_bfloat16",
+            "float": "float",
+            "int64": "int64_t",
+        }
+    )
+
+    backend_datatype_convertors: Dict[str, Dict[str, str]] = field(
+        default_factory=lambda: {
+            "half": {"float": "__half2float"},
+            "__nv_bfloat16": {"float": "__bfloat162float"},
+            "float": {
+                "half": "__float2half_rn",
+                "__nv_bfloat16": "__float2bfloat16_rn",
+            },
+        }
+    )
+
+    bf16_op_num_elements_to_backend_type: List[Tuple[int, str]] = field(
+        default_factory=lambda: [
+            (2, "__nv_bfloat162"),
+            (1, "__nv_bfloat16"),
+        ]
+    )
+    bf16_op_type_priority_list: List[str] = field(
+        default_factory=lambda: [
+            "__nv_bfloat162",
+            "__nv_bfloat16",
+            "float",
+        ]
+    )
+
+    def __post_init__(self):
+        # Only basic arithmetic is native in bfloat16, other funcs are
+        # computed in float.
+        for func_enum, funcs in BF16_FUNC_ENUM_TO_FUNC_NAME.items():
+            self.func_enum_to_func_name[func_enum].update(funcs)
+
+    def get_op_num_elements_to_backend_type(self, dtype: str) -> List[Tuple[int, str]]:
+        if dtype == "bfloat16":
+            return self.bf16_op_num_elements_to_backend_type
+        return super().get_op_num_elements_to_backend_type(dtype)
+
+    def get_op_type_priority_list(self, op_t: str) -> List[str]:
+        if op_t.startswith("__nv_bfloat16"):
+            return self.bf16_op_type_priority_list
+        return super().get_op_type_priority_list(op_t)
+
     def dtype_to_lib_type(self, dtype: str):
         return self.get_dtype_to_dtype(dtype, self.dtype_to_cutlass_type)
@@ -23,12 +23,14 @@ import multiprocessing
 import os
 import pathlib
 import re
+import time
 import typing
 from typing import Optional
 
 import jinja2
 
-from ..utils import logger
+from ..utils import compile_profiler, logger
+from .profiler_store import ProfilerStore
 from .target import Target
 from .task_runner import BaseRunner, Task
 
@@ -130,10 +132,35 @@ class Runner(BaseRunner):
         list
             An empty list
         """
-        ret = super().pull(self._ftask_proc, self._fret_proc)
+        tasks = list(self._queue)
+        try:
+            ret = super().pull(self._ftask_proc, self._fret_proc)
+        finally:
+            for task in tasks:
+                _record_task(task)
         return ret
 
 
+def _record_task(task: Task) -> None:
+    """Records the queue wait and compile time of a finished task with
+    the current compile profiler."""
+    if task._finished_at is None:
+        return
+    compile_profiler.add_build_task(
+        task._name,
+        task._queued_at,
+        task._timestamp,
+        task._finished_at,
+        lane=task.assigned_dev(),
+        failed=task.is_failed(),
+    )
+
+
+def _record_cache_hit(obj: str) -> None:
+    now = time.time()
+    compile_profiler.add_build_task(obj, now, now, now, cache_hit=True)
+
+
 class Builder(object):
     """Builder is a module to compile generated source code
     files into binary objects.
@@ -207,6 +234,75 @@ class Builder(object):
         self._runner.join()
         self._runner.pull()
 
+    def build_profilers(self, files: list[typing.Tuple[str, str]], cc_cmd: str):
+        """Build profiler executables through the cross-workdir ProfilerStore.
+
+        Profilers already in the store are linked into place instead of being
+        rebuilt. Profilers being built by another process on the same host are
+        waited for and then fetched from the store.
+
+        Parameters
+        ----------
+        files : list[Tuple[str, str]]
+            list of tuples of profiler source path and executable path
+        cc_cmd : str
+            command line template for building executables
+        """
+        store = ProfilerStore.from_env()
+        if store is None:
+            self.build_objs(files, cc_cmd)
+            return
+
+        to_build = []
+        waiting = []
+        locks = []
+        try:
+            for src, obj in files:
+                key = store.key(src, cc_cmd)
+                if store.fetch(key, obj):
+                    _record_cache_hit(obj)
+                    continue
+                lock = store.try_lock(key)
+                if lock is None:
+                    waiting.append((src, obj, key))
+                    continue
+                locks.append(lock)
+                # it might have been published before we got the lock
+                if store.fetch(key, obj):
+                    _record_cache_hit(obj)
+                else:
+                    to_build.append((src, obj, key))
+            self.build_objs([(src, obj) for src, obj, _ in to_build], cc_cmd)
+            for _, obj, key in to_build:
+                store.publish(key, obj)
+        finally:
+            for lock in locks:
+                store.unlock(lock)
+
+        rebuild = []
+        for src, obj, key in waiting:
+            lock = store.lock(key)
+            if store.fetch(key, obj):
+                _record_cache_hit(obj)
+                store.unlock(lock)
+            else:
+                rebuild.append((src, obj, key, lock))
+        try:
+            self.build_objs([(src, obj) for src, obj, _, _ in rebuild], cc_cmd)
+            for _, obj, key, _ in rebuild:
+                store.publish(key, obj)
+        finally:
+            for _, _, _, lock in rebuild:
+                store.unlock(lock)
+
+        logger.info(
+            __name__,
+            f"Profiler store: {len(files) - len(to_build) - len(rebuild)} hits, "
+            f"{len(to_build) + len(rebuild)} builds",
+        )
+        if len(to_build) + len(rebuild) > 0:
+            store.gc()
+
     def build_so(self, target: Target, objs: list[str]):
         """Generate a task to build all objects into a dynamic library
 
@@ -31,6 +31,7 @@ from aitemplate.compiler.base import Operator
 from aitemplate.compiler.tensor_accessor import TensorAccessor
 
 from aitemplate.compiler.transform.memory_planning import Workspace
+from aitemplate.compiler.weight_store import WeightStore
 
 from ..compiler.base import get_dtype_size, IntImm, IntVar, Tensor
 from . import registry
@@ -181,6 +182,10 @@ def dtype_to_enumerator(dtype):
             return "kInt"
         elif dtype == "int64":
             return "kLong"
+        elif dtype == "bfloat16":
+            return "kBFloat16"
+        elif dtype == "int8":
+            return "kInt8"
         else:
             raise AssertionError(f"unknown dtype {dtype}")
 
@@ -271,6 +276,8 @@ class ModelContainerGenerator:
         num_outputs: int,
         constants_data_file: io.BytesIO,
         output_name_to_idx: Dict[str, int],
+        profile_ops: bool = False,
+        weight_store: Optional[WeightStore] = None,
     ):
         self.target = Target.current()
         self.f_var_decl = registry.get(self.target.name() + ".lib.var_decl")
@@ -284,6 +291,8 @@ class ModelContainerGenerator:
         self.tensor_map_set = []
         self.set_inputs = []
         self.func_seq = []
+        # (name, op type) of each function call in func_seq
+        self.op_infos = []
         self.tensor_decl = []
         self.dim_decl = []
         self.device_to_device_copies = []
@@ -303,9 +312,16 @@ class ModelContainerGenerator:
         self.constants_data_size = 0
         self.owned_constants_init = []
 
+        # With a weight store, owned constants are sliced from the shared
+        # weights instead of the constants blob.
+        self.weight_store = weight_store
+        self.set_up_shared_weights = []
+        self.shared_weights_size = 0
+
         self.input_idx = 0
         self.unbound_constant_idx = 0
         self.output_name_to_idx = output_name_to_idx
+        self.profile_ops = profile_ops
 
         (
             self.max_blob_size,
@@ -371,7 +387,16 @@ class ModelContainerGenerator:
         """
         name = tensor._attrs["name"]
         data = tensor._attrs["data"]
-        if data is not None:
+        if data is not None and self.weight_store is not None:
+            # Owned constant in the weight store, bound with SetSharedWeights.
+            num_bytes = len(data)
+            offset = self.weight_store.add(name, data.to_bytes())
+            self.set_up_shared_weights.append(
+                f"      {name} = reinterpret_cast<decltype({name})>"
+                f"(shared_weights + {offset});"
+            )
+            self.shared_weights_size = max(self.shared_weights_size, offset + num_bytes)
+        elif data is not None:
             # Owned constant. Set up logic for copying the constant in from *.so.
             assert (
                 tensor._attrs["offset"] >= 0
@@ -542,6 +567,7 @@ class ModelContainerGenerator:
             if func._attrs["original_name"] not in self.visited_func:
                 self.visited_func.add(func._attrs["original_name"])
                 self.func_seq.append(f_func_call(func._attrs, indent="    "))
+                self.op_infos.append((func._attrs["original_name"], func._attrs["op"]))
             if "int_state_flag" in func._attrs:
                 if func._attrs["name"] not in self.state_record:
                     self.function_state.append(
@@ -616,22 +642,28 @@ class ModelContainerGenerator:
             device_to_device_copies="\n".join(self.device_to_device_copies),
             set_up_param_dynamic_shapes="\n".join(self.set_up_param_dynamic_shapes),
             function_seq=self.func_seq,
+            set_up_shared_weights="\n".join(self.set_up_shared_weights),
             tensor_decl="\n".join(self.tensor_decl),
             dim_decl="\n".join(self.dim_decl),
             function_state="\n".join(self.function_state),
             target_has_graph_mode=target_has_graph_mode,
             unique_workspace_size=self.workspace.unique_size,
+            profile_ops=self.profile_ops,
+            op_infos=self.op_infos if self.profile_ops else [],
         )
 
         result["model-generated.h"] = model_def
 
         model_container_src_fname = f"model_container_base{self.target.src_extension()}"
+        # the constants blob is unused with a weight store
+        param_size = self.max_constant_blob_size if self.weight_store is None else 0
         model_container_base_src = MODEL_CONTAINER_TEMPLATE.render(
             blob_size=self.max_blob_size,
             workspace_size=self.workspace.total_size(),
             num_inputs=self.num_inputs,
             num_outputs=self.num_outputs,
-            param_size=self.max_constant_blob_size,
+            param_size=param_size,
+            shared_weights_size=self.shared_weights_size,
             set_up_constant_names="\n".join(self.set_up_constant_names),
             set_up_param_dtypes="\n".join(self.set_up_param_dtypes),
             set_up_output_shapes="\n".join(self.set_up_output_shapes),
@@ -678,6 +710,8 @@ def gen_library_src(  # noqa: C901
     workdir: str,
     output_tensors: List[Tensor],
     model_name: str = "",
+    profile_ops: bool = False,
+    weight_store: Optional[WeightStore] = None,
 ) -> list[Tuple[str, str]]:
     """Generate model driver source code files for the given graph
 
@@ -694,6 +728,12 @@ def gen_library_src(  # noqa: C901
         Target directory for generated C++ source code files
     model_name : str, optional
         Sub working directory in the workdir for the given model, by default ""
+    profile_ops : bool, optional
+        Record an event around each op, so that the model can be profiled op
+        by op with Model.profile_ops, by default False
+    weight_store : Optional[WeightStore], optional
+        Store the owned constants in this weight store instead of the
+        library, by default None
 
     Returns
     -------
@@ -722,10 +762,14 @@ def gen_library_src(  # noqa: C901
         num_outputs,
         constants_data_file,
         output_name_to_index,
+        profile_ops=profile_ops,
+        weight_store=weight_store,
     )
     for node in sorted_graph:
         model_container_generator.append_tensor(node)
     constants_data_file.close()
+    if weight_store is not None:
+        weight_store.save()
 
     files = model_container_generator.generate_source()
     to_build = [(constants_fname, to_obj_name(constants_fname))]
@@ -16,8 +16,9 @@
 Backend-agnostic functions for elementwise codegen.
 """
 
+import re
 from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import jinja2
 
@@ -29,12 +30,20 @@ from . import tensor_accessor_codegen
 
 CONSTANT_TEMPLATE = jinja2.Template(
     """
-#define FUSED_ELE_THREAD_SIZE 256
+#define FUSED_ELE_THREAD_SIZE {{block_size}}
 
+// number of elements of a single read_t vector
 const int N_ELEMENTS_PER_THREAD = sizeof({{read_t}}) / sizeof({{data_t}});
 const int N_ELEMENTS_PER_READ = sizeof({{read_t}}) / sizeof({{data_t}});
 const int N_OPS_PER_THREAD = sizeof({{read_t}}) / sizeof({{op_t}});
-    """
+const int N_VECTORS_PER_THREAD = {{vectors_per_thread}};
+const int N_ELEMENTS_PER_BLOCK = FUSED_ELE_THREAD_SIZE * N_VECTORS_PER_THREAD * N_ELEMENTS_PER_THREAD;
+{% if grid_stride %}
+const int GRID_STRIDE_MAX_BLOCKS = {{grid_stride_max_blocks}};
+{% endif %}
+    """,
+    trim_blocks=True,
+    lstrip_blocks=True,
 )
 
 KERNEL_DECL_INPUT_PARAM_TEMPLATE = jinja2.Template("const {{read_t}}* input{{idx}}")
@@ -44,19 +53,22 @@ KERNEL_TMP_INPUT_TEMPLATE = jinja2.Template("p_tmp_i{{idx}}[i]")
 KERNEL_TMP_OUTPUT_TEMPLATE = jinja2.Template("p_tmp_o{{idx}}[i]")
 
 
+# Tensor accessor offsets are not baked into kernels. They are added to the
+# data pointers at the call site instead, so that fused_elementwise ops which
+# only differ in offsets can share a kernel.
 GET_STRIDED_ADDRESS_TEMPLATE = jinja2.Template(
     """
   {% if tensor_accessor.is_contiguous %}
   {{data_ptr}} = get_strided_address</*data_t*/ {{data_t}},
                                      /*read_t*/ {{read_t}},
                                      /*is_contiguous*/ true>(
-      {{data_ptr}}, {{data_idx}}, {{tensor_accessor.offset}}, 0, 0);
+      {{data_ptr}}, {{data_idx}}, 0, 0, 0);
   {% else %}
   {{data_ptr}} = get_strided_address</*data_t*/ {{data_t}},
                                      /*read_t*/ {{read_t}},
                                      /*is_contiguous*/ false>(
       {{data_ptr}}, {{data_idx}},
-      {{tensor_accessor.offset}},
+      0,
       {{tensor_accessor.original_total_elements_from_stride_dim}},
       {{tensor_accessor.actual_total_elements_from_stride_dim}});
   {% endif %}
@@ -87,21 +99,40 @@ KERNEL_DEFINE_OUTPUTS_TEMPLATE = jinja2.Template(
 
 KERNEL_WRITE_OUTPUT_TEMPLATE = jinja2.Template(
     """
+  {{read_t}} *{{output_name}} = output{{output_idx}};
   {{get_strided_address}}
   *{{output_name}} = tmp_o{{output_idx}};
     """
 )
 
 
+# Each thread processes N_VECTORS_PER_THREAD read_t vectors, which are
+# FUSED_ELE_THREAD_SIZE vectors apart so that reads of a block are coalesced.
+# With grid_stride, a fixed number of blocks loops over all elements.
+# With is_device, the kernel is generated as a device function which runs
+# on block bid, see GROUP_KERNEL_TEMPLATE.
 KERNEL_TEMPLATE = jinja2.Template(
     """
+{% if is_device %}
+__device__ __forceinline__ void
+{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims}} {{index_t}} n_elements, int bid) {
+{% else %}
 __global__ void
-{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims}} int n_elements) {
+{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims}} {{index_t}} n_elements) {
   const int bid = blockIdx.x;
+{% endif %}
   const int tid = threadIdx.x;
-  const int idx = bid * FUSED_ELE_THREAD_SIZE + tid;
-  const int idx_elem = idx * N_ELEMENTS_PER_THREAD;
-  if (idx_elem >= n_elements) {
+  {{index_t}} thread_idx = static_cast<{{index_t}}>(bid) * FUSED_ELE_THREAD_SIZE * N_VECTORS_PER_THREAD + tid;
+{% if grid_stride %}
+  const {{index_t}} grid_stride = static_cast<{{index_t}}>(gridDim.x) * FUSED_ELE_THREAD_SIZE * N_VECTORS_PER_THREAD;
+  for (; thread_idx * N_ELEMENTS_PER_THREAD < n_elements; thread_idx += grid_stride) {
+{% else %}
+  {
+{% endif %}
+#pragma unroll
+  for (int vec = 0; vec < N_VECTORS_PER_THREAD; ++vec) {
+  const {{index_t}} idx = thread_idx + vec * FUSED_ELE_THREAD_SIZE;
+  if (idx * N_ELEMENTS_PER_THREAD >= n_elements) {
     return;
   }
   {{read_inputs}}
@@ -111,8 +142,12 @@ __global__ void
     {{fused_funcs}}
   }
   {{write_outputs}}
+  }
+  }
 }
-    """
+    """,
+    trim_blocks=True,
+    lstrip_blocks=True,
 )
 
 FUNC_DECL_INPUT_PARAM_TEMPLATE = jinja2.Template("const {{data_t}}* input{{idx}}")
@@ -140,31 +175,36 @@ namespace {
 
 }  // namespace
 
-void invoke_{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims_decl}} int n_elements, {{prefix}}Stream_t stream) {
+void invoke_{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims_decl}} {{index_t}} n_elements, {{prefix}}Stream_t stream) {
     if (n_elements == 0) {
       return;
     }
-    int block_size = static_cast<int>(std::ceil(static_cast<double>(n_elements) / N_ELEMENTS_PER_THREAD / FUSED_ELE_THREAD_SIZE));
-    {{func_name}}<<<block_size, FUSED_ELE_THREAD_SIZE, 0, stream>>>(
+    {{index_t}} grid_size = (n_elements + N_ELEMENTS_PER_BLOCK - 1) / N_ELEMENTS_PER_BLOCK;
+{% if grid_stride %}
+    grid_size = std::min(grid_size, static_cast<{{index_t}}>(GRID_STRIDE_MAX_BLOCKS));
+{% endif %}
+    {{func_name}}<<<static_cast<unsigned>(grid_size), FUSED_ELE_THREAD_SIZE, 0, stream>>>(
         {{kernel_call_output_params}},
         {{kernel_call_input_params}},
         {{dynamic_dims_call}}
         n_elements
     );
 }
-    """
+    """,
+    trim_blocks=True,
+    lstrip_blocks=True,
 )
 
 FUNC_DECL_TEMPLATE = jinja2.Template(
     """
-void invoke_{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims}} int n_elements, {{prefix}}Stream_t stream);
+void invoke_{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims}} {{index_t}} n_elements, {{prefix}}Stream_t stream);
     """
 )
 
 FUNC_CALL_TEMPLATE = jinja2.Template(
     """
 {{indent}}{
-    {{indent}}int {{func_name}}_n_elements = {{calculate_n}};
+    {{indent}}{{index_t}} {{func_name}}_n_elements = {{calculate_n}};
     {{indent}}invoke_{{func_name}}({{output_params}}, {{input_params}}, {{dynamic_dims}} {{func_name}}_n_elements, {{stream}});
 {{indent}}}
     """
@@ -200,6 +240,118 @@ class FusedElementwiseMetaData:
     sub_funcs: List[ElementwiseMetaData]
 
 
+@dataclass(frozen=True)
+class LaunchConfig:
+    """Launch configuration of a fused_elementwise kernel."""
+
+    # threads per block
+    block_size: int
+    # read_t vectors processed by each thread
+    vectors_per_thread: int
+    # whether a fixed number of blocks loops over all elements
+    grid_stride: bool
+
+    def name(self) -> str:
+        """Returns the name of the config, which is the algo of profiling
+        results."""
+        name = f"block{self.block_size}_vec{self.vectors_per_thread}"
+        if self.grid_stride:
+            name += "_grid_stride"
+        return name
+
+    @staticmethod
+    def from_name(name: str) -> "LaunchConfig":
+        match = re.fullmatch(r"block(\d+)_vec(\d+)(_grid_stride)?", name)
+        if match is None:
+            raise RuntimeError(f"Invalid fused_elementwise launch config {name}!")
+        return LaunchConfig(
+            int(match.group(1)), int(match.group(2)), match.group(3) is not None
+        )
+
+
+DEFAULT_LAUNCH_CONFIG = LaunchConfig(256, 1, False)
+
+# Blocks of grid-stride kernels, enough to fill the SMs of a GPU.
+GRID_STRIDE_MAX_BLOCKS = 4096
+
+# Launch configs used without profiling, as (max number of elements, config).
+# The first entry which covers the number of elements of an op is used.
+LAUNCH_CONFIG_HEURISTICS = [
+    (1 << 18, DEFAULT_LAUNCH_CONFIG),
+    (1 << 24, LaunchConfig(256, 2, False)),
+    (1 << 27, LaunchConfig(256, 4, False)),
+    (None, LaunchConfig(512, 4, True)),
+]
+
+# Launch configs profiled by the fused_elementwise profiler. Grid-stride
+# configs are only profiled if they launch fewer blocks than one-shot ones.
+LAUNCH_CONFIG_CANDIDATES = [
+    LaunchConfig(128, 1, False),
+    LaunchConfig(256, 1, False),
+    LaunchConfig(256, 2, False),
+    LaunchConfig(256, 4, False),
+    LaunchConfig(512, 2, False),
+    LaunchConfig(256, 4, True),
+    LaunchConfig(512, 4, True),
+]
+
+# Up to this number of elements, kernels are indexed with int. Indices may
+# exceed the number of elements by up to a grid stride, hence the margin to
+# INT_MAX.
+INT32_INDEX_MAX_ELEMENTS = 1 << 30
+# read_t is at most 16 bytes, i.e. 8 fp16 elements
+MAX_ELEMENTS_PER_VECTOR = 8
+
+
+def get_index_type(max_num_elements: int) -> str:
+    """Returns the type of element indices of a fused_elementwise kernel."""
+    if max_num_elements > INT32_INDEX_MAX_ELEMENTS:
+        return "int64_t"
+    return "int"
+
+
+def heuristic_launch_config(max_num_elements: int) -> LaunchConfig:
+    """Returns the launch config used if an op has not been profiled."""
+    for num_elements, launch_config in LAUNCH_CONFIG_HEURISTICS:
+        if num_elements is None or max_num_elements <= num_elements:
+            return launch_config
+    raise AssertionError("unreachable")
+
+
+def launch_config_candidates(max_num_elements: int) -> List[LaunchConfig]:
+    """Returns the launch configs to be profiled for an op."""
+    candidates = []
+    for launch_config in LAUNCH_CONFIG_CANDIDATES:
+        if launch_config.grid_stride:
+            block_elements = (
+                launch_config.block_size
+                * launch_config.vectors_per_thread
+                * MAX_ELEMENTS_PER_VECTOR
+            )
+            if max_num_elements <= GRID_STRIDE_MAX_BLOCKS * block_elements:
+                continue
+        candidates.append(launch_config)
+    return candidates
+
+
+def get_max_num_elements(output_accessors: List[TensorAccessor]) -> int:
+    """Returns the upper bound of the number of elements of a
+    fused_elementwise op."""
+    num_elements = 1
+    for dim in output_accessors[0].original_shapes:
+        num_elements *= dim.upper_bound()
+    return num_elements
+
+
+def get_launch_config(func_attrs: Dict[str, Any]) -> LaunchConfig:
+    """Returns the profiled launch config of a fused_elementwise op, or the
+    heuristic one if the op has not been profiled."""
+    for exec_item in func_attrs.get("exec_path", {}).values():
+        if exec_item.algo:
+            return LaunchConfig.from_name(exec_item.algo)
+    return heuristic_launch_config(get_max_num_elements(func_attrs["output_accessors"]))
+
+
 def gen_function_single_thread(
     fused_func_metadata,
     input_names,
@@ -357,13 +509,15 @@ def _get_types_and_sizes(
 
     # Handle input broadcast.
     output_shape = output_accessors[0].original_shapes
-    dtype = "float16"
+    dtype = inputs[0]._attrs["dtype"]
     input_broadcast_sizes = []
     min_num_elements = None
     for input_tensor, input_accessor in zip(inputs, input_accessors):
-        if input_tensor._attrs["dtype"] != "float16":
+        if input_tensor._attrs["dtype"] != dtype:
             raise NotImplementedError(
-                "Unsupported dtype {}!".format(input_tensor._attrs["dtype"])
+                "Mixed dtypes {} and {} are not supported!".format(
+                    dtype, input_tensor._attrs["dtype"]
+                )
             )
         input_shape = input_accessor.original_shapes
         broadcastable, _ = shape_utils.get_broadcast_max_shape(
@@ -428,10 +582,10 @@ def _parse_func_metadata(
         inputs, input_accessors, output_accessors, backend_spec
     )
     read_type = backend_spec.get_backend_type(
-        alignment, dtype, backend_spec.read_num_elements_to_backend_type
+        alignment, dtype, backend_spec.get_read_num_elements_to_backend_type(dtype)
     )
     op_type = backend_spec.get_backend_type(
-        alignment, dtype, backend_spec.op_num_elements_to_backend_type
+        alignment, dtype, backend_spec.get_op_num_elements_to_backend_type(dtype)
     )
     data_type = backend_spec.get_fp16_dtype(dtype)
     sub_func_metadata, op_type = _get_sub_func_metadata(
@@ -527,6 +681,23 @@ def _gen_input_broadcast_size_str(
     return res
 
 
+def _gen_data_ptr_str(tensor: Tensor, backend_spec: BackendSpec) -> str:
+    """Casts the pointer of tensor to the data type of the kernel."""
+    dtype = tensor._attrs["dtype"]
+    if dtype == "float16":
+        return backend_spec.cast_to_half_ptr_template.render(name=tensor._attrs["name"])
+    return "reinterpret_cast<{}*>({})".format(
+        backend_spec.get_fp16_dtype(dtype), tensor._attrs["name"]
+    )
+
+
+def _gen_ptr_with_offset_str(ptr: str, tensor_accessor: TensorAccessor) -> str:
+    """Applies the offset of tensor_accessor to a data pointer."""
+    if tensor_accessor.offset == 0:
+        return ptr
+    return "{} + {}".format(ptr, tensor_accessor.offset)
+
+
 def _gen_dynamic_dim_str(
     index_type: str, dynamic_dims: List[IntVar], has_type: bool
 ) -> str:
@@ -574,7 +745,7 @@ def _gen_write_outputs_str(fused_elementwise_metadata: FusedElementwiseMetaData)
     for output_idx, output_accessor in enumerate(
         fused_elementwise_metadata.output_accessors
     ):
-        output_name = f"output{output_idx}"
+        output_name = f"output_tmp{output_idx}"
         get_strided_addr_str = GET_STRIDED_ADDRESS_TEMPLATE.render(
             tensor_accessor=output_accessor,
             data_ptr=output_name,
@@ -586,17 +757,36 @@ def _gen_write_outputs_str(fused_elementwise_metadata: FusedElementwiseMetaData)
             get_strided_address=get_strided_addr_str,
             output_name=output_name,
             output_idx=output_idx,
+            read_t=fused_elementwise_metadata.read_t,
         )
         write_outputs.append(write_out)
     write_outputs_str = "\n".join(write_outputs)
     return write_outputs_str
 
 
+def _gen_constant(
+    fused_elementwise_metadata: FusedElementwiseMetaData,
+    launch_config: LaunchConfig,
+) -> str:
+    return CONSTANT_TEMPLATE.render(
+        block_size=launch_config.block_size,
+        vectors_per_thread=launch_config.vectors_per_thread,
+        grid_stride=launch_config.grid_stride,
+        grid_stride_max_blocks=GRID_STRIDE_MAX_BLOCKS,
+        read_t=fused_elementwise_metadata.read_t,
+        op_t=fused_elementwise_metadata.op_t,
+        data_t=fused_elementwise_metadata.data_t,
+    )
+
+
 def _gen_kernel_function(
-    func_attrs: Dict[str, Any],
+    func_name: str,
     index_type: str,
     fused_elementwise_metadata: FusedElementwiseMetaData,
     backend_datatype_convertors: Dict[str, Dict[str, str]],
+    launch_config: LaunchConfig = DEFAULT_LAUNCH_CONFIG,
+    element_index_type: str = "int",
+    is_device: bool = False,
 ) -> str:
     output_params_decl = ",".join(
         [
@@ -644,7 +834,10 @@ def _gen_kernel_function(
     )
 
     kernel_func = KERNEL_TEMPLATE.render(
-        func_name=func_attrs["name"],
+        is_device=is_device,
+        grid_stride=launch_config.grid_stride,
+        index_t=element_index_type,
+        func_name=func_name,
         output_params=output_params_decl,
         input_params=input_params_decl,
         dynamic_dims=_gen_dynamic_dim_str(
@@ -658,13 +851,46 @@ def _gen_kernel_function(
     return kernel_func
 
 
+def fused_elementwise_config(
+    func_attrs: Dict[str, Any],
+    backend_spec: BackendSpec,
+) -> None:
+    """Initializes the launch config candidates of a fused_elementwise op
+    for profiling, i.e. sets op_instance, heuristic_launch_config and the
+    data types of the kernel."""
+    fused_elementwise_metadata = _parse_func_metadata(
+        func_attrs["elementwise_ops"],
+        func_attrs["inputs"],
+        func_attrs["outputs"],
+        func_attrs["input_accessors"],
+        func_attrs["output_accessors"],
+        func_attrs["original_inputs"],
+        func_attrs["original_outputs"],
+        backend_spec,
+    )
+    func_attrs["read_t"] = fused_elementwise_metadata.read_t
+    func_attrs["op_t"] = fused_elementwise_metadata.op_t
+    func_attrs["data_t"] = fused_elementwise_metadata.data_t
+    max_num_elements = get_max_num_elements(func_attrs["output_accessors"])
+    func_attrs["op_instance"] = {
+        launch_config.name(): launch_config
+        for launch_config in launch_config_candidates(max_num_elements)
+    }
+    func_attrs["heuristic_launch_config"] = heuristic_launch_config(
+        max_num_elements
+    ).name()
+
+
 def fused_elementwise_gen_function(
     func_attrs: Dict[str, Any],
     custom_libs: str,
     head_template: str,
     backend_spec: BackendSpec,
+    launch_config: Optional[LaunchConfig] = None,
 ) -> str:
-    """Generates fused_elementwise function definition."""
+    """Generates fused_elementwise function definition. The kernel is
+    launched with launch_config if given, e.g. by profilers, and with the
+    config selected by get_launch_config otherwise."""
 
     ops = func_attrs["elementwise_ops"]
     inputs = func_attrs["inputs"]
@@ -688,14 +914,20 @@ def fused_elementwise_gen_function(
     func_attrs["op_t"] = fused_elementwise_metadata.op_t
     func_attrs["data_t"] = fused_elementwise_metadata.data_t
 
+    if launch_config is None:
+        launch_config = get_launch_config(func_attrs)
+    element_index_type = get_index_type(get_max_num_elements(output_accessors))
+
     tensor_accessor_lib = tensor_accessor_codegen.get_libs()
     tensor_accessor_lib_str = "\n\n" + tensor_accessor_lib + "\n\n"
 
     kernel_function = _gen_kernel_function(
-        func_attrs,
+        func_attrs["name"],
         backend_spec.index_type,
         fused_elementwise_metadata,
         backend_spec.backend_datatype_convertors,
+        launch_config,
+        element_index_type,
     )
     output_params_decl = ",".join(
         [
@@ -729,13 +961,11 @@ def fused_elementwise_gen_function(
             for i, _ in enumerate(fused_elementwise_metadata.inputs)
         ]
     )
-    constant = CONSTANT_TEMPLATE.render(
-        read_t=fused_elementwise_metadata.read_t,
-        op_t=fused_elementwise_metadata.op_t,
-        data_t=fused_elementwise_metadata.data_t,
-    )
+    constant = _gen_constant(fused_elementwise_metadata, launch_config)
 
     function = FUNC_TEMPLATE.render(
+        grid_stride=launch_config.grid_stride,
+        index_t=element_index_type,
         prefix=backend_spec.prefix,
         head=backend_spec.header_src_template.render(extra_header=head_template),
         constant=constant,
@@ -803,6 +1033,7 @@ def fused_elementwise_gen_function_decl(
     )
 
     function_decl = FUNC_DECL_TEMPLATE.render(
+        index_t=get_index_type(get_max_num_elements(output_accessors)),
         prefix=backend_spec.prefix,
         func_name=func_name,
         output_params=output_params_decl,
@@ -841,24 +1072,20 @@ def fused_elementwise_gen_function_call(
     )
 
     output_params_vec = []
-    for output in outputs:
-        if output._attrs["dtype"] != "float16":
-            raise NotImplementedError(
-                "Unsupported dtype {}".format(output._attrs["dtype"])
-            )
+    for output, output_accessor in zip(outputs, output_accessors):
         output_params_vec.append(
-            backend_spec.cast_to_half_ptr_template.render(name=output._attrs["name"])
+            _gen_ptr_with_offset_str(
+                _gen_data_ptr_str(output, backend_spec), output_accessor
+            )
         )
     output_params = ",".join(output_params_vec)
 
     input_params_vec = []
-    for inp in inputs:
-        if inp._attrs["dtype"] != "float16":
-            raise NotImplementedError(
-                "Unsupported dtype {}".format(inp._attrs["dtype"])
-            )
+    for inp, input_accessor in zip(inputs, input_accessors):
         input_params_vec.append(
-            backend_spec.cast_to_half_ptr_template.render(name=inp._attrs["name"])
+            _gen_ptr_with_offset_str(
+                _gen_data_ptr_str(inp, backend_spec), input_accessor
+            )
         )
     input_params = ",".join(input_params_vec)
 
@@ -867,6 +1094,7 @@ def fused_elementwise_gen_function_call(
     )
 
     return FUNC_CALL_TEMPLATE.render(
+        index_t=get_index_type(get_max_num_elements(output_accessors)),
         stream=backend_spec.stream,
         func_name=func_attrs["name"],
         calculate_n=num_elements_calculator,
@@ -879,3 +1107,283 @@ def fused_elementwise_gen_function_call(
         ),
         indent=indent,
     )
+
+
+# group_fused_elementwise: each fused_elementwise op is a segment, which
+# runs on its own range of thread blocks. Segments get their own
+# namespace, so that their read / op types are independent.
+GROUP_KERNEL_TEMPLATE = jinja2.Template(
+    """
+__global__ void
+{{func_name}}({{params}}, {{dynamic_dims}} {{n_elements}}, {{block_ends}}) {
+  const int bid = blockIdx.x;
+{% for segment in segments %}
+  if (bid < block_end{{loop.index0}}) {
+    segment{{loop.index0}}::kernel(
+        {{segment.args}},
+        {{segment.dynamic_dims}}
+        n_elements{{loop.index0}},
+        bid{% if not loop.first %} - block_end{{loop.index0 - 1}}{% endif %});
+    return;
+  }
+{% endfor %}
+}
+    """,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+GROUP_FUNC_TEMPLATE = jinja2.Template(
+    """
+{{head}}
+
+namespace {
+
+{{custom_libs}}
+
+{{tensor_accessor_lib}}
+
+{% for segment in segments %}
+namespace segment{{loop.index0}} {
+
+{{segment.constant}}
+
+{{segment.kernel_function}}
+
+}  // namespace segment{{loop.index0}}
+
+{% endfor %}
+{{kernel_function}}
+
+}  // namespace
+
+void invoke_{{func_name}}({{params}}, {{dynamic_dims_decl}} {{n_elements_decl}}, {{prefix}}Stream_t stream) {
+{% for segment in segments %}
+    int block_end{{loop.index0}} = {% if not loop.first %}block_end{{loop.index0 - 1}} + {% endif %}(n_elements{{loop.index0}} + segment{{loop.index0}}::N_ELEMENTS_PER_BLOCK - 1) / segment{{loop.index0}}::N_ELEMENTS_PER_BLOCK;
+{% endfor %}
+    if (block_end{{num_segments - 1}} == 0) {
+      return;
+    }
+    {{func_name}}<<<block_end{{num_segments - 1}}, FUSED_ELE_THREAD_SIZE, 0, stream>>>(
+        {{kernel_call_params}},
+        {{dynamic_dims_call}}
+        {{n_elements_call}},
+        {{block_ends_call}}
+    );
+}
+    """,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+GROUP_FUNC_DECL_TEMPLATE = jinja2.Template(
+    """
+void invoke_{{func_name}}({{params}}, {{dynamic_dims}} {{n_elements}}, {{prefix}}Stream_t stream);
+    """
+)
+
+GROUP_FUNC_CALL_TEMPLATE = jinja2.Template(
+    """
+{{indent}}{
+{% for calculate_n in calculate_ns %}
+    {{indent}}int {{func_name}}_n_elements{{loop.index0}} = {{calculate_n}};
+{% endfor %}
+    {{indent}}invoke_{{func_name}}({{params}}, {{dynamic_dims}} {{n_elements}}, {{stream}});
+{{indent}}}
+    """,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+def _get_segment_metadata(
+    func_attrs: Dict[str, Any], backend_spec: BackendSpec
+) -> List[FusedElementwiseMetaData]:
+    """Returns the metadata of each fused_elementwise op of a
+    group_fused_elementwise op."""
+    return [
+        _parse_func_metadata(
+            op._attrs["elementwise_ops"],
+            op._attrs["inputs"],
+            op._attrs["outputs"],
+            op._attrs["input_accessors"],
+            op._attrs["output_accessors"],
+            op._attrs["original_inputs"],
+            op._attrs["original_outputs"],
+            backend_spec,
+        )
+        for op in func_attrs["fused_elementwise_ops"]
+    ]
+
+
+def _get_group_dynamic_dims(
+    segments: List[FusedElementwiseMetaData],
+) -> List[IntVar]:
+    res = {}
+    for segment in segments:
+        for dim in segment.dynamic_dims:
+            res[dim._attrs["name"]] = dim
+    return list(res.values())
+
+
+def _gen_segment_params(
+    segments: List[FusedElementwiseMetaData], type_key: str, cast: bool = False
+) -> str:
+    """Generates the pointer params of all segments, either declarations of
+    type_key ("data_t" or "read_t"), or casts to read_t of the host params.
+    """
+    params = []
+    for segment_idx, segment in enumerate(segments):
+        names = [
+            ("", f"s{segment_idx}_output{idx}") for idx in range(len(segment.outputs))
+        ] + [
+            ("const ", f"s{segment_idx}_input{idx}")
+            for idx in range(len(segment.inputs))
+        ]
+        for const, name in names:
+            dtype = getattr(segment, type_key)
+            if cast:
+                params.append(f"reinterpret_cast<{const}{dtype}*>({name})")
+            else:
+                params.append(f"{const}{dtype}* {name}")
+    return ", ".join(params)
+
+
+def _gen_ptrs_with_offsets(
+    tensors: List[Tensor],
+    tensor_accessors: List[TensorAccessor],
+    backend_spec: BackendSpec,
+) -> List[str]:
+    res = []
+    for tensor, tensor_accessor in zip(tensors, tensor_accessors):
+        res.append(
+            _gen_ptr_with_offset_str(
+                _gen_data_ptr_str(tensor, backend_spec), tensor_accessor
+            )
+        )
+    return res
+
+
+def group_fused_elementwise_gen_function(
+    func_attrs: Dict[str, Any],
+    custom_libs: str,
+    head_template: str,
+    backend_spec: BackendSpec,
+) -> str:
+    """Generates group_fused_elementwise function definition."""
+    segments = _get_segment_metadata(func_attrs, backend_spec)
+    dynamic_dims = _get_group_dynamic_dims(segments)
+    # segments are small, see fuse_group_elementwise, so they are launched
+    # with the default config and int indices
+    segment_srcs = []
+    for segment_idx, segment in enumerate(segments):
+        segment_dynamic_dims = _gen_dynamic_dim_str(
+            backend_spec.index_type, segment.dynamic_dims, has_type=False
+        )
+        args = [f"s{segment_idx}_output{idx}" for idx in range(len(segment.outputs))]
+        args += [f"s{segment_idx}_input{idx}" for idx in range(len(segment.inputs))]
+        segment_srcs.append(
+            {
+                "constant": _gen_constant(segment, DEFAULT_LAUNCH_CONFIG),
+                "kernel_function": _gen_kernel_function(
+                    "kernel",
+                    backend_spec.index_type,
+                    segment,
+                    backend_spec.backend_datatype_convertors,
+                    is_device=True,
+                ),
+                "args": ", ".join(args),
+                "dynamic_dims": segment_dynamic_dims,
+            }
+        )
+    num_segments = len(segments)
+    n_elements = ", ".join(f"int n_elements{i}" for i in range(num_segments))
+    kernel_function = GROUP_KERNEL_TEMPLATE.render(
+        func_name=func_attrs["name"],
+        params=_gen_segment_params(segments, "read_t"),
+        dynamic_dims=_gen_dynamic_dim_str(
+            backend_spec.index_type, dynamic_dims, has_type=True
+        ),
+        n_elements=n_elements,
+        block_ends=", ".join(f"int block_end{i}" for i in range(num_segments)),
+        segments=segment_srcs,
+    )
+    tensor_accessor_lib = tensor_accessor_codegen.get_libs()
+    return GROUP_FUNC_TEMPLATE.render(
+        prefix=backend_spec.prefix,
+        head=backend_spec.header_src_template.render(extra_header=head_template),
+        custom_libs=custom_libs,
+        tensor_accessor_lib="\n\n" + tensor_accessor_lib + "\n\n",
+        segments=segment_srcs,
+        num_segments=num_segments,
+        kernel_function=kernel_function,
+        func_name=func_attrs["name"],
+        params=_gen_segment_params(segments, "data_t"),
+        dynamic_dims_decl=_gen_dynamic_dim_str(
+            backend_spec.index_type, dynamic_dims, has_type=True
+        ),
+        n_elements_decl=n_elements,
+        kernel_call_params=_gen_segment_params(segments, "read_t", cast=True),
+        dynamic_dims_call=_gen_dynamic_dim_str(
+            backend_spec.index_type, dynamic_dims, has_type=False
+        ),
+        n_elements_call=", ".join(f"n_elements{i}" for i in range(num_segments)),
+        block_ends_call=", ".join(f"block_end{i}" for i in range(num_segments)),
+    )
+
+
+def group_fused_elementwise_gen_function_decl(
+    func_attrs,
+    backend_spec: BackendSpec,
+):
+    """Generates group_fused_elementwise function declaration."""
+    segments = _get_segment_metadata(func_attrs, backend_spec)
+    return GROUP_FUNC_DECL_TEMPLATE.render(
+        prefix=backend_spec.prefix,
+        func_name=func_attrs["name"],
+        params=_gen_segment_params(segments, "data_t"),
+        dynamic_dims=_gen_dynamic_dim_str(
+            backend_spec.index_type,
+            _get_group_dynamic_dims(segments),
+            has_type=True,
+        ),
+        n_elements=", ".join(f"int n_elements{i}" for i in range(len(segments))),
+    )
+
+
+def group_fused_elementwise_gen_function_call(
+    func_attrs,
+    indent: str,
+    backend_spec: BackendSpec,
+):
+    """Generates group_fused_elementwise function call, i.e. a single
+    kernel launch for all fused_elementwise ops of the group."""
+    func_name = func_attrs["name"]
+    segments = _get_segment_metadata(func_attrs, backend_spec)
+    params = []
+    calculate_ns = []
+    for segment in segments:
+        params += _gen_ptrs_with_offsets(
+            segment.outputs, segment.output_accessors, backend_spec
+        )
+        params += _gen_ptrs_with_offsets(
+            segment.inputs, segment.input_accessors, backend_spec
+        )
+        calculate_ns.append(
+            _gen_int_var_product_str(segment.output_accessors[0].original_shapes)
+        )
+    return GROUP_FUNC_CALL_TEMPLATE.render(
+        stream=backend_spec.stream,
+        func_name=func_name,
+        calculate_ns=calculate_ns,
+        params=",".join(params),
+        dynamic_dims=_gen_dynamic_dim_str(
+            backend_spec.index_type,
+            _get_group_dynamic_dims(segments),
+            has_type=False,
+        ),
+        n_elements=", ".join(
+            f"{func_name}_n_elements{i}" for i in range(len(segments))
+        ),
+        indent=indent,
+    )
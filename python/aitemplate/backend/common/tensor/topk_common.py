@@ -766,4 +766,4 @@ def gen_profiler(
     # build
     target = Target.current()
     compile_engine = builder.Builder()
-    compile_engine.build_objs(file_pairs, target.compile_cmd(executable=True))
+    compile_engine.build_profilers(file_pairs, target.compile_cmd(executable=True))
@@ -247,4 +247,4 @@ def gen_profiler(func_attrs, workdir, header_files, backend_spec):
     # build
     target = Target.current()
     compile_engine = builder.Builder()
-    compile_engine.build_objs(file_pairs, target.compile_cmd(executable=True))
+    compile_engine.build_profilers(file_pairs, target.compile_cmd(executable=True))
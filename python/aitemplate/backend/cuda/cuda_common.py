@@ -19,13 +19,16 @@ from typing import Dict
 
 DTYPE_TO_CUDATYPE: Dict[str, str] = {
     "float16": "half",
+    "bfloat16": "__nv_bfloat16",
     "float": "float",
     "int64": "int64_t",
+    "int8": "int8_t",
 }
 
 
 DTYPE_TO_CUTLASSTYPE: Dict[str, str] = {
     "float16": "cutlass::half_t",
+    "bfloat16": "cutlass::bfloat16_t",
     "float": "float",
 }
 
@@ -17,12 +17,16 @@ Elementwise codegen for CUDA.
 """
 
 import os
+from hashlib import sha1
 from typing import Any, Dict
 
+import jinja2
+
 from ... import registry
 from ...backend_spec import CUDASpec
 from ...common import elementwise_common
 from ...target import Target
+from ..gemm_universal.common import add_profiler, build_profiler
 
 HEAD_TEMPLATE = """
 #include <cuda_fp16.hpp>
@@ -31,6 +35,63 @@ HEAD_TEMPLATE = """
 #include "cutlass/constants.h"
 """
 
+# A profiler times the function of a fused_elementwise op with a single
+# launch config. Inputs and outputs are allocated with the full size of
+# their tensors, and are accessed without accessor offsets.
+PROFILER_TEMPLATE = jinja2.Template(
+    """
+#include <iostream>
+
+{{function}}
+
+int main(int argc, char** argv) {
+  std::vector<{{data_t}}*> ptrs;
+{% for size in sizes %}
+  {
+    {{data_t}}* ptr;
+    cudaMalloc(&ptr, {{size}} * sizeof({{data_t}}));
+    cudaMemset(ptr, 0, {{size}} * sizeof({{data_t}}));
+    ptrs.push_back(ptr);
+  }
+{% endfor %}
+  cudaStream_t stream;
+  cudaStreamCreate(&stream);
+  auto run = [&]() {
+    invoke_{{func_name}}({{params}}, {{dynamic_dims}} {{n_elements}}, stream);
+  };
+  // warmup
+  for (int i = 0; i < 5; ++i) {
+    run();
+  }
+  cudaEvent_t events[2];
+  for (auto& event : events) {
+    cudaEventCreate(&event);
+  }
+  cudaEventRecord(events[0], stream);
+  for (int i = 0; i < {{iters}}; ++i) {
+    run();
+  }
+  cudaEventRecord(events[1], stream);
+  cudaEventSynchronize(events[1]);
+  auto err = cudaGetLastError();
+  if (err != cudaSuccess) {
+    std::cerr << cudaGetErrorString(err) << std::endl;
+    return 1;
+  }
+  float runtime_ms = 0;
+  cudaEventElapsedTime(&runtime_ms, events[0], events[1]);
+  std::cout << std::fixed << "TIME:" << runtime_ms / {{iters}} << std::endl;
+  std::cout << "WS:0" << std::endl;
+  for (auto ptr : ptrs) {
+    cudaFree(ptr);
+  }
+  return 0;
+}
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
 
 @registry.reg("cuda.fused_elementwise.gen_function")
 def fused_elementwise_gen_function(func_attrs: Dict[str, Any]) -> str:
@@ -46,6 +107,75 @@ def fused_elementwise_gen_function(func_attrs: Dict[str, Any]) -> str:
     )
 
 
+def _max_num_elements(tensor) -> int:
+    num_elements = 1
+    for dim in tensor._attrs["shape"]:
+        num_elements *= dim.upper_bound()
+    return num_elements
+
+
+def _gen_profilers(func_attrs: Dict[str, Any]) -> Dict[str, str]:
+    """Returns the profiler source of each launch config candidate. The
+    sources don't depend on the name of the op, so that ops with the same
+    fused functions share their profilers and profile cache entries."""
+    custom_libs = Target.current().get_custom_libs(
+        os.path.dirname(__file__), "custom_math.cuh"
+    )
+    func_attrs = dict(func_attrs, name=func_attrs["op"])
+    tensors = func_attrs["outputs"] + func_attrs["inputs"]
+    dynamic_dims = elementwise_common._get_dynamic_dims(func_attrs["output_accessors"])
+    profilers = {}
+    for algo, launch_config in func_attrs["op_instance"].items():
+        function = elementwise_common.fused_elementwise_gen_function(
+            func_attrs=func_attrs,
+            custom_libs=custom_libs,
+            head_template=HEAD_TEMPLATE,
+            backend_spec=CUDASpec(),
+            launch_config=launch_config,
+        )
+        profilers[algo] = PROFILER_TEMPLATE.render(
+            function=function,
+            func_name=func_attrs["name"],
+            data_t=func_attrs["data_t"],
+            sizes=[_max_num_elements(tensor) for tensor in tensors],
+            params=", ".join(f"ptrs[{idx}]" for idx in range(len(tensors))),
+            dynamic_dims="".join(f"{dim.upper_bound()}, " for dim in dynamic_dims),
+            n_elements=elementwise_common.get_max_num_elements(
+                func_attrs["output_accessors"]
+            ),
+            iters=20,
+        )
+    return profilers
+
+
+@registry.reg("cuda.fused_elementwise.config")
+def fused_elementwise_config(func_attrs: Dict[str, Any]) -> None:
+    """Initializes the launch config candidates of fused_elementwise and
+    the profiler_key, which identifies its fused functions in the profiler
+    directory and the profile cache."""
+    elementwise_common.fused_elementwise_config(func_attrs, CUDASpec())
+    hasher = sha1()
+    for code in _gen_profilers(func_attrs).values():
+        hasher.update(code.encode("utf-8"))
+    func_attrs["profiler_key"] = hasher.hexdigest()[:16]
+
+
+@registry.reg("cuda.fused_elementwise.gen_profiler")
+def fused_elementwise_gen_profiler(func_attrs: Dict[str, Any], workdir: str) -> None:
+    """Generates and builds a profiler for each launch config candidate of
+    fused_elementwise, see fused_elementwise_config."""
+    file_pairs = []
+    for algo, code in _gen_profilers(func_attrs).items():
+        add_profiler(
+            file_pairs,
+            workdir,
+            os.path.join(func_attrs["op"], func_attrs["profiler_key"]),
+            algo,
+            code,
+        )
+    build_profiler(file_pairs)
+
+
 @registry.reg("cuda.fused_elementwise.func_decl")
 def fused_elementwise_gen_function_decl(func_attrs):
     """Generates fused_elementwise function declaration."""
@@ -63,3 +193,36 @@ def fused_elementwise_gen_function_call(func_attrs, indent):
         indent=indent,
         backend_spec=CUDASpec(),
     )
+
+
+@registry.reg("cuda.group_fused_elementwise.gen_function")
+def group_fused_elementwise_gen_function(func_attrs: Dict[str, Any]) -> str:
+    """Generates group_fused_elementwise function definition."""
+    custom_libs = Target.current().get_custom_libs(
+        os.path.dirname(__file__), "custom_math.cuh"
+    )
+    return elementwise_common.group_fused_elementwise_gen_function(
+        func_attrs=func_attrs,
+        custom_libs=custom_libs,
+        head_template=HEAD_TEMPLATE,
+        backend_spec=CUDASpec(),
+    )
+
+
+@registry.reg("cuda.group_fused_elementwise.func_decl")
+def group_fused_elementwise_gen_function_decl(func_attrs):
+    """Generates group_fused_elementwise function declaration."""
+    return elementwise_common.group_fused_elementwise_gen_function_decl(
+        func_attrs=func_attrs,
+        backend_spec=CUDASpec(),
+    )
+
+
+@registry.reg("cuda.group_fused_elementwise.func_call")
+def group_fused_elementwise_gen_function_call(func_attrs, indent):
+    """Generates group_fused_elementwise function call."""
+    return elementwise_common.group_fused_elementwise_gen_function_call(
+        func_attrs=func_attrs,
+        indent=indent,
+        backend_spec=CUDASpec(),
+    )
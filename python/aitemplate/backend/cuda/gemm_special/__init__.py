@@ -15,7 +15,12 @@
 """
 special gemm ops
 """
-from . import bmm_rcr_n1, bmm_rrr_k1_tanh, gemm_rrr_small_nk
+from . import bmm_rcr_n1, bmm_rrr_k1_tanh, gemm_rcr_weight_int8, gemm_rrr_small_nk
 
 
-__all__ = ["bmm_rcr_n1", "bmm_rrr_k1_tanh", "gemm_rrr_small_nk"]
+__all__ = [
+    "bmm_rcr_n1",
+    "bmm_rrr_k1_tanh",
+    "gemm_rcr_weight_int8",
+    "gemm_rrr_small_nk",
+]
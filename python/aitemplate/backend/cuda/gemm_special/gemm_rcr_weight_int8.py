@@ -0,0 +1,304 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Weight-only int8 GEMM for A[RowMajor], B[ColMajor], C[RowMajor]
+
+A: [M, K] float16, A can be ND with the first N - 1 dimensions as batch
+   dimensions
+B: [N, K] int8, packed by aitemplate.utils.quantization.pack_int8_weight
+scale: [N] float16
+bias: [N] float16, gemm_rcr_bias_weight_int8 only
+C: [M, N] float16
+
+Every warp computes a single output channel for a few rows of A, so that
+each weight is read once per thread block. Weights are dequantized in
+registers and the products are accumulated in float, then scaled per
+channel.
+"""
+
+import jinja2
+
+from ... import registry
+from ...common import gemm_common
+from ..gemm_universal import common
+
+# pylint: disable=C0301,W0613,W0612
+
+
+FUNC_DECL_TEMPLATE = jinja2.Template(
+    """
+void {{func_name}}(
+  cutlass::half_t*,
+  int8_t*,
+  cutlass::half_t*,
+{% if has_bias %}
+  cutlass::half_t*,
+{% endif %}
+  cutlass::half_t*,
+{% for i in range(a_ndim) %}
+  int64_t*,
+{% endfor %}
+{% for i in range(b_ndim) %}
+  int64_t*,
+{% endfor %}
+{% for i in range(c_ndim) %}
+  int64_t*,
+{% endfor %}
+  cudaStream_t
+);
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+FUNC_CALL_TEMPLATE = jinja2.Template(
+    """
+{{indent}}{{func_name}}(
+{{indent}}    {{a_ptr}},
+{{indent}}    {{b_ptr}},
+{{indent}}    {{scale_ptr}},
+{% if has_bias %}
+{{indent}}    {{bias_ptr}},
+{% endif %}
+{{indent}}    {{c_ptr}},
+{% for adim in adims %}
+{{indent}}    {{adim}},
+{% endfor %}
+{% for bdim in bdims %}
+{{indent}}    {{bdim}},
+{% endfor %}
+{% for cdim in cdims %}
+{{indent}}    {{cdim}},
+{% endfor %}
+{{indent}}    stream
+{{indent}});
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+SRC_TEMPLATE = jinja2.Template(
+    """
+#include <algorithm>
+#include <cuda_fp16.h>
+#include <cuda_runtime.h>
+#include "cutlass/cutlass.h"
+#include "cutlass/numeric_types.h"
+
+namespace {
+
+constexpr int kWarpSize = 32;
+// warps per thread block, each of which computes one output channel
+constexpr int kNumWarps = 4;
+// rows of A computed by a thread block at a time
+constexpr int kRowsPerBlock = 4;
+// weights read by a thread at a time
+constexpr int kElementsPerThread = 8;
+constexpr int kMaxGridY = 65535;
+
+// Converts 4 packed weights to half2s of weights (0, 1) and (2, 3), see
+// pack_int8_weight. 0x64XX is 1024 + XX in half, so the weights are obtained
+// by placing the bytes below 0x64 and subtracting 1024 + 128.
+__device__ __forceinline__ void dequantize_int8x4(uint32_t packed, half2* out) {
+  const uint32_t kBase = 0x64646464;
+  uint32_t lo = __byte_perm(packed, kBase, 0x5250);
+  uint32_t hi = __byte_perm(packed, kBase, 0x5351);
+  const half2 kOffset = __float2half2_rn(1152.f);
+  out[0] = __hsub2(*reinterpret_cast<half2*>(&lo), kOffset);
+  out[1] = __hsub2(*reinterpret_cast<half2*>(&hi), kOffset);
+}
+
+template <bool HAS_BIAS>
+__global__ void gemm_rcr_weight_int8_kernel(
+    const half* __restrict__ a,
+    const uint8_t* __restrict__ b,
+    const half* __restrict__ scale,
+    const half* __restrict__ bias,
+    half* __restrict__ c,
+    int64_t M,
+    int64_t N,
+    int64_t K) {
+  const int warp_id = threadIdx.x / kWarpSize;
+  const int lane_id = threadIdx.x % kWarpSize;
+  const int64_t n = static_cast<int64_t>(blockIdx.x) * kNumWarps + warp_id;
+  if (n >= N) {
+    return;
+  }
+  const uint8_t* b_row = b + n * K;
+  const float channel_scale = __half2float(scale[n]);
+  const float channel_bias = HAS_BIAS ? __half2float(bias[n]) : 0.f;
+
+  for (int64_t m_begin = static_cast<int64_t>(blockIdx.y) * kRowsPerBlock;
+       m_begin < M;
+       m_begin += static_cast<int64_t>(gridDim.y) * kRowsPerBlock) {
+    float acc[kRowsPerBlock] = {0.f};
+    for (int64_t k = lane_id * kElementsPerThread; k < K;
+         k += kWarpSize * kElementsPerThread) {
+      uint2 packed = __ldg(reinterpret_cast<const uint2*>(b_row + k));
+      half2 w[4];
+      dequantize_int8x4(packed.x, w);
+      dequantize_int8x4(packed.y, w + 2);
+#pragma unroll
+      for (int i = 0; i < kRowsPerBlock; ++i) {
+        const int64_t m = m_begin + i;
+        if (m < M) {
+          uint4 a_vec = __ldg(reinterpret_cast<const uint4*>(a + m * K + k));
+          const half2* a2 = reinterpret_cast<const half2*>(&a_vec);
+#pragma unroll
+          for (int j = 0; j < 4; ++j) {
+            float2 af = __half22float2(a2[j]);
+            float2 wf = __half22float2(w[j]);
+            acc[i] += af.x * wf.x + af.y * wf.y;
+          }
+        }
+      }
+    }
+
+#pragma unroll
+    for (int i = 0; i < kRowsPerBlock; ++i) {
+#pragma unroll
+      for (int offset = kWarpSize / 2; offset > 0; offset /= 2) {
+        acc[i] += __shfl_xor_sync(0xffffffff, acc[i], offset);
+      }
+    }
+    if (lane_id == 0) {
+#pragma unroll
+      for (int i = 0; i < kRowsPerBlock; ++i) {
+        const int64_t m = m_begin + i;
+        if (m < M) {
+          c[m * N + n] = __float2half_rn(acc[i] * channel_scale + channel_bias);
+        }
+      }
+    }
+  }
+}
+
+} // namespace
+
+void {{function_name}} (
+    cutlass::half_t* a_ptr,
+    int8_t* b_ptr,
+    cutlass::half_t* scale_ptr,
+{% if has_bias %}
+    cutlass::half_t* bias_ptr,
+{% endif %}
+    cutlass::half_t* c_ptr,
+{% for i in range(a_ndim) %}
+    int64_t* a_dim{{i}},
+{% endfor %}
+{% for i in range(b_ndim) %}
+    int64_t* b_dim{{i}},
+{% endfor %}
+{% for i in range(c_ndim) %}
+    int64_t* c_dim{{i}},
+{% endfor %}
+    cudaStream_t stream
+) {
+  {{shape_function}}
+  {{input_output_checks}}
+  if (!scale_ptr) {
+    throw std::runtime_error("scale_ptr is null!");
+  }
+{% if has_bias %}
+  if (!bias_ptr) {
+    throw std::runtime_error("bias_ptr is null!");
+  }
+{% endif %}
+
+  dim3 grid(
+      (N + kNumWarps - 1) / kNumWarps,
+      std::min<int64_t>((M + kRowsPerBlock - 1) / kRowsPerBlock, kMaxGridY));
+  gemm_rcr_weight_int8_kernel<{{"true" if has_bias else "false"}}>
+      <<<grid, kNumWarps * kWarpSize, 0, stream>>>(
+          reinterpret_cast<const half*>(a_ptr),
+          reinterpret_cast<const uint8_t*>(b_ptr),
+          reinterpret_cast<const half*>(scale_ptr),
+{% if has_bias %}
+          reinterpret_cast<const half*>(bias_ptr),
+{% else %}
+          nullptr,
+{% endif %}
+          reinterpret_cast<half*>(c_ptr),
+          M,
+          N,
+          K);
+}
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+def _has_bias(func_attrs):
+    return func_attrs["op"] == "gemm_rcr_bias_weight_int8"
+
+
+@registry.reg("cuda.gemm_rcr_weight_int8.gen_function")
+@registry.reg("cuda.gemm_rcr_bias_weight_int8.gen_function")
+def gen_function(func_attrs, exec_cond_template, dim_info_dict):
+    shape_func = gemm_common.gen_shape_eval_code(
+        indent=1, dtype="int64_t", dim_info_dict=dim_info_dict, is_ptr=True
+    )
+    a_ndim = func_attrs["inputs"][0]._rank()
+    c_ndim = func_attrs["outputs"][0]._rank()
+    input_output_checks = common.INPUT_OUTPUT_CHECKS_TEMPLATE.render(
+        input_ndims=a_ndim,
+        weight_ndims=2,
+        output_ndims=c_ndim,
+    )
+    return SRC_TEMPLATE.render(
+        function_name=func_attrs["name"],
+        shape_function=shape_func,
+        input_output_checks=input_output_checks,
+        has_bias=_has_bias(func_attrs),
+        a_ndim=a_ndim,
+        b_ndim=2,
+        c_ndim=c_ndim,
+    )
+
+
+@registry.reg("cuda.gemm_rcr_weight_int8.func_decl")
+@registry.reg("cuda.gemm_rcr_bias_weight_int8.func_decl")
+def gen_function_decl(func_attrs):
+    return FUNC_DECL_TEMPLATE.render(
+        func_name=func_attrs["name"],
+        has_bias=_has_bias(func_attrs),
+        a_ndim=func_attrs["inputs"][0]._rank(),
+        b_ndim=2,
+        c_ndim=func_attrs["outputs"][0]._rank(),
+    )
+
+
+@registry.reg("cuda.gemm_rcr_weight_int8.func_call")
+@registry.reg("cuda.gemm_rcr_bias_weight_int8.func_call")
+def gen_function_call(func_attrs, indent="  "):
+    a, b, scale = func_attrs["inputs"][:3]
+    c = func_attrs["outputs"][0]
+    has_bias = _has_bias(func_attrs)
+    return FUNC_CALL_TEMPLATE.render(
+        func_name=func_attrs["name"],
+        a_ptr=a._attrs["name"],
+        b_ptr=b._attrs["name"],
+        scale_ptr=scale._attrs["name"],
+        has_bias=has_bias,
+        bias_ptr=func_attrs["inputs"][3]._attrs["name"] if has_bias else None,
+        c_ptr=c._attrs["name"],
+        adims=["&" + dim._attrs["name"] for dim in a._attrs["shape"]],
+        bdims=["&" + dim._attrs["name"] for dim in b._attrs["shape"]],
+        cdims=["&" + dim._attrs["name"] for dim in c._attrs["shape"]],
+        indent=indent,
+    )
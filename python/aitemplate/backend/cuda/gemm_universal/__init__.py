@@ -29,6 +29,7 @@ from . import (
     gemm_rcr_bias_add_add,
     gemm_rcr_bias_add_add_relu,
     gemm_rcr_bias_add_relu,
+    gemm_rcr_bias_elementwise,
     gemm_rcr_bias_fast_gelu,
     gemm_rcr_bias_gelu,
     gemm_rcr_bias_hardswish,
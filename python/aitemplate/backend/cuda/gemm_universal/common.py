@@ -30,6 +30,7 @@ from ....compiler.base import IntImm
 from ... import builder
 from ...common import gemm_common, tensor_accessor_codegen
 from ...target import Target
+from .. import cuda_common
 
 # pylint: disable=C0301,C0415,R1705
 
@@ -154,12 +155,12 @@ SRC_TEMPLATE = jinja2.Template(
 {{instances}}
 
 void {{function_name}} (
-    cutlass::half_t* a_ptr,
-    cutlass::half_t* b_ptr,
+    {{dtype | default("cutlass::half_t")}}* a_ptr,
+    {{dtype | default("cutlass::half_t")}}* b_ptr,
 {% if has_d %}
-    cutlass::half_t* d_ptr,
+    {{dtype | default("cutlass::half_t")}}* d_ptr,
 {% endif %}
-    cutlass::half_t* c_ptr,
+    {{dtype | default("cutlass::half_t")}}* c_ptr,
     uint8_t* workspace,
 {% if support_split_k %}
     int split_k,
@@ -233,9 +234,9 @@ EXEC_TEMPLATE = jinja2.Template(
 FUNC_DECL_TEMPLATE = jinja2.Template(
     """
 void {{func_name}}(
-  cutlass::half_t*,
-  cutlass::half_t*,
-  cutlass::half_t*,
+  {{dtype | default("cutlass::half_t")}}*,
+  {{dtype | default("cutlass::half_t")}}*,
+  {{dtype | default("cutlass::half_t")}}*,
   uint8_t*,
 {% if support_split_k %}
   int,
@@ -611,6 +612,11 @@ def extract_config(f_proc_op):
     return gemm_ops
 
 
+def get_dtype(func_attrs):
+    """Returns the cutlass type of the gemm, which is the type of input a."""
+    return cuda_common.dtype_to_cutlass_type(func_attrs["inputs"][0].dtype())
+
+
 def extract_config_name(config):
     pattern = re.compile(r"\s*using\s(.*?)\s=")
     decl = config.split("\n")[2]
@@ -684,7 +690,7 @@ def gen_function(
     return src_template.render(
         instances=instance_decl,
         function_name=func_name,
-        dtype="cutlass::half_t",
+        dtype=get_dtype(func_attrs),
         shape_eval=shape_eval_func,
         input_addr_calculator=input_addr_calculator,
         output_addr_calculator=output_addr_calculator,
@@ -709,7 +715,7 @@ def build_profiler(file_pairs):
         random.shuffle(file_pairs)
         file_pairs = file_pairs[:2]
     compile_engine = builder.Builder()
-    compile_engine.build_objs(file_pairs, target.compile_cmd(executable=True))
+    compile_engine.build_profilers(file_pairs, target.compile_cmd(executable=True))
 
 
 def add_profiler(file_pairs, workdir, op_type, output_name, code):
@@ -747,6 +753,21 @@ def gen_profiler(
         indent=2, dtype="int64_t", dim_info_dict=dim_info_dict, is_ptr=True
     )
 
+    dtype = get_dtype(func_attrs)
+    tensor_ptrs = [
+        "memory_pool->RequestHalfTensorByIdx(0)",
+        "memory_pool->RequestHalfTensorByIdx(1)",
+        "memory_pool->RequestHalfTensorByIdx(2)",
+        bias_ptr_arg,
+    ]
+    if dtype != "cutlass::half_t":
+        # the memory pool of the profiler holds 16-bit tensors of any type
+        tensor_ptrs = [
+            f"reinterpret_cast<{dtype}*>({ptr})" if ptr is not None else None
+            for ptr in tensor_ptrs
+        ]
+    a_ptr, b_ptr, c_ptr, bias_ptr_arg = tensor_ptrs
+
     file_pairs = []
     has_bias = bias_ptr_arg is not None
     for op_name, op in op_instance.items():
@@ -771,6 +792,7 @@ def gen_profiler(
         op_func = src_template.render(
             instances=instance,
             function_name="gemm",
+            dtype=dtype,
             input_ndims=ndims,
             weight_ndims=ndims,
             output_ndims=ndims,
@@ -783,11 +805,11 @@ def gen_profiler(
         )
         func_call = FUNC_CALL_TEMPLATE.render(
             func_name="gemm",
-            a_ptr="memory_pool->RequestHalfTensorByIdx(0)",
-            b_ptr="memory_pool->RequestHalfTensorByIdx(1)",
+            a_ptr=a_ptr,
+            b_ptr=b_ptr,
             has_bias=has_bias,
             bias_ptr=bias_ptr_arg,
-            c_ptr="memory_pool->RequestHalfTensorByIdx(2)",
+            c_ptr=c_ptr,
             split_k="split_k",
             adims=adims,
             bdims=bdims,
@@ -864,16 +886,20 @@ def gen_function_call(func_attrs, indent="  ", bias_ptr_arg=None):
     )
 
 
-def default_fproc_f16(*, op, a_layout, b_layout, c_layout, epiligue_name):
+def default_fproc_f16(
+    *, op, a_layout, b_layout, c_layout, epiligue_name, dtype="float16"
+):
     import copy
 
     import cutlass_lib
 
     ret = []
     data_type = cutlass_lib.library.DataType.f16
+    if dtype == "bfloat16":
+        data_type = cutlass_lib.library.DataType.bf16
     acc_type = cutlass_lib.library.DataType.f32
     # check target use fp16 acc
-    if "use_fp16_acc" in Target.current()._kwargs:
+    if dtype == "float16" and "use_fp16_acc" in Target.current()._kwargs:
         if Target.current()._kwargs["use_fp16_acc"]:
             acc_type = cutlass_lib.library.DataType.f16
     if (
@@ -912,6 +938,7 @@ def make_fproc_f16(func_attrs, layout):
             b_layout=b_layout,
             c_layout=c_layout,
             epiligue_name=func_attrs["epilogue"],
+            dtype=func_attrs["inputs"][0].dtype(),
         )
 
     func_attrs["op_instance"] = extract_config(fproc_f16)
@@ -59,10 +59,10 @@ SRC_TEMPLATE = jinja2.Template(
 {{instances}}
 
 void {{function_name}} (
-    cutlass::half_t* a_ptr,
-    cutlass::half_t* b_ptr,
-    cutlass::half_t* bias_ptr,
-    cutlass::half_t* c_ptr,
+    {{dtype | default("cutlass::half_t")}}* a_ptr,
+    {{dtype | default("cutlass::half_t")}}* b_ptr,
+    {{dtype | default("cutlass::half_t")}}* bias_ptr,
+    {{dtype | default("cutlass::half_t")}}* c_ptr,
     uint8_t* workspace,
 {% if support_split_k %}
     int split_k,
@@ -111,10 +111,10 @@ void {{function_name}} (
 FUNC_DECL_TEMPLATE = jinja2.Template(
     """
 void {{func_name}}(
-  cutlass::half_t*,
-  cutlass::half_t*,
-  cutlass::half_t*,
-  cutlass::half_t*,
+  {{dtype | default("cutlass::half_t")}}*,
+  {{dtype | default("cutlass::half_t")}}*,
+  {{dtype | default("cutlass::half_t")}}*,
+  {{dtype | default("cutlass::half_t")}}*,
   uint8_t*,
 {% if support_split_k %}
     int,
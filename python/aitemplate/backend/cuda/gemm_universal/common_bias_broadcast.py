@@ -90,7 +90,11 @@ PROBLEM_ARGS_TEMPLATE = jinja2.Template(
     /*batch_stride_Tensor*/ 0,
     input_a_stride,
     input_b_stride,
+{% if has_d0 %}
     {{layout.stride_c}},
+{% else %}
+    /*ldc1, d0_ptr is the bias*/ 0,
+{% endif %}
 {% if has_d1 %}
     {{layout.stride_c}},
 {% else %}
@@ -160,6 +164,8 @@ SRC_TEMPLATE = jinja2.Template(
 #include "cutlass/util/reference/device/tensor_fill.h"
 #include "cutlass/util/device_memory.h"
 
+{{extra_code}}
+
 #define CUTLASS_CHECK(status)                                                         \\
   {                                                                                   \\
     cutlass::Status error = status;                                                   \\
@@ -496,6 +502,7 @@ def gen_function(
     binary_op1,
     binary_op2,
     unary_op2,
+    extra_code="",
 ):
     input_addr_calculator = gemm_rcr.get_input_addr_calculator(func_attrs)
     input_ndims = len(func_attrs["input_accessors"][0].original_shapes)
@@ -504,7 +511,10 @@ def gen_function(
     support_split_k = _support_split_k(func_attrs)
     has_d1 = common.has_d1(func_attrs)
     problem_args = PROBLEM_ARGS_TEMPLATE.render(
-        layout=layout, support_split_k=support_split_k, has_d1=has_d1
+        layout=layout,
+        support_split_k=support_split_k,
+        has_d0=_has_d0(func_attrs),
+        has_d1=has_d1,
     )
     return common.gen_function(
         func_attrs,
@@ -529,6 +539,7 @@ def gen_function(
             stride_dim="N",
             output_accessor=func_attrs["output_accessors"][0],
         ),
+        extra_code=extra_code,
     )
 
 
@@ -544,13 +555,24 @@ def gen_function_decl(func_attrs):
     )
 
 
+def _has_d0(func_attrs):
+    # Ops without sources, i.e. gemm_rcr_bias_elementwise with a source-free
+    # epilogue, pass the bias as D0 with a row stride of 0, so that D0 reads
+    # stay in bounds. Their epilogue ignores it.
+    return len(func_attrs["inputs"]) > 3
+
+
 def gen_function_call(func_attrs, indent="  "):
     has_d1 = common.has_d1(func_attrs)
     if has_d1:
         (a, b, bias, d0, d1) = func_attrs["inputs"]
-    else:
+    elif _has_d0(func_attrs):
         (a, b, bias, d0) = func_attrs["inputs"]
         d1 = None
+    else:
+        (a, b, bias) = func_attrs["inputs"]
+        d0 = bias
+        d1 = None
     c = func_attrs["outputs"][0]
     # overwrite the global defs if we have input TensorAccessor
     local_dim_defs = common.gen_local_dim_defs(func_attrs, indent=indent)
@@ -197,6 +197,7 @@ def gen_function_decl(func_attrs):
     weight_ndims = len(func_attrs["input_accessors"][1].original_shapes)
     return common.FUNC_DECL_TEMPLATE.render(
         func_name=func_name,
+        dtype=common.get_dtype(func_attrs),
         input_ndims=input_ndims,
         weight_ndims=weight_ndims,
         support_split_k=True,
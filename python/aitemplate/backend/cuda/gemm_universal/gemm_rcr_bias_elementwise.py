@@ -0,0 +1,236 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+GEMM Specialization for
+C = Epilogue(GeMM(A, B) + bias, D0, D1),
+where A[RowMajor][M, K], B[ColMajor][N, K], C[RowMajor][M, N]
+bias[RowMajor][N], D0[RowMajor][M, N], D1[RowMajor][M, N]
+
+Epilogue is an elementwise expression, which is split into the two binary
+ops of the broadcast epilogue: Epilogue = BinaryOp2(BinaryOp1(x, D0), D1).
+Both are generated as custom functors.
+"""
+import os
+
+import jinja2
+
+from ... import registry
+from ...backend_spec import CUDASpec
+from ...target import Target
+from . import common, common_bias_broadcast
+from .layout import RCR
+
+# pylint: disable=C0103,C0415,W0613,C0301,R1705,R1703
+
+IDENTITY = "cutlass::epilogue::thread::Identity"
+
+# Profilers only depend on the mainloop, so they are shared by all
+# epilogue expressions.
+PROFILER_BINARY_OP1 = "cutlass::plus"
+PROFILER_BINARY_OP2 = "cutlass::plus"
+
+FUNCTOR_TEMPLATE = jinja2.Template(
+    """
+template <typename T>
+struct {{name}} {
+  static const bool kIsHeavy = true;
+
+  CUTLASS_DEVICE
+  T operator()(T const& {{lhs}}_in, T const& {{rhs}}_in) const {
+    float {{lhs}} = static_cast<float>({{lhs}}_in);
+    float {{rhs}} = static_cast<float>({{rhs}}_in);
+{% for stmt in stmts %}
+    {{stmt}}
+{% endfor %}
+    return T({{result}});
+  }
+};
+
+template <typename T, int N>
+struct {{name}}<cutlass::Array<T, N>> {
+  static const bool kIsHeavy = true;
+
+  CUTLASS_DEVICE
+  cutlass::Array<T, N> operator()(
+      cutlass::Array<T, N> const& lhs, cutlass::Array<T, N> const& rhs) const {
+    {{name}}<T> op;
+    cutlass::Array<T, N> result;
+    CUTLASS_PRAGMA_UNROLL
+    for (int i = 0; i < N; ++i) {
+      result[i] = op(lhs[i], rhs[i]);
+    }
+    return result;
+  }
+};
+""",
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+EXTRA_CODE_TEMPLATE = jinja2.Template(
+    """
+#include "cutlass/fast_math.h"
+
+{{custom_libs}}
+
+{{functors}}
+"""
+)
+
+
+def _gen_expr(expr, backend_spec):
+    """Generates float statements for expr, where shared sub-expressions are
+    only computed once. Returns (statements, result)."""
+    stmts = []
+    names = {}
+    for sub_expr in expr.subexprs():
+        if sub_expr.leaf is not None:
+            names[sub_expr] = sub_expr.leaf
+        elif sub_expr.func is None:
+            names[sub_expr] = "static_cast<float>({})".format(sub_expr.value)
+        else:
+            funcs = backend_spec.func_enum_to_func_name.get(sub_expr.func, {})
+            func_name = funcs.get("float")
+            if func_name is None:
+                raise NotImplementedError(
+                    "Unsupported func {} in epilogue!".format(sub_expr.func)
+                )
+            name = "tmp_{}".format(len(stmts))
+            stmts.append(
+                "float {} = {}({});".format(
+                    name, func_name, ", ".join(names[arg] for arg in sub_expr.args)
+                )
+            )
+            names[sub_expr] = name
+    return stmts, names[expr]
+
+
+def functor_names(func_attrs):
+    """Returns the names of the two binary op functors of func_attrs. The
+    second one is None if the op has a single source."""
+    name = func_attrs["name"]
+    if common.has_d1(func_attrs):
+        return f"{name}_binary_op1", f"{name}_binary_op2"
+    return f"{name}_binary_op1", None
+
+
+def gen_functors(func_attrs):
+    """Generates the binary op functors of the epilogue of func_attrs.
+
+    Parameters
+    ----------
+    func_attrs : Dict
+        Stores the operation attributes.
+
+    Returns
+    -------
+    str
+        Functor definitions.
+    """
+    backend_spec = CUDASpec()
+    stage1, stage2 = func_attrs["epilogue_stages"]
+    name1, name2 = functor_names(func_attrs)
+    functors = []
+    for expr, name, lhs, rhs in [
+        (stage1, name1, "x", "d0"),
+        (stage2, name2, "s", "d1"),
+    ]:
+        if expr is None:
+            continue
+        stmts, result = _gen_expr(expr, backend_spec)
+        functors.append(
+            FUNCTOR_TEMPLATE.render(
+                name=name, lhs=lhs, rhs=rhs, stmts=stmts, result=result
+            )
+        )
+    return "\n".join(functors)
+
+
+@registry.reg("cuda.gemm_rcr_bias_elementwise.config")
+def gemm_rcr_config(func_attrs, dtype="float16"):
+    return common_bias_broadcast.gemm_bias_broadcast_config(func_attrs, RCR)
+
+
+@registry.reg("cuda.gemm_rcr_bias_elementwise.gen_profiler")
+def gen_profiler(func_attrs, workdir, dim_info_dict):
+    # profile with two sources, so that the profilers of ops with one
+    # and two sources don't collide
+    common_bias_broadcast.gen_profiler(
+        {**func_attrs, "num_sources": 2},
+        workdir,
+        dim_info_dict,
+        RCR,
+        IDENTITY,
+        PROFILER_BINARY_OP1,
+        PROFILER_BINARY_OP2,
+        IDENTITY,
+    )
+
+
+@registry.reg("cuda.gemm_rcr_bias_elementwise.gen_function")
+def gen_function(
+    func_attrs,
+    exec_cond_template,
+    dim_info_dict,
+):
+    custom_libs = Target.current().get_custom_libs(
+        os.path.join(os.path.dirname(__file__), "..", "elementwise"),
+        "custom_math.cuh",
+    )
+    binary_op1, binary_op2 = functor_names(func_attrs)
+    return common_bias_broadcast.gen_function(
+        func_attrs,
+        exec_cond_template,
+        dim_info_dict,
+        RCR,
+        IDENTITY,
+        binary_op1,
+        binary_op2,
+        IDENTITY,
+        extra_code=EXTRA_CODE_TEMPLATE.render(
+            custom_libs=custom_libs, functors=gen_functors(func_attrs)
+        ),
+    )
+
+
+@registry.reg("cuda.gemm_rcr_bias_elementwise.func_decl")
+def gen_function_decl(func_attrs):
+    return common_bias_broadcast.gen_function_decl(func_attrs)
+
+
+@registry.reg("cuda.gemm_rcr_bias_elementwise.func_call")
+def gen_function_call(func_attrs, indent="  "):
+    return common_bias_broadcast.gen_function_call(func_attrs, indent)
+
+
+@registry.reg("cuda.gemm_rcr_bias_elementwise.filter")
+def function_filter(cfg, func_attrs, ab_alignment):
+    """Generates function filter.
+
+    Parameters
+    ----------
+    cfg: str
+        The filename generated for profiler.
+    func_attrs : Dict
+        Stores the operation attributes.
+    ab_alignment:
+        Input alignments.
+
+    Returns
+    -------
+    bool
+        If input cfg should be filtered.
+    """
+    return common.function_filter(cfg, func_attrs, ab_alignment)
@@ -74,6 +74,7 @@ def gemm_rrr_config(func_attrs, dtype="float16"):
             b_layout=cutlass_lib.library.LayoutType.RowMajor,
             c_layout=cutlass_lib.library.LayoutType.RowMajor,
             epiligue_name=func_attrs["epilogue"],
+            dtype=func_attrs["inputs"][0].dtype(),
         )
 
     func_attrs["op_instance"] = common.extract_config(fproc_f16)
@@ -129,6 +130,7 @@ def gen_function_decl(func_attrs):
     weight_ndims = len(func_attrs["input_accessors"][1].original_shapes)
     return common.FUNC_DECL_TEMPLATE.render(
         func_name=func_name,
+        dtype=common.get_dtype(func_attrs),
         input_ndims=input_ndims,
         weight_ndims=weight_ndims,
         support_split_k=True,
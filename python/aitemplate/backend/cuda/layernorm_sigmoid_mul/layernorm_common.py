@@ -20,10 +20,16 @@ from typing import Any, Dict, List
 
 import jinja2
 
+from .. import cuda_common
+
 FUNC_CALL_FP16_PARAM_TEMPLATE = jinja2.Template(
     "reinterpret_cast<half*>(&({{name}}->raw()))"
 )
 
+FUNC_CALL_PARAM_TEMPLATE = jinja2.Template(
+    "reinterpret_cast<{{elem_type}}*>(&({{name}}->raw()))"
+)
+
 GAMMA_BETA_CONST_DEFS_TEMPLATE = jinja2.Template(
     """
 {% if is_gamma_const %}
@@ -82,6 +88,17 @@ def gamma_beta_const_defs(func_attrs: Dict[str, Any]) -> str:
     )
 
 
+def get_elem_type(func_attrs: Dict[str, Any]) -> str:
+    """Returns the cuda type of the elements of the input."""
+    return cuda_common.dtype_to_cuda_type(func_attrs["inputs"][0].dtype())
+
+
+def get_param_name(tensor, elem_type: str) -> str:
+    return FUNC_CALL_PARAM_TEMPLATE.render(
+        elem_type=elem_type, name=tensor._attrs["name"]
+    )
+
+
 def get_input_names(func_attrs: Dict[str, Any]) -> List[str]:
     """
     Return a list of rendered name strings for inputs. It returns nullptr
@@ -100,14 +117,15 @@ def get_input_names(func_attrs: Dict[str, Any]) -> List[str]:
         beta = inputs[idx]
         idx += 1
 
-    input_name = FUNC_CALL_FP16_PARAM_TEMPLATE.render(name=x._attrs["name"])
+    elem_type = get_elem_type(func_attrs)
+    input_name = get_param_name(x, elem_type)
     if gamma is None:
         gamma_name = "nullptr"
     else:
-        gamma_name = FUNC_CALL_FP16_PARAM_TEMPLATE.render(name=gamma._attrs["name"])
+        gamma_name = get_param_name(gamma, elem_type)
     if beta is None:
         beta_name = "nullptr"
     else:
-        beta_name = FUNC_CALL_FP16_PARAM_TEMPLATE.render(name=beta._attrs["name"])
+        beta_name = get_param_name(beta, elem_type)
 
     return (input_name, gamma_name, beta_name)
@@ -31,6 +31,7 @@ from . import layernorm_common
 FUNC_TEMPLATE = jinja2.Template(
     """
 #include <cuda_fp16.h>
+#include <cuda_bf16.h>
 #include "cutlass/cutlass.h"
 #include "cutlass/fast_math.h"
 #include "logging.h"
@@ -48,17 +49,17 @@ namespace {
 {
     {{input_accessor}}
     {{output_accessor}}
-    return invokeLayernormSigmoidMul<half, float, {{fuse_sigmoid_mul}}>(output, input, gamma, beta, m, n, eps, stream, input_accessor, output_accessor);
+    return invokeLayernormSigmoidMul<{{elem_type}}, float, {{fuse_sigmoid_mul}}>(output, input, gamma, beta, m, n, eps, stream, input_accessor, output_accessor);
 }
     """
 )
 
 FUNC_SIGNATURE = jinja2.Template(
     """
-cudaError_t {{func_name}}(half* output,
-                   half* input,
-                   const half* gamma,
-                   const half* beta,
+cudaError_t {{func_name}}({{elem_type}}* output,
+                   {{elem_type}}* input,
+                   const {{elem_type}}* gamma,
+                   const {{elem_type}}* beta,
                    int m,
                    int n,
                    const float eps,
@@ -93,7 +94,11 @@ def layernorm_gen_function(func_attrs: Dict[str, Any]) -> str:
             os.path.dirname(__file__), "layernorm_sigmoid_mul_kernel.cuh"
         ),
         tensor_accessor_libs=tensor_accessor_codegen.get_libs(),
-        func_signature=FUNC_SIGNATURE.render(func_name=func_attrs["name"]),
+        func_signature=FUNC_SIGNATURE.render(
+            func_name=func_attrs["name"],
+            elem_type=layernorm_common.get_elem_type(func_attrs),
+        ),
+        elem_type=layernorm_common.get_elem_type(func_attrs),
         fuse_sigmoid_mul="false",
         input_accessor=tensor_accessor_codegen.TENSOR_ACCESSOR_TEMPLATE.render(
             name="input_accessor", tensor_accessor=func_attrs["input_accessors"][0]
@@ -113,7 +118,11 @@ def layernorm_sigmoid_mul_gen_function(func_attrs: Dict[str, Any]) -> str:
             os.path.dirname(__file__), "layernorm_sigmoid_mul_kernel.cuh"
         ),
         tensor_accessor_libs=tensor_accessor_codegen.get_libs(),
-        func_signature=FUNC_SIGNATURE.render(func_name=func_attrs["name"]),
+        func_signature=FUNC_SIGNATURE.render(
+            func_name=func_attrs["name"],
+            elem_type=layernorm_common.get_elem_type(func_attrs),
+        ),
+        elem_type=layernorm_common.get_elem_type(func_attrs),
         fuse_sigmoid_mul="true",
         input_accessor=tensor_accessor_codegen.TENSOR_ACCESSOR_TEMPLATE.render(
             name="input_accessor", tensor_accessor=func_attrs["input_accessors"][0]
@@ -129,7 +138,10 @@ def layernorm_sigmoid_mul_gen_function(func_attrs: Dict[str, Any]) -> str:
 @registry.reg("cuda.layernorm_sigmoid_mul.func_decl")
 def layernorm_sigmoid_mul_gen_function_decl(func_attrs: Dict[str, Any]):
     return FUNC_DECL.render(
-        func_signature=FUNC_SIGNATURE.render(func_name=func_attrs["name"]).strip()
+        func_signature=FUNC_SIGNATURE.render(
+            func_name=func_attrs["name"],
+            elem_type=layernorm_common.get_elem_type(func_attrs),
+        ).strip()
     )
 
 
@@ -142,8 +154,8 @@ def layernorm_sigmoid_mul_gen_function_call(func_attrs, indent="  "):
         func_attrs["inputs"]
     ), "expected at least 1 inputs but got {}".format(len(func_attrs["inputs"]))
 
-    output_name = layernorm_common.FUNC_CALL_FP16_PARAM_TEMPLATE.render(
-        name=func_attrs["outputs"][0]._attrs["name"]
+    output_name = layernorm_common.get_param_name(
+        func_attrs["outputs"][0], layernorm_common.get_elem_type(func_attrs)
     )
     (input_name, gamma_name, beta_name) = layernorm_common.get_input_names(func_attrs)
 
@@ -578,7 +578,10 @@ cudaError_t invokeLayernormSigmoidMul(
   }
   dim3 grid(m);
   dim3 block(n);
-  if ((n % 4 == 0) && (n >= 128) && (n <= 4096) &&
+  // there are no vectorized kernels of other types, e.g. bfloat16
+  constexpr bool has_vectorized_kernel =
+      std::is_same<T, float>::value || std::is_same<T, half>::value;
+  if (has_vectorized_kernel && (n % 4 == 0) && (n >= 128) && (n <= 4096) &&
       /* float4 and half4 kernels read 4 elements at once;
          so they cannot be picked when an existing strided dim has the number of
          elements not divisible by 4 */
@@ -597,7 +600,7 @@ cudaError_t invokeLayernormSigmoidMul(
               input_accessor,
               output_accessor);
       LAYER_NORM_CUDA_CHECK_LAUNCH();
-    } else {
+    } else if constexpr (std::is_same<T, half>::value) {
       layernorm_sigmoid_mul_stored_locally<FuseSigmoidMul>
           <<<grid, block, 0, stream>>>(
               (half4*)output,
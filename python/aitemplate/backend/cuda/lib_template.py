@@ -35,12 +35,16 @@ def var_decl(name, value=0, indent="  "):
 def ptr_decl(name, dtype="float16", indent="  "):
     if dtype == "float16":
         type_string = "cutlass::half_t*"
+    elif dtype == "bfloat16":
+        type_string = "cutlass::bfloat16_t*"
     elif dtype in ["float", "float32"]:
         type_string = "float*"
     elif dtype == "int64":
         type_string = "int64_t*"
     elif dtype in ["int", "int32"]:
         type_string = "int32_t*"
+    elif dtype == "int8":
+        type_string = "int8_t*"
     else:
         raise NotImplementedError
     return PTR_TEMPLATE.render(name=name, dtype=type_string, indent=indent)
@@ -25,11 +25,12 @@ from ....compiler.base import IntImm
 
 from ... import registry
 from ...target import Target
+from .. import cuda_common
 
 # pylint: disable=C0301, C0116
 
-FUNC_CALL_FP16_PARAM_TEMPLATE = jinja2.Template(
-    "reinterpret_cast<cutlass::half_t*>(&({{name}}->raw()))"
+FUNC_CALL_PARAM_TEMPLATE = jinja2.Template(
+    "reinterpret_cast<{{dtype}}*>(&({{name}}->raw()))"
 )
 
 FUNC_CALL_FP32_PARAM_TEMPLATE = jinja2.Template(
@@ -89,7 +90,7 @@ namespace {
       dim3 block(thread_group_width, thread_group_per_block);
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float8,{{dtype}},8><<<grid, block, 0, stream>>>( (const float8*)input, (float8*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<float4,{{dtype}},8><<<grid, block, 0, stream>>>( (const float4*)input, (float4*)output, m, n);
       {% endif %}
     {% elif K <= 3840 %} // For threshold K, please refer to this post: https://fb.quip.com/HCfIAbpWB0qi
@@ -101,12 +102,12 @@ namespace {
       const int cols_per_thread = num_packs * 8;
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float8,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const float8*)input, (float8*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<float4,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const float4*)input, (float4*)output, m, n);
       {% endif %}
     {% elif dtype=="float" and K > 3840 %}
         LaunchSoftmaxBlockAll<float8,{{dtype}},{{K}}>( (const float8*) input, (float8*) output, m, stream, &success);
-    {% elif "half" in dtype and K > 3840 %}
+    {% elif dtype != "float" and K > 3840 %}
         LaunchSoftmaxBlockAll<float4,{{dtype}},{{K}}>( (const float4*) input, (float4*) output, m, stream, &success);
     {% endif %}
   {% elif K % 4 == 0 %}
@@ -124,7 +125,7 @@ namespace {
       dim3 block(thread_group_width, thread_group_per_block);
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float4,{{dtype}},8><<<grid, block, 0, stream>>>( (const float4*)input, (float4*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<float2,{{dtype}},8><<<grid, block, 0, stream>>>( (const float2*)input, (float2*)output, m, n);
       {% endif %}
     {% elif K <= 1920 %} // For threshold K, please refer to this post: https://fb.quip.com/HCfIAbpWB0qi
@@ -136,12 +137,12 @@ namespace {
       const int cols_per_thread = num_packs * 8;
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float4,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const float4*)input, (float4*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<float2,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const float2*)input, (float2*)output, m, n);
       {% endif %}
     {% elif dtype=="float" and K > 1920 %}
         LaunchSoftmaxBlockAll<float4,{{dtype}},{{K}}>( (const float4*) input, (float4*) output, m, stream, &success);
-    {% elif "half" in dtype and K > 1920 %}
+    {% elif dtype != "float" and K > 1920 %}
         LaunchSoftmaxBlockAll<float2,{{dtype}},{{K}}>( (const float2*) input, (float2*) output, m, stream, &success);
     {% endif %}
   {% elif K % 2 == 0 %}
@@ -159,7 +160,7 @@ namespace {
       dim3 block(thread_group_width, thread_group_per_block);
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float2,{{dtype}},8><<<grid, block, 0, stream>>>( (const float2*)input, (float2*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<float,{{dtype}},8><<<grid, block, 0, stream>>>( (const float*)input, (float*)output, m, n);
       {% endif %}
     {% elif K <= 1152 %} // For threshold K, please refer to this post: https://fb.quip.com/HCfIAbpWB0qi
@@ -171,12 +172,12 @@ namespace {
       const int cols_per_thread = num_packs * 2;
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float2,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const float2*)input, (float2*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<float,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const float*)input, (float*)output, m, n);
       {% endif %}
     {% elif dtype=="float" and K > 1152 %}
         LaunchSoftmaxBlockAll<float2,{{dtype}},{{K}}>( (const float2*) input, (float2*) output, m, stream, &success);
-    {% elif "half" in dtype and K > 1152 %}
+    {% elif dtype != "float" and K > 1152 %}
         LaunchSoftmaxBlockAll<float,{{dtype}},{{K}}>( (const float*) input, (float*) output, m, stream, &success);
     {% endif %}
   {% else %}
@@ -194,7 +195,7 @@ namespace {
       dim3 block(thread_group_width, thread_group_per_block);
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float,{{dtype}},8><<<grid, block, 0, stream>>>( (const float*)input, (float*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<half,{{dtype}},8><<<grid, block, 0, stream>>>( (const half*)input, (half*)output, m, n);
       {% endif %}
     {% elif K <= 1408 %} // For threshold K, please refer to this post: https://fb.quip.com/HCfIAbpWB0qi
@@ -205,18 +206,18 @@ namespace {
       const int cols_per_thread = ({{K}}+31)/32;
       {% if dtype=="float" %}
         softmax_stored_locally_multi_dim<float,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const float*)input, (float*)output, m, n);
-      {% elif "half" in dtype %}
+      {% elif dtype != "float" %}
         softmax_stored_locally_multi_dim<half,{{dtype}},cols_per_thread><<<grid, block, 0, stream>>>((const half*)input, (half*)output, m, n);
       {% endif %}
     {% elif dtype=="float" and K > 1408 %}
         LaunchSoftmaxBlockAll<float,{{dtype}},{{K}}>( (const float*) input, (float*) output, m, stream, &success);
-    {% elif "half" in dtype and K > 1408 %}
+    {% elif dtype != "float" and K > 1408 %}
         LaunchSoftmaxBlockAll<half,{{dtype}},{{K}}>( (const half*) input, (half*) output, m, stream, &success);
     {% endif %}
   {% endif %}
 
   if(!success){
-    softmaxBlockNocache<half><<<m, 1024, 0, stream>>>((half*)input, (half*)output, m, n);
+    softmaxBlockNocache<{{dtype}}><<<m, 1024, 0, stream>>>(input, output, m, n);
   }
 }
     """
@@ -262,11 +263,15 @@ FUNC_CALL_TEMPLATE = jinja2.Template(
 )
 
 
+def get_dtype(func_attrs: Dict[str, Any]) -> str:
+    return cuda_common.dtype_to_cutlass_type(func_attrs["inputs"][0].dtype())
+
+
 def get_func_signature(func_attrs: Dict[str, Any]) -> str:
     input_ndim = func_attrs["inputs"][0]._rank()
     return FUNC_SIGNATURE.render(
         func_name=func_attrs["name"],
-        dtype="cutlass::half_t",
+        dtype=get_dtype(func_attrs),
         input_ndim=input_ndim,
     ).strip()
 
@@ -308,7 +313,7 @@ def softmax_gen_function(func_attrs: Dict[str, Any]) -> str:
         ),
         func_signature=get_func_signature(func_attrs),
         shape_functions=SHAPE_FUNCTIONS.render(input_ndim=rank),
-        dtype="cutlass::half_t",
+        dtype=get_dtype(func_attrs),
         K=k,
         m=find_tile_size(k),
     )
@@ -324,11 +329,12 @@ def softmax_gen_function_call(func_attrs, indent="  "):
     assert len(func_attrs["outputs"]) == 1
     assert len(func_attrs["inputs"]) == 1
 
-    input_name = FUNC_CALL_FP16_PARAM_TEMPLATE.render(
-        name=func_attrs["inputs"][0]._attrs["name"]
+    dtype = get_dtype(func_attrs)
+    input_name = FUNC_CALL_PARAM_TEMPLATE.render(
+        name=func_attrs["inputs"][0]._attrs["name"], dtype=dtype
     )
-    output_name = FUNC_CALL_FP16_PARAM_TEMPLATE.render(
-        name=func_attrs["outputs"][0]._attrs["name"]
+    output_name = FUNC_CALL_PARAM_TEMPLATE.render(
+        name=func_attrs["outputs"][0]._attrs["name"], dtype=dtype
     )
 
     shapes = func_attrs["inputs"][0]._attrs["shape"]
@@ -55,6 +55,7 @@ KERNEL_SRC_TEMPLATE = jinja2.Template(
     """
 #include <assert.h>
 #include <cuda_fp16.h>
+#include <cuda_bf16.h>
 
 #include <chrono>
 #include <functional>
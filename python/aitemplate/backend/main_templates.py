@@ -23,11 +23,14 @@ MODEL_TEMPLATE = jinja2.Template(
 #pragma once
 #include "logging.h"
 #include "device_functions-generated.h"
+#include "graph_cache.h"
 #include "model_interface.h"
+#include "op_profiler.h"
 #include "raii_wrapper.h"
 #include "macros.h"
 #include <algorithm>
 #include <deque>
+#include <memory>
 #include <string>
 #include <unordered_map>
 #include <math.h>
@@ -74,7 +77,8 @@ class Model {
         workspace(RAII_DeviceMalloc(workspace_size)),
         params(num_inputs + num_outputs + num_unbound_constants),
         num_inputs(num_inputs),
-        constants(constants) {
+        constants(constants),
+        graph_cache(std::make_unique<GraphCache>()) {
       dmlc::InitLogging("aitemplate"); // TODO(xxx): render network name
       LOG(INFO) << "Init AITemplate Runtime.";
       global_workspace = static_cast<uint8_t*>(workspace.get()) + {{ unique_workspace_size }};
@@ -87,6 +91,9 @@ class Model {
 #endif
       DEVICE_CHECK(GetDeviceProperties(&device_properties, device_idx));
       DEVICE_CHECK(StreamCreate(&graph_capture_stream, /*non_blocking=*/true));
+{% if profile_ops %}
+      op_profiler = std::make_unique<OpProfiler>(op_infos.size());
+{% endif %}
 
   {{ set_up_constants }}
       auto* blob_ptr = static_cast<uint8_t*>(blob.get());
@@ -98,12 +105,6 @@ class Model {
     ~Model() {
       DestroyEvent(run_finished);
       StreamDestroy(graph_capture_stream);
-      if (graph_exec != nullptr) {
-        GraphExecDestroy(graph_exec);
-      }
-      if (graph != nullptr) {
-        GraphDestroy(graph);
-      }
     }
 
     Model(Model&&) = default;
@@ -132,9 +133,15 @@ class Model {
 
     void RunImpl(StreamType stream) {
   {% for func in function_seq %}
+{% if profile_ops %}
+      op_profiler->Record({{ loop.index0 }}, stream);
+{% endif %}
   {{ func }}
       DeviceCheckLastError(__FILE__, __LINE__);
   {% endfor %}
+{% if profile_ops %}
+      op_profiler->Record({{ function_seq|length }}, stream);
+{% endif %}
       DeviceToDeviceCopies(stream);
     }
 
@@ -204,6 +211,35 @@ class Model {
       }
       const void** ptr = it->second;
       *ptr = src;
+      // the old pointer is baked into the cached graphs
+      graph_cache->Invalidate();
+    }
+
+    // Points the constants of a model compiled with a WeightStore into the
+    // shared weights, see ModelContainer::SetSharedWeights.
+    void SetSharedWeights(uint8_t* shared_weights) {
+{{ set_up_shared_weights }}
+      graph_cache->Invalidate();
+    }
+
+    GraphCache& GetGraphCache() {
+      return *graph_cache;
+    }
+
+    // The ops of RunImpl if the model was compiled with profile_ops, none
+    // otherwise.
+    static size_t NumProfiledOps() {
+      return op_infos.size();
+    }
+
+    static const OpInfo& GetOpInfo(size_t idx) {
+      CHECK_VECTOR_ACCESS(op_infos, idx)
+      return op_infos[idx];
+    }
+
+    // nullptr unless the model was compiled with profile_ops.
+    OpProfiler* GetOpProfiler() {
+      return op_profiler.get();
     }
 
   private:
@@ -220,24 +256,83 @@ class Model {
       }
     }
 
+    // Launches the cached graph for the current input dims, capturing it on
+    // a miss. Graphs are relaunched as they are on a hit, and recaptured and
+    // updated in place if the I/O pointers have changed.
     void RunAsGraph(StreamType stream) {
+      graph_key.clear();
+      for (size_t i = 0; i < num_inputs; ++i) {
+        for (const auto& dim : params[i].shape_ptrs) {
+          graph_key.push_back(dim.GetValue());
+        }
+      }
+      graph_ptrs.clear();
+      for (const auto& param : params) {
+        graph_ptrs.push_back(param.ptr);
+      }
+
+      auto& entry = graph_cache->Acquire(graph_key);
+      if (entry.captured && entry.ptrs == graph_ptrs) {
+        graph_cache->RecordHit();
+        size_t dim_idx = 0;
+        for (size_t i = num_inputs; i < params.size(); ++i) {
+          for (auto& dim : params[i].shape_ptrs) {
+            dim.SetValue(entry.output_dims[dim_idx++]);
+          }
+        }
+      } else {
+        if (entry.captured) {
+          graph_cache->RecordUpdate();
+        } else {
+          graph_cache->RecordMiss();
+        }
+        try {
+          CaptureGraph(entry);
+        } catch (...) {
+          graph_cache->Erase(entry);
+          throw;
+        }
+      }
+
+      DEVICE_CHECK(GraphExecLaunch(entry.graph_exec, stream));
+    }
+
+    void CaptureGraph(GraphCache::Entry& entry) {
+      GraphType graph = nullptr;
       DEVICE_CHECK(StreamBeginCapture(graph_capture_stream));
       try {
         RunImpl(graph_capture_stream);
       } catch (...) {
         DEVICE_CHECK(StreamEndCapture(graph_capture_stream, &graph));
+        GraphDestroy(graph);
         throw;
       }
       DEVICE_CHECK(StreamEndCapture(graph_capture_stream, &graph));
-
-      if (graph_exec == nullptr) {
-        DEVICE_CHECK(GraphInstantiate(&graph_exec, graph));
-      } else if (GraphExecUpdate(graph_exec, graph) != GetDeviceSuccess()) {
-        DEVICE_CHECK(GraphExecDestroy(graph_exec));
-        DEVICE_CHECK(GraphInstantiate(&graph_exec, graph));
+      try {
+        if (entry.graph_exec == nullptr) {
+          DEVICE_CHECK(GraphInstantiate(&entry.graph_exec, graph));
+        } else if (GraphExecUpdate(entry.graph_exec, graph) != GetDeviceSuccess()) {
+          // e.g. the topology of the graph has changed; the failed update
+          // must not be reported by the next launch check
+          GetLastError();
+          DEVICE_CHECK(GraphExecDestroy(entry.graph_exec));
+          entry.graph_exec = nullptr;
+          DEVICE_CHECK(GraphInstantiate(&entry.graph_exec, graph));
+        }
+      } catch (...) {
+        GraphDestroy(graph);
+        throw;
       }
+      DEVICE_CHECK(GraphDestroy(graph));
 
-      DEVICE_CHECK(GraphExecLaunch(graph_exec, stream));
+      entry.ptrs = graph_ptrs;
+      entry.output_dims.clear();
+      for (size_t i = num_inputs; i < params.size(); ++i) {
+        for (const auto& dim : params[i].shape_ptrs) {
+          entry.output_dims.push_back(dim.GetValue());
+        }
+      }
+      entry.captured = true;
     }
 
     int device_idx;
@@ -302,14 +397,25 @@ class Model {
     // Constants are not included.
     std::vector<ParamInfo> params;
 
-    GraphExecType graph_exec = nullptr;
-    GraphType graph = nullptr;
+    // Instantiated graphs for graph_mode runs, held by pointer so that Model
+    // stays movable.
+    std::unique_ptr<GraphCache> graph_cache;
     StreamType graph_capture_stream;
+    // Scratch buffers for the lookup key, reused across runs.
+    GraphCache::Key graph_key;
+    std::vector<void*> graph_ptrs;
 
     std::unordered_map<std::string, const void**> constant_name_to_ptr_;
 
     constexpr static bool target_has_graph_mode = {{ target_has_graph_mode }};
 
+    static constexpr std::array<OpInfo, {{ op_infos|length }}> op_infos = {
+{% for name, op in op_infos %}
+      OpInfo{"{{ name }}", "{{ op }}"},
+{% endfor %}
+    };
+    std::unique_ptr<OpProfiler> op_profiler;
+
 {{ tensor_decl }}
 {{ dim_decl }}
 {{ function_state }}
@@ -370,8 +476,8 @@ ModelContainerBase::ModelContainerBase(
 }
 
 ModelContainer* CreateModelContainer(size_t num_runtimes) {
-  // num_runtimes, blob_size, workspace_size, num_inputs, num_outputs, num_unbound_constants, param_size
-  return new ModelContainer(num_runtimes, {{blob_size}}, {{workspace_size}}, {{num_inputs}}, {{num_outputs}}, {{num_unbound_constants}}, {{param_size}});
+  // num_runtimes, blob_size, workspace_size, num_inputs, num_outputs, num_unbound_constants, param_size, shared_weights_size
+  return new ModelContainer(num_runtimes, {{blob_size}}, {{workspace_size}}, {{num_inputs}}, {{num_outputs}}, {{num_unbound_constants}}, {{param_size}}, {{shared_weights_size}});
 }
 } // namespace ait
 """
@@ -0,0 +1,355 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Portable bundles of profile cache records.
+
+A bundle is a gzip-compressed JSON file holding the records of all profile
+cache tables of one target, together with their template versions, devices
+and a sha1 of the records. Bundles exported on one build host can be merged
+into the local cache of another host, or layered read-only on top of it:
+
+    python -m aitemplate.backend.profile_cache_bundle export cuda.db out.aitcache
+    python -m aitemplate.backend.profile_cache_bundle merge all.aitcache a b c
+    python -m aitemplate.backend.profile_cache_bundle import cuda.db all.aitcache
+
+Conflicting records of the same workload are resolved by keeping the
+fastest profiled duration.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+from hashlib import sha1
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils import logger
+from .profiler_cache import (
+    CACHE_KEY_COLUMNS,
+    CACHE_VALUE_COLUMNS,
+    cache_record_key,
+    is_faster_record,
+    ProfileCacheDB,
+    ProfileCacheStore,
+    TEMPLATE_VERSION,
+)
+
+# Version of the bundle file format.
+BUNDLE_FORMAT_VERSION = 1
+
+
+class ProfileCacheBundle(object):
+    """Profile cache records of a single target, indexed by workload."""
+
+    def __init__(self, target: str) -> None:
+        """
+        Parameters
+        ----------
+        target : str
+            Target device name of the records, i.e. CUDA or ROCM.
+        """
+        self._target = target
+        # op_class -> (key, template_ver) -> record
+        self._records: Dict[str, Dict[Tuple, Dict[str, Any]]] = {
+            op_class: {} for op_class in CACHE_KEY_COLUMNS
+        }
+
+    @property
+    def target(self) -> str:
+        return self._target
+
+    def records(self, op_class: str) -> List[Dict[str, Any]]:
+        """Returns all records of an op class."""
+        return list(self._records[op_class].values())
+
+    def template_versions(self) -> List[int]:
+        """Returns the template versions of all records."""
+        return sorted(
+            {r["template_ver"] for t in self._records.values() for r in t.values()}
+        )
+
+    def devices(self) -> List[str]:
+        """Returns the devices (archs) of all records."""
+        return sorted(
+            {str(r["device"]) for t in self._records.values() for r in t.values()}
+        )
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self._records.values())
+
+    def add(self, op_class: str, record: Dict[str, Any]) -> bool:
+        """Adds a record, keeping the fastest one of each workload.
+
+        Returns
+        -------
+        bool
+            Whether the record has been added.
+        """
+        record = dict(record)
+        record.setdefault("template_ver", TEMPLATE_VERSION)
+        record.setdefault("duration", -1)
+        if op_class == "elementwise":
+            # records exported before profiler_key was added
+            record.setdefault("profiler_key", "")
+        key = (cache_record_key(op_class, record), record["template_ver"])
+        old = self._records[op_class].get(key, None)
+        if old is not None and not is_faster_record(record, old):
+            return False
+        self._records[op_class][key] = record
+        return True
+
+    def merge(self, other: ProfileCacheBundle) -> int:
+        """Merges the records of another bundle into this one.
+
+        Returns
+        -------
+        int
+            Number of added or replaced records.
+        """
+        if other.target != self._target:
+            raise RuntimeError(
+                f"Cannot merge {other.target} profile cache into {self._target}"
+            )
+        changed = 0
+        for op_class, table in other._records.items():
+            for record in table.values():
+                changed += int(self.add(op_class, record))
+        return changed
+
+    def query(self, op_class: str, args: Dict[str, Any]) -> Optional[Tuple]:
+        """Looks up a workload, in the same way as ProfileCacheDB queries.
+
+        Parameters
+        ----------
+        op_class : str
+            gemm, conv, normalization or elementwise
+        args : Dict[str, Any]
+            Query entry of the workload.
+
+        Returns
+        -------
+        Optional[Tuple]
+            Cached values, e.g. (algo, workspace, split_k) for gemm, or None.
+        """
+        key = (cache_record_key(op_class, args), TEMPLATE_VERSION)
+        record = self._records[op_class].get(key, None)
+        if record is None:
+            return None
+        return tuple(record[col] for col in CACHE_VALUE_COLUMNS[op_class])
+
+    def query_gemm_split_k_history(self, args: Dict[str, Any]) -> List[Tuple[str, int]]:
+        """Returns (exec_entry, split_k) of the gemm records of an op_type on a
+        device, see ProfileCacheDB.query_gemm_split_k_history."""
+        return [
+            (r["exec_entry"], r["split_k"])
+            for r in self._records["gemm"].values()
+            if r["op_type"] == args["op_type"]
+            and str(r["device"]) == str(args["device"])
+            and r["template_ver"] == TEMPLATE_VERSION
+            and r.get("split_k_profiled", 1) == 1
+        ]
+
+    def content_hash(self) -> str:
+        """Returns the sha1 of all records, independent of their order."""
+        hasher = sha1()
+        for op_class in sorted(self._records):
+            for key in sorted(self._records[op_class], key=str):
+                record = self._records[op_class][key]
+                hasher.update(op_class.encode("utf-8"))
+                hasher.update(json.dumps(record, sort_keys=True).encode("utf-8"))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def from_db(db: ProfileCacheDB, device: str = None) -> ProfileCacheBundle:
+        """Creates a bundle from a local profile cache.
+
+        Parameters
+        ----------
+        db : ProfileCacheDB
+            The local profile cache.
+        device : str, optional
+            Only export records of this device (arch), by default all.
+        """
+        bundle = ProfileCacheBundle(db._target)
+        for op_class in CACHE_KEY_COLUMNS:
+            for record in db.export_records(op_class):
+                if device is None or str(record["device"]) == str(device):
+                    bundle.add(op_class, record)
+        return bundle
+
+    def to_db(self, db: ProfileCacheDB) -> int:
+        """Merges all records into a local profile cache.
+
+        Returns
+        -------
+        int
+            Number of added or replaced records.
+        """
+        if db._target != self._target:
+            raise RuntimeError(
+                f"Cannot import {self._target} profile cache into {db._target}"
+            )
+        changed = 0
+        for op_class, table in self._records.items():
+            for record in table.values():
+                changed += int(db.merge_record(op_class, record))
+        db._con.commit()
+        return changed
+
+    def save(self, path: str) -> None:
+        """Writes the bundle to path."""
+        content = {
+            "format_version": BUNDLE_FORMAT_VERSION,
+            "target": self._target,
+            "template_ver": self.template_versions(),
+            "devices": self.devices(),
+            "sha1": self.content_hash(),
+            "records": {op_class: self.records(op_class) for op_class in self._records},
+        }
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(content, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> ProfileCacheBundle:
+        """Reads a bundle written by save().
+
+        Raises
+        ------
+        RuntimeError
+            If the bundle has an unknown format or is corrupted.
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            content = json.load(f)
+        if content.get("format_version", None) != BUNDLE_FORMAT_VERSION:
+            raise RuntimeError(
+                f"Unsupported profile cache bundle format of {path}: "
+                f"{content.get('format_version', None)}"
+            )
+        bundle = ProfileCacheBundle(content["target"])
+        for op_class, records in content["records"].items():
+            for record in records:
+                bundle.add(op_class, record)
+        if bundle.content_hash() != content["sha1"]:
+            raise RuntimeError(f"Corrupted profile cache bundle {path}")
+        return bundle
+
+
+class LayeredProfileCache(ProfileCacheStore):
+    """Read-only profile cache bundles layered on top of a local cache.
+
+    Queries are answered by the local cache first, then by the bundles in
+    order. Inserts only go to the local cache.
+    """
+
+    def __init__(self, local: ProfileCacheStore, bundles: List[ProfileCacheBundle]):
+        self._local = local
+        self._target = local._target
+        self._bundles = []
+        for bundle in bundles:
+            if bundle.target != local._target:
+                logger.info(
+                    __name__,
+                    f"Skip {bundle.target} profile cache bundle for {local._target}",
+                )
+                continue
+            self._bundles.append(bundle)
+
+    def query(self, op_class: str, args: Dict[str, Any]) -> Optional[Tuple]:
+        value = self._local.query(op_class, args)
+        if value is not None:
+            return value
+        for bundle in self._bundles:
+            value = bundle.query(op_class, args)
+            if value is not None:
+                return value
+        return None
+
+    def insert(self, op_class: str, args: Dict[str, Any]) -> None:
+        self._local.insert(op_class, args)
+
+    def query_gemm_split_k_history(self, args: Dict[str, Any]) -> List[Tuple[str, int]]:
+        history = list(self._local.query_gemm_split_k_history(args))
+        for bundle in self._bundles:
+            history.extend(bundle.query_gemm_split_k_history(args))
+        return history
+
+
+def load_bundles_from_env() -> List[ProfileCacheBundle]:
+    """Loads the bundles listed in PROFILE_CACHE_BUNDLES, separated by
+    os.pathsep. Bundles which cannot be loaded are skipped."""
+    paths = os.environ.get("PROFILE_CACHE_BUNDLES", "")
+    bundles = []
+    for path in paths.split(os.pathsep):
+        if path == "":
+            continue
+        try:
+            bundles.append(ProfileCacheBundle.load(path))
+        except (OSError, ValueError, KeyError, RuntimeError) as error:
+            logger.info(__name__, f"Cannot load profile cache bundle {path}: {error}")
+    return bundles
+
+
+def _target_of_db(path: str) -> str:
+    # local caches are named after their target, e.g. ~/.aitemplate/cuda.db
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Profile cache bundle tool")
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+    export_parser = subparsers.add_parser("export", help="export a local cache")
+    export_parser.add_argument("db", help="local cache, e.g. ~/.aitemplate/cuda.db")
+    export_parser.add_argument("bundle", help="output bundle")
+    export_parser.add_argument("--device", default=None, help="only export arch")
+    export_parser.add_argument("--target", default=None, help="cuda or rocm")
+    import_parser = subparsers.add_parser("import", help="merge bundles into cache")
+    import_parser.add_argument("db", help="local cache, e.g. ~/.aitemplate/cuda.db")
+    import_parser.add_argument("bundles", nargs="+")
+    import_parser.add_argument("--target", default=None, help="cuda or rocm")
+    merge_parser = subparsers.add_parser("merge", help="merge bundles")
+    merge_parser.add_argument("bundle", help="output bundle")
+    merge_parser.add_argument("bundles", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "merge":
+        out = None
+        for path in args.bundles:
+            bundle = ProfileCacheBundle.load(path)
+            if out is None:
+                out = bundle
+            else:
+                out.merge(bundle)
+        out.save(args.bundle)
+        print(f"Merged {len(out)} records into {args.bundle}")
+        return
+
+    target = args.target if args.target is not None else _target_of_db(args.db)
+    db = ProfileCacheDB(target, path=args.db)
+    if args.cmd == "export":
+        bundle = ProfileCacheBundle.from_db(db, args.device)
+        bundle.save(args.bundle)
+        print(f"Exported {len(bundle)} records to {args.bundle}")
+    else:
+        for path in args.bundles:
+            changed = ProfileCacheBundle.load(path).to_db(db)
+            print(f"Imported {changed} records from {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,8 +17,9 @@ SQLite backend for conv/gemm profiling cache
 """
 import enum
 import sqlite3
+from abc import ABC, abstractmethod
 
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import jinja2
 
@@ -32,15 +33,102 @@ class CacheMode(enum.Enum):
 
     Profiling cache can be stored locally or remotely.
     For LOCAL mode, the cache is stored in a SQLite database.
-    For REMOTE mode, the profiled results can be queried with RESTFul API.
-
-    REMOTE mode is not implemented yet.
+    For REMOTE mode, the profiled results are queried from a key-value store
+    over HTTP, see :class:`~aitemplate.backend.remote_profile_cache.RemoteProfileCache`.
     """
 
     LOCAL = 1
     REMOTE = 2
 
 
+# Default template_ver of cache records. Records of other template versions
+# are not used by profile cache bundles.
+TEMPLATE_VERSION = 290
+
+# Columns identifying a profiled workload in each cache table, i.e. the
+# columns used by the query templates below.
+CACHE_KEY_COLUMNS = {
+    "gemm": (
+        "dtype_a",
+        "dtype_b",
+        "dtype_c",
+        "dtype_acc",
+        "major_a",
+        "major_b",
+        "major_c",
+        "op_type",
+        "device",
+        "epilogue",
+        "pshape",
+        "exec_entry_sha1",
+    ),
+    "conv": (
+        "dtype_a",
+        "dtype_b",
+        "dtype_c",
+        "dtype_acc",
+        "major_a",
+        "major_b",
+        "major_c",
+        "kh",
+        "kw",
+        "co",
+        "stride",
+        "pad",
+        "dilate",
+        "op_type",
+        "device",
+        "epilogue",
+        "split_k",
+        "exec_entry_sha1",
+    ),
+    "normalization": (
+        "dtype_in",
+        "dtype_out",
+        "dtype_acc",
+        "rank",
+        "op_type",
+        "device",
+        "exec_entry_sha1",
+    ),
+    "elementwise": (
+        "dtype",
+        "read_t",
+        "num_inputs",
+        "num_outputs",
+        "op_type",
+        "device",
+        "profiler_key",
+        "exec_entry_sha1",
+    ),
+}
+
+# Columns returned by cache queries of each table.
+CACHE_VALUE_COLUMNS = {
+    "gemm": ("algo", "workspace", "split_k"),
+    "conv": ("algo", "workspace"),
+    "normalization": ("algo", "workspace"),
+    "elementwise": ("algo", "workspace"),
+}
+
+
+def cache_record_key(op_class: str, record: Dict[str, Any]) -> Tuple:
+    """Returns the workload key of a query or record entry."""
+    # sqlite column affinity may turn ints into strings (e.g. epilogue), so
+    # keys are compared as strings
+    return tuple(str(record[col]) for col in CACHE_KEY_COLUMNS[op_class])
+
+
+def is_faster_record(new: Dict[str, Any], old: Dict[str, Any]) -> bool:
+    """Returns whether the profiled duration of record new beats the one of
+    record old. Records without a duration (-1) never beat any record."""
+    new_duration = new.get("duration", -1)
+    old_duration = old.get("duration", -1)
+    if new_duration is None or new_duration < 0:
+        return False
+    return old_duration is None or old_duration < 0 or new_duration < old_duration
+
+
 GEMM_INIT_TEMPLATE = jinja2.Template(
     """
  CREATE TABLE IF NOT EXISTS {{dev}}_gemm (
@@ -62,6 +150,7 @@ GEMM_INIT_TEMPLATE = jinja2.Template(
   duration FLOAT DEFAULT -1,
   split_k INTEGER DEFAULT 1,
   pshape VARCHAR(64) NOT NULL,
+  split_k_profiled INTEGER DEFAULT 1,
   template_ver INTEGER NOT NULL DEFAULT 290,
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
 );
@@ -106,7 +195,9 @@ INSERT INTO {{dev}}_gemm (
     algo,
     workspace,
     split_k,
-    pshape
+    pshape,
+    split_k_profiled,
+    duration
 )
 VALUES (
     '{{exec_entry}}',
@@ -124,7 +215,9 @@ VALUES (
     '{{algo}}',
     {{workspace}},
     {{split_k}},
-    '{{pshape}}'
+    '{{pshape}}',
+    {{split_k_profiled | default(1)}},
+    {{duration | default(-1)}}
 );
 """
 )
@@ -139,6 +232,17 @@ exec_entry_sha1='{{exec_entry_sha1}}';
 """
 )
 
+GEMM_SPLIT_K_HISTORY_TEMPLATE = jinja2.Template(
+    """
+SELECT exec_entry, split_k
+FROM {{dev}}_gemm
+WHERE
+op_type='{{op_type}}' AND
+device='{{device}}' AND
+split_k_profiled=1;
+"""
+)
+
 CONV_INIT_TEMPLATE = jinja2.Template(
     """
  CREATE TABLE IF NOT EXISTS {{dev}}_conv (
@@ -220,7 +324,8 @@ INSERT INTO {{dev}}_conv (
     device,
     algo,
     workspace,
-    split_k
+    split_k,
+    duration
 )
 VALUES (
     '{{exec_entry}}',
@@ -243,7 +348,8 @@ VALUES (
     '{{device}}',
     '{{algo}}',
     {{workspace}},
-    {{split_k}}
+    {{split_k}},
+    {{duration | default(-1)}}
 );
 """
 )
@@ -297,7 +403,8 @@ INSERT INTO {{dev}}_normalization (
     op_type,
     device,
     algo,
-    workspace
+    workspace,
+    duration
 )
 VALUES (
     '{{exec_entry}}',
@@ -309,13 +416,163 @@ VALUES (
     '{{op_type}}',
     '{{device}}',
     '{{algo}}',
-    {{workspace}}
+    {{workspace}},
+    {{duration | default(-1)}}
+);
+"""
+)
+
+ELEMENTWISE_INIT_TEMPLATE = jinja2.Template(
+    """
+ CREATE TABLE IF NOT EXISTS {{dev}}_elementwise (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  exec_entry VARCHAR(8192) NOT NULL,
+  exec_entry_sha1 VARCHAR(64) NOT NULL,
+  dtype VARCHAR(64) NOT NULL,
+  read_t VARCHAR(64) NOT NULL,
+  num_inputs INTEGER NOT NULL,
+  num_outputs INTEGER NOT NULL,
+  op_type VARCHAR(512) NOT NULL,
+  device VARCHAR(16) NOT NULL,
+  profiler_key VARCHAR(64) NOT NULL DEFAULT '',
+  algo VARCHAR(512) NOT NULL,
+  workspace INTEGER DEFAULT 0,
+  duration FLOAT DEFAULT -1,
+  template_ver INTEGER NOT NULL DEFAULT 290,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+"""
+)
+
+ELEMENTWISE_QUERY_TEMPLATE = jinja2.Template(
+    """
+SELECT algo, workspace
+FROM {{dev}}_elementwise
+WHERE
+dtype='{{dtype}}' AND
+read_t='{{read_t}}' AND
+num_inputs={{num_inputs}} AND
+num_outputs={{num_outputs}} AND
+op_type='{{op_type}}' AND
+device='{{device}}' AND
+profiler_key='{{profiler_key}}' AND
+exec_entry_sha1='{{exec_entry_sha1}}';
+"""
+)
+
+ELEMENTWISE_INSERT_TEMPLATE = jinja2.Template(
+    """
+INSERT INTO {{dev}}_elementwise (
+    exec_entry,
+    exec_entry_sha1,
+    dtype,
+    read_t,
+    num_inputs,
+    num_outputs,
+    op_type,
+    device,
+    profiler_key,
+    algo,
+    workspace,
+    duration
+)
+VALUES (
+    '{{exec_entry}}',
+    '{{exec_entry_sha1}}',
+    '{{dtype}}',
+    '{{read_t}}',
+    {{num_inputs}},
+    {{num_outputs}},
+    '{{op_type}}',
+    '{{device}}',
+    '{{profiler_key}}',
+    '{{algo}}',
+    {{workspace}},
+    {{duration | default(-1)}}
 );
 """
 )
 
 
-class ProfileCacheDB(object):
+class ProfileCacheStore(ABC):
+    r"""Interface of profile cache stores.
+
+    Stores implement query() and insert() for the op classes gemm, conv,
+    normalization and elementwise. Stores with expensive lookups may also batch them in
+    prefetch() and defer writes until flush().
+    """
+
+    mode = CacheMode.LOCAL
+
+    @abstractmethod
+    def query(self, op_class: str, args: Dict[str, Any]) -> Optional[Tuple]:
+        """a function to query op from cache
+
+        Parameters
+        ----------
+        op_class : str
+            gemm, conv, normalization or elementwise
+        args : Dict
+            query entry
+
+        Returns
+        -------
+        Tuple
+            profiling results, None on cache miss
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert(self, op_class: str, args: Dict[str, Any]) -> None:
+        """a function to insert op into cache
+
+        Parameters
+        ----------
+        op_class : str
+            gemm, conv, normalization or elementwise
+        args : Dict
+            record entry
+        """
+        raise NotImplementedError
+
+    def prefetch(self, op_class: str, queries: List[Dict[str, Any]]) -> None:
+        """a function to announce upcoming queries, so that they can be
+        looked up in a batch"""
+        return
+
+    def flush(self) -> None:
+        """a function to write out deferred inserts"""
+        return
+
+    def query_gemm(self, args: Dict[str, Any]) -> Optional[Tuple]:
+        return self.query("gemm", args)
+
+    def query_conv(self, args: Dict[str, Any]) -> Optional[Tuple]:
+        return self.query("conv", args)
+
+    def query_normalization(self, args: Dict[str, Any]) -> Optional[Tuple]:
+        return self.query("normalization", args)
+
+    def query_elementwise(self, args: Dict[str, Any]) -> Optional[Tuple]:
+        return self.query("elementwise", args)
+
+    def query_gemm_split_k_history(self, args: Dict[str, Any]) -> List[Tuple[str, int]]:
+        return []
+
+    def insert_gemm(self, args: Dict[str, Any]) -> None:
+        self.insert("gemm", args)
+
+    def insert_conv(self, args: Dict[str, Any]) -> None:
+        self.insert("conv", args)
+
+    def insert_normalization(self, args: Dict[str, Any]) -> None:
+        self.insert("normalization", args)
+
+    def insert_elementwise(self, args: Dict[str, Any]) -> None:
+        self.insert("elementwise", args)
+
+
+class ProfileCacheDB(ProfileCacheStore):
     r"""Local SQLite profile cache database."""
 
     def __init__(
@@ -330,9 +587,9 @@ class ProfileCacheDB(object):
         path : str, optional
             path to the database file. If not specified, a temporary file is created.
         uri : str, optional
-            uri to the RESFul API (Not implemented yet)
+            uri to the RESFul API, use RemoteProfileCache instead
         port : str, optional
-            port to the RESFul API (Not implemented yet)
+            port to the RESFul API, use RemoteProfileCache instead
 
         """
         self._target = target
@@ -346,18 +603,30 @@ class ProfileCacheDB(object):
             self._cur = self._con.cursor()
             self._init_db()
         else:
-            raise NotImplementedError
+            raise NotImplementedError(
+                "ProfileCacheDB only stores results locally, "
+                "use RemoteProfileCache for the REMOTE cache mode"
+            )
 
     def _init_db(self):
         """Creates table in cache."""
         self._create_gemm_table()
         self._create_conv_table()
         self._create_norm_table()
+        self._create_elementwise_table()
 
     def _create_gemm_table(self):
         """Creates gemm table."""
         sql = GEMM_INIT_TEMPLATE.render(dev=self._target)
         self._cur.execute(sql)
+        # tables created before split_k_profiled was added
+        self._cur.execute(f"PRAGMA table_info({self._target}_gemm);")
+        columns = [row[1] for row in self._cur.fetchall()]
+        if "split_k_profiled" not in columns:
+            self._cur.execute(
+                f"ALTER TABLE {self._target}_gemm "
+                "ADD COLUMN split_k_profiled INTEGER DEFAULT 1;"
+            )
         self._con.commit()
 
     def _create_conv_table(self):
@@ -372,8 +641,23 @@ class ProfileCacheDB(object):
         self._cur.execute(sql)
         self._con.commit()
 
-    def _query(self, sql: str) -> Tuple[str, int]:
-        """a function to query op from cache
+    def _create_elementwise_table(self):
+        """Creates elementwise table."""
+        sql = ELEMENTWISE_INIT_TEMPLATE.render(dev=self._target)
+        self._cur.execute(sql)
+        # tables created before profiler_key was added, their rows don't
+        # tell which fused functions they belong to and never match
+        self._cur.execute(f"PRAGMA table_info({self._target}_elementwise);")
+        columns = [row[1] for row in self._cur.fetchall()]
+        if "profiler_key" not in columns:
+            self._cur.execute(
+                f"ALTER TABLE {self._target}_elementwise "
+                "ADD COLUMN profiler_key VARCHAR(64) NOT NULL DEFAULT '';"
+            )
+        self._con.commit()
+
+    def _query_all(self, sql: str) -> List[Tuple]:
+        """a function to query all matching rows from cache
 
         Parameters
         ----------
@@ -382,21 +666,36 @@ class ProfileCacheDB(object):
 
         Returns
         -------
-        Tuple
-            profiling results
+        List[Tuple]
+            all matching rows
         """
         if self._mode == CacheMode.LOCAL:
             if self._db_commit_flag:
                 self._con.commit()
                 self._db_commit_flag = False
             self._cur.execute(sql)
-            out = self._cur.fetchall()
-            if len(out) == 0:
-                return None
-            return out[0]
+            return self._cur.fetchall()
 
         raise NotImplementedError
 
+    def _query(self, sql: str) -> Tuple[str, int]:
+        """a function to query op from cache
+
+        Parameters
+        ----------
+        sql : str
+            sql statement for query
+
+        Returns
+        -------
+        Tuple
+            profiling results
+        """
+        out = self._query_all(sql)
+        if len(out) == 0:
+            return None
+        return out[0]
+
     def query_gemm(self, args: Dict[str, Any]) -> Tuple[str, int]:
         """a function to query gemm op epilogue from cache
 
@@ -413,6 +712,24 @@ class ProfileCacheDB(object):
         sql = GEMM_QUERY_TEMPLATE.render(dev=self._target, **args)
         return self._query(sql)
 
+    def query_gemm_split_k_history(self, args: Dict[str, Any]) -> List[Tuple[str, int]]:
+        """a function to query the selected split_k of all cached gemm
+        results of a given op_type on a given device, whose profiling
+        tried split_k > 1
+
+        Parameters
+        ----------
+        args : Dict
+            Dict with op_type and device
+
+        Returns
+        -------
+        List[Tuple[str, int]]
+            (exec_entry, split_k) of every matching record
+        """
+        sql = GEMM_SPLIT_K_HISTORY_TEMPLATE.render(dev=self._target, **args)
+        return self._query_all(sql)
+
     def query_conv(self, args: Dict[str, Any]) -> Tuple[str, int]:
         """a function to query conv op epilogue from cache,
         here we use the same sql table for conv and gemm
@@ -446,6 +763,46 @@ class ProfileCacheDB(object):
         sql = NORM_QUERY_TEMPLATE.render(dev=self._target, **args)
         return self._query(sql)
 
+    def query_elementwise(self, args: Dict[str, Any]) -> Tuple[str, int]:
+        """a function to query the launch config of an elementwise op from
+        cache
+
+        Parameters
+        ----------
+        args : Dict
+            Elementwise query entry
+
+        Returns
+        -------
+        Tuple
+            profiling results
+        """
+        sql = ELEMENTWISE_QUERY_TEMPLATE.render(dev=self._target, **args)
+        return self._query(sql)
+
+    def query(self, op_class: str, args: Dict[str, Any]) -> Optional[Tuple]:
+        if op_class == "gemm":
+            return self.query_gemm(args)
+        if op_class == "conv":
+            return self.query_conv(args)
+        if op_class == "normalization":
+            return self.query_normalization(args)
+        if op_class == "elementwise":
+            return self.query_elementwise(args)
+        raise NotImplementedError
+
+    def insert(self, op_class: str, args: Dict[str, Any]) -> None:
+        if op_class == "gemm":
+            self.insert_gemm(args)
+        elif op_class == "conv":
+            self.insert_conv(args)
+        elif op_class == "normalization":
+            self.insert_normalization(args)
+        elif op_class == "elementwise":
+            self.insert_elementwise(args)
+        else:
+            raise NotImplementedError
+
     def _insert(self, query_sql: str, insert_sql: str) -> None:
         """a function to insert op into cache
 
@@ -549,6 +906,97 @@ class ProfileCacheDB(object):
         insert_sql = NORM_INSERT_TEMPLATE.render(dev=self._target, **args)
         self._insert(query_sql, insert_sql)
 
+    def insert_elementwise(self, args: Dict[str, Any]) -> None:
+        """a function to insert the launch config of an elementwise op into
+        cache
+
+        Parameters
+        ----------
+        args : Dict
+            Elementwise Record Entry
+
+        """
+        query_sql = ELEMENTWISE_QUERY_TEMPLATE.render(
+            dev=self._target,
+            dtype=args["dtype"],
+            read_t=args["read_t"],
+            num_inputs=args["num_inputs"],
+            num_outputs=args["num_outputs"],
+            op_type=args["op_type"],
+            device=args["device"],
+            profiler_key=args["profiler_key"],
+            exec_entry_sha1=args["exec_entry_sha1"],
+        )
+        insert_sql = ELEMENTWISE_INSERT_TEMPLATE.render(dev=self._target, **args)
+        self._insert(query_sql, insert_sql)
+
+    def export_records(self, op_class: str) -> List[Dict[str, Any]]:
+        """a function to dump all records of an op class
+
+        Parameters
+        ----------
+        op_class : str
+            gemm, conv, normalization or elementwise
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            all records, without their row id and creation time
+        """
+        self._cur.execute(f"SELECT * FROM {self._target}_{op_class};")
+        names = [d[0] for d in self._cur.description]
+        records = []
+        for row in self._cur.fetchall():
+            record = dict(zip(names, row))
+            record.pop("id")
+            record.pop("created_at")
+            records.append(record)
+        return records
+
+    def merge_record(self, op_class: str, record: Dict[str, Any]) -> bool:
+        """a function to merge a record into cache. An existing record of the
+        same workload is only replaced if the new record is faster.
+
+        Parameters
+        ----------
+        op_class : str
+            gemm, conv, normalization or elementwise
+        record : Dict[str, Any]
+            full record, as returned by export_records
+
+        Returns
+        -------
+        bool
+            whether the cache has been changed
+        """
+        table = f"{self._target}_{op_class}"
+        key_columns = CACHE_KEY_COLUMNS[op_class] + ("template_ver",)
+        record = dict(record)
+        record.setdefault("template_ver", TEMPLATE_VERSION)
+        cond = " AND ".join(f"{col}=?" for col in key_columns)
+        key = [record[col] for col in key_columns]
+        self._cur.execute(f"SELECT * FROM {table} WHERE {cond};", key)
+        names = [d[0] for d in self._cur.description]
+        out = self._cur.fetchall()
+        if len(out) == 0:
+            columns = ", ".join(record.keys())
+            values = ", ".join("?" for _ in record)
+            self._cur.execute(
+                f"INSERT INTO {table} ({columns}) VALUES ({values});",
+                list(record.values()),
+            )
+        else:
+            if not is_faster_record(record, dict(zip(names, out[0]))):
+                return False
+            updates = [col for col in record.keys() if col not in key_columns]
+            assignments = ", ".join(f"{col}=?" for col in updates)
+            self._cur.execute(
+                f"UPDATE {table} SET {assignments} WHERE {cond};",
+                [record[col] for col in updates] + key,
+            )
+        self._db_commit_flag = True
+        return True
+
     def __del__(self):
         self._con.commit()
         self._con.close()
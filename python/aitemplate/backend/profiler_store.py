@@ -0,0 +1,223 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Content-addressed store of profiler executables shared across workdirs.
+
+Profiler binaries are keyed by the sha1 of their rendered source and their
+compile command, so identical profilers generated into different workdirs
+are only built once per host. Entries are published atomically and builds
+of the same key are serialized with a per-key file lock.
+"""
+from __future__ import annotations
+
+import fcntl
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+from hashlib import sha1
+from typing import Optional, TextIO
+
+from .._libinfo import __version__
+from ..utils import logger
+
+# Default upper bound of the store size, in GB.
+DEFAULT_MAX_SIZE_GB = 16
+# Temporary files older than this (in seconds) are left-overs of dead builds.
+_STALE_TMP_SECONDS = 3600
+
+
+class ProfilerStore(object):
+    """A content-addressed, cross-workdir store of profiler executables."""
+
+    def __init__(self, path: str, max_size_bytes: int = None) -> None:
+        """
+        Parameters
+        ----------
+        path : str
+            Root directory of the store.
+        max_size_bytes : int, optional
+            Garbage-collect least recently used entries above this size.
+            By default DEFAULT_MAX_SIZE_GB.
+        """
+        self._path = path
+        self._obj_dir = os.path.join(path, "objs")
+        self._lock_dir = os.path.join(path, "locks")
+        self._tmp_dir = os.path.join(path, "tmp")
+        for d in (self._obj_dir, self._lock_dir, self._tmp_dir):
+            os.makedirs(d, exist_ok=True)
+        if max_size_bytes is None:
+            max_size_bytes = DEFAULT_MAX_SIZE_GB * (1 << 30)
+        self._max_size_bytes = max_size_bytes
+
+    @staticmethod
+    def from_env() -> Optional[ProfilerStore]:
+        """Creates the store configured by environment variables.
+
+        PROFILER_STORE_DIR sets the store location (by default
+        ${CACHE_DIR:-~/.aitemplate}/profilers), PROFILER_STORE_MAX_SIZE_GB its
+        size limit, and DISABLE_PROFILER_STORE=1 disables it.
+
+        Returns
+        -------
+        Optional[ProfilerStore]
+            The store, or None if it is disabled or cannot be created.
+        """
+        if os.environ.get("DISABLE_PROFILER_STORE", None) == "1":
+            return None
+        path = os.environ.get("PROFILER_STORE_DIR", None)
+        if path is None:
+            prefix = os.environ.get("CACHE_DIR", None)
+            if prefix is None:
+                prefix = os.path.join(pathlib.Path.home(), ".aitemplate")
+            path = os.path.join(prefix, "profilers")
+        max_size_gb = float(
+            os.environ.get("PROFILER_STORE_MAX_SIZE_GB", DEFAULT_MAX_SIZE_GB)
+        )
+        try:
+            return ProfilerStore(path, int(max_size_gb * (1 << 30)))
+        except OSError as error:
+            logger.info(__name__, f"Cannot use profiler store at {path}: {error}")
+            return None
+
+    def key(self, src: str, cc_cmd: str) -> str:
+        """Returns the content key of a profiler source file.
+
+        Parameters
+        ----------
+        src : str
+            Path to the rendered profiler source.
+        cc_cmd : str
+            Compile command template, e.g. Target.compile_cmd(executable=True).
+        """
+        hasher = sha1()
+        hasher.update(__version__.encode("utf-8"))
+        hasher.update(cc_cmd.encode("utf-8"))
+        with open(src, "rb") as f:
+            hasher.update(f.read())
+        return hasher.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._obj_dir, key)
+
+    def fetch(self, key: str, obj_path: str) -> bool:
+        """Materializes a stored profiler at obj_path.
+
+        Returns
+        -------
+        bool
+            True on a store hit.
+        """
+        entry = self._entry_path(key)
+        try:
+            if os.path.exists(obj_path):
+                os.remove(obj_path)
+            try:
+                os.link(entry, obj_path)
+            except OSError:
+                # cross-device or no hardlink support
+                shutil.copy2(entry, obj_path)
+            # mark as recently used for garbage collection
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        logger.debug(__name__, f"Profiler store hit: {obj_path}")
+        return True
+
+    def publish(self, key: str, obj_path: str) -> None:
+        """Atomically publishes a freshly built profiler."""
+        if not os.path.exists(obj_path):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        os.close(fd)
+        try:
+            shutil.copy2(obj_path, tmp_path)
+            os.replace(tmp_path, self._entry_path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def try_lock(self, key: str) -> Optional[TextIO]:
+        """Takes the build lock of key without blocking.
+
+        Returns
+        -------
+        Optional[TextIO]
+            The lock handle, or None if another builder holds the lock.
+        """
+        f = open(os.path.join(self._lock_dir, key), "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        return f
+
+    def lock(self, key: str) -> TextIO:
+        """Takes the build lock of key, waiting for other builders."""
+        f = open(os.path.join(self._lock_dir, key), "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    @staticmethod
+    def unlock(lock: TextIO) -> None:
+        """Releases a lock returned by lock() or try_lock()."""
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+    def size_bytes(self) -> int:
+        """Returns the total size of stored profilers."""
+        return sum(entry.stat().st_size for entry in os.scandir(self._obj_dir))
+
+    def gc(self) -> None:
+        """Removes least recently used entries until the store fits into its
+        size limit, as well as left-over temporary files."""
+        now = time.time()
+        for entry in os.scandir(self._tmp_dir):
+            try:
+                if now - entry.stat().st_mtime > _STALE_TMP_SECONDS:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        for entry in os.scandir(self._obj_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.name))
+        total = sum(size for _, size, _ in entries)
+        if total <= self._max_size_bytes:
+            return
+        entries.sort()
+        for _, size, key in entries:
+            if total <= self._max_size_bytes:
+                break
+            lock = self.try_lock(key)
+            if lock is None:
+                # being rebuilt right now
+                continue
+            # The lock file is kept: builders which opened it before it was
+            # removed would lock a different file than later builders.
+            try:
+                os.remove(self._entry_path(key))
+            except FileNotFoundError:
+                pass
+            finally:
+                self.unlock(lock)
+            total -= size
+        logger.info(__name__, f"Profiler store garbage collected to {total} bytes")
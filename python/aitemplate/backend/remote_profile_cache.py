@@ -0,0 +1,192 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+REMOTE profile cache mode: profiling results in a key-value store over HTTP.
+
+Records are stored under the sha1 of their target, op class, template
+version and workload. The store speaks two JSON requests:
+
+    POST {uri}/lookup   {"keys": [key, ...]}      -> {"records": {key: record}}
+    POST {uri}/records  {"records": {key: record}} -> {"stored": n}
+
+Results fetched from the remote store are written back to the local cache,
+and new local results are uploaded in batches. If the remote store fails or
+times out, it is disabled for the rest of the session and profiling falls
+back to the local cache.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import urllib.error
+import urllib.request
+from hashlib import sha1
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils import logger
+from .profiler_cache import (
+    CACHE_VALUE_COLUMNS,
+    cache_record_key,
+    CacheMode,
+    ProfileCacheStore,
+    TEMPLATE_VERSION,
+)
+
+# Timeout of a single request to the remote store, in seconds.
+DEFAULT_TIMEOUT = 5.0
+# Max number of keys or records per request.
+DEFAULT_BATCH_SIZE = 256
+
+# pylint: disable=C0103
+
+
+class RemoteProfileCache(ProfileCacheStore):
+    """A remote key-value profile store with a local write-back cache."""
+
+    mode = CacheMode.REMOTE
+
+    def __init__(
+        self,
+        local: ProfileCacheStore,
+        uri: str,
+        timeout: float = DEFAULT_TIMEOUT,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        local : ProfileCacheStore
+            Local cache which is queried first and receives remote results.
+        uri : str
+            Base uri of the remote store, e.g. http://cache-host:8080/ait
+        timeout : float, optional
+            Timeout of a single request in seconds, by default DEFAULT_TIMEOUT.
+        batch_size : int, optional
+            Max number of keys or records per request. Inserted records are
+            uploaded once batch_size of them are pending, or on flush().
+        """
+        self._local = local
+        self._target = local._target
+        self._uri = uri.rstrip("/")
+        self._timeout = timeout
+        self._batch_size = batch_size
+        self._available = True
+        # key -> remote record, or None for a known remote miss
+        self._fetched: Dict[str, Optional[Dict[str, Any]]] = {}
+        # key -> record to upload
+        self._pending: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def from_env(local: ProfileCacheStore) -> Optional[RemoteProfileCache]:
+        """Creates the remote cache configured by PROFILE_CACHE_URI and
+        PROFILE_CACHE_TIMEOUT, or returns None if no uri is set."""
+        uri = os.environ.get("PROFILE_CACHE_URI", None)
+        if not uri:
+            return None
+        timeout = float(os.environ.get("PROFILE_CACHE_TIMEOUT", DEFAULT_TIMEOUT))
+        logger.info(__name__, f"Using remote profile cache at {uri}")
+        return RemoteProfileCache(local, uri, timeout=timeout)
+
+    def _key(self, op_class: str, args: Dict[str, Any]) -> str:
+        template_ver = args.get("template_ver", TEMPLATE_VERSION)
+        content = [self._target, op_class, template_ver]
+        content.extend(cache_record_key(op_class, args))
+        return sha1(json.dumps(content).encode("utf-8")).hexdigest()
+
+    def _request(self, path: str, payload: Dict[str, Any]) -> Optional[Dict]:
+        if not self._available:
+            return None
+        request = urllib.request.Request(
+            self._uri + path,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self._timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except (urllib.error.URLError, socket.timeout, OSError, ValueError) as error:
+            logger.info(
+                __name__,
+                f"Remote profile cache {self._uri} is unavailable, "
+                f"falling back to local profiling: {error}",
+            )
+            self._available = False
+            return None
+
+    def prefetch(self, op_class: str, queries: List[Dict[str, Any]]) -> None:
+        """Looks up all local misses of queries in batched remote requests."""
+        keys = []
+        for args in queries:
+            key = self._key(op_class, args)
+            if key in self._fetched or key in keys:
+                continue
+            if self._local.query(op_class, args) is not None:
+                continue
+            keys.append(key)
+        self._fetch(keys)
+
+    def _fetch(self, keys: List[str]) -> None:
+        """Looks up keys in batched remote requests."""
+        for i in range(0, len(keys), self._batch_size):
+            chunk = keys[i : i + self._batch_size]
+            response = self._request("/lookup", {"keys": chunk})
+            if response is None:
+                return
+            records = response.get("records", {})
+            for key in chunk:
+                self._fetched[key] = records.get(key, None)
+
+    def query(self, op_class: str, args: Dict[str, Any]) -> Optional[Tuple]:
+        value = self._local.query(op_class, args)
+        if value is not None:
+            return value
+        key = self._key(op_class, args)
+        if key not in self._fetched:
+            # a local miss, which is not looked up locally again
+            self._fetch([key])
+        record = self._fetched.get(key, None)
+        if record is None:
+            return None
+        # write back, later queries are answered locally
+        self._local.insert(op_class, record)
+        return tuple(record[col] for col in CACHE_VALUE_COLUMNS[op_class])
+
+    def insert(self, op_class: str, args: Dict[str, Any]) -> None:
+        self._local.insert(op_class, args)
+        record = dict(args)
+        record.setdefault("template_ver", TEMPLATE_VERSION)
+        record["op_class"] = op_class
+        self._pending[self._key(op_class, record)] = record
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Uploads all pending records."""
+        self._local.flush()
+        pending = list(self._pending.items())
+        self._pending = {}
+        for i in range(0, len(pending), self._batch_size):
+            chunk = dict(pending[i : i + self._batch_size])
+            if self._request("/records", {"records": chunk}) is None:
+                logger.info(
+                    __name__, f"Drop {len(pending) - i} remote profile cache records"
+                )
+                return
+
+    def query_gemm_split_k_history(self, args: Dict[str, Any]) -> List[Tuple[str, int]]:
+        return self._local.query_gemm_split_k_history(args)
@@ -678,7 +678,7 @@ def gen_profiler(
     # build
     target = Target.current()
     compile_engine = builder.Builder()
-    compile_engine.build_objs(file_paris, target.compile_cmd(executable=True))
+    compile_engine.build_profilers(file_paris, target.compile_cmd(executable=True))
     # cleanup source
     # for src_path, _ in file_paris:
     #     os.remove(src_path)
@@ -397,7 +397,7 @@ def gen_profiler(
     # build
     target = Target.current()
     compile_engine = builder.Builder()
-    compile_engine.build_objs(file_paris, target.compile_cmd(executable=True))
+    compile_engine.build_profilers(file_paris, target.compile_cmd(executable=True))
 
 
 # no longer used by layernorm
@@ -18,6 +18,7 @@ ROCM codegen functions for view ops.
 import jinja2
 
 from ....backend import registry
+from ....compiler.ops.common.view_ops import gen_unknown_dim_expr
 
 SRC_TEMPLATE = jinja2.Template(
     """
@@ -91,6 +92,7 @@ def reshape_gen_function(func_attrs, shape_eval_template):
     input_ndim = len(func_attrs["inputs"][0]._attrs["shape"])
     output_ndim = len(func_attrs["outputs"][0]._attrs["shape"])
     unknown_idx = func_attrs["unknown_idx"]
+    unknown_expr = gen_unknown_dim_expr(func_attrs) if unknown_idx >= 0 else None
 
     input_args = INPUT_ARGS_TEMPLATE.render(input_ndim=input_ndim)
     output_args = OUTPUT_ARGS_TEMPLATE.render(output_ndim=output_ndim)
@@ -101,6 +103,7 @@ def reshape_gen_function(func_attrs, shape_eval_template):
         input_ndim=input_ndim,
         output_ndim=output_ndim,
         unknown_idx=unknown_idx,
+        unknown_expr=unknown_expr,
     )
 
     return SRC_TEMPLATE.render(
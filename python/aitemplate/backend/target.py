@@ -24,7 +24,9 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 
 from ..utils import logger
 from . import registry
+from .profile_cache_bundle import LayeredProfileCache, load_bundles_from_env
 from .profiler_cache import ProfileCacheDB
+from .remote_profile_cache import RemoteProfileCache
 
 _MYPATH = os.path.dirname(os.path.realpath(__file__))
 _3RDPARTY_PATH = os.path.normpath(os.path.join(_MYPATH, "..", "..", "..", "3rdparty"))
@@ -81,6 +83,7 @@ class Target(object):
 
     def __exit__(self, ptype, value, trace):
         """Exit the target context manager."""
+        self.flush_profile_cache()
         self._profile_cache = None
         global CURRENT_TARGET
         CURRENT_TARGET = None
@@ -325,6 +328,14 @@ class Target(object):
         self._profile_cache = ProfileCacheDB(
             TargetType(self._target_type).name, path=self._cache_path
         )
+        # read-only bundles of pre-seeded profiling results
+        bundles = load_bundles_from_env()
+        if len(bundles) > 0:
+            self._profile_cache = LayeredProfileCache(self._profile_cache, bundles)
+        # shared profiling results of other build hosts
+        remote_cache = RemoteProfileCache.from_env(self._profile_cache)
+        if remote_cache is not None:
+            self._profile_cache = remote_cache
 
     def get_profile_cache_path(self):
         """Get local profile cache path for this target."""
@@ -336,7 +347,7 @@ class Target(object):
         Parameters
         ----------
         op_class : str
-            Op class name. gemm, conv or normalization
+            Op class name. gemm, conv, normalization or elementwise
         args : str
             Op arguments.
 
@@ -356,8 +367,50 @@ class Target(object):
             return self._profile_cache.query_conv(args)
         if op_class == "normalization":
             return self._profile_cache.query_normalization(args)
+        if op_class == "elementwise":
+            return self._profile_cache.query_elementwise(args)
         raise NotImplementedError
 
+    def query_gemm_split_k_history(self, args: Dict[str, Any]) -> List[Tuple[str, int]]:
+        """Query (exec_entry, split_k) of all cached gemm results with the
+        given op_type and device. Used to mine a split-k prior.
+
+        Parameters
+        ----------
+        args : Dict[str, Any]
+            Dict with op_type and device.
+
+        Returns
+        -------
+        List[Tuple[str, int]]
+            Cached records, empty if there is no profile cache.
+        """
+        if self._profile_cache is None:
+            return []
+        return self._profile_cache.query_gemm_split_k_history(args)
+
+    def prefetch_profile_cache(
+        self, op_class: str, queries: List[Dict[str, Any]]
+    ) -> None:
+        """Announce upcoming profile cache queries, so that remote caches can
+        look them up in a single batch.
+
+        Parameters
+        ----------
+        op_class : str
+            Op class name. gemm, conv, normalization or elementwise
+        queries : List[Dict[str, Any]]
+            Query entries.
+        """
+        if self._profile_cache is None or len(queries) == 0:
+            return
+        self._profile_cache.prefetch(op_class, queries)
+
+    def flush_profile_cache(self) -> None:
+        """Write out pending profile cache records, e.g. to a remote cache."""
+        if self._profile_cache is not None:
+            self._profile_cache.flush()
+
     def insert_profile_cache(self, op_class: str, args: str):
         """Insert the profile cache for the given op class and args."""
         if op_class == "gemm":
@@ -366,6 +419,8 @@ class Target(object):
             self._profile_cache.insert_conv(args)
         elif op_class == "normalization":
             self._profile_cache.insert_normalization(args)
+        elif op_class == "elementwise":
+            self._profile_cache.insert_elementwise(args)
         else:
             raise NotImplementedError
 
@@ -54,6 +54,10 @@ class Task(object):
         self._assigned_dev = None
         self._proc = None
         self._timestamp = 0
+        # wall clock times when the task was created and when it finished,
+        # the time between creation and _timestamp is spent in the queue
+        self._queued_at = time.time()
+        self._finished_at = None
         self._stdout = ""
         self._stderr = ""
         self._kwargs = kwargs
@@ -137,10 +141,12 @@ class Task(object):
             self._finished = True
             self._is_timeout = True
             self._failed = True
+            self._finished_at = current_time
             return True
         # handle finished job
         if self._proc.poll() is not None:
             self._finished = True
+            self._finished_at = current_time
         return self._finished
 
     def pull(self, fproc: typing.Callable) -> None:
@@ -12,18 +12,22 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
-from . import base, ops, tensor_accessor, transform
+from . import base, ops, profiling, tensor_accessor, transform
 from .compiler import compile_model
-from .model import AIT_DEFAULT_NUM_RUNTIMES, AITData, Model
+from .model import AIT_DEFAULT_NUM_RUNTIMES, AITData, Model, SharedWeights
+from .weight_store import WeightStore
 
 __all__ = [
     "base",
     "op_registry",
     "ops",
+    "profiling",
     "tensor_accessor",
     "transform",
     "compile_model",
     "Model",
     "AITData",
+    "SharedWeights",
+    "WeightStore",
     "AIT_DEFAULT_NUM_RUNTIMES",
 ]
@@ -17,12 +17,14 @@ Basic data types of AITemplate.
 """
 from __future__ import annotations
 
+import math
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
+from fractions import Fraction
 from functools import reduce
 from pprint import pformat
-from typing import Any, Dict, List, Set, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 import numpy as np
 
@@ -86,6 +88,7 @@ class IntVar(Node):
         self,
         values: List[int],
         name: str = None,
+        symbolic_value: Optional[DimExpr] = None,
     ) -> None:
         """Initializes an IntVar.
 
@@ -106,9 +109,15 @@ class IntVar(Node):
         name : str, optional
             Name of this dimension, by default None.
             This field must be set for dims which are used by input tensors.
+
+        symbolic_value : DimExpr, optional
+            The expression of other dims this dimension is derived from, e.g.
+            batch * seq_len for a flattened dim, by default None.
+            Use DimExpr.to_int_var() to create derived dims.
         """
         super().__init__()
         self._attrs["name"] = name
+        self._attrs["symbolic_value"] = symbolic_value
 
         if values is None or len(values) < 2:
             raise RuntimeError(
@@ -128,14 +137,22 @@ class IntVar(Node):
         return pformat(self._attrs, indent=2)
 
     def __eq__(self, another: Any) -> bool:
-        return (
-            isinstance(another, IntVar)
-            and self._attrs["values"] == another._attrs["values"]
+        if not isinstance(another, IntVar):
+            return False
+        if (
+            self._attrs["values"] == another._attrs["values"]
             and self._attrs["name"] == another._attrs["name"]
-        )
+        ):
+            return True
+        # derived dims are equal if they have the same expression,
+        # whatever their names
+        expr = self._attrs.get("symbolic_value")
+        another_expr = another._attrs.get("symbolic_value")
+        return expr is not None and another_expr is not None and expr == another_expr
 
     def __hash__(self) -> int:
-        return hash((self._attrs["name"], tuple(self._attrs["values"])))
+        # equal derived dims may have different names, but have the same values
+        return hash(tuple(self._attrs["values"]))
 
     def lower_bound(self) -> int:
         """Returns lower bound of this dynamic dim."""
@@ -145,6 +162,24 @@ class IntVar(Node):
         """Returns upper bound of this dynamic dim."""
         return self._attrs["values"][-1]
 
+    def symbolic_value(self) -> DimExpr:
+        """Returns the expression of this dim, which is the dim itself unless
+        it is derived from other dims."""
+        expr = self._attrs["symbolic_value"]
+        return expr if expr is not None else DimExpr(factors=((self, 1),))
+
+    def __mul__(self, other: Union[int, IntVar, DimExpr]) -> DimExpr:
+        return self.symbolic_value() * other
+
+    def __rmul__(self, other: int) -> DimExpr:
+        return DimExpr.of(other) * self
+
+    def __truediv__(self, other: Union[int, IntVar, DimExpr]) -> DimExpr:
+        return self.symbolic_value() / other
+
+    def __rtruediv__(self, other: int) -> DimExpr:
+        return DimExpr.of(other) / self
+
     def pseudo_code(self, with_shape=False) -> str:
         return (
             self._attrs["name"]
@@ -200,17 +235,204 @@ class IntImm(IntVar):
         """Returns value of this IntImm."""
         return self._attrs["values"][0]
 
+    def symbolic_value(self) -> DimExpr:
+        return DimExpr(self.value())
+
     def pseudo_code(self, with_shape=False) -> str:
         return str(self.value())
 
 
+class DimExpr:
+    """
+    A DimExpr is a symbolic expression of dims: a product of integer powers
+    of IntVars with a rational coefficient, e.g. batch * seq_len * 64 or
+    batch / 2. IntVars in the expression are compared with IntVar.__eq__.
+
+    DimExprs let shape functions propagate dynamic dims through products and
+    quotients, e.g. in reshape and flatten, and decide equality, divisibility
+    and bounds without enumerating the values of every IntVar.
+    """
+
+    def __init__(
+        self,
+        coeff: Union[int, Fraction] = 1,
+        factors: Tuple[Tuple[IntVar, int], ...] = (),
+    ) -> None:
+        """Initializes a DimExpr.
+
+        Parameters
+        ----------
+        coeff : Union[int, Fraction], optional
+            Constant coefficient, by default 1
+        factors : Tuple[Tuple[IntVar, int], ...], optional
+            (dim, exponent) pairs, by default (). Factors of equal dims are
+            merged and factors with a zero exponent are dropped.
+        """
+        merged: List[List[Any]] = []
+        for var, exponent in factors:
+            for factor in merged:
+                if factor[0] is var or factor[0] == var:
+                    factor[1] += exponent
+                    break
+            else:
+                merged.append([var, exponent])
+        self._coeff = Fraction(coeff)
+        self._factors = tuple((var, exp) for var, exp in merged if exp != 0)
+
+    @staticmethod
+    def of(dim: Union[int, IntVar, DimExpr]) -> DimExpr:
+        """Returns the expression of an int, a dim or an expression."""
+        if isinstance(dim, DimExpr):
+            return dim
+        if isinstance(dim, IntVar):
+            return dim.symbolic_value()
+        return DimExpr(dim)
+
+    def __mul__(self, other: Union[int, IntVar, DimExpr]) -> DimExpr:
+        other = DimExpr.of(other)
+        return DimExpr(self._coeff * other._coeff, self._factors + other._factors)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: Union[int, IntVar, DimExpr]) -> DimExpr:
+        other = DimExpr.of(other)
+        inverse = tuple((var, -exp) for var, exp in other._factors)
+        return DimExpr(self._coeff / other._coeff, self._factors + inverse)
+
+    def __rtruediv__(self, other: Union[int, IntVar]) -> DimExpr:
+        return DimExpr.of(other) / self
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (int, IntVar)):
+            other = DimExpr.of(other)
+        if not isinstance(other, DimExpr):
+            return False
+        if self._coeff != other._coeff or len(self._factors) != len(other._factors):
+            return False
+        # factors are merged, so matching each factor once is enough
+        return all(factor in other._factors for factor in self._factors)
+
+    def __hash__(self) -> int:
+        return hash(
+            (self._coeff, frozenset((hash(var), exp) for var, exp in self._factors))
+        )
+
+    def __repr__(self) -> str:
+        return f"DimExpr({self.pseudo_code()})"
+
+    def free_dims(self) -> List[IntVar]:
+        """Returns the dims of this expression."""
+        return [var for var, _ in self._factors]
+
+    def is_constant(self) -> bool:
+        """Returns whether this expression does not depend on any dim."""
+        return len(self._factors) == 0
+
+    def is_integral(self) -> bool:
+        """Returns whether this expression is an integer for all values of its
+        dims, i.e. its coefficient is an integer and no dim is a divisor."""
+        return self._coeff.denominator == 1 and all(exp > 0 for _, exp in self._factors)
+
+    def is_divisible_by(self, divisor: Union[int, IntVar, DimExpr]) -> bool:
+        """Returns whether this expression is provably divisible by divisor.
+        This is conservative, e.g. 6 * batch is not divisible by 4 even if
+        batch is always even."""
+        divisor = DimExpr.of(divisor)
+        if divisor._coeff == 0:
+            return False
+        return (self / divisor).is_integral()
+
+    def bounds(self) -> Tuple[int, int]:
+        """Returns the inclusive integer (lower, upper) bounds of this
+        expression, given the bounds of its dims."""
+        lower = upper = self._coeff
+        for var, exp in self._factors:
+            if exp > 0:
+                lower *= Fraction(var.lower_bound()) ** exp
+                upper *= Fraction(var.upper_bound()) ** exp
+            else:
+                # dims are at least 1 where they divide
+                lower /= Fraction(max(var.upper_bound(), 1)) ** -exp
+                upper /= Fraction(max(var.lower_bound(), 1)) ** -exp
+        return math.ceil(lower), math.floor(upper)
+
+    def values(self) -> List[int]:
+        """Returns the values of an integral expression. If it depends on a
+        single dim, these are the values of the expression for every value of
+        the dim. Otherwise, only its bounds are returned, so the number of
+        values does not grow with the number of dims."""
+        if len(self._factors) == 1:
+            var, exp = self._factors[0]
+            return sorted(
+                {int(self._coeff * value**exp) for value in var._attrs["values"]}
+            )
+        return sorted(set(self.bounds()))
+
+    def to_int_var(self, name: str = None) -> IntVar:
+        """Returns a dim with the value of this integral expression: an IntImm
+        for constants, the dim itself for a single dim, and otherwise a new
+        IntVar derived from its dims.
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of a new IntVar, by default None
+
+        Returns
+        -------
+        IntVar
+            The dim.
+        """
+        if not self.is_integral():
+            raise RuntimeError(f"{self} is not an integer dim")
+        if self.is_constant():
+            return IntImm(int(self._coeff), name=name)
+        if self._coeff == 1 and self._factors[0][1] == 1 and len(self._factors) == 1:
+            return self._factors[0][0]
+        return IntVar(self.values(), name=name, symbolic_value=self)
+
+    def _gen_code(self, dim_to_str: Callable[[IntVar], str], mul: str) -> str:
+        def product(coeff: int, exp_sign: int) -> str:
+            terms = [str(coeff)] if coeff != 1 else []
+            for var, exp in self._factors:
+                if exp * exp_sign > 0:
+                    terms.extend([dim_to_str(var)] * abs(exp))
+            return mul.join(terms) if terms else "1"
+
+        numerator = product(self._coeff.numerator, 1)
+        if self._coeff.denominator == 1 and self.is_integral():
+            return numerator
+        return f"({numerator}) / ({product(self._coeff.denominator, -1)})"
+
+    def to_cpp(self, dim_to_str: Callable[[IntVar], str]) -> str:
+        """Returns a C++ expression which evaluates this expression.
+
+        Parameters
+        ----------
+        dim_to_str : Callable[[IntVar], str]
+            Returns the C++ expression of a dim of this expression, e.g. the
+            name of its variable.
+
+        Returns
+        -------
+        str
+            The C++ expression.
+        """
+        return self._gen_code(dim_to_str, " * ")
+
+    def pseudo_code(self, with_shape=False) -> str:
+        return self._gen_code(lambda var: var.pseudo_code(), "*")
+
+
 _DTYPE2BYTE = {
     "float16": 2,
+    "bfloat16": 2,
     "float32": 4,
     "float": 4,
     "int": 4,
     "int32": 4,
     "int64": 8,
+    "int8": 1,
 }
 
 
@@ -333,7 +555,13 @@ class _TorchConstantTensorData(_ConstantTensorData):
         self.tensor = tensor
 
     def to_bytes(self) -> bytes:
-        return self.tensor.cpu().detach().numpy().tobytes()
+        tensor = self.tensor.cpu().detach()
+        if self.dtype == "bfloat16":
+            # numpy has no bfloat16, copy the raw bits instead
+            import torch
+
+            tensor = tensor.view(torch.int16)
+        return tensor.numpy().tobytes()
 
     def size(self) -> int:
         """
@@ -19,11 +19,12 @@ import os
 from typing import Dict, List, Optional, Union
 
 from aitemplate import backend, compiler
-from aitemplate.utils import graph_utils, logger
+from aitemplate.utils import compile_profiler, graph_utils, logger
 
 from .base import DynamicProfileStrategy, Tensor
 
-from .model import AIT_DEFAULT_NUM_RUNTIMES, Model, TorchTensor
+from .model import AIT_DEFAULT_NUM_RUNTIMES, Model, SharedWeights, TorchTensor
+from .weight_store import WeightStore
 
 # pylint: disable=W0102
 
@@ -89,6 +90,8 @@ def compile_model(
     num_runtimes: int = AIT_DEFAULT_NUM_RUNTIMES,
     profile_dir: str = None,
     constants: Optional[Dict[str, TorchTensor]] = None,
+    profile_ops: bool = False,
+    weight_store: Optional[WeightStore] = None,
 ) -> Model:
     """Compiles a model and generates a .so file.
 
@@ -114,6 +117,16 @@ def compile_model(
             How many runtimes should be stored in the internal pool. This
             determines how many inferences can happen concurrently. By
             default, set to 2. Must be positive.
+    profile_ops : bool, optional
+        Record an event around each op, so that the model can be profiled op
+        by op with Model.profile_ops. Regular runs are not slowed down. By
+        default False.
+    weight_store : Optional[WeightStore], optional
+        Store the constants bound at compile time in this weight store, which
+        can be shared by several models, instead of the .so. The returned
+        model is bound to the current contents of the store; to share them in
+        device memory, bind the models compiled with the store to one
+        SharedWeights, see Model.set_shared_weights. By default None.
 
     Returns
     -------
@@ -134,37 +147,53 @@ def compile_model(
     profile_dir = workdir if profile_dir is None else profile_dir
     if int(recompile) == 1:
         os.makedirs(test_dir, exist_ok=True)
-        with target:
-            graph = compiler.transform.toposort(tensor)
+        with target, compile_profiler.CompileProfiler() as profiler:
+            with profiler.stage("toposort"):
+                graph = compiler.transform.toposort(tensor)
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "toposort")
 
             output_tensors = [tensor] if isinstance(tensor, Tensor) else tensor
             _validate_tensor_args(graph, output_tensors)
 
-            compiler.transform.bind_constants(graph, constants)
+            with profiler.stage("bind_constants"):
+                compiler.transform.bind_constants(graph, constants)
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "bind_constants")
 
-            compiler.transform.remove_unused_ops(graph)
+            with profiler.stage("remove_unused_ops"):
+                compiler.transform.remove_unused_ops(graph)
             graph_utils.dump_graph_debug_str_to_file(
                 graph, test_dir, "remove_unused_ops"
             )
 
-            compiler.transform.remove_no_ops(graph)
+            with profiler.stage("remove_no_ops"):
+                compiler.transform.remove_no_ops(graph)
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "remove_no_ops")
 
-            compiler.transform.name_graph(graph)
+            with profiler.stage("name_graph"):
+                compiler.transform.name_graph(graph)
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "name_graph")
 
-            compiler.transform.mark_param_tensor(graph)
+            with profiler.stage("mark_param_tensor"):
+                compiler.transform.mark_param_tensor(graph)
             graph_utils.dump_graph_debug_str_to_file(
                 graph, test_dir, "mark_param_tensor"
             )
 
-            graph = compiler.transform.optimize_graph(graph, test_dir)
+            with profiler.stage("eliminate_common_subexpressions"):
+                graph = compiler.transform.eliminate_common_subexpressions(
+                    graph, test_dir
+                )
+            graph_utils.dump_graph_debug_str_to_file(
+                graph, test_dir, "eliminate_common_subexpressions"
+            )
+
+            with profiler.stage("optimize_graph"):
+                graph = compiler.transform.optimize_graph(graph, test_dir)
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "optimize_graph")
 
-            compiler.transform.mark_special_views(graph)
-            compiler.transform.refine_graph(graph)
+            with profiler.stage("refine_graph"):
+                compiler.transform.mark_special_views(graph)
+                compiler.transform.refine_graph(graph, test_dir)
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "refine_graph")
 
             if profile_devs is None:
@@ -173,64 +202,81 @@ def compile_model(
                     profile_devs = [0]
                 else:
                     profile_devs = device_env.split(",")
-            compiler.transform.profile(
-                graph, profile_dir, profile_devs, dynamic_profiling_strategy
-            )
+            with profiler.stage("profile"):
+                compiler.transform.profile(
+                    graph, profile_dir, profile_devs, dynamic_profiling_strategy
+                )
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "profile")
 
             constant_folding_workdir = os.path.join(workdir, test_name)
             os.makedirs(constant_folding_workdir, exist_ok=True)
-            graph = compiler.transform.constant_folding(graph, constant_folding_workdir)
+            with profiler.stage("constant_folding"):
+                graph = compiler.transform.constant_folding(
+                    graph, constant_folding_workdir
+                )
             graph_utils.dump_graph_debug_str_to_file(
                 graph, test_dir, "constant_folding"
             )
 
             _verify_outputs_still_in_graph(graph, output_tensors)
-            (
-                max_blob,
-                max_constant_blob,
-                workspace,
-            ) = compiler.transform.memory_planning(graph)
+            with profiler.stage("memory_planning"):
+                (
+                    max_blob,
+                    max_constant_blob,
+                    workspace,
+                ) = compiler.transform.memory_planning(graph)
             graph_utils.dump_graph_debug_str_to_file(graph, test_dir, "memory_planning")
-            file_pairs = backend.codegen.gen_function_src(graph, workdir, test_name)
-
-            # It's possible that the original output tensor has been replaced with a new tensor.
-            # Preserve original output tensors' orders but use the new tensors.
-            new_output_tensor_dict = {
-                tensor._attrs["name"]: tensor
-                for tensor in graph
-                if tensor._attrs["is_output"]
-            }
-            output_tensors = [tensor] if isinstance(tensor, Tensor) else tensor
-            output_tensors = [
-                new_output_tensor_dict[tensor._attrs["name"]]
-                for tensor in output_tensors
-            ]
-
-            main_pairs = backend.codegen.gen_library_src(
-                graph,
-                max_blob,
-                max_constant_blob,
-                workspace,
-                workdir,
-                output_tensors,
-                test_name,
-            )
-            file_pairs.extend(main_pairs)
+
+            with profiler.stage("codegen"):
+                file_pairs = backend.codegen.gen_function_src(graph, workdir, test_name)
+
+                # It's possible that the original output tensor has been replaced with a new tensor.
+                # Preserve original output tensors' orders but use the new tensors.
+                new_output_tensor_dict = {
+                    tensor._attrs["name"]: tensor
+                    for tensor in graph
+                    if tensor._attrs["is_output"]
+                }
+                output_tensors = [tensor] if isinstance(tensor, Tensor) else tensor
+                output_tensors = [
+                    new_output_tensor_dict[tensor._attrs["name"]]
+                    for tensor in output_tensors
+                ]
+
+                main_pairs = backend.codegen.gen_library_src(
+                    graph,
+                    max_blob,
+                    max_constant_blob,
+                    workspace,
+                    workdir,
+                    output_tensors,
+                    test_name,
+                    profile_ops=profile_ops,
+                    weight_store=weight_store,
+                )
+                file_pairs.extend(main_pairs)
 
             compile_engine = backend.builder.Builder()
             if logger.is_debug():
                 compile_engine.gen_makefile(file_pairs, dll_name, workdir, test_name)
 
-            compile_engine.build_objs(
-                file_pairs,
-                backend.target.Target.current().compile_cmd(False),
-                backend.target.Target.current().binary_compile_cmd(),
-            )
-            compile_engine.build_so(
-                os.path.join(workdir, test_name, dll_name), [p[1] for p in file_pairs]
-            )
+            with profiler.stage("build_objs"):
+                compile_engine.build_objs(
+                    file_pairs,
+                    backend.target.Target.current().compile_cmd(False),
+                    backend.target.Target.current().binary_compile_cmd(),
+                )
+            with profiler.stage("build_so"):
+                compile_engine.build_so(
+                    os.path.join(workdir, test_name, dll_name),
+                    [p[1] for p in file_pairs],
+                )
+
+        profiler.save(os.path.join(test_dir, "compile_profile.json"))
+        logger.info(__name__, f"compile_model timings:\n{profiler.summary_table()}")
 
     module = Model(os.path.join(workdir, test_name, dll_name), num_runtimes)
     module.debug_sorted_graph = graph
+    if weight_store is not None and module.get_shared_weights_size() > 0:
+        module.set_shared_weights(SharedWeights(weight_store.path))
     return module
@@ -17,12 +17,27 @@ Python bindings to the AIT runtime.
 """
 import ctypes
 import enum
+import itertools
 import logging
 import math
-from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar, Union
+import os
+import weakref
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import numpy as np
 
+from aitemplate.utils.array_interface import ArrayInfo, DLPackArray, get_array_info
+from aitemplate.utils.op_profile import OpProfile
 from aitemplate.utils.torch_utils import torch_dtype_to_string
 
 # Controls how many runtimes will be used in ModelContainer by default.
@@ -37,11 +52,13 @@ AIT_DEFAULT_NUM_RUNTIMES = 1
 
 DTYPE_TO_BYTES: Dict[str, str] = {
     "float16": 2,
+    "bfloat16": 2,
     "float32": 4,
     "float": 4,
     "int": 4,
     "int32": 4,
     "int64": 8,
+    "int8": 1,
 }
 
 
@@ -160,6 +177,168 @@ class _CFormatAITData(ctypes.Structure):
     ]
 
 
+# Layout of _CFormatAITData, to fill arrays of it with numpy.
+_C_FORMAT_AIT_DATA_NP_DTYPE = np.dtype(
+    {
+        "names": ["pointer", "shape_data", "size", "dtype"],
+        "formats": [np.uintp, np.uintp, np.uintp, np.intc],
+        "offsets": [
+            _CFormatAITData.pointer.offset,
+            _CFormatAITData.shape.offset + _AITemplateShape.shape_data.offset,
+            _CFormatAITData.shape.offset + _AITemplateShape.size.offset,
+            _CFormatAITData.dtype.offset,
+        ],
+        "itemsize": ctypes.sizeof(_CFormatAITData),
+    }
+)
+
+
+class GraphCacheStats(NamedTuple):
+    """
+    Statistics of the CUDA graph caches of a Model, see
+    Model.get_graph_cache_stats.
+
+    hits: graph_mode runs which relaunched a cached graph as is.
+    misses: graph_mode runs which captured and instantiated a graph.
+    updates: graph_mode runs with cached input shapes but new input, output or
+        constant pointers, which recaptured the graph and updated it in place.
+    evictions: cached graphs dropped to make room for others.
+    size: number of cached graphs.
+    """
+
+    hits: int
+    misses: int
+    updates: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses + self.updates
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class _CFormatGraphCacheStats(ctypes.Structure):
+    _fields_ = [
+        ("hits", ctypes.c_uint64),
+        ("misses", ctypes.c_uint64),
+        ("updates", ctypes.c_uint64),
+        ("evictions", ctypes.c_uint64),
+        ("size", ctypes.c_size_t),
+    ]
+
+
+class StagingPoolStats(NamedTuple):
+    """
+    Statistics of the staging buffers of a Model, which hold the outputs of
+    runs with outputs on the host, see Model.get_staging_pool_stats.
+
+    allocations: buffers allocated because none were idle.
+    pinned_allocations: pinned host buffers allocated for buffers which had
+        none, i.e. for their first run_with_pinned_outputs.
+    reuses: runs which reused idle buffers.
+    in_use: buffers used by runs, or leased by run_with_pinned_outputs.
+    idle: buffers kept for later runs.
+    """
+
+    allocations: int
+    pinned_allocations: int
+    reuses: int
+    in_use: int
+    idle: int
+
+
+class _CFormatStagingPoolStats(ctypes.Structure):
+    _fields_ = [
+        ("allocations", ctypes.c_uint64),
+        ("pinned_allocations", ctypes.c_uint64),
+        ("reuses", ctypes.c_uint64),
+        ("in_use", ctypes.c_size_t),
+        ("idle", ctypes.c_size_t),
+    ]
+
+
+class _StagingBuffersLease:
+    """
+    Staging buffers leased by run_with_pinned_outputs, which are given back
+    when the lease is garbage collected, i.e. when all arrays viewing them are.
+    """
+
+    def __init__(self, dll, handle: ctypes.c_void_p, buffers: ctypes.c_void_p):
+        self._dll = dll
+        self._handle = handle
+        self._buffers = buffers
+
+    def __del__(self):
+        # the buffers are freed with the container
+        if self._dll.is_open:
+            self._dll.AITemplateModelContainerReleaseStagingBuffers(
+                self._handle, self._buffers
+            )
+
+
+class SharedWeights:
+    """
+    The contents of a weight store file (see WeightStore) in device memory,
+    shared by all models bound to them with Model.set_shared_weights. The file
+    is mapped and uploaded once, with the library of the first model bound to
+    them. The device memory is freed once the SharedWeights and all models
+    bound to them are garbage collected, or when they are closed, which must
+    not happen while those models are used.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.num_bytes = os.path.getsize(path)
+        if self.num_bytes == 0:
+            raise ValueError(f"Weight store {path} is empty")
+        # device pointer, set once uploaded
+        self.data_ptr = None
+        self._dll = None
+
+    def _upload(self, lib_path: str) -> None:
+        if self._dll is not None:
+            return
+        # The library is loaded again, so that the memory can still be freed
+        # after the model which uploaded it is closed.
+        dll = ctypes.cdll.LoadLibrary(lib_path)
+        ptr = ctypes.c_void_p()
+        null_stream = ctypes.c_void_p()
+        if dll.AITemplateDeviceMalloc(
+            ctypes.byref(ptr), ctypes.c_size_t(self.num_bytes), null_stream, True
+        ):
+            _dlclose(dll)
+            raise RuntimeError(f"Failed to allocate {self.num_bytes} bytes")
+        weights = np.memmap(self.path, dtype=np.uint8, mode="r")
+        err = dll.AITemplateMemcpy(
+            ptr,
+            ctypes.c_void_p(weights.ctypes.data),
+            ctypes.c_size_t(self.num_bytes),
+            ctypes.c_int(AITemplateMemcpyKind.HostToDevice.value),
+            null_stream,
+            True,
+        )
+        del weights
+        if err:
+            dll.AITemplateDeviceFree(ptr, null_stream, True)
+            _dlclose(dll)
+            raise RuntimeError(f"Failed to upload weight store {self.path}")
+        self._dll = dll
+        self.data_ptr = ptr.value
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self._dll is not None:
+            self._dll.AITemplateDeviceFree(
+                ctypes.c_void_p(self.data_ptr), ctypes.c_void_p(), True
+            )
+            _dlclose(self._dll)
+            self._dll = None
+            self.data_ptr = None
+
+
 class Model(object):
     """AITemplate Python runtime binding."""
 
@@ -232,6 +411,17 @@ class Model(object):
             "int": 3,
             "int32": 3,
             "int64": 4,
+            "bfloat16": 5,
+            "int8": 6,
+        }
+        # numpy has no bfloat16, so bfloat16 data is viewed as uint16.
+        self._ENUM_TO_NUMPY_DTYPE = {
+            1: np.dtype("float16"),
+            2: np.dtype("float32"),
+            3: np.dtype("int32"),
+            4: np.dtype("int64"),
+            5: np.dtype("uint16"),
+            6: np.dtype("int8"),
         }
         self._output_name_to_index = self._construct_output_name_to_index_map()
         self._input_name_to_index = self._construct_input_name_to_index_map()
@@ -245,6 +435,15 @@ class Model(object):
         # avoid leaking memory.
         self._allocated_ait_data = set()
 
+        # (weakref, ArrayInfo, _CFormatAITData) of the arrays passed to
+        # run_with_arrays, by id. The struct is reused while the array info
+        # is unchanged. Entries are dropped when their array is garbage
+        # collected.
+        self._array_cache = {}
+
+        # Bound with set_shared_weights, referenced to keep them alive.
+        self._shared_weights = None
+
     def __enter__(self):
         return self
 
@@ -259,6 +458,7 @@ class Model(object):
         for ptr in list(self._allocated_ait_data):
             self.free_gpu_memory(ptr, sync=True)
         self.DLL.close()
+        self._shared_weights = None
 
     def __getstate__(self):
         return {"lib_path": self.DLL.lib_path}
@@ -291,6 +491,16 @@ class Model(object):
             c_params[i] = self._convert_single_param_to_c_format(param)
         return c_params
 
+    def _make_c_output_shapes(self):
+        num_outputs = len(self._output_ndims)
+        c_output_shapes_out = (ctypes.POINTER(ctypes.c_int64) * num_outputs)()
+        for i in range(num_outputs):
+            c_output_shapes_out[i] = ctypes.cast(
+                (ctypes.c_int64 * self._output_ndims[i])(),
+                ctypes.POINTER(ctypes.c_int64),
+            )
+        return c_output_shapes_out
+
     def _prepare_run(
         self,
         inputs,
@@ -302,14 +512,7 @@ class Model(object):
         c_stream = (
             ctypes.c_void_p() if stream_ptr is None else ctypes.c_void_p(stream_ptr)
         )
-
-        num_outputs = len(self._output_ndims)
-        c_output_shapes_out = (ctypes.POINTER(ctypes.c_int64) * num_outputs)()
-        for i in range(num_outputs):
-            c_output_shapes_out[i] = ctypes.cast(
-                (ctypes.c_int64 * self._output_ndims[i])(),
-                ctypes.POINTER(ctypes.c_int64),
-            )
+        c_output_shapes_out = self._make_c_output_shapes()
 
         return (
             c_inputs,
@@ -372,14 +575,38 @@ class Model(object):
             outputs,
             stream_ptr,
         )
+        self._run_c(
+            c_inputs,
+            len(inputs),
+            c_outputs,
+            len(outputs),
+            c_stream,
+            sync,
+            graph_mode,
+            outputs_on_host,
+            c_output_shapes_out,
+        )
+        return self._make_ait_outputs(outputs, c_output_shapes_out)
 
+    def _run_c(
+        self,
+        c_inputs,
+        num_inputs: int,
+        c_outputs,
+        num_outputs: int,
+        c_stream,
+        sync: bool,
+        graph_mode: bool,
+        outputs_on_host: bool,
+        c_output_shapes_out,
+    ) -> None:
         if not outputs_on_host:
             self.DLL.AITemplateModelContainerRun(
                 self.handle,
                 c_inputs,
-                ctypes.c_size_t(len(inputs)),
+                ctypes.c_size_t(num_inputs),
                 c_outputs,
-                ctypes.c_size_t(len(outputs)),
+                ctypes.c_size_t(num_outputs),
                 c_stream,
                 ctypes.c_bool(sync),
                 ctypes.c_bool(graph_mode),
@@ -389,16 +616,14 @@ class Model(object):
             self.DLL.AITemplateModelContainerRunWithOutputsOnHost(
                 self.handle,
                 c_inputs,
-                ctypes.c_size_t(len(inputs)),
+                ctypes.c_size_t(num_inputs),
                 c_outputs,
-                ctypes.c_size_t(len(outputs)),
+                ctypes.c_size_t(num_outputs),
                 c_stream,
                 ctypes.c_bool(graph_mode),
                 c_output_shapes_out,
             )
 
-        return self._make_ait_outputs(outputs, c_output_shapes_out)
-
     def run(
         self,
         inputs: Union[Dict[str, AITData], List[AITData]],
@@ -490,6 +715,109 @@ class Model(object):
 
         return self._interpret_tensors_as_shapes(outputs, outputs_ait)
 
+    def _array_to_c_format(
+        self, array: Any, stream_ptr: Optional[int]
+    ) -> Tuple[ArrayInfo, _CFormatAITData]:
+        # the array is queried on every run, as DLPack exports synchronize
+        # with stream_ptr and arrays may be resized in place
+        info = get_array_info(array, stream_ptr)
+        key = id(array)
+        entry = self._array_cache.get(key)
+        if entry is not None and entry[0]() is array and entry[1] == info:
+            return info, entry[2]
+
+        c_param = self._convert_single_param_to_c_format(
+            AITData(info.data_ptr, info.shape, info.dtype)
+        )
+        cache = self._array_cache
+        try:
+            ref = weakref.ref(array, lambda _, key=key: cache.pop(key, None))
+        except TypeError:
+            # can't be cached without a weak reference, since ids are reused
+            return info, c_param
+        cache[key] = (ref, info, c_param)
+        return info, c_param
+
+    def _arrays_to_c_format(
+        self,
+        arrays: Union[Dict[str, Any], List[Any]],
+        stream_ptr: Optional[int],
+        is_inputs: bool,
+    ):
+        if isinstance(arrays, dict):
+            arrays = self._dict_to_ordered_list(arrays, is_inputs=is_inputs)
+        name = "inputs" if is_inputs else "outputs"
+        infos = []
+        c_arrays = (_CFormatAITData * len(arrays))()
+        for i, array in enumerate(arrays):
+            info, c_arrays[i] = self._array_to_c_format(array, stream_ptr)
+            if is_inputs and info.on_host:
+                raise ValueError(f"{name}[{i}] failed check: on GPU")
+            if not is_inputs and info.readonly:
+                raise ValueError(f"{name}[{i}] failed check: writable")
+            infos.append(info)
+        return arrays, infos, c_arrays
+
+    def run_with_arrays(
+        self,
+        inputs: Union[Dict[str, Any], List[Any]],
+        outputs: Union[Dict[str, Any], List[Any]],
+        stream_ptr: Optional[int] = None,
+        sync: bool = True,
+        graph_mode: bool = False,
+    ) -> Dict[str, DLPackArray]:
+        """
+        Run the model with the arrays of any framework, without copies. See
+        run() for information about the arguments.
+
+        The inputs and outputs may be any contiguous arrays which expose
+        __cuda_array_interface__ or DLPack, e.g. CuPy, JAX or PyTorch arrays.
+        Either all or none of the outputs may be in host memory, e.g. NumPy
+        arrays exposing __array_interface__; host outputs are copied back
+        after a synchronous run.
+
+        The C struct of each array is reused until the array is garbage
+        collected, as long as its memory, shape and dtype don't change.
+
+        Returns
+        -------
+        The outputs, truncated to the shapes computed by shape inference, as
+        DLPackArrays. They can be imported by other frameworks without copies,
+        e.g. with torch.from_dlpack or cupy.from_dlpack, and keep the output
+        arrays alive.
+        """
+        inputs, _, c_inputs = self._arrays_to_c_format(
+            inputs, stream_ptr, is_inputs=True
+        )
+        outputs, output_infos, c_outputs = self._arrays_to_c_format(
+            outputs, stream_ptr, is_inputs=False
+        )
+        outputs_on_host = any(info.on_host for info in output_infos)
+        if outputs_on_host and not all(info.on_host for info in output_infos):
+            raise ValueError("Either all or none of the outputs must be on the host")
+
+        c_output_shapes_out = self._make_c_output_shapes()
+        self._run_c(
+            c_inputs,
+            len(inputs),
+            c_outputs,
+            len(outputs),
+            ctypes.c_void_p() if stream_ptr is None else ctypes.c_void_p(stream_ptr),
+            sync,
+            graph_mode,
+            outputs_on_host,
+            c_output_shapes_out,
+        )
+        return {
+            name: DLPackArray.from_array_info(
+                output_infos[idx]._replace(
+                    shape=c_output_shapes_out[idx][: self._output_ndims[idx]]
+                ),
+                owner=outputs[idx],
+            )
+            for name, idx in self._output_name_to_index.items()
+        }
+
     def _run_with_outputs_on_host(
         self,
         inputs: Union[Dict[str, AITData], List[AITData]],
@@ -537,6 +865,60 @@ class Model(object):
         )
         return self._interpret_tensors_as_shapes(outputs, output_shapes)
 
+    def run_with_pinned_outputs(
+        self,
+        inputs: Union[Dict[str, AITData], List[AITData]],
+        stream_ptr: Optional[int] = None,
+        graph_mode: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Run the model, and copy the outputs to pinned host memory owned by
+        the Model. See run() for information about the arguments.
+
+        Unlike with _run_with_outputs_on_host, no memory is allocated per run:
+        the outputs are computed into device buffers and copied to page-locked
+        host buffers, both of which are pooled. The stream is synchronized
+        before returning.
+
+        Returns
+        -------
+        NumPy arrays viewing the pinned buffers, with the output shapes
+        computed by shape inference. The buffers are reused once all of the
+        arrays have been garbage collected, so copy any array that is kept
+        around; the arrays must not be used after the Model is closed.
+        bfloat16 outputs are returned as uint16 arrays holding the raw bits.
+        """
+        if isinstance(inputs, dict):
+            inputs = self._dict_to_ordered_list(inputs, is_inputs=True)
+        c_inputs = self._convert_params_to_c_format(inputs)
+        num_outputs = len(self._output_ndims)
+        c_outputs = (_CFormatAITData * num_outputs)()
+        c_output_shapes_out = self._make_c_output_shapes()
+        c_buffers = ctypes.c_void_p()
+        self.DLL.AITemplateModelContainerRunWithPinnedOutputs(
+            self.handle,
+            c_inputs,
+            ctypes.c_size_t(len(inputs)),
+            c_outputs,
+            ctypes.c_size_t(num_outputs),
+            ctypes.c_void_p() if stream_ptr is None else ctypes.c_void_p(stream_ptr),
+            ctypes.c_bool(graph_mode),
+            c_output_shapes_out,
+            ctypes.byref(c_buffers),
+        )
+        lease = _StagingBuffersLease(self.DLL, self.handle, c_buffers)
+
+        results = {}
+        for name, idx in self._output_name_to_index.items():
+            shape = c_output_shapes_out[idx][: self._output_ndims[idx]]
+            dtype = self._ENUM_TO_NUMPY_DTYPE[c_outputs[idx].dtype]
+            num_bytes = math.prod(shape) * dtype.itemsize
+            buffer = (ctypes.c_char * num_bytes).from_address(c_outputs[idx].pointer)
+            # the views keep the buffer alive, which keeps the lease alive
+            buffer.lease = lease
+            results[name] = np.frombuffer(buffer, dtype=dtype).reshape(shape)
+        return results
+
     def benchmark(
         self,
         inputs: Union[Dict[str, AITData], List[AITData]],
@@ -583,6 +965,92 @@ class Model(object):
 
         return (mean, std, self._make_ait_outputs(outputs, c_output_shapes_out))
 
+    def get_op_infos(self) -> List[Tuple[str, str]]:
+        """
+        Get the unique name and the type of each op which can be profiled
+        with profile_ops, in launch order. Empty unless the model was compiled
+        with profile_ops=True.
+        """
+        num_ops = ctypes.c_size_t()
+        self.DLL.AITemplateModelContainerGetNumOps(self.handle, ctypes.byref(num_ops))
+        infos = []
+        name = ctypes.c_char_p()
+        op = ctypes.c_char_p()
+        for i in range(num_ops.value):
+            self.DLL.AITemplateModelContainerGetOpInfo(
+                self.handle, ctypes.c_size_t(i), ctypes.byref(name), ctypes.byref(op)
+            )
+            infos.append((name.value.decode("utf-8"), op.value.decode("utf-8")))
+        return infos
+
+    def profile_ops(
+        self,
+        inputs: Union[Dict[str, AITData], List[AITData]],
+        outputs: Union[Dict[str, AITData], List[AITData]],
+        stream_ptr: Optional[int] = None,
+        count: int = 10,
+        trace_path: Optional[str] = None,
+    ) -> OpProfile:
+        """
+        Time each op of the model, which must have been compiled with
+        profile_ops=True. See run() for information on most parameters.
+
+        The model is run count times without CUDA graphs, with an event
+        recorded before each op. The time of an op is measured until the next
+        op starts, so it includes the host-side launch overhead of the next op
+        if the device is idle.
+
+        Parameters
+        ----------
+        count : int
+            The number of runs to profile.
+        trace_path : Optional[str]
+            If given, the timeline of the runs is saved to this path as a
+            Chrome trace JSON file, see OpProfile.save.
+
+        Returns
+        -------
+        The timeline of the ops in each run. OpProfile.summary() returns the
+        statistics of each op.
+        """
+        op_infos = self.get_op_infos()
+        if not op_infos:
+            raise RuntimeError(
+                "The model has no ops to profile; compile it with profile_ops=True"
+            )
+        if isinstance(inputs, dict):
+            inputs = self._dict_to_ordered_list(inputs, is_inputs=True)
+        if isinstance(outputs, dict):
+            outputs = self._dict_to_ordered_list(outputs, is_inputs=False)
+        (c_inputs, c_outputs, c_stream, c_output_shapes_out,) = self._prepare_run(
+            inputs,
+            outputs,
+            stream_ptr,
+        )
+        start_ms = np.zeros((count, len(op_infos)), dtype=np.float32)
+        duration_ms = np.zeros((count, len(op_infos)), dtype=np.float32)
+        self.DLL.AITemplateModelContainerProfileOps(
+            self.handle,
+            c_inputs,
+            ctypes.c_size_t(len(inputs)),
+            c_outputs,
+            ctypes.c_size_t(len(outputs)),
+            c_stream,
+            ctypes.c_size_t(count),
+            start_ms.ctypes.data_as(ctypes.POINTER(ctypes.c_float)),
+            duration_ms.ctypes.data_as(ctypes.POINTER(ctypes.c_float)),
+            c_output_shapes_out,
+        )
+        profile = OpProfile(
+            names=[name for name, _ in op_infos],
+            ops=[op for _, op in op_infos],
+            start_ms=start_ms,
+            duration_ms=duration_ms,
+        )
+        if trace_path is not None:
+            profile.save(trace_path)
+        return profile
+
     def benchmark_with_tensors(
         self,
         inputs: Union[List[TorchTensor], Dict[str, TorchTensor]],
@@ -689,6 +1157,125 @@ class Model(object):
             self.handle, c_name, ctypes.byref(c_tensor)
         )
 
+    def _convert_constants_to_c_format(
+        self,
+        constants: Union[Dict[str, AITData], List[Tuple[str, AITData]]],
+    ):
+        """
+        Vectorized _convert_params_to_c_format for many constants: the C
+        structs are filled through a numpy view, which is much cheaper than
+        setting the fields of each struct with ctypes. The returned numpy
+        arrays own the memory of the C arrays.
+        """
+        items = list(constants.items()) if isinstance(constants, dict) else constants
+        num_tensors = len(items)
+        c_names = (ctypes.c_char_p * num_tensors)(
+            *(name.encode("utf-8") for name, _ in items)
+        )
+        tensors = [tensor for _, tensor in items]
+        ranks = np.fromiter((len(t.shape) for t in tensors), np.int64, num_tensors)
+        shape_data = np.fromiter(
+            itertools.chain.from_iterable(t.shape for t in tensors),
+            np.int64,
+            int(ranks.sum()),
+        )
+        shape_offsets = np.cumsum(ranks) - ranks
+        c_tensors_data = np.zeros(num_tensors, _C_FORMAT_AIT_DATA_NP_DTYPE)
+        c_tensors_data["pointer"] = [t.data_ptr for t in tensors]
+        c_tensors_data["shape_data"] = (
+            shape_data.ctypes.data + shape_offsets * shape_data.itemsize
+        )
+        c_tensors_data["size"] = ranks
+        c_tensors_data["dtype"] = [self._dtype_str_to_enum(t.dtype) for t in tensors]
+        c_tensors = (_CFormatAITData * num_tensors).from_buffer(c_tensors_data)
+        return (
+            c_names,
+            c_tensors,
+            ctypes.c_size_t(num_tensors),
+            (shape_data, c_tensors_data),
+        )
+
+    def set_many_constants(
+        self, constants: Union[Dict[str, AITData], List[Tuple[str, AITData]]]
+    ):
+        """
+        Set many constants in one call, given as a dict or a list of
+        (name, tensor) pairs. All of the tensors are validated before any
+        constant is set, so nothing is set if one of them is invalid.
+
+        Like set_constant, the pointers inside the tensors must be valid for
+        the entire duration of run().
+        """
+        (
+            c_names,
+            c_tensors,
+            c_num_tensors,
+            _buffers,
+        ) = self._convert_constants_to_c_format(constants)
+        self.DLL.AITemplateModelContainerSetManyConstants(
+            self.handle, c_names, c_tensors, c_num_tensors
+        )
+
+    def upload_many_constants(
+        self,
+        constants: Union[Dict[str, AITData], List[Tuple[str, AITData]]],
+        stream_ptr: Optional[int] = None,
+        sync: bool = True,
+    ):
+        """
+        Like set_many_constants, but the tensors are in host memory. Each of
+        them is copied once, on the given stream, into device memory owned by
+        the model, which is shared by all runtimes; the host memory may be
+        freed afterwards.
+
+        The copies are asynchronous if the host memory is pinned. If sync is
+        False, the host memory must stay valid until the stream has finished
+        them.
+        """
+        (
+            c_names,
+            c_tensors,
+            c_num_tensors,
+            _buffers,
+        ) = self._convert_constants_to_c_format(constants)
+        self.DLL.AITemplateModelContainerUploadManyConstants(
+            self.handle,
+            c_names,
+            c_tensors,
+            c_num_tensors,
+            ctypes.c_void_p() if stream_ptr is None else ctypes.c_void_p(stream_ptr),
+            ctypes.c_bool(sync),
+        )
+
+    def get_shared_weights_size(self) -> int:
+        """
+        Get the size of the weight store the model was compiled with, in
+        bytes, or 0 if its constants are embedded in the library.
+        """
+        num_bytes = ctypes.c_size_t()
+        self.DLL.AITemplateModelContainerGetSharedWeightsSize(
+            self.handle, ctypes.byref(num_bytes)
+        )
+        return num_bytes.value
+
+    def set_shared_weights(self, weights: SharedWeights):
+        """
+        Bind the constants of a model compiled with a WeightStore to the
+        contents of the store in device memory, which are uploaded if this is
+        the first model bound to them. The models compiled with the same store
+        should be bound to the same SharedWeights, so that the weights are in
+        device memory once. The model keeps a reference to weights.
+
+        Like set_constant, this must not be called while runs are in flight.
+        """
+        weights._upload(self.lib_path)
+        self.DLL.AITemplateModelContainerSetSharedWeights(
+            self.handle,
+            ctypes.c_void_p(weights.data_ptr),
+            ctypes.c_size_t(weights.num_bytes),
+        )
+        self._shared_weights = weights
+
     def set_constant_with_tensor(self, name: str, tensor: TorchTensor):
         """
         Set a constant with a PyTorch tensor.
@@ -700,6 +1287,21 @@ class Model(object):
         self.torch_constant_tensors[name] = tensor
         self.set_constant(name, torch_to_ait_data(tensor))
 
+    def set_many_constants_with_tensors(self, tensors: Dict[str, TorchTensor]):
+        """
+        Set many constants with PyTorch tensors in one call, see
+        set_many_constants. Model will store references to the given tensors
+        in torch_constant_tensors until they are explicitly deleted or
+        replaced.
+        """
+        for name, tensor in tensors.items():
+            if not tensor.is_contiguous() or not tensor.is_cuda:
+                raise ValueError(f"Constant {name} must be contiguous and on the GPU.")
+        self.set_many_constants(
+            {name: torch_to_ait_data(tensor) for name, tensor in tensors.items()}
+        )
+        self.torch_constant_tensors.update(tensors)
+
     def get_output_maximum_shape(
         self, output_idx_or_name: Union[int, str]
     ) -> List[int]:
@@ -809,6 +1411,95 @@ class Model(object):
         self.DLL.AITemplateModelContainerGetNumRuntimes(self.handle, ctypes.byref(out))
         return out.value
 
+    def set_caller_affinity(self, enabled: bool) -> None:
+        """
+        If enabled, each thread calling run() prefers the runtime it used
+        last, e.g. so that a thread which always runs the same shapes keeps
+        reusing the same CUDA graph. Otherwise, runs are spread over the
+        runtimes. Disabled by default.
+        """
+        self.DLL.AITemplateModelContainerSetCallerAffinity(
+            self.handle, ctypes.c_bool(enabled)
+        )
+
+    def set_graph_cache_capacity(self, capacity: int) -> None:
+        """
+        Set the number of CUDA graphs each runtime caches for runs with
+        graph_mode=True. Graphs are keyed by the values of the dynamic input
+        dims, so the capacity should cover the number of distinct input
+        shapes the model is run with. Must be positive, by default 8.
+        """
+        self.DLL.AITemplateModelContainerSetGraphCacheCapacity(
+            self.handle, ctypes.c_size_t(capacity)
+        )
+
+    def get_graph_cache_capacity(self) -> int:
+        """
+        Get the number of CUDA graphs each runtime caches, see
+        set_graph_cache_capacity.
+        """
+        out = ctypes.c_size_t()
+        self.DLL.AITemplateModelContainerGetGraphCacheCapacity(
+            self.handle, ctypes.byref(out)
+        )
+        return out.value
+
+    def get_graph_cache_stats(self) -> GraphCacheStats:
+        """
+        Get the statistics of the CUDA graph caches, summed over all runtimes.
+        """
+        out = _CFormatGraphCacheStats()
+        self.DLL.AITemplateModelContainerGetGraphCacheStats(
+            self.handle, ctypes.byref(out)
+        )
+        return GraphCacheStats(
+            hits=out.hits,
+            misses=out.misses,
+            updates=out.updates,
+            evictions=out.evictions,
+            size=out.size,
+        )
+
+    def set_staging_pool_capacity(self, capacity: int) -> None:
+        """
+        Set the number of staging buffers kept while idle for runs with
+        outputs on the host, see run_with_pinned_outputs. Each holds the
+        maximum size of all outputs, in device memory and, once used by
+        run_with_pinned_outputs, in pinned host memory. By default, the
+        number of runtimes.
+        """
+        self.DLL.AITemplateModelContainerSetStagingPoolCapacity(
+            self.handle, ctypes.c_size_t(capacity)
+        )
+
+    def get_staging_pool_capacity(self) -> int:
+        """
+        Get the number of staging buffers kept while idle, see
+        set_staging_pool_capacity.
+        """
+        out = ctypes.c_size_t()
+        self.DLL.AITemplateModelContainerGetStagingPoolCapacity(
+            self.handle, ctypes.byref(out)
+        )
+        return out.value
+
+    def get_staging_pool_stats(self) -> StagingPoolStats:
+        """
+        Get the statistics of the staging buffers for runs with outputs on
+        the host.
+        """
+        out = _CFormatStagingPoolStats()
+        self.DLL.AITemplateModelContainerGetStagingPoolStats(
+            self.handle, ctypes.byref(out)
+        )
+        return StagingPoolStats(
+            allocations=out.allocations,
+            pinned_allocations=out.pinned_allocations,
+            reuses=out.reuses,
+            in_use=out.in_use,
+            idle=out.idle,
+        )
+
     def numpy_to_ait_data(
         self, arr: np.ndarray, stream_ptr: Optional[int] = None, sync: bool = True
     ) -> AITData:
@@ -839,12 +1530,34 @@ class Model(object):
         ait_data: AITData,
         stream_ptr: Optional[int] = None,
         sync: bool = True,
+        out: Optional[np.ndarray] = None,
     ) -> np.ndarray:
         """
         Create numpy array from an AITData.
         Copies on the given stream.
+
+        numpy has no bfloat16, so bfloat16 data is returned as a uint16
+        array holding the raw bits.
+
+        If out is given, the data is copied into it instead of a new array,
+        e.g. to reuse the array across calls, and a view of it with the shape
+        of ait_data is returned. It must be contiguous, have the right dtype
+        and at least as many elements as ait_data. With sync=False, the copy
+        may still be in flight when this returns.
         """
-        arr = np.empty(ait_data.shape, dtype=ait_data.dtype)
+        dtype = "uint16" if ait_data.dtype == "bfloat16" else ait_data.dtype
+        if out is None:
+            arr = np.empty(ait_data.shape, dtype=dtype)
+        else:
+            numel = math.prod(ait_data.shape)
+            if out.dtype != dtype or out.size < numel:
+                raise ValueError(
+                    f"out must be a {dtype} array with at least {numel} elements, "
+                    f"but got a {out.dtype} array with {out.size}"
+                )
+            if not out.flags.c_contiguous or not out.flags.writeable:
+                raise ValueError("out must be contiguous and writable")
+            arr = out.reshape(-1)[:numel].reshape(ait_data.shape)
         self.memcpy(
             arr.ctypes._data.value,
             ait_data.data_ptr,
@@ -19,6 +19,7 @@ Common ops.
 from .elementwise import *
 from .epilogue import *
 from .fused_elementwise import *
+from .group_fused_elementwise import *
 from .math import *
 from .python_ops import *
 from .view_ops import *
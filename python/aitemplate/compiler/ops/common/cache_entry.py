@@ -0,0 +1,59 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Elementwise cache entry.
+"""
+from dataclasses import dataclass
+
+# pylint: disable=C0103
+
+
+@dataclass
+class ElementwiseQueryEntry:
+    """Query Entry
+
+    Attributes
+    ----------
+    """
+
+    dtype: str
+    read_t: str
+    num_inputs: int
+    num_outputs: int
+    op_type: str
+    device: str
+    profiler_key: str
+    exec_entry_sha1: str
+
+
+@dataclass
+class ElementwiseRecordEntry:
+    """Record Entry
+
+    Attributes
+    ----------
+    """
+
+    exec_entry: str
+    exec_entry_sha1: str
+    dtype: str
+    read_t: str
+    num_inputs: int
+    num_outputs: int
+    op_type: str
+    device: str
+    profiler_key: str
+    algo: str
+    workspace: int
@@ -91,7 +91,11 @@ class elementwise(Operator):
         ]
         self._set_depth()
         output_shape = self._infer_shapes(*converted_args)
-        output = Tensor(output_shape, src_ops={self})
+        # the output takes the dtype of the tensor inputs
+        dtypes = [arg._attrs["dtype"] for arg in self._attrs["inputs"]]
+        output = Tensor(
+            output_shape, src_ops={self}, dtype=dtypes[0] if dtypes else "float16"
+        )
         self._attrs["outputs"] = [output]
         return output
 
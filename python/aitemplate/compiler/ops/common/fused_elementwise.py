@@ -15,12 +15,17 @@
 """
 Fused elementwise operator definition.
 """
-from typing import List
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 from .... import backend
 from ....backend import registry
-from ...base import Operator
+from ....backend.profiler_runner import ProfileResult
+from ...base import ExecItem
+from ...profiling import exec_key_sha1, ProfileCandidate, ProfiledOperator
 from ...tensor_accessor import TensorAccessor
+from .cache_entry import ElementwiseQueryEntry, ElementwiseRecordEntry
 from .elementwise import elementwise
 
 # pylint: disable=C0301,C0103,W0223
@@ -35,11 +40,18 @@ def _check_shapes_eq(shapes1, shapes2) -> bool:
     return True
 
 
-class fused_elementwise(Operator):
+class fused_elementwise(ProfiledOperator):
     """fused_elementwise operator is used internally.
     It's the actual operator which does ++ codegen.
+
+    Kernels are launched with a heuristic launch config, i.e. block size,
+    vectors per thread and grid-stride or one-shot. With the
+    profile_elementwise kwarg of the cuda target, the launch config is
+    profiled instead.
     """
 
+    _profile_cache_class = "elementwise"
+
     def _check_output_shape(self) -> None:
         outputs = self._attrs["outputs"]
         shape = outputs[0]._attrs["shape"]
@@ -53,19 +65,21 @@ class fused_elementwise(Operator):
 
     def _update_inputs_outputs(self) -> None:
         ops = set(self._attrs["elementwise_ops"])
-        external_inputs = set()
-        external_outputs = set()
+        # Dicts keep external inputs / outputs in the order of first use,
+        # so that structurally identical fused ops get the same signature.
+        external_inputs = {}
+        external_outputs = {}
         tmp_inputs = set()
         tmp_outputs = set()
 
-        for op in ops:
+        for op in self._attrs["elementwise_ops"]:
             for input_tensor in op._attrs["inputs"]:
                 tmp_inputs.add(input_tensor)
                 if (
                     len(input_tensor._attrs["src_ops"]) == 0
                     or len(set(input_tensor._attrs["src_ops"]) - ops) > 0
                 ) and (not input_tensor.is_a_const_num()):
-                    external_inputs.add(input_tensor)
+                    external_inputs[input_tensor] = None
                 assert op in input_tensor._attrs["dst_ops"]
             for output_tensor in op._attrs["outputs"]:
                 tmp_outputs.add(output_tensor)
@@ -73,22 +87,22 @@ class fused_elementwise(Operator):
                     output_tensor._attrs["is_output"]
                     or len(output_tensor._attrs["dst_ops"] - ops) > 0
                 ):
-                    external_outputs.add(output_tensor)
+                    external_outputs[output_tensor] = None
                 assert len(output_tensor._attrs["src_ops"]) == 1
                 assert list(output_tensor._attrs["src_ops"])[0] == op
 
         assert (
-            external_inputs == tmp_inputs - tmp_outputs
+            external_inputs.keys() == tmp_inputs - tmp_outputs
         ), "external_inputs: {} is not equal to tmp_inputs: {} - tmp_outputs: {}.".format(
             external_inputs, tmp_inputs, tmp_outputs
         )
         assert (
-            len(tmp_outputs - tmp_inputs - external_outputs) == 0
+            len(tmp_outputs - tmp_inputs - external_outputs.keys()) == 0
         ), "tmp_outputs: {} - tmp_inputs: {} - external_outputs: {} is not empty.".format(
             tmp_outputs, tmp_inputs, external_outputs
         )
         assert (
-            len(external_outputs - tmp_outputs) == 0
+            len(external_outputs.keys() - tmp_outputs) == 0
         ), "external_outputs: {} - tmp_outputs: {} is not empty.".format(
             external_outputs, tmp_outputs
         )
@@ -138,12 +152,115 @@ class fused_elementwise(Operator):
 
         self._attrs["op"] = "fused_elementwise"
         self._attrs["elementwise_ops"] = elementwise_ops
-        self._attrs["has_profiler"] = False
+        # profiling is a no-op unless enabled, see _profile_launch_config
+        self._attrs["has_profiler"] = True
+        self._attrs["exec_path"] = OrderedDict()
 
         self._update_inputs_outputs()
         self._set_depth()
         self._check_constant()
 
+    def _profile_launch_config(self) -> bool:
+        target = backend.target.Target.current()
+        return target.name() == "cuda" and "profile_elementwise" in target._kwargs
+
+    def _init_profile(self, dynamic_profiling_strategy) -> None:
+        if "op_instance" in self._attrs or not self._profile_launch_config():
+            return
+        target = backend.target.Target.current()
+        # init candidate launch configs
+        func_key = "{target}.{op}.config".format(
+            target=target.name(), op=self._attrs["op"]
+        )
+        func = registry.get(func_key)
+        func(self._attrs)
+        # launch configs are profiled with the upper bound of the number of
+        # elements, regardless of dynamic_profiling_strategy
+        num_elements = 1
+        for dim in self._attrs["output_accessors"][0].original_shapes:
+            num_elements *= dim.upper_bound()
+        exec_key = f"n_elements == {num_elements}"
+        self._attrs["exec_path"] = OrderedDict(
+            [(exec_key, ExecItem(profiling_key=exec_key, exec_cond="", algo=""))]
+        )
+
+    def _profiler_prefix(self, workdir: str) -> str:
+        # profilers depend on the fused functions, see gen_profiler
+        return os.path.join(
+            workdir, "profiler", self._attrs["op"], self._attrs["profiler_key"]
+        )
+
+    def _profile_query(self, exec_key: str) -> Dict[str, Any]:
+        target = backend.target.Target.current()
+        query = ElementwiseQueryEntry(
+            dtype=self._attrs["outputs"][0].dtype(),
+            read_t=self._attrs["read_t"],
+            num_inputs=len(self._attrs["inputs"]),
+            num_outputs=len(self._attrs["outputs"]),
+            op_type=self._attrs["op"],
+            device=target._arch,
+            profiler_key=self._attrs["profiler_key"],
+            exec_entry_sha1=exec_key_sha1(exec_key),
+        )
+        return query.__dict__
+
+    def _profile_record(self, exec_key: str, value: Tuple) -> Dict[str, Any]:
+        algo, workspace = value
+        target = backend.target.Target.current()
+        cache_record = ElementwiseRecordEntry(
+            exec_entry=exec_key,
+            exec_entry_sha1=exec_key_sha1(exec_key),
+            dtype=self._attrs["outputs"][0].dtype(),
+            read_t=self._attrs["read_t"],
+            num_inputs=len(self._attrs["inputs"]),
+            num_outputs=len(self._attrs["outputs"]),
+            op_type=self._attrs["op"],
+            device=target._arch,
+            profiler_key=self._attrs["profiler_key"],
+            algo=algo,
+            workspace=workspace,
+        )
+        return cache_record.__dict__
+
+    def _profile_dummy(self, exec_key: str) -> Optional[Tuple]:
+        return (self._attrs["heuristic_launch_config"], 0)
+
+    def _profile_candidates(
+        self,
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        if round_idx > 0:
+            return []
+        candidates = []
+        for algo in self._attrs["op_instance"].keys():
+            exe_path = os.path.join(profiler_prefix, algo)
+            if not os.access(exe_path, os.X_OK):
+                raise RuntimeError("Profiler %s is not executable" % exe_path)
+            candidates.append(ProfileCandidate(algo, [exe_path]))
+        return candidates
+
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        algo, _ = value
+        self._attrs["exec_path"][exec_key].algo = algo
+
+    def gen_profiler(
+        self, workdir: str = None, dynamic_profiling_strategy=None
+    ) -> None:
+        if not self._profile_launch_config():
+            return
+        self._init_profile(dynamic_profiling_strategy)
+        if not self._should_build_profiler():
+            return
+        target = backend.target.Target.current()
+        func_key = "{target}.{op}.gen_profiler".format(
+            target=target.name(), op=self._attrs["op"]
+        )
+        func = registry.get(func_key)
+        func(self._attrs, workdir)
+
     def gen_function(self) -> str:
         target = backend.target.Target.current()
         func_key = "{target}.{op}.gen_function".format(
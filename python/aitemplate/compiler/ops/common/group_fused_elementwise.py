@@ -0,0 +1,89 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Group fused elementwise operator definition.
+"""
+from typing import List
+
+from .... import backend
+from ....backend import registry
+from ...base import Operator
+from .fused_elementwise import fused_elementwise
+
+# pylint: disable=C0103,W0223
+
+
+class group_fused_elementwise(Operator):
+    """group_fused_elementwise operator is used internally, see
+    fuse_group_elementwise. It launches mutually independent
+    fused_elementwise ops as a single kernel, where each fused_elementwise op
+    runs on its own range of thread blocks.
+    """
+
+    def _update_inputs_outputs(self) -> None:
+        ops = self._attrs["fused_elementwise_ops"]
+        # inputs may be shared by several fused_elementwise ops
+        input_accessors = {}
+        outputs = []
+        output_accessors = []
+        for op in ops:
+            for tensor, accessor in zip(
+                op._attrs["inputs"], op._attrs["input_accessors"]
+            ):
+                input_accessors.setdefault(tensor, accessor)
+                tensor._attrs["dst_ops"].discard(op)
+            for tensor, accessor in zip(
+                op._attrs["outputs"], op._attrs["output_accessors"]
+            ):
+                outputs.append(tensor)
+                output_accessors.append(accessor)
+                tensor._attrs["src_ops"].discard(op)
+                tensor._attrs["src_ops"].add(self)
+
+        self._attrs["inputs"] = list(input_accessors)
+        self._attrs["input_accessors"] = list(input_accessors.values())
+        self._attrs["outputs"] = outputs
+        self._attrs["output_accessors"] = output_accessors
+
+    def __init__(self, fused_elementwise_ops: List[fused_elementwise]) -> None:
+        super().__init__()
+
+        if len(fused_elementwise_ops) < 2:
+            raise RuntimeError(
+                "group_fused_elementwise needs at least 2 fused_elementwise ops!"
+            )
+        for op in fused_elementwise_ops:
+            if op._attrs["op"] != "fused_elementwise":
+                raise RuntimeError(
+                    f"Expected fused_elementwise ops, got {op._attrs['op']}!"
+                )
+
+        self._attrs["op"] = "group_fused_elementwise"
+        self._attrs["fused_elementwise_ops"] = fused_elementwise_ops
+        self._attrs["has_profiler"] = False
+
+        self._update_inputs_outputs()
+        self._set_depth()
+
+    def gen_function(self) -> str:
+        target = backend.target.Target.current()
+        func_key = "{target}.{op}.gen_function".format(
+            target=target.name(), op=self._attrs["op"]
+        )
+        func = registry.get(func_key)
+        return func(self._attrs)
+
+    def _args_for_pseudo_code(self):
+        return [op._attrs["name"] for op in self._attrs["fused_elementwise_ops"]]
@@ -25,7 +25,14 @@ import jinja2
 
 from aitemplate import backend
 from aitemplate.backend import registry
-from aitemplate.compiler.base import IntImm, IntVar, IntVarTensor, Operator, Tensor
+from aitemplate.compiler.base import (
+    DimExpr,
+    IntImm,
+    IntVar,
+    IntVarTensor,
+    Operator,
+    Tensor,
+)
 
 from ....utils.shape_utils import convert_shape_to_IntVar
 from ....utils.tensor_utils import wrap_dim
@@ -35,7 +42,9 @@ from ....utils.tensor_utils import wrap_dim
 # Only used in generating C++ code
 RESHAPE_FUNC_TEMPLATE = jinja2.Template(
     """
-{% if unknown_idx >= 0 %}
+{% if unknown_idx >= 0 and unknown_expr %}
+{{indent}}*out_{{unknown_idx}} = {{unknown_expr}};
+{% elif unknown_idx >= 0 %}
 {% for idx in range(input_ndim) %}
 {{indent}}{{dtype}}IN_{{idx}} = *in_{{idx}};
 {% endfor %}
@@ -129,6 +138,43 @@ class _reshape_base(_view):
         return output_shape
 
 
+def _product(dims: List[IntVar]) -> DimExpr:
+    return math.prod((dim.symbolic_value() for dim in dims), start=DimExpr(1))
+
+
+def _find_dim(shape: List[Optional[IntVar]], dim: IntVar) -> int:
+    for idx, shape_dim in enumerate(shape):
+        if shape_dim is not None and (shape_dim is dim or shape_dim == dim):
+            return idx
+    return -1
+
+
+def gen_unknown_dim_expr(func_attrs) -> Optional[str]:
+    """Returns the C++ expression of the unknown output dim of a reshape or
+    flatten op, in terms of the in_* and out_* pointers of its shape
+    function. Returns None if the output dim has no symbolic expression
+    of the input dims and the other output dims, e.g. for reshapes which
+    were inferred from dim values.
+    """
+    unknown_idx = func_attrs["unknown_idx"]
+    x_shape = func_attrs["inputs"][0]._attrs["shape"]
+    y_shape = list(func_attrs["outputs"][0]._attrs["shape"])
+    expr = y_shape[unknown_idx].symbolic_value()
+    y_shape[unknown_idx] = None
+
+    names = {}
+    for dim in expr.free_dims():
+        idx = _find_dim(x_shape, dim)
+        if idx >= 0:
+            names[id(dim)] = f"(*in_{idx})"
+            continue
+        idx = _find_dim(y_shape, dim)
+        if idx < 0:
+            return None
+        names[id(dim)] = f"(*out_{idx})"
+    return expr.to_cpp(lambda dim: names[id(dim)])
+
+
 def _is_dynamic_dim_reused(x_shape_values, y_shape_values) -> bool:
     x_cumulative_static_dim = math.prod(v[0] for v in x_shape_values if 1 == len(v))
     y_cumulative_static_dim = math.prod(v[0] for v in y_shape_values if 1 == len(v))
@@ -196,7 +242,33 @@ class reshape(_reshape_base):
             new_shape[unknown_idx] = numel // prod
         return new_shape
 
+    def _infer_shapes_symbolic(self, x: Tensor) -> Optional[List[IntVar]]:
+        """Infers the output shape from the expressions of the dims, see
+        DimExpr. Returns None if the number of elements of the new shape
+        cannot be proven to match x, e.g. if the new shape has dims which
+        are unrelated to x."""
+        new_shape = list(self._attrs["shape"])
+        unknown_idx = _find_dim(new_shape, IntImm(-1))
+        known_dims = [dim for idx, dim in enumerate(new_shape) if idx != unknown_idx]
+        if any(isinstance(dim, IntImm) and dim.value() <= 0 for dim in known_dims):
+            return None
+        numel = _product(x._attrs["shape"])
+        known_numel = _product(known_dims)
+        if unknown_idx < 0:
+            return new_shape if numel == known_numel else None
+        if not numel.is_divisible_by(known_numel):
+            return None
+        new_shape[unknown_idx] = (numel / known_numel).to_int_var()
+        if not isinstance(new_shape[unknown_idx], IntImm):
+            self._attrs["unknown_idx"] = unknown_idx
+        return new_shape
+
     def _infer_shapes(self, x: Tensor):
+        output_shape = self._infer_shapes_symbolic(x)
+        if output_shape is not None:
+            return output_shape
+
+        # fall back to running shape inference for every combination of values
         x_shape_values = [var._attrs["values"] for var in x._attrs["shape"]]
         x_dynamic_dims = [
             var for var in x._attrs["shape"] if 1 < len(var._attrs["values"])
@@ -279,46 +351,14 @@ class flatten(_reshape_base):
         self._attrs["start"] = start_dim
         self._attrs["end"] = end_dim
 
-    def _infer_shape(self, x: List[int]):
-        start = self._attrs["start"]
-        end = self._attrs["end"]
-
-        start = wrap_dim(start, len(x))
-        end = wrap_dim(end, len(x))
-
-        new_shape = []
-        for idx in range(start):
-            new_shape.append(x[idx])
-
-        prod = 1
-        for dim in x[start : end + 1]:
-            prod *= dim
-        new_shape.append(prod)
-
-        for dim in x[end + 1 :]:
-            new_shape.append(dim)
-
-        return new_shape
-
     def _infer_shapes(self, x: Tensor):
-        x_shape_values = [var._attrs["values"] for var in x._attrs["shape"]]
-        x_shapes = itertools.product(*x_shape_values)
-        x_dynamic_dims = [
-            var for var in x._attrs["shape"] if 1 < len(var._attrs["values"])
-        ]
-
-        # run infershape for each
-        y_shapes = [self._infer_shape(x_shape) for x_shape in x_shapes]
-
-        def unique(vector):
-            return sorted(set(vector))
-
-        y_shape_values = list(map(unique, zip(*y_shapes)))
-        reuse_dynamic_dim = _is_dynamic_dim_reused(x_shape_values, y_shape_values)
-        return self.make_output_shape(
-            y_shape_values,
-            dynamic_dim=x_dynamic_dims[0] if reuse_dynamic_dim else None,
-        )
+        x_shape = x._attrs["shape"]
+        start = wrap_dim(self._attrs["start"], len(x_shape))
+        end = wrap_dim(self._attrs["end"], len(x_shape))
+        flattened_dim = _product(x_shape[start : end + 1]).to_int_var()
+        if not isinstance(flattened_dim, IntImm):
+            self._attrs["unknown_idx"] = start
+        return x_shape[:start] + [flattened_dim] + x_shape[end + 1 :]
 
     def _sanity_check(self, x_shape):
         x_rank = len(x_shape)
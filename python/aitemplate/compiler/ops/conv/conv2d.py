@@ -19,16 +19,16 @@ import itertools
 import os
 import re
 from collections import OrderedDict
-from hashlib import sha1
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 import jinja2
 
 from .... import backend
 from ....backend import registry
-from ....backend.target import Target
+from ....backend.profiler_runner import ProfileResult
 from ....utils import logger, shape_utils
-from ...base import DynamicProfileStrategy, IntImm, IntVar, Operator, Tensor
+from ...base import DynamicProfileStrategy, IntImm, IntVar, Tensor
+from ...profiling import exec_key_sha1, ProfileCandidate, ProfiledOperator
 from .cache_entry import ConvQueryEntry, ConvRecordEntry
 
 # pylint: disable=C0103,W0221,R1732,W0102,W1202,C0301,R1716
@@ -87,7 +87,7 @@ EXEC_COND_TEMPLATE = jinja2.Template(
 )
 
 
-class conv2d(Operator):
+class conv2d(ProfiledOperator):
     r"""
     Applies a 2D convolution on input with size (N, H, W, C_in), and produces output with size (N, H_out, W_out, C_out) where N is batch size, H, W are the height and width of the image in pixels, and C is the number of channels.
 
@@ -143,6 +143,8 @@ class conv2d(Operator):
         https://github.com/vdumoulin/conv_arithmetic/blob/master/README.md
     """
 
+    _profile_cache_class = "conv"
+
     def __init__(self, stride, pad, dilate=1, group=1) -> None:
         """Conv2d constructor.
 
@@ -203,28 +205,16 @@ class conv2d(Operator):
         ]
 
     def _infer_shapes(self, x: Tensor, w: Tensor) -> List[int]:
-        x_shape_values = [var._attrs["values"] for var in x._attrs["shape"]]
-        x_shapes = itertools.product(*x_shape_values)
         w_shape = [var._attrs["values"][0] for var in w._attrs["shape"]]
         self._attrs["CO"] = w_shape[0]
         self._attrs["KH"] = w_shape[1]
         self._attrs["KW"] = w_shape[2]
-        # run infershape for each
-        y_shapes = []
-        for x_shape in x_shapes:
-            y_shape = self._infer_shape(x_shape, w_shape)
-            y_shapes.append(y_shape)
-
-        def unique(vector):
-            return sorted(set(vector))
-
-        output_shape = [
-            shape_utils.gen_int_var(unique([d[0] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[1] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[2] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[3] for d in y_shapes])),
-        ]
-        return output_shape
+        # NO = N, HO = f(H), WO = f(W), CO is static
+        return shape_utils.infer_shape_per_dim(
+            x._attrs["shape"],
+            lambda x_shape: self._infer_shape(x_shape, w_shape),
+            [0, 1, 2, None],
+        )
 
     def _invert_exec_key(self, key):
         tmp = re.findall(r"(\d+)", key)
@@ -350,18 +340,20 @@ class conv2d(Operator):
         command = [str(x) for x in cmd]
         return command
 
-    def _profile_single_workload(self, profiler_prefix, exec_key, devices):
+    def _init_profile(self, dynamic_profiling_strategy) -> None:
+        if "op_instance" not in self._attrs:
+            target = backend.target.Target.current()
+            # init candidate ops
+            func_key = "{target}.{op}.config".format(
+                target=target.name(), op=self._attrs["op"]
+            )
+            func = registry.get(func_key)
+            func(self._attrs)
+
+    def _profile_query(self, exec_key: str) -> Dict[str, Any]:
         target = backend.target.Target.current()
-        # if in CI just choose minimal configs
-        # workspace is a hack just provides 102400 Byte
-        if target.use_dummy_profiling_results():
-            algo = target.select_minimal_algo(list(self._attrs["op_instance"].keys()))
-            logger.info(__name__, f"Select minimal algo {algo} for CI")
-            return (algo, 102400)
-        # query cache
         tmp_key = next(iter(self._attrs["op_instance"].keys()))
         tmp_op = self._attrs["op_instance"][tmp_key]
-        exec_entry_sha1 = sha1(exec_key.encode("utf-8")).hexdigest()
         split_k = 1 if self._attrs["split_k"] is None else self._attrs["split_k"]
         query = ConvQueryEntry(
             dtype_a=tmp_op.A.element.value,
@@ -381,48 +373,19 @@ class conv2d(Operator):
             device=target._arch,
             epilogue=tmp_op.epilogue_functor.value,
             split_k=split_k,
-            exec_entry_sha1=exec_entry_sha1,
+            exec_entry_sha1=exec_key_sha1(exec_key),
         )
-        cache_value = target.query_profile_cache("conv", query.__dict__)
-        if cache_value is not None and not target.force_profile():
-            logger.info(__name__, "Load profiling result from cache.")
-            return cache_value
-        if target.use_dummy_profiling_results():
-            op_type = self._attrs["op"]
-            raise Exception(
-                "This is a CI run but we could not find the following cache ",
-                f"available on device {target._arch}\n",
-                f"{op_type} {exec_entry_sha1}.\n",
-                "To bypass, you need to make it available in the db table.",
-            )
-
-        func_key = "{target}.{op}.filter".format(
-            target=target.name(), op=self._attrs["op"]
-        )
-        func = registry.get(func_key)
-        content = list(self._attrs["op_instance"].keys())
-        runner = backend.profiler_runner.Runner(devices, self._attrs["name"])
-        x_shape = self._invert_exec_key(exec_key)
-        for cfg in content:
-            if not func(cfg, self._attrs, x_shape):
-                continue
-            command = self._gen_profile_cmd(profiler_prefix, cfg, x_shape)
-            runner.push(cfg, command)
-
-        runner.join()
-        result = runner.pull()
+        return query.__dict__
 
-        out = sorted(result, key=lambda x: x[1])
-        if len(out) == 0:
-            raise RuntimeError(
-                "Profile workload: " + "" + "failed. " "Results: {}.".format(result)
-            )
-        best_algo = out[0][0]
-        workspace = out[0][1].workspace
-        ## cache
+    def _profile_record(self, exec_key: str, value: Tuple) -> Dict[str, Any]:
+        target = backend.target.Target.current()
+        best_algo, workspace = value
+        tmp_key = next(iter(self._attrs["op_instance"].keys()))
+        tmp_op = self._attrs["op_instance"][tmp_key]
+        split_k = 1 if self._attrs["split_k"] is None else self._attrs["split_k"]
         cache_record = ConvRecordEntry(
             exec_entry=exec_key,
-            exec_entry_sha1=exec_entry_sha1,
+            exec_entry_sha1=exec_key_sha1(exec_key),
             dtype_a=tmp_op.A.element.value,
             dtype_b=tmp_op.B.element.value,
             dtype_c=tmp_op.C.element.value,
@@ -443,19 +406,45 @@ class conv2d(Operator):
             workspace=workspace,
             split_k=split_k,  # todo add into profile
         )
-        Target.current().insert_profile_cache("conv", cache_record.__dict__)
-        return (best_algo, workspace)
+        return cache_record.__dict__
 
-    def profile(
+    def _profile_dummy(self, exec_key: str) -> Tuple:
+        # workspace is a hack just provides 102400 Byte
+        target = backend.target.Target.current()
+        algo = target.select_minimal_algo(list(self._attrs["op_instance"].keys()))
+        return (algo, 102400)
+
+    def _profile_candidates(
         self,
-        workdir="./",
-        devices=None,
-        dynamic_profiling_strategy=DynamicProfileStrategy.HINTS,
-    ):
-        if devices is None:
-            devices = [0]
-        self._profile_static(workdir, devices)
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        if round_idx > 0:
+            return []
+        target = backend.target.Target.current()
+        func_key = "{target}.{op}.filter".format(
+            target=target.name(), op=self._attrs["op"]
+        )
+        func = registry.get(func_key)
+        x_shape = self._invert_exec_key(exec_key)
+        candidates = []
+        for cfg in self._attrs["op_instance"].keys():
+            if not func(cfg, self._attrs, x_shape):
+                continue
+            command = self._gen_profile_cmd(profiler_prefix, cfg, x_shape)
+            candidates.append(ProfileCandidate(cfg, command))
+        return candidates
+
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        best_algo, workspace = value
+        self._attrs["exec_path"][exec_key] = best_algo
+        self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
 
+    def _finish_profile(
+        self, workdir: str, devices: List[int], dynamic_profiling_strategy
+    ) -> None:
         has_dynamic = False
         for input_tensor in self._attrs["inputs"]:
             for dim in input_tensor._attrs["shape"]:
@@ -471,30 +460,13 @@ class conv2d(Operator):
                 )
             self._profile_dynamic_dim(workdir)
 
-    def _profile_static(self, workdir, devices):
-        """Profiles with static shapes."""
-
-        workloads = list(self._attrs["exec_path"].keys())
-        profiler_prefix = os.path.join(workdir, "profiler", self._attrs["op"])
-        if "op_instance" not in self._attrs:
-            target = backend.target.Target.current()
-            # init candidate ops
-            func_key = "{target}.{op}.config".format(
-                target=target.name(), op=self._attrs["op"]
-            )
-            func = registry.get(func_key)
-            func(self._attrs)
-
-        for wkl in workloads:
-            logger.info(
-                __name__,
-                "Profile: {name}: {wkl}".format(name=self._attrs["name"], wkl=wkl),
-            )
-            best_algo, workspace = self._profile_single_workload(
-                profiler_prefix, wkl, devices
-            )
-            self._attrs["exec_path"][wkl] = best_algo
-            self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
+    def profile(
+        self,
+        workdir="./",
+        devices=None,
+        dynamic_profiling_strategy=DynamicProfileStrategy.HINTS,
+    ):
+        super().profile(workdir, devices, dynamic_profiling_strategy)
 
     def _profile_dynamic_dim(self, workdir):
         """Profiles with dynamic shapes."""
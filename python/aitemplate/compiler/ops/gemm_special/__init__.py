@@ -17,7 +17,14 @@ special gemm ops
 """
 from .bmm_rcr_n1 import bmm_rcr_n1
 from .bmm_rrr_k1_tanh import bmm_rrr_k1_tanh
+from .gemm_rcr_weight_int8 import gemm_rcr_bias_weight_int8, gemm_rcr_weight_int8
 from .gemm_rrr_small_nk import gemm_rrr_small_nk
 
 
-__all__ = ["bmm_rcr_n1", "bmm_rrr_k1_tanh", "gemm_rrr_small_nk"]
+__all__ = [
+    "bmm_rcr_n1",
+    "bmm_rrr_k1_tanh",
+    "gemm_rcr_bias_weight_int8",
+    "gemm_rcr_weight_int8",
+    "gemm_rrr_small_nk",
+]
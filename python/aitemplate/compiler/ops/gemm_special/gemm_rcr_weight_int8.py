@@ -0,0 +1,158 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Weight-only int8 GEMM for A[RowMajor], B[ColMajor], C[RowMajor]
+
+A: [M, K] float16, A can be ND with the first N - 1 dimensions as batch
+   dimensions
+B: [N, K] int8, quantized per output channel and packed, see
+   aitemplate.utils.quantization
+scale: [N] float16
+bias: [N] float16, gemm_rcr_bias_weight_int8 only
+C: [M, N] float16
+
+These ops are created by the quantize_gemm_weights pass from gemm_rcr and
+gemm_rcr_bias ops with constant weights. Reading half as many weight bytes
+speeds up memory-bound gemms, e.g. with small M in decoding.
+"""
+
+from ...base import IntImm, Tensor
+from ..gemm_universal import gemm_common as common
+
+# pylint: disable=C0103,W0223,W0221,W0613
+
+
+class gemm_rcr_weight_int8(common.gemm):
+    """Weight-only int8 GEMM, which is equivalent to the following pytorch code:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        A = torch.randn(M, K).cuda().half()
+        B = torch.randint(-127, 128, (N, K), dtype=torch.int8).cuda()
+        scale = torch.rand(N).cuda().half()
+
+        y = torch.nn.functional.linear(A, B.half() * scale[:, None])
+
+    where B is packed with aitemplate.utils.quantization.pack_int8_weight.
+    """
+
+    # B is read 8 int8 elements at a time
+    K_ALIGNMENT = 8
+
+    def __init__(self):
+        super().__init__()
+        self._attrs["op"] = "gemm_rcr_weight_int8"
+        self._attrs["has_profiler"] = False
+
+    @staticmethod
+    def is_valid_shape(a: Tensor, b: Tensor) -> bool:
+        if len(a.shape()) < 2 or len(b.shape()) != 2:
+            return False
+        n, k = b.shape()
+        return (
+            isinstance(n, IntImm)
+            and isinstance(k, IntImm)
+            and k.value() % gemm_rcr_weight_int8.K_ALIGNMENT == 0
+            and a.shape()[-1] == k
+        )
+
+    def _infer_shapes(self, a: Tensor, b: Tensor, scale: Tensor):
+        if not gemm_rcr_weight_int8.is_valid_shape(a, b):
+            raise RuntimeError(
+                "shape (tensor a: {}, tensor b: {}) not valid for {}".format(
+                    a.shape(), b.shape(), self._attrs["op"]
+                )
+            )
+        if b.dtype() != "int8" or scale.dtype() != "float16":
+            raise RuntimeError(
+                f"{self._attrs['op']} expects int8 weights and float16 scales, "
+                f"got {b.dtype()} and {scale.dtype()}"
+            )
+        if scale.shape() != b.shape()[:1]:
+            raise RuntimeError(
+                f"scale shape {scale.shape()} doesn't match weight shape {b.shape()}"
+            )
+        return a._attrs["shape"][:-1] + [b._attrs["shape"][0]]
+
+    def gen_profiler(
+        self, workdir: str = None, dynamic_profiling_strategy=None
+    ) -> None:
+        """This kernel does not require profiling"""
+        return
+
+    def _extract_dims(self, for_profiling=False):
+        A_rank = self._attrs["inputs"][0]._rank()
+        # (M, K) * (N, K) = (M, N)
+        return {
+            "M": [
+                common.DimInfo(
+                    common.Source.INPUT, tensor_idx=0, dim_idx=list(range(A_rank - 1))
+                ),
+                common.DimInfo(
+                    common.Source.OUTPUT, tensor_idx=0, dim_idx=list(range(A_rank - 1))
+                ),
+            ],
+            "N": [
+                common.DimInfo(common.Source.INPUT, tensor_idx=1, dim_idx=0),
+                common.DimInfo(common.Source.OUTPUT, tensor_idx=0, dim_idx=A_rank - 1),
+            ],
+            "K": [
+                common.DimInfo(common.Source.INPUT, tensor_idx=0, dim_idx=A_rank - 1),
+                common.DimInfo(common.Source.INPUT, tensor_idx=1, dim_idx=1),
+            ],
+        }
+
+    def __call__(self, a: Tensor, b: Tensor, scale: Tensor) -> Tensor:
+        self._attrs["inputs"] = [a, b, scale]
+        self._set_depth()
+        output_shape = self._infer_shapes(a, b, scale)
+        output = Tensor(output_shape, src_ops={self}, dtype=a.dtype())
+        self._attrs["outputs"] = [output]
+        return output
+
+
+class gemm_rcr_bias_weight_int8(gemm_rcr_weight_int8):
+    """Weight-only int8 GEMM with bias, which is equivalent to the following
+    pytorch code:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        A = torch.randn(M, K).cuda().half()
+        B = torch.randint(-127, 128, (N, K), dtype=torch.int8).cuda()
+        scale = torch.rand(N).cuda().half()
+        bias = torch.randn(N).cuda().half()
+
+        y = torch.nn.functional.linear(A, B.half() * scale[:, None], bias)
+
+    where B is packed with aitemplate.utils.quantization.pack_int8_weight.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._attrs["op"] = "gemm_rcr_bias_weight_int8"
+
+    def __call__(self, a: Tensor, b: Tensor, scale: Tensor, bias: Tensor) -> Tensor:
+        if bias.shape() != b.shape()[:1]:
+            raise RuntimeError(
+                f"bias shape {bias.shape()} doesn't match weight shape {b.shape()}"
+            )
+        self._attrs["inputs"] = [a, b, scale, bias]
+        self._set_depth()
+        output_shape = self._infer_shapes(a, b, scale)
+        output = Tensor(output_shape, src_ops={self}, dtype=a.dtype())
+        self._attrs["outputs"] = [output]
+        return output
@@ -30,6 +30,7 @@ from .gemm_rcr_bias_add import gemm_rcr_bias_add
 from .gemm_rcr_bias_add_add import gemm_rcr_bias_add_add
 from .gemm_rcr_bias_add_add_relu import gemm_rcr_bias_add_add_relu
 from .gemm_rcr_bias_add_relu import gemm_rcr_bias_add_relu
+from .gemm_rcr_bias_elementwise import gemm_rcr_bias_elementwise
 from .gemm_rcr_bias_fast_gelu import gemm_rcr_bias_fast_gelu
 from .gemm_rcr_bias_gelu import gemm_rcr_bias_gelu
 from .gemm_rcr_bias_hardswish import gemm_rcr_bias_hardswish
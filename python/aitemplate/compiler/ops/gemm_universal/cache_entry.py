@@ -56,3 +56,5 @@ class GemmRecordEntry:
     algo: str
     workspace: int
     split_k: int
+    # 0 if split_k > 1 was not profiled, e.g. because of the split-k prior
+    split_k_profiled: int = 1
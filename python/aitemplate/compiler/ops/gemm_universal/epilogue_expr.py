@@ -0,0 +1,138 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Elementwise epilogue expressions of GEMMs.
+
+An expression is a tree over the GEMM + bias result X, up to two extra
+sources D0 and D1 of the same shape, and scalar constants. It is immutable
+and hashable, so that ops holding it can be compared and deduped.
+"""
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Tuple, Union
+
+from ..common.epilogue import FuncEnum
+
+# pylint: disable=C0103
+
+
+@dataclass(frozen=True)
+class EpilogueExpr:
+    """A node of an epilogue expression: either a func applied to args, a
+    named leaf, or a constant value."""
+
+    func: Optional[FuncEnum] = None
+    args: Tuple["EpilogueExpr", ...] = ()
+    leaf: Optional[str] = None
+    value: Optional[Union[int, float]] = None
+
+    def __str__(self) -> str:
+        if self.leaf is not None:
+            return self.leaf
+        if self.func is None:
+            return str(self.value)
+        return "{}({})".format(self.func.name, ", ".join(str(a) for a in self.args))
+
+    def leaves(self) -> FrozenSet[str]:
+        """Returns the names of all leaves."""
+        if self.leaf is not None:
+            return frozenset({self.leaf})
+        return frozenset().union(*[arg.leaves() for arg in self.args])
+
+    def subexprs(self) -> List["EpilogueExpr"]:
+        """Returns all distinct sub-expressions, children first."""
+        res = {}
+        for arg in self.args:
+            for expr in arg.subexprs():
+                res[expr] = None
+        res[self] = None
+        return list(res)
+
+    def size(self) -> int:
+        """Returns the number of func nodes."""
+        if self.func is None:
+            return 0
+        return 1 + sum(arg.size() for arg in self.args)
+
+    def substitute(self, mapping) -> "EpilogueExpr":
+        """Returns a copy with the sub-expressions in mapping replaced."""
+        if self in mapping:
+            return mapping[self]
+        if not self.args:
+            return self
+        return EpilogueExpr(
+            func=self.func, args=tuple(arg.substitute(mapping) for arg in self.args)
+        )
+
+
+def leaf(name: str) -> EpilogueExpr:
+    return EpilogueExpr(leaf=name)
+
+
+def const(value: Union[int, float]) -> EpilogueExpr:
+    return EpilogueExpr(value=value)
+
+
+def apply(func: FuncEnum, *args: EpilogueExpr) -> EpilogueExpr:
+    return EpilogueExpr(func=func, args=tuple(args))
+
+
+# GEMM + bias result
+X = leaf("x")
+# extra sources
+D0 = leaf("d0")
+D1 = leaf("d1")
+# result of the first stage, see split_epilogue()
+S = leaf("s")
+
+
+def split_epilogue(
+    expr: EpilogueExpr,
+) -> Optional[Tuple[EpilogueExpr, Optional[EpilogueExpr]]]:
+    """Splits an expression into the stages of the broadcast epilogue, i.e.
+    LinearCombinationResidualBlockV2, which reads D0 and D1 in turn:
+
+        expr(X, D0, D1) = stage2(stage1(X, D0), D1)
+
+    stage1 is over X and D0, and stage2 is over S, the result of stage1, and
+    D1. stage2 is None if expr doesn't use D1. A source-free expression,
+    i.e. one over X only, is a stage1 which ignores D0.
+
+    Parameters
+    ----------
+    expr : EpilogueExpr
+        An expression over X, D0 and D1, where D1 is only used together
+        with D0.
+
+    Returns
+    -------
+    Optional[Tuple[EpilogueExpr, Optional[EpilogueExpr]]]
+        (stage1, stage2), or None if expr cannot be split this way.
+    """
+    leaves = expr.leaves()
+    if not leaves <= {"x", "d0", "d1"}:
+        return None
+    if "d1" not in leaves:
+        return expr, None
+    if "d0" not in leaves:
+        return None
+    # X and D0 may only be used through the result of stage1
+    candidates = [
+        e for e in expr.subexprs() if "d0" in e.leaves() and e.leaves() <= {"x", "d0"}
+    ]
+    for stage1 in sorted(candidates, key=lambda e: -e.size()):
+        stage2 = expr.substitute({stage1: S})
+        if stage2.leaves() <= {"s", "d1"}:
+            return stage1, stage2
+    return None
@@ -23,20 +23,29 @@ from dataclasses import dataclass
 from enum import Enum
 from hashlib import sha1
 from operator import itemgetter
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
 import jinja2
 
 from .... import backend
 from ....backend import registry
-from ....backend.target import Target
+from ....backend.profiler_runner import ProfileResult
 from ....utils import logger
-from ...base import DynamicProfileStrategy, ExecItem, IntImm, IntVar, Operator, Tensor
+from ...base import DynamicProfileStrategy, ExecItem, IntImm, IntVar, Tensor
+from ...profiling import exec_key_sha1, ProfileCandidate, ProfiledOperator
 from ...tensor_accessor import TensorAccessor
 from .cache_entry import GemmQueryEntry, GemmRecordEntry
+from .split_k_prior import (
+    get_split_k_prior,
+    invalidate_split_k_prior,
+    parse_exec_key,
+)
 
 # pylint: disable=C0103,R1711,W0102,W0221,E1120
 
+# Number of best split_k == 1 configs which are profiled again with split_k > 1.
+SPLIT_K_TOP_CONFIGS = 3
+
 EXEC_COND_TEMPLATE = jinja2.Template(
     """
 {{indent}}if ({{cond}}) {
@@ -163,9 +172,11 @@ def _to_list(elem):
         return [elem]
 
 
-class gemm(Operator):
+class gemm(ProfiledOperator):
     """Base gemm operators"""
 
+    _profile_cache_class = "gemm"
+
     def __init__(
         self,
     ):
@@ -358,54 +369,86 @@ class gemm(Operator):
                 )
             )
 
-    def _should_build_profiler(
-        self, workloads: List[str], new_op_instance: OrderedDict
-    ):
-        """
-        Check if we should build profilers. If we have a cached
-        entry for this gemm instance, we update this gemm op's
-        relevant attributes with the cached result and return False.
-        """
+    def _init_profile(self, dynamic_profiling_strategy) -> None:
+        if "op_instance" not in self._attrs:
+            target = backend.target.Target.current()
+            # init candidate ops
+            func_key = "{target}.{op}.config".format(
+                target=target.name(), op=self._attrs["op"]
+            )
+            func = registry.get(func_key)
+            func(self._attrs)
+
+    def _profile_is_done(self, exec_key: str) -> bool:
+        # we have cached best algo
+        return self._attrs["exec_path"][exec_key].algo != ""
+
+    def _profile_query(self, exec_key: str) -> Dict[str, Any]:
         target = backend.target.Target.current()
+        tmp_key = next(iter(self._attrs["op_instance"].keys()))
+        tmp_op = self._attrs["op_instance"][tmp_key]
+        query = GemmQueryEntry(
+            dtype_a=tmp_op.A.element.value,
+            dtype_b=tmp_op.B.element.value,
+            dtype_c=tmp_op.C.element.value,
+            dtype_acc=tmp_op.accumulator_type().value,
+            major_a=tmp_op.A.layout.value,
+            major_b=tmp_op.B.layout.value,
+            major_c=tmp_op.C.layout.value,
+            op_type=self._attrs["op"],
+            device=target._arch,
+            epilogue=tmp_op.epilogue_functor.value,
+            exec_entry_sha1=exec_key_sha1(exec_key),
+            pshape=self._attrs["permute_shape"],
+        )
+        return query.__dict__
 
-        build_profiler = True
-        # Now, let's query if all of our workloads have cache entries. If that
-        # is the case, it is safely to skip generating and building profilers.
-        if not target.use_dummy_profiling_results():
-            tmp_key = next(iter(new_op_instance.keys()))
-            tmp_op = new_op_instance[tmp_key]
-            build_profiler = False
-            for wkl in workloads:
-                exec_entry_sha1 = sha1(wkl.encode("utf-8")).hexdigest()
-                query = GemmQueryEntry(
-                    dtype_a=tmp_op.A.element.value,
-                    dtype_b=tmp_op.B.element.value,
-                    dtype_c=tmp_op.C.element.value,
-                    dtype_acc=tmp_op.accumulator_type().value,
-                    major_a=tmp_op.A.layout.value,
-                    major_b=tmp_op.B.layout.value,
-                    major_c=tmp_op.C.layout.value,
-                    op_type=self._attrs["op"],
-                    device=target._arch,
-                    epilogue=tmp_op.epilogue_functor.value,
-                    exec_entry_sha1=exec_entry_sha1,
-                    pshape=self._attrs["permute_shape"],
-                )
-                cache_value = target.query_profile_cache("gemm", query.__dict__)
-                if cache_value is not None and not target.force_profile():
-                    logger.info(
-                        __name__,
-                        f'Load profiling result for {self._attrs["name"]} '
-                        f"from cache: {cache_value}",
-                    )
-                    best_algo, workspace, split_k = cache_value
-                    self._attrs["exec_path"][wkl].algo = best_algo
-                    self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
-                    self._attrs["split_k"] = split_k
-                else:
-                    # cache miss - we will have to generate and build profilers
-                    build_profiler = True
-        return build_profiler
+    def _profile_record(self, exec_key: str, value: Tuple) -> Dict[str, Any]:
+        best_algo, workspace, split_k = value
+        target = backend.target.Target.current()
+        tmp_key = next(iter(self._attrs["op_instance"].keys()))
+        tmp_op = self._attrs["op_instance"][tmp_key]
+        cache_record = GemmRecordEntry(
+            exec_entry=exec_key,
+            exec_entry_sha1=exec_key_sha1(exec_key),
+            dtype_a=tmp_op.A.element.value,
+            dtype_b=tmp_op.B.element.value,
+            dtype_c=tmp_op.C.element.value,
+            dtype_acc=tmp_op.accumulator_type().value,
+            major_a=tmp_op.A.layout.value,
+            major_b=tmp_op.B.layout.value,
+            major_c=tmp_op.C.layout.value,
+            op_type=self._attrs["op"],
+            epilogue=tmp_op.epilogue_functor.value,
+            device=target._arch,
+            algo=best_algo,
+            workspace=workspace,
+            split_k=split_k,
+            pshape=self._attrs["permute_shape"],
+            split_k_profiled=int(
+                self._attrs.get("split_k_profiled", {}).get(exec_key, True)
+            ),
+        )
+        return cache_record.__dict__
+
+    def _profile_dummy(self, exec_key: str) -> Tuple:
+        # workspace is a hack just provides 102400 Byte
+        target = backend.target.Target.current()
+        algo = target.select_minimal_algo(list(self._attrs["op_instance"].keys()))
+        return (algo, 102400, 1)
+
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        best_algo, workspace, split_k = value
+        self._attrs["exec_path"][exec_key].algo = best_algo
+        self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
+        self._attrs["split_k"] = split_k
+        logger.debug(__name__, "Profile best split-k: {}".format(split_k))
+
+    def _supports_split_k(self) -> bool:
+        return not (
+            self._attrs["op"].startswith("group_gemm")
+            or self._attrs["op"].startswith("bmm")
+        )
 
     def gen_profiler(
         self, workdir: str = None, dynamic_profiling_strategy=DynamicProfileStrategy.MAX
@@ -456,7 +499,7 @@ class gemm(Operator):
         )
         self._attrs["op_instance"] = new_op_instance
 
-        build_profiler = self._should_build_profiler(workloads, new_op_instance)
+        build_profiler = self._should_build_profiler(workloads)
         if build_profiler:
             # generate profiler
             func_key = "{target}.{op}.gen_profiler".format(
@@ -518,170 +561,83 @@ class gemm(Operator):
                 )
         return ab_alignment
 
-    def _profile_single_workload(self, profiler_prefix, exec_key, devices):
-        target = backend.target.Target.current()
-        tmp_key = next(iter(self._attrs["op_instance"].keys()))
-        tmp_op = self._attrs["op_instance"][tmp_key]
-        exec_entry_sha1 = sha1(exec_key.encode("utf-8")).hexdigest()
-        split_k = 1 if self._attrs["split_k"] is None else self._attrs["split_k"]
-        # Because we call gen_profiler to generate and compile all profilers
-        # before running any of them, we won't be able to update the exec_path
-        # in gen_profiler even if two gemms have the same problem size (assume that
-        # we don't have a cache entry for this problem size). Consequently,
-        # we still need to query the cache here to ensure we won't re-profile
-        # the second gemm with the same problem size. Note that if we already
-        # have a cache entry for the problem size before gen_profiler, we will
-        # setup exec_path correctly in gen_profiler, so we won't get here at all.
-        query = GemmQueryEntry(
-            dtype_a=tmp_op.A.element.value,
-            dtype_b=tmp_op.B.element.value,
-            dtype_c=tmp_op.C.element.value,
-            dtype_acc=tmp_op.accumulator_type().value,
-            major_a=tmp_op.A.layout.value,
-            major_b=tmp_op.B.layout.value,
-            major_c=tmp_op.C.layout.value,
-            op_type=self._attrs["op"],
-            device=target._arch,
-            epilogue=tmp_op.epilogue_functor.value,
-            exec_entry_sha1=exec_entry_sha1,
-            pshape=self._attrs["permute_shape"],
-        )
-        cache_value = target.query_profile_cache("gemm", query.__dict__)
-        if cache_value is not None and not target.force_profile():
-            logger.debug(
-                __name__,
-                f'Load profiling result for {self._attrs["name"]} '
-                f"from cache: {cache_value}",
-            )
-            return cache_value
-        if target.use_dummy_profiling_results():
-            op_type = self._attrs["op"]
-            raise Exception(
-                "This is a CI run but we could not find the following cache ",
-                f"available on device {target._arch}\n",
-                f"{op_type} {exec_entry_sha1}.\n",
-                "To bypass, you need to make it available in the db table.",
-            )
-        # do real profile
-        content = list(self._attrs["op_instance"].keys())
-        runner = backend.profiler_runner.Runner(devices, self._attrs["name"])
-
-        results = []
-        if self._attrs["op"].startswith("group_gemm") or self._attrs["op"].startswith(
-            "bmm"
-        ):
-            for cfg in content:
-                command = self._gen_profile_cmd(profiler_prefix, cfg, exec_key)
-                runner.push(cfg, command)
-            runner.join()
-            result = runner.pull()
-            results += [item + (1,) for item in result]
-        else:
-            m, n, k = gemm_inverse_key_func(exec_key)[-3:]
-            for split_k in self._split_k_search_space(m, n, k):
-                for cfg in content:
-                    command = self._gen_profile_cmd(profiler_prefix, cfg, exec_key)
-                    command.append(str(split_k))
-                    logger.debug(__name__, "profiling cmd: {}".format(command))
-                    runner.push(cfg, command)
-                runner.join()
-                result = runner.pull()
-                results += [item + (split_k,) for item in result]
-
-        out = sorted(results, key=lambda x: x[1].duration)
-        if len(out) == 0:
-            raise RuntimeError(
-                "Profile workload: " + "" + "failed. " "Results: {}.".format(result)
-            )
-        best_algo = out[0][0]
-        workspace = out[0][1].workspace
-        split_k = out[0][2]
-        # cache
-        cache_record = GemmRecordEntry(
-            exec_entry=exec_key,
-            exec_entry_sha1=exec_entry_sha1,
-            dtype_a=tmp_op.A.element.value,
-            dtype_b=tmp_op.B.element.value,
-            dtype_c=tmp_op.C.element.value,
-            dtype_acc=tmp_op.accumulator_type().value,
-            major_a=tmp_op.A.layout.value,
-            major_b=tmp_op.B.layout.value,
-            major_c=tmp_op.C.layout.value,
-            op_type=self._attrs["op"],
-            epilogue=tmp_op.epilogue_functor.value,
-            device=target._arch,
-            algo=best_algo,
-            workspace=workspace,
-            split_k=split_k,
-            pshape=self._attrs["permute_shape"],
-        )
-        Target.current().insert_profile_cache("gemm", cache_record.__dict__)
-        logger.info(__name__, f"Selected kernel: {best_algo}, {workspace}, {split_k}")
-        return (best_algo, workspace, split_k)
-
-    def profile(
+    def _profile_candidates(
         self,
-        workdir="./",
-        devices=None,
-        dynamic_profiling_strategy=None,
-    ):
-        """Selects the fastest kernel configurations.
-
-        Parameters
-        ----------
-        workdir : str, optional
-            Base dir to keep profiling source codes, by default "./"
-        devices: list, optional
-            Devices used for profiling, by default device 0 will be used.
-        dynamic_profiling_strategy: DynamicProfileStrategy, optional
-            Unused (profiles are generated at compile time), by default None.
-            Call site in :func:`~aitemplate.compiler.transform.profile.profile`
-            uses this parameter for each op, so it cannot be removed until all
-            profile generation is done at compile time.
-        """
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        content = list(self._attrs["op_instance"].keys())
+        if not self._supports_split_k():
+            if round_idx > 0:
+                return []
+            return [
+                ProfileCandidate(
+                    cfg, self._gen_profile_cmd(profiler_prefix, cfg, exec_key), (1,)
+                )
+                for cfg in content
+            ]
 
-        if devices is None:
-            devices = [0]
+        # Profile all configs without split-k first, and then only
+        # try split-k on the fastest few of them.
+        if round_idx == 0:
+            return [
+                ProfileCandidate(
+                    cfg,
+                    self._gen_profile_cmd(profiler_prefix, cfg, exec_key) + ["1"],
+                    (1,),
+                )
+                for cfg in content
+            ]
+        if round_idx > 1:
+            return []
 
-        workloads = list(self._attrs["exec_path"].keys())
-        profiler_prefix = os.path.join(workdir, "profiler", self._attrs["op"])
-        if "op_instance" not in self._attrs:
-            target = backend.target.Target.current()
-            # init candidate ops
-            func_key = "{target}.{op}.config".format(
-                target=target.name(), op=self._attrs["op"]
-            )
-            func = registry.get(func_key)
-            func(self._attrs)
-        for wkl in workloads:
-            logger.info(
+        target = backend.target.Target.current()
+        dims = parse_exec_key(exec_key)
+        m, n, k = dims["M"], dims["N"], dims["K"]
+        split_k_space = sorted(self._split_k_search_space(m, n, k) - {1})
+        if len(split_k_space) == 0:
+            return []
+        prior = get_split_k_prior(target, self._attrs["op"])
+        if not target.force_profile() and not prior.may_win(m, n, k):
+            logger.debug(
                 __name__,
-                "Profile: {name}: {wkl}".format(name=self._attrs["name"], wkl=wkl),
+                f"skip split-k profiling for M={m}, N={n}, K={k}: "
+                "split-k never won for similar shapes in profile cache",
             )
-            target = backend.target.Target.current()
-            # if in CI just choose minimal configs
-            # workspace is a hack just provides 102400 Byte
-            if target.use_dummy_profiling_results():
-                algo = target.select_minimal_algo(
-                    list(self._attrs["op_instance"].keys())
-                )
-                logger.info(__name__, f"Select minimal algo {algo} for CI")
-                self._attrs["exec_path"][wkl].algo = algo
-                self._attrs["workspace"] = 102400
-            elif self._attrs["exec_path"][wkl].algo != "":
-                # we have cached best algo
-                return
-            else:
-                best_algo, workspace, split_k = self._profile_single_workload(
-                    profiler_prefix, wkl, devices
-                )
-                self._attrs["exec_path"][wkl].algo = best_algo
-                self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
-                self._attrs["split_k"] = split_k
-                logger.debug(
-                    __name__,
-                    "Profile best split-k: {}".format(split_k),
-                )
+            return []
+        top_cfgs = [
+            cand.algo
+            for cand, _ in sorted(results, key=lambda x: x[1].duration)[
+                :SPLIT_K_TOP_CONFIGS
+            ]
+        ]
+        return [
+            ProfileCandidate(
+                cfg,
+                self._gen_profile_cmd(profiler_prefix, cfg, exec_key) + [str(split_k)],
+                (split_k,),
+            )
+            for split_k in split_k_space
+            for cfg in top_cfgs
+        ]
+
+    def _select_profile_result(
+        self, exec_key: str, results: List[Tuple[ProfileCandidate, ProfileResult]]
+    ) -> Tuple:
+        value = super()._select_profile_result(exec_key, results)
+        if self._supports_split_k():
+            # Only results of rounds which tried split_k > 1 tell whether
+            # split-k wins, see split_k_prior.
+            split_k_profiled = any(cand.extra[0] > 1 for cand, _ in results)
+            self._attrs.setdefault("split_k_profiled", {})[exec_key] = split_k_profiled
+            if split_k_profiled:
+                # the result is about to be cached and counts for the prior,
+                # whether split-k won or not, so mine it on the next request
+                target = backend.target.Target.current()
+                invalidate_split_k_prior(target, self._attrs["op"])
+        return value
 
     def gen_function(self) -> str:
         """Generates the function code for the gemm op for the current target.
@@ -756,7 +712,7 @@ class gemm(Operator):
         self._sanity_check(a, b)
         output_shape = self._infer_shapes(a, b)
         self._extract_epilogue_alignment(output_shape)
-        output = Tensor(output_shape, src_ops={self})
+        output = Tensor(output_shape, src_ops={self}, dtype=a._attrs["dtype"])
         self._attrs["outputs"] = [output]
         self._attrs["output_accessors"] = [TensorAccessor(output)]
         return output
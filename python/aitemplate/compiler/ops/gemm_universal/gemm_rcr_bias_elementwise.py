@@ -0,0 +1,90 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+GEMM Specialization: Epilogue(GEMM_RCR(A, B) + Bias, D0, D1)
+"""
+from typing import Any, Dict
+
+from ...base import Tensor
+from .epilogue_expr import EpilogueExpr, split_epilogue
+from .gemm_rcr_bias import gemm_rcr_bias
+from .gemm_rcr_bias_broadcast import gemm_rcr_bias_broadcast
+
+# pylint: disable=C0103, W0223, W0221
+
+
+class gemm_rcr_bias_elementwise(gemm_rcr_bias_broadcast):
+    """GEMM Specialization: Epilogue(GEMM_RCR(A, B) + Bias, D0, D1), where
+    Epilogue is an elementwise expression, see epilogue_expr.py. The
+    expression is generated as custom epilogue functors, so any expression
+    which split_epilogue() accepts is fused into the GEMM.
+
+    For example, with the expression TANH(x) * d0 + d1, this operator is
+    equivalent to the following pytorch code:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        A = torch.randn(M, K).cuda().half()
+        B = torch.randn(N, K).cuda().half()
+        Bias = torch.randn(N).cuda().half()
+        D0 = torch.randn(M, N).cuda().half()
+        D1 = torch.randn(M, N).cuda().half()
+
+        linear = torch.nn.functional.linear(A, B, bias=Bias)
+        y = torch.tanh(linear) * D0 + D1
+
+    The expression may also use a single source, or no source at all, e.g.
+    TANH(x) * 0.5. A source-free epilogue reads the bias as D0, with a row
+    stride of 0, and ignores it.
+
+    Limitations: the broadcast epilogue reads at most two (M, N) sources,
+    and its kernels are float16 only.
+    """
+
+    def __init__(self, epilogue_expr: EpilogueExpr):
+        """Constructor for gemm_rcr_bias_elementwise
+
+        Parameters
+        ----------
+        epilogue_expr : EpilogueExpr
+            Expression over x (the GEMM + bias result), and optionally d0
+            and d1.
+        """
+        super().__init__()
+        stages = split_epilogue(epilogue_expr)
+        if stages is None:
+            raise RuntimeError(
+                f"Unsupported epilogue expression for gemm_rcr_bias_elementwise: "
+                f"{epilogue_expr}"
+            )
+        self._attrs["op"] = "gemm_rcr_bias_elementwise"
+        self._attrs["epilogue_expr"] = epilogue_expr
+        self._attrs["epilogue_stages"] = stages
+        if stages[1] is not None:
+            self._attrs["num_sources"] = 2
+        else:
+            self._attrs["num_sources"] = 1 if "d0" in stages[0].leaves() else 0
+
+    def __call__(
+        self, a: Tensor, b: Tensor, bias: Tensor, d0: Tensor = None, d1: Tensor = None
+    ) -> Tensor:
+        if d0 is None:
+            # source-free epilogue
+            return gemm_rcr_bias.__call__(self, a, b, bias)
+        return super().__call__(a, b, bias, d0, d1)
+
+    def _get_op_attributes(self) -> Dict[str, Any]:
+        return {"epilogue_expr": self._attrs["epilogue_expr"]}
@@ -291,7 +291,7 @@ class group_gemm_rcr(common.gemm):
             f"Group_gemm profiler valid configs: {sorted(new_op_instance.keys())}",
         )
         self._attrs["op_instance"] = new_op_instance
-        build_profiler = super()._should_build_profiler(workloads, new_op_instance)
+        build_profiler = super()._should_build_profiler(workloads)
         if build_profiler:
             func_key = "{target}.{op}.gen_profiler".format(
                 target=target.name(), op=self._attrs["op"]
@@ -0,0 +1,119 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Split-k prior mined from the gemm profile cache.
+
+For every (op_type, arch, M / N / K bucket) we count how many cached
+profiling results selected split_k > 1. Only results of rounds which actually
+profiled split_k > 1 are counted. If a bucket has enough samples and split-k
+never won, the split-k stage of gemm profiling is skipped.
+"""
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# Minimal number of cached results in a bucket before the prior is trusted.
+MIN_SAMPLES = 8
+
+# A single dim condition of an exec key, e.g. "M == 128" or "M <= 256".
+_EXEC_COND_PATTERN = re.compile(r"(\w+)\s*(==|>=|<=)\s*(\d+)")
+
+# (cache_path, op_type, device) -> SplitKPrior
+_PRIORS: Dict[Tuple[str, str, str], "SplitKPrior"] = {}
+
+
+def parse_exec_key(exec_key: str) -> Dict[str, int]:
+    """Returns the value of every dim of a gemm exec key, e.g.
+    {"M": 128, "N": 64, "K": 256} for "M == 128 && N == 64 && K == 256".
+    Dims with a range, e.g. "M >= 1 && M <= 256", take the upper bound.
+    """
+    dims = {}
+    for name, op, value in _EXEC_COND_PATTERN.findall(exec_key):
+        if op == ">=" and name in dims:
+            continue
+        dims[name] = int(value)
+    return dims
+
+
+def shape_bucket(m: int, n: int, k: int) -> Tuple[int, int, int]:
+    """Returns the log2 bucket of (M, N, K)."""
+    return (m.bit_length(), n.bit_length(), k.bit_length())
+
+
+class SplitKPrior:
+    """Per-bucket split-k win statistics of a single (op_type, device)."""
+
+    def __init__(self, history: Iterable[Tuple[str, int]] = ()):
+        """
+        Parameters
+        ----------
+        history : Iterable[Tuple[str, int]]
+            (exec_entry, split_k) of previously selected gemm kernels.
+        """
+        # bucket -> [number of split_k > 1 wins, number of samples]
+        self._stats: Dict[Tuple[int, int, int], List[int]] = defaultdict(lambda: [0, 0])
+        for exec_entry, split_k in history:
+            dims = parse_exec_key(exec_entry)
+            if not all(name in dims for name in ("M", "N", "K")):
+                continue
+            self.record(dims["M"], dims["N"], dims["K"], split_k)
+
+    def record(self, m: int, n: int, k: int, split_k: int) -> None:
+        """Records the split_k selected for a gemm of shape (m, n, k), by a
+        profiling round which tried split_k > 1."""
+        stat = self._stats[shape_bucket(m, n, k)]
+        stat[0] += int(split_k is not None and split_k > 1)
+        stat[1] += 1
+
+    def may_win(self, m: int, n: int, k: int) -> bool:
+        """Returns False if history shows split-k never wins for this shape
+        bucket, True otherwise (including when there is too little history).
+        """
+        bucket = shape_bucket(m, n, k)
+        if bucket not in self._stats:
+            return True
+        wins, samples = self._stats[bucket]
+        return samples < MIN_SAMPLES or wins > 0
+
+
+def _prior_key(target, op_type: str) -> Tuple[str, str, str]:
+    return (target.get_profile_cache_path(), op_type, target._arch)
+
+
+def get_split_k_prior(target, op_type: str) -> SplitKPrior:
+    """Returns the split-k prior of op_type on target, mining the target's
+    profile cache if it is not loaded yet.
+
+    Parameters
+    ----------
+    target : Target
+        Current target.
+    op_type : str
+        Gemm op type, e.g. gemm_rcr_bias.
+    """
+    key = _prior_key(target, op_type)
+    if key not in _PRIORS:
+        history = target.query_gemm_split_k_history(
+            {"op_type": op_type, "device": target._arch}
+        )
+        _PRIORS[key] = SplitKPrior(history)
+    return _PRIORS[key]
+
+
+def invalidate_split_k_prior(target, op_type: str) -> None:
+    """Drops the loaded split-k prior of op_type on target, so that it is
+    mined again, together with newly cached results, on its next request.
+    """
+    _PRIORS.pop(_prior_key(target, op_type), None)
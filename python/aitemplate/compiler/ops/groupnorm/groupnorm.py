@@ -18,8 +18,7 @@ Operator definition for groupnorm.
 import os
 import re
 from collections import OrderedDict
-from hashlib import sha1
-from typing import Any, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
 import jinja2
 
@@ -27,9 +26,10 @@ from aitemplate.testing import detect_target
 
 from .... import backend
 from ....backend import registry
+from ....backend.profiler_runner import ProfileResult
 from ....backend.target import Target
-from ....utils import logger
-from ...base import DynamicProfileStrategy, ExecItem, IntImm, IntVar, Operator, Tensor
+from ...base import DynamicProfileStrategy, ExecItem, IntImm, IntVar, Tensor
+from ...profiling import exec_key_sha1, ProfileCandidate, ProfiledOperator
 from ..softmax.cache_entry import NormQueryEntry, NormRecordEntry
 
 # pylint: disable=C0103,W0221,W0102,W0223
@@ -44,7 +44,7 @@ EXEC_COND_TEMPLATE = jinja2.Template(
 )
 
 
-class group_norm(Operator):
+class group_norm(ProfiledOperator):
     """Standalone group norm op.
     The grouped dim must be the last dim of the input tensor.
     """
@@ -210,22 +210,21 @@ class group_norm(Operator):
         command = [str(x) for x in cmd]
         return command
 
-    def _profile_single_workload(self, profiler_prefix, exec_key, devices):
-        """Profile a single workload.
+    def _init_profile(self, dynamic_profiling_strategy) -> None:
+        self._extract_exec_path(dynamic_profiling_strategy)
+        if "op_instance" not in self._attrs:
+            target = backend.target.Target.current()
+            # init candidate ops
+            func_key = "{target}.{op}.config".format(
+                target=target.name(), op=self._attrs["op"]
+            )
+            func = registry.get(func_key)
+            func(self._attrs)
 
-        Parameters
-        ----------
-        profiler_prefix : str
-            Base dir to keep profiling source codes.
-        exec_key: str
-            Input arguments to profiler executables.
-        devices: List[int]
-            GPU device ids used for profiling.
-        """
+    def _profile_query(self, exec_key: str) -> Dict[str, Any]:
         target = backend.target.Target.current()
         tmp_key = next(iter(self._attrs["op_instance"].keys()))
         tmp_op = self._attrs["op_instance"][tmp_key]
-        exec_entry_sha1 = sha1(exec_key.encode("utf-8")).hexdigest()
         query = NormQueryEntry(
             dtype_in=tmp_op.In.value,
             dtype_acc=tmp_op.accumulator_type().value,
@@ -233,34 +232,18 @@ class group_norm(Operator):
             rank=tmp_op.Rank,
             op_type=self._attrs["op"],
             device=target._arch,
-            exec_entry_sha1=exec_entry_sha1,
+            exec_entry_sha1=exec_key_sha1(exec_key),
         )
-        cache_value = target.query_profile_cache("normalization", query.__dict__)
-        if cache_value is not None and not target.force_profile():
-            logger.info(__name__, "Load profiling result from cache.")
-            return cache_value
-
-        content = list(self._attrs["op_instance"].keys())
-        runner = backend.profiler_runner.Runner(devices, self._attrs["name"])
-        x_shape_dict = self._invert_exec_key(exec_key)
-        for cfg in content:
-            command = self._gen_profile_cmd(profiler_prefix, cfg, x_shape_dict)
-            runner.push(cfg, command)
+        return query.__dict__
 
-        runner.join()
-        result = runner.pull()
-
-        out = sorted(result, key=lambda x: x[1])
-        if len(out) == 0:
-            raise RuntimeError(
-                "Profile workload: " + "" + "failed. " "Results: {}.".format(result)
-            )
-        best_algo = out[0][0]
-        workspace = out[0][1].workspace
-        ## cache
+    def _profile_record(self, exec_key: str, value: Tuple) -> Dict[str, Any]:
+        best_algo, workspace = value
+        target = backend.target.Target.current()
+        tmp_key = next(iter(self._attrs["op_instance"].keys()))
+        tmp_op = self._attrs["op_instance"][tmp_key]
         cache_record = NormRecordEntry(
             exec_entry=exec_key,
-            exec_entry_sha1=exec_entry_sha1,
+            exec_entry_sha1=exec_key_sha1(exec_key),
             dtype_in=tmp_op.In.value,
             dtype_acc=tmp_op.accumulator_type().value,
             dtype_out=tmp_op.Out.value,
@@ -270,54 +253,29 @@ class group_norm(Operator):
             algo=best_algo,
             workspace=workspace,
         )
-        Target.current().insert_profile_cache("normalization", cache_record.__dict__)
-        return (best_algo, workspace)
+        return cache_record.__dict__
 
-    def profile(
+    def _profile_candidates(
         self,
-        workdir="./",
-        devices=None,
-        dynamic_profiling_strategy=DynamicProfileStrategy.MAX,
-    ):
-        """Selects the fastest kernel configurations.
-
-        Parameters
-        ----------
-        workdir : str, optional
-            Base dir to keep profiling source codes, by default "./"
-        devices: list, optional
-            Devices used for profiling, by default device 0 will be used.
-        dynamic_profiling_strategy: DynamicProfileStrategy, optional
-            A dynamic profiling strategy. By default MAX is used, i.e. to profile
-            a dynamic range, an upper bound will be used.
-        """
-
-        if devices is None:
-            devices = [0]
-
-        self._extract_exec_path(dynamic_profiling_strategy)
-
-        workloads = list(self._attrs["exec_path"].keys())
-        profiler_prefix = os.path.join(workdir, "profiler", self._attrs["op"])
-        if "op_instance" not in self._attrs:
-            target = backend.target.Target.current()
-            # init candidate ops
-            func_key = "{target}.{op}.config".format(
-                target=target.name(), op=self._attrs["op"]
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        if round_idx > 0:
+            return []
+        x_shape_dict = self._invert_exec_key(exec_key)
+        return [
+            ProfileCandidate(
+                cfg, self._gen_profile_cmd(profiler_prefix, cfg, x_shape_dict)
             )
-            func = registry.get(func_key)
-            func(self._attrs)
+            for cfg in self._attrs["op_instance"].keys()
+        ]
 
-        for wkl in workloads:
-            logger.info(
-                __name__,
-                "Profile: {name}: {wkl}".format(name=self._attrs["name"], wkl=wkl),
-            )
-            best_algo, workspace = self._profile_single_workload(
-                profiler_prefix, wkl, devices
-            )
-            self._attrs["exec_path"][wkl].algo = best_algo
-            self._attrs["workspace"] = workspace
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        best_algo, workspace = value
+        self._attrs["exec_path"][exec_key].algo = best_algo
+        self._attrs["workspace"] = workspace
 
     def gen_profiler(
         self,
@@ -341,6 +299,9 @@ class group_norm(Operator):
         )
         func = registry.get(func_key)
         func(self._attrs)
+        self._extract_exec_path(dynamic_profiling_strategy)
+        if not self._should_build_profiler():
+            return
         func_key = "{target}.{op}.gen_profiler".format(
             target=target.name(), op=self._attrs["op"]
         )
@@ -18,8 +18,7 @@ Softmax op implementation
 import os
 import re
 from collections import OrderedDict
-from hashlib import sha1
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
 import jinja2
 
@@ -27,11 +26,12 @@ from aitemplate.testing import detect_target
 
 from .... import backend
 from ....backend import registry
+from ....backend.profiler_runner import ProfileResult
 from ....backend.target import Target
 
-from ....utils import logger
 from ....utils.tensor_utils import wrap_dim
-from ...base import DynamicProfileStrategy, ExecItem, IntVar, Operator, Tensor
+from ...base import DynamicProfileStrategy, ExecItem, IntVar, Tensor
+from ...profiling import exec_key_sha1, ProfileCandidate, ProfiledOperator
 from .cache_entry import NormQueryEntry, NormRecordEntry
 
 EXEC_COND_TEMPLATE = jinja2.Template(
@@ -43,7 +43,7 @@ EXEC_COND_TEMPLATE = jinja2.Template(
 )
 
 
-class softmax(Operator):
+class softmax(ProfiledOperator):
     r"""Applies the Softmax function to a 2D input Tensor
     rescaling them so that the elements of the n-dimensional output Tensor
     lie in the range [0,1] and sum to 1.
@@ -64,6 +64,8 @@ class softmax(Operator):
         values in the range [0, 1].
     """
 
+    _profile_cache_class = "normalization"
+
     def __init__(
         self,
     ) -> None:
@@ -203,7 +205,7 @@ class softmax(Operator):
         self._set_depth()
         output_shape = self._infer_shapes(x)
         self._extract_exec_path()
-        output = Tensor(output_shape, src_ops={self})
+        output = Tensor(output_shape, src_ops={self}, dtype=x._attrs["dtype"])
         self._attrs["outputs"] = [output]
         return output
 
@@ -228,25 +230,21 @@ class softmax(Operator):
         command = [str(x) for x in cmd]
         return command
 
-    def _profile_single_workload(self, profiler_prefix, exec_key, devices):
-        """Profile a single workload.
+    def _init_profile(self, dynamic_profiling_strategy) -> None:
+        self._extract_exec_path(dynamic_profiling_strategy)
+        if "op_instance" not in self._attrs:
+            target = backend.target.Target.current()
+            # init candidate ops
+            func_key = "{target}.{op}.config".format(
+                target=target.name(), op=self._attrs["op"]
+            )
+            func = registry.get(func_key)
+            func(self._attrs)
 
-        Parameters
-        ----------
-        profiler_prefix : str
-            Base dir to keep profiling source codes.
-        exec_key: str
-            Input arguments to profiler executables.
-        devices: List[int]
-            GPU device ids used for profiling.
-        """
+    def _profile_query(self, exec_key: str) -> Dict[str, Any]:
         target = backend.target.Target.current()
-        # if in CI just choose minimal configs
-        # workspace is a hack just provides 102400 Byte
-        # query cache
         tmp_key = next(iter(self._attrs["op_instance"].keys()))
         tmp_op = self._attrs["op_instance"][tmp_key]
-        exec_entry_sha1 = sha1(exec_key.encode("utf-8")).hexdigest()
         query = NormQueryEntry(
             dtype_in=tmp_op.In.value,
             dtype_acc=tmp_op.accumulator_type().value,
@@ -254,34 +252,18 @@ class softmax(Operator):
             rank=tmp_op.Rank,
             op_type=self._attrs["op"],
             device=target._arch,
-            exec_entry_sha1=exec_entry_sha1,
+            exec_entry_sha1=exec_key_sha1(exec_key),
         )
-        cache_value = target.query_profile_cache("normalization", query.__dict__)
-        if cache_value is not None and not target.force_profile():
-            logger.info(__name__, "Load profiling result from cache.")
-            return cache_value
-
-        content = list(self._attrs["op_instance"].keys())
-        runner = backend.profiler_runner.Runner(devices, self._attrs["name"])
-        x_shape = self._invert_exec_key(exec_key)
-        for cfg in content:
-            command = self._gen_profile_cmd(profiler_prefix, cfg, x_shape)
-            runner.push(cfg, command)
-
-        runner.join()
-        result = runner.pull()
+        return query.__dict__
 
-        out = sorted(result, key=lambda x: x[1])
-        if len(out) == 0:
-            raise RuntimeError(
-                "Profile workload: " + "" + "failed. " "Results: {}.".format(result)
-            )
-        best_algo = out[0][0]
-        workspace = out[0][1].workspace
-        ## cache
+    def _profile_record(self, exec_key: str, value: Tuple) -> Dict[str, Any]:
+        best_algo, workspace = value
+        target = backend.target.Target.current()
+        tmp_key = next(iter(self._attrs["op_instance"].keys()))
+        tmp_op = self._attrs["op_instance"][tmp_key]
         cache_record = NormRecordEntry(
             exec_entry=exec_key,
-            exec_entry_sha1=exec_entry_sha1,
+            exec_entry_sha1=exec_key_sha1(exec_key),
             dtype_in=tmp_op.In.value,
             dtype_acc=tmp_op.accumulator_type().value,
             dtype_out=tmp_op.Out.value,
@@ -291,54 +273,27 @@ class softmax(Operator):
             algo=best_algo,
             workspace=workspace,
         )
-        Target.current().insert_profile_cache("normalization", cache_record.__dict__)
-        return (best_algo, workspace)
+        return cache_record.__dict__
 
-    def profile(
+    def _profile_candidates(
         self,
-        workdir="./",
-        devices=None,
-        dynamic_profiling_strategy=DynamicProfileStrategy.MAX,
-    ):
-        """Selects the fastest kernel configurations.
-
-        Parameters
-        ----------
-        workdir : str, optional
-            Base dir to keep profiling source codes, by default "./"
-        devices: list, optional
-            Devices used for profiling, by default device 0 will be used.
-        dynamic_profiling_strategy: DynamicProfileStrategy, optional
-            A dynamic profiling strategy. By default MAX is used, i.e. to profile
-            a dynamic range, an upper bound will be used.
-        """
-
-        if devices is None:
-            devices = [0]
-
-        self._extract_exec_path(dynamic_profiling_strategy)
-
-        workloads = list(self._attrs["exec_path"].keys())
-        profiler_prefix = os.path.join(workdir, "profiler", self._attrs["op"])
-        if "op_instance" not in self._attrs:
-            target = backend.target.Target.current()
-            # init candidate ops
-            func_key = "{target}.{op}.config".format(
-                target=target.name(), op=self._attrs["op"]
-            )
-            func = registry.get(func_key)
-            func(self._attrs)
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        if round_idx > 0:
+            return []
+        x_shape = self._invert_exec_key(exec_key)
+        return [
+            ProfileCandidate(cfg, self._gen_profile_cmd(profiler_prefix, cfg, x_shape))
+            for cfg in self._attrs["op_instance"].keys()
+        ]
 
-        for wkl in workloads:
-            logger.info(
-                __name__,
-                "Profile: {name}: {wkl}".format(name=self._attrs["name"], wkl=wkl),
-            )
-            best_algo, workspace = self._profile_single_workload(
-                profiler_prefix, wkl, devices
-            )
-            self._attrs["exec_path"][wkl].algo = best_algo
-            self._attrs["workspace"] = workspace
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        best_algo, workspace = value
+        self._attrs["exec_path"][exec_key].algo = best_algo
+        self._attrs["workspace"] = workspace
 
     def gen_profiler(
         self,
@@ -352,6 +307,9 @@ class softmax(Operator):
         )
         func = registry.get(func_key)
         func(self._attrs)
+        self._extract_exec_path(dynamic_profiling_strategy)
+        if not self._should_build_profiler():
+            return
         func_key = "{target}.{op}.gen_profiler".format(
             target=target.name(), op=self._attrs["op"]
         )
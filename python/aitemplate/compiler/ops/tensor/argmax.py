@@ -19,15 +19,17 @@ import itertools
 import os
 import re
 from collections import OrderedDict
-from typing import List
+from typing import List, Tuple
 
 import jinja2
 import numpy as np
 
 from .... import backend
 from ....backend import registry
+from ....backend.profiler_runner import ProfileResult
 from ....utils import logger, shape_utils
-from ...base import Operator, Tensor
+from ...base import Tensor
+from ...profiling import ProfileCandidate, ProfiledOperator
 
 # pylint: disable=C0103,W0221,W0102,W0223
 
@@ -38,7 +40,7 @@ instance_size == {{x_dim0}} &&  instance_num == {{x_dim1}}
 )
 
 
-class argmax(Operator):
+class argmax(ProfiledOperator):
     """
     Returns the indices of the maximum value of all elements across a dimension in the input tensor. If there are multiple maximal values then the indices of the first maximal value are returned.
 
@@ -155,52 +157,22 @@ class argmax(Operator):
         logger.info(__name__, "profiling cmd: {}".format(command))
         return command
 
-    def _profile_single_workload(self, profiler_prefix, exec_key, devices):
-        runner = backend.profiler_runner.Runner(devices, self._attrs["name"])
+    def _profile_candidates(
+        self,
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        if round_idx > 0:
+            return []
         cfg = self._attrs["op"]
         x_shape = self._invert_exec_key(exec_key)
-        command = self._gen_profile_cmd(profiler_prefix, cfg, x_shape)
-        runner.push(cfg, command)
-        runner.join()
-        result = runner.pull()
-
-        out = sorted(result, key=lambda x: x[1])
-        if len(out) == 0:
-            raise RuntimeError(
-                "Profile workload: " + "" + "failed. " "Results: {}.".format(result)
-            )
-        workspace = out[0][1].workspace
-        return workspace
-
-    def profile(
-        self,
-        workdir="./",
-        devices=None,
-        dynamic_profiling_strategy=None,
-    ):
-        """Get the Argmax Op workspace
-
-        Parameters
-        ----------
-        workdir : str, optional
-            Base dir to keep profiling source codes, by default "./"
-        devices: list, optional
-            Devices used for profiling, by default device 0 will be used.
-        dynamic_profiling_strategy: DynamicProfileStrategy, optional
-            A dynamic profiling strategy. By default MAX is used, i.e. to profile
-            a dynamic range, an upper bound will be used.
-        """
-
-        if devices is None:
-            devices = [0]
-
-        workloads = list(self._attrs["exec_path"].keys())
-        profiler_prefix = os.path.join(workdir, "profiler", self._attrs["op"])
-
-        for wkl in workloads:
-            logger.info(
-                __name__,
-                "Profile: {name}: {wkl}".format(name=self._attrs["name"], wkl=wkl),
-            )
-            workspace = self._profile_single_workload(profiler_prefix, wkl, devices)
-            self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
+        return [
+            ProfileCandidate(cfg, self._gen_profile_cmd(profiler_prefix, cfg, x_shape))
+        ]
+
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        """Get the Argmax Op workspace"""
+        _, workspace = value
+        self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
@@ -15,7 +15,6 @@
 """
 upsampling2d.
 """
-import itertools
 import logging
 import re
 from collections import OrderedDict
@@ -109,24 +108,10 @@ class upsampling2d_base(Operator):
         ]
 
     def _infer_shapes(self, x: Tensor):
-        x_shape_values = [var._attrs["values"] for var in x._attrs["shape"]]
-        x_shapes = itertools.product(*x_shape_values)
-        # run infershape for each
-        y_shapes = []
-        for x_shape in x_shapes:
-            y_shape = self._infer_shape(x_shape)
-            y_shapes.append(y_shape)
-
-        def unique(vector):
-            return sorted(set(vector))
-
-        output_shape = [
-            shape_utils.gen_int_var(unique([d[0] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[1] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[2] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[3] for d in y_shapes])),
-        ]
-        return output_shape
+        # NO = N, HO = f(H), WO = f(W), CO = C
+        return shape_utils.infer_shape_per_dim(
+            x._attrs["shape"], self._infer_shape, [0, 1, 2, 3]
+        )
 
     def _invert_exec_key(self, key):
         tmp = re.findall(r"(\d+)", key)
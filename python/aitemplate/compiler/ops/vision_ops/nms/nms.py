@@ -19,14 +19,16 @@ import itertools
 import os
 import re
 from collections import OrderedDict
-from typing import List
+from typing import List, Tuple
 
 import jinja2
 
 from ..... import backend
 from .....backend import registry
+from .....backend.profiler_runner import ProfileResult
 from .....utils import logger, shape_utils
-from ....base import Operator, Tensor
+from ....base import Tensor
+from ....profiling import ProfileCandidate, ProfiledOperator
 
 # pylint: disable=C0103,W0221,W0102,W0223
 
@@ -49,7 +51,7 @@ num_batch == {{x_dim0}} &&  num_rois == {{x_dim1}}
 )
 
 
-class nms(Operator):
+class nms(ProfiledOperator):
     r"""
     Performs non-maximum suppression (NMS) on the boxes according to their intersection-over-union (IoU).
 
@@ -109,26 +111,15 @@ class nms(Operator):
 
     def _infer_shapes(self, x: Tensor, w: Tensor):
         """Infer the output shape"""
-        x_shape_values = [var._attrs["values"] for var in x._attrs["shape"]]
-        x_shapes = itertools.product(*x_shape_values)
         w_shape = [var._attrs["values"][0] for var in w._attrs["shape"]]
         self._attrs["KH"] = w_shape[0]
         self._attrs["KW"] = w_shape[1]
-        # run infershape for each
-        y_shapes = []
-        for x_shape in x_shapes:
-            y_shape = self._infer_shape(x_shape, w_shape)
-            y_shapes.append(y_shape)
-
-        def unique(vector):
-            return sorted(set(vector))
-
-        output_shape = [
-            shape_utils.gen_int_var(unique([d[0] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[1] for d in y_shapes])),
-            shape_utils.gen_int_var(unique([d[2] for d in y_shapes])),
-        ]
-        return output_shape
+        # NO = N, CO = nmsMaxOut, HO = H
+        return shape_utils.infer_shape_per_dim(
+            x._attrs["shape"],
+            lambda x_shape: self._infer_shape(x_shape, w_shape),
+            [0, None, 2],
+        )
 
     def __call__(self, x: Tensor, scores: Tensor) -> Tensor:
         self._attrs["inputs"] = [x, scores]
@@ -188,41 +179,22 @@ class nms(Operator):
         logger.info(__name__, "profiling cmd: {}".format(command))
         return command
 
-    def _profile_single_workload(self, profiler_prefix, exec_key, devices):
-        runner = backend.profiler_runner.Runner(devices, self._attrs["name"])
+    def _profile_candidates(
+        self,
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        if round_idx > 0:
+            return []
         cfg = self._attrs["op"]
         x_shape = self._invert_exec_key(exec_key)
-        command = self._gen_profile_cmd(profiler_prefix, cfg, x_shape)
-        runner.push(cfg, command)
-        runner.join()
-        result = runner.pull()
-
-        out = sorted(result, key=lambda x: x[1])
-        if len(out) == 0:
-            raise RuntimeError(
-                "Profile workload: " + "" + "failed. " "Results: {}.".format(result)
-            )
-        workspace = out[0][1].workspace
-        return workspace
-
-    def profile(
-        self,
-        workdir="./",
-        devices=None,
-        dynamic_profiling_strategy=None,
-    ):
-        """Profile to compute the NMS Op workspace size."""
-
-        if devices is None:
-            devices = [0]
-
-        workloads = list(self._attrs["exec_path"].keys())
-        profiler_prefix = os.path.join(workdir, "profiler", self._attrs["op"])
-
-        for wkl in workloads:
-            logger.info(
-                __name__,
-                "Profile: {name}: {wkl}".format(name=self._attrs["name"], wkl=wkl),
-            )
-            workspace = self._profile_single_workload(profiler_prefix, wkl, devices)
-            self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
+        return [
+            ProfileCandidate(cfg, self._gen_profile_cmd(profiler_prefix, cfg, x_shape))
+        ]
+
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        """Get the NMS Op workspace"""
+        _, workspace = value
+        self._attrs["workspace"] = max(self._attrs["workspace"], workspace)
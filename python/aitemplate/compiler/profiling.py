@@ -0,0 +1,374 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Shared profiling framework for operators with profilers.
+
+Operators subclass ProfiledOperator and only supply their profiling
+workloads, profiler commands and profile cache entries. profile_ops() takes
+care of the rest for any number of ops at once:
+
+    * profile cache lookup before any profiler is run,
+    * dedupe of identical workloads across ops,
+    * batched execution of all profiler commands on all devices,
+    * result selection and cache writes.
+"""
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from hashlib import sha1
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..backend.profiler_runner import ProfileResult, Runner
+from ..backend.target import Target
+from ..utils import logger
+from .base import DynamicProfileStrategy, Operator
+
+# pylint: disable=W0613
+
+
+@dataclass
+class ProfileCandidate:
+    """A single profiler invocation of a workload."""
+
+    algo: str
+    command: List[str]
+    # Op-specific values appended to the selected result, e.g. (split_k,)
+    extra: Tuple = ()
+
+
+@dataclass
+class _ProfileJob:
+    """All candidates and results of one unique workload."""
+
+    op: ProfiledOperator
+    exec_key: str
+    profiler_prefix: str
+    query: Optional[Dict[str, Any]]
+    # (op, exec_key) pairs which receive the result of this job
+    consumers: List[Tuple[ProfiledOperator, str]] = field(default_factory=list)
+    results: List[Tuple[ProfileCandidate, ProfileResult]] = field(default_factory=list)
+
+
+def exec_key_sha1(exec_key: str) -> str:
+    """Returns the hash of an exec key used in profile cache entries."""
+    return sha1(exec_key.encode("utf-8")).hexdigest()
+
+
+class ProfiledOperator(Operator):
+    """Base class of operators which select kernels by running profilers.
+
+    Subclasses implement _profile_candidates() and _apply_profile_result(),
+    and the _profile_query() / _profile_record() pair if their results are
+    stored in the profile cache.
+    """
+
+    # Op class in the profile cache, e.g. "gemm", "conv" or "normalization".
+    # None if the results of this op are not cached.
+    _profile_cache_class: Optional[str] = None
+
+    def _init_profile(self, dynamic_profiling_strategy) -> None:
+        """Prepares exec_path and kernel candidates before profiling."""
+        return
+
+    def _profiler_prefix(self, workdir: str) -> str:
+        """Returns the dir of the profiler executables of this op."""
+        return os.path.join(workdir, "profiler", self._attrs["op"])
+
+    def _profile_workloads(self) -> List[str]:
+        """Returns the exec keys to be profiled."""
+        return list(self._attrs["exec_path"].keys())
+
+    def _profile_is_done(self, exec_key: str) -> bool:
+        """Returns whether exec_key already has a selected kernel."""
+        return False
+
+    def _profile_query(self, exec_key: str) -> Optional[Dict[str, Any]]:
+        """Returns the profile cache query entry of exec_key, or None if the
+        results of this op are not cached."""
+        return None
+
+    def _profile_record(self, exec_key: str, value: Tuple) -> Dict[str, Any]:
+        """Returns the profile cache record entry of a selected result."""
+        raise NotImplementedError
+
+    def _profile_dummy(self, exec_key: str) -> Optional[Tuple]:
+        """Returns a result used instead of profiling in CI runs, or None if
+        this op has to be profiled regardless."""
+        return None
+
+    def _profile_candidates(
+        self,
+        profiler_prefix: str,
+        exec_key: str,
+        round_idx: int,
+        results: List[Tuple[ProfileCandidate, ProfileResult]],
+    ) -> List[ProfileCandidate]:
+        """Returns the profiler invocations of a profiling round.
+
+        Parameters
+        ----------
+        profiler_prefix : str
+            Dir of the profiler executables.
+        exec_key : str
+            The profiled workload.
+        round_idx : int
+            Profiling round, starting from 0.
+        results : List[Tuple[ProfileCandidate, ProfileResult]]
+            Successful results of all previous rounds.
+
+        Returns
+        -------
+        List[ProfileCandidate]
+            Candidates to run in this round. Profiling of exec_key stops
+            once no candidate is returned.
+        """
+        raise NotImplementedError
+
+    def _select_profile_result(
+        self, exec_key: str, results: List[Tuple[ProfileCandidate, ProfileResult]]
+    ) -> Tuple:
+        """Returns the selected result, in the same format as cached values,
+        i.e. (algo, workspace) followed by the extra values of the candidate.
+        """
+        cand, result = min(results, key=lambda x: x[1].duration)
+        return (cand.algo, result.workspace) + tuple(cand.extra)
+
+    def _apply_profile_result(self, exec_key: str, value: Tuple) -> None:
+        """Updates op attributes with a selected or cached result."""
+        raise NotImplementedError
+
+    def _finish_profile(
+        self, workdir: str, devices: List[int], dynamic_profiling_strategy
+    ) -> None:
+        """Called once all workloads of this op have a result."""
+        return
+
+    def _query_profile_cache(self, exec_key: str) -> Optional[Tuple]:
+        target = Target.current()
+        query = self._profile_query(exec_key)
+        if query is None or target.force_profile():
+            return None
+        return target.query_profile_cache(self._profile_cache_class, query)
+
+    def _should_build_profiler(self, workloads: List[str] = None) -> bool:
+        """Loads cached results and returns whether profilers must be built.
+
+        Parameters
+        ----------
+        workloads : List[str], optional
+            Exec keys to look up, by default all workloads of this op.
+        """
+        target = Target.current()
+        if target.use_dummy_profiling_results():
+            return True
+        if workloads is None:
+            workloads = self._profile_workloads()
+        _prefetch_profile_cache(target, [(self, wkl) for wkl in workloads])
+        build_profiler = False
+        for wkl in workloads:
+            cache_value = self._query_profile_cache(wkl)
+            if cache_value is None:
+                # cache miss - we will have to generate and build profilers
+                build_profiler = True
+                continue
+            logger.info(
+                __name__,
+                f'Load profiling result for {self._attrs["name"]} '
+                f"from cache: {cache_value}",
+            )
+            self._apply_profile_result(wkl, cache_value)
+        return build_profiler
+
+    def profile(
+        self,
+        workdir="./",
+        devices=None,
+        dynamic_profiling_strategy=DynamicProfileStrategy.MAX,
+    ) -> None:
+        """Selects the fastest kernel configurations.
+
+        Parameters
+        ----------
+        workdir : str, optional
+            Base dir to keep profiling source codes, by default "./"
+        devices: list, optional
+            Devices used for profiling, by default device 0 will be used.
+        dynamic_profiling_strategy: DynamicProfileStrategy, optional
+            A dynamic profiling strategy. By default MAX is used, i.e. to profile
+            a dynamic range, an upper bound will be used.
+        """
+        profile_ops([self], workdir, devices, dynamic_profiling_strategy)
+
+
+def _prefetch_profile_cache(
+    target: Target, workloads: List[Tuple[ProfiledOperator, str]]
+) -> None:
+    """Announces the cache queries of workloads, grouped by op class."""
+    if target.force_profile():
+        return
+    queries: Dict[str, List[Dict[str, Any]]] = OrderedDict()
+    for op, exec_key in workloads:
+        query = op._profile_query(exec_key)
+        if query is not None:
+            queries.setdefault(op._profile_cache_class, []).append(query)
+    for op_class, class_queries in queries.items():
+        target.prefetch_profile_cache(op_class, class_queries)
+
+
+def _freeze(query: Dict[str, Any]) -> Tuple:
+    return tuple(sorted(query.items()))
+
+
+def profile_ops(
+    ops: List[ProfiledOperator],
+    workdir: str = "./",
+    devices: List[int] = None,
+    dynamic_profiling_strategy=DynamicProfileStrategy.MAX,
+) -> None:
+    """Profiles all workloads of the given ops together.
+
+    Cached workloads are loaded from the profile cache. Identical uncached
+    workloads, i.e. those with the same profile cache query, are profiled
+    once. Profiler commands of all workloads are executed by a single
+    runner over all devices.
+
+    Parameters
+    ----------
+    ops : List[ProfiledOperator]
+        Ops to be profiled.
+    workdir : str, optional
+        Base dir of profiler executables, by default "./"
+    devices : List[int], optional
+        Devices used for profiling, by default device 0 will be used.
+    dynamic_profiling_strategy: DynamicProfileStrategy, optional
+        A dynamic profiling strategy, by default MAX.
+    """
+    if devices is None:
+        devices = [0]
+    target = Target.current()
+
+    workloads = []
+    for op in ops:
+        op._init_profile(dynamic_profiling_strategy)
+        for exec_key in op._profile_workloads():
+            if not op._profile_is_done(exec_key):
+                workloads.append((op, exec_key))
+    if not target.use_dummy_profiling_results():
+        _prefetch_profile_cache(target, workloads)
+
+    jobs: Dict[Tuple, _ProfileJob] = OrderedDict()
+    for op, exec_key in workloads:
+        logger.info(
+            __name__,
+            "Profile: {name}: {wkl}".format(name=op._attrs["name"], wkl=exec_key),
+        )
+        # if in CI just choose minimal configs
+        if target.use_dummy_profiling_results():
+            value = op._profile_dummy(exec_key)
+            if value is not None:
+                logger.info(__name__, f"Select {value} for CI")
+                op._apply_profile_result(exec_key, value)
+                continue
+
+        cache_value = op._query_profile_cache(exec_key)
+        if cache_value is not None:
+            logger.debug(
+                __name__,
+                f'Load profiling result for {op._attrs["name"]} '
+                f"from cache: {cache_value}",
+            )
+            op._apply_profile_result(exec_key, cache_value)
+            continue
+        query = op._profile_query(exec_key)
+        if target.use_dummy_profiling_results() and query is not None:
+            raise RuntimeError(
+                "This is a CI run but we could not find the following cache "
+                f"available on device {target._arch}\n"
+                f"{op._attrs['op']} {exec_key_sha1(exec_key)}.\n"
+                "To bypass, you need to make it available in the db table."
+            )
+
+        if query is not None:
+            job_key = (op._profile_cache_class, _freeze(query))
+        else:
+            job_key = (id(op), exec_key)
+        if job_key not in jobs:
+            profiler_prefix = op._profiler_prefix(workdir)
+            jobs[job_key] = _ProfileJob(op, exec_key, profiler_prefix, query)
+        jobs[job_key].consumers.append((op, exec_key))
+
+    _run_profile_jobs(list(jobs.values()), devices)
+
+    for job in jobs.values():
+        if len(job.results) == 0:
+            raise RuntimeError(
+                f"Profile workload: {job.exec_key} of {job.op._attrs['name']} failed."
+            )
+        value = job.op._select_profile_result(job.exec_key, job.results)
+        logger.info(__name__, f"Selected kernel for {job.op._attrs['name']}: {value}")
+        if job.query is not None:
+            record = job.op._profile_record(job.exec_key, value)
+            record["duration"] = _selected_duration(job, value)
+            target.insert_profile_cache(job.op._profile_cache_class, record)
+        for op, exec_key in job.consumers:
+            op._apply_profile_result(exec_key, value)
+
+    target.flush_profile_cache()
+    for op in ops:
+        op._finish_profile(workdir, devices, dynamic_profiling_strategy)
+
+
+def _selected_duration(job: _ProfileJob, value: Tuple) -> float:
+    """Returns the best profiled duration of a selected value, -1 if unknown."""
+    durations = [
+        result.duration
+        for cand, result in job.results
+        if (cand.algo,) + tuple(cand.extra) == (value[0],) + tuple(value[2:])
+    ]
+    return min(durations) if len(durations) > 0 else -1
+
+
+def _run_profile_jobs(jobs: List[_ProfileJob], devices: List[int]) -> None:
+    """Runs all rounds of profiler candidates of jobs in a shared runner."""
+    if len(jobs) == 0:
+        return
+    runner = Runner(devices, "profile")
+    round_idx = 0
+    pending = jobs
+    while len(pending) > 0:
+        tasks = {}
+        next_pending = []
+        for job_idx, job in enumerate(pending):
+            candidates = job.op._profile_candidates(
+                job.profiler_prefix, job.exec_key, round_idx, list(job.results)
+            )
+            if len(candidates) == 0:
+                continue
+            next_pending.append(job)
+            for cand_idx, cand in enumerate(candidates):
+                # task ids must be unique within the runner
+                task_id = f"{job.op._attrs['name']}:{cand.algo}:{job_idx}.{cand_idx}"
+                tasks[task_id] = (job, cand)
+                logger.debug(__name__, f"profiling cmd: {cand.command}")
+                runner.push(task_id, cand.command)
+        if len(tasks) > 0:
+            runner.join()
+            for task_id, result in runner.pull():
+                job, cand = tasks[task_id]
+                job.results.append((cand, result))
+        pending = next_pending
+        round_idx += 1
@@ -15,7 +15,9 @@
 # flake8: noqa
 from .bind_constants import bind_constants
 from .constant_folding import constant_folding
+from .eliminate_common_subexpressions import eliminate_common_subexpressions
 from .fuse_conv_elementwise import fuse_conv_elementwise
+from .fuse_group_elementwise import fuse_group_elementwise
 from .fuse_group_ops import (
     fuse_group_gemm_ops,
     fuse_group_layernorm_ops,
@@ -29,6 +31,7 @@ from .memory_planning import memory_planning
 from .name_graph import name_graph
 from .optimize_graph import optimize_graph
 from .profile import profile
+from .quantize_gemm_weights import quantize_gemm_weights
 from .refine_graph import refine_graph
 from .remove_no_ops import remove_no_ops
 from .remove_unused_ops import remove_unused_ops
@@ -0,0 +1,182 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Graph pass to eliminate common subexpressions, i.e. to merge ops which
+compute the same outputs from the same input tensors.
+"""
+import os
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from ...utils import logger
+from ...utils.graph_utils import get_sorted_ops
+from ...utils.markdown_table import markdownTable
+from ..base import Operator, Tensor
+from .refine_graph import _Unhashable, op_signature, same_tensor_type
+from .transform_utils import replace_tensor, sanitize_sorted_graph
+
+
+def _input_identities(op: Operator) -> Hashable:
+    """Identities of the input tensors of op. Constant numbers of elementwise
+    args are covered by op_signature(), by value."""
+    identities = [tuple(op._attrs["inputs"])]
+    if "args" in op._attrs:
+        identities.append(
+            tuple(None if arg.is_a_const_num() else arg for arg in op._attrs["args"])
+        )
+    return tuple(identities)
+
+
+def _cse_key(op: Operator) -> Optional[Hashable]:
+    """Returns a key such that ops with equal keys compute the same outputs,
+    None if op is never merged."""
+    if len(op._attrs["outputs"]) == 0:
+        return None
+    try:
+        signature = op_signature(op)
+    except _Unhashable:
+        return None
+    if signature is None:
+        return None
+    return (signature, _input_identities(op))
+
+
+def _can_merge(kept: Operator, duplicate: Operator) -> bool:
+    kept_outputs = kept._attrs["outputs"]
+    outputs = duplicate._attrs["outputs"]
+    if len(kept_outputs) != len(outputs):
+        return False
+    for kept_output, output in zip(kept_outputs, outputs):
+        # model outputs and external tensors are separate buffers, which
+        # must be written by their own op
+        if output._attrs["is_output"] or output._attrs["external_tensor"] is not None:
+            return False
+        if not same_tensor_type(kept_output, output):
+            return False
+    return True
+
+
+def _merge(kept: Operator, duplicate: Operator) -> None:
+    # reshape ops are not dst_ops of their shape tensors
+    for tensor in set(duplicate._attrs["inputs"]):
+        tensor._attrs["dst_ops"].discard(duplicate)
+    for kept_output, output in zip(kept._attrs["outputs"], duplicate._attrs["outputs"]):
+        replace_tensor(output, kept_output)
+
+
+def _eliminated_bytes(op: Operator) -> int:
+    """Bytes of the outputs of op which no longer need to be allocated.
+    Views share the memory of their input."""
+    return sum(
+        tensor.size_bytes()
+        for tensor in op._attrs["outputs"]
+        if tensor._attrs["is_view_of"] is None
+    )
+
+
+def cse_report(eliminated: List[Tuple[Operator, Operator, int]]) -> str:
+    """Returns a markdown table with the number of eliminated ops and the
+    bytes of their outputs per op type.
+
+    Parameters
+    ----------
+    eliminated : List[Tuple[Operator, Operator, int]]
+        (kept op, eliminated op, eliminated bytes) for every eliminated op
+
+    Returns
+    -------
+    str
+        The report.
+    """
+    counts: Dict[str, int] = {}
+    sizes: Dict[str, int] = {}
+    for _, op, size in eliminated:
+        op_type = op._attrs["op"]
+        counts[op_type] = counts.get(op_type, 0) + 1
+        sizes[op_type] = sizes.get(op_type, 0) + size
+    rows = [
+        {"op": op_type, "eliminated": counts[op_type], "bytes": sizes[op_type]}
+        for op_type in sorted(counts, key=lambda op_type: (-sizes[op_type], op_type))
+    ]
+    rows.append(
+        {
+            "op": "total",
+            "eliminated": len(eliminated),
+            "bytes": sum(sizes.values()),
+        }
+    )
+    return markdownTable(rows).setParams(row_sep="markdown", quote=False).getMarkdown()
+
+
+def eliminate_common_subexpressions(
+    sorted_graph: List[Tensor], workdir: str = None
+) -> List[Tensor]:
+    """Graph pass to merge ops which compute the same outputs, e.g. the same
+    permute or elementwise op of the same tensor in two branches of a model.
+
+    Two ops are merged if their op_signature() is equal, see refine_graph,
+    and they read the same input tensors. The later op is removed and its
+    consumers read the outputs of the earlier op instead. Ops are visited in
+    topological order, so chains of duplicated ops are merged in a single
+    run.
+
+    Ops are not merged if an output of the later op is a model output or
+    an external tensor, or if their outputs differ in type.
+
+    Parameters
+    ----------
+    sorted_graph : List[Tensor]
+        Input graph
+    workdir : str, optional
+        If set and ops were eliminated, a cse_report() is written to
+        workdir/eliminate_common_subexpressions_report.md
+
+    Returns
+    -------
+    List[Tensor]
+        Graph after elimination
+    """
+    key_to_op: Dict[Hashable, Operator] = {}
+    eliminated: List[Tuple[Operator, Operator, int]] = []
+    for op in get_sorted_ops(sorted_graph):
+        # keys are computed lazily, so that the inputs of ops following a
+        # merged op already refer to the kept outputs
+        key = _cse_key(op)
+        if key is None:
+            continue
+        kept = key_to_op.get(key)
+        if kept is None:
+            key_to_op[key] = op
+            continue
+        if not _can_merge(kept, op):
+            continue
+        logger.debug(__file__, f"merge {op._attrs['name']} into {kept._attrs['name']}")
+        eliminated.append((kept, op, _eliminated_bytes(op)))
+        _merge(kept, op)
+
+    if len(eliminated) == 0:
+        return sorted_graph
+
+    report = cse_report(eliminated)
+    logger.info(
+        __file__,
+        f"eliminated {len(eliminated)} common subexpressions, saving up to "
+        f"{sum(size for _, _, size in eliminated)} bytes of intermediate tensors",
+    )
+    logger.debug(__file__, f"eliminated ops:\n{report}")
+    if workdir is not None:
+        path = os.path.join(workdir, "eliminate_common_subexpressions_report.md")
+        with open(path, "w") as f:
+            f.write(report + "\n")
+    return sanitize_sorted_graph(sorted_graph)
@@ -0,0 +1,174 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Horizontal fusion pass to launch independent fused_elementwise ops together.
+"""
+from typing import Dict, List
+
+from ...utils import graph_utils, logger
+from ..base import Operator, Tensor
+from ..ops.common import group_fused_elementwise
+from . import transform_utils
+from .toposort import toposort
+
+# Only small fused_elementwise ops are grouped. Larger ones are not bound by
+# the kernel launch overhead.
+MAX_SEGMENT_ELEMENTS = 256 * 1024
+# A group runs once all of its inputs are ready, which delays its earliest
+# ops. Limiting the total size of a group bounds the cost of the delay.
+MAX_GROUP_ELEMENTS = 1024 * 1024
+MAX_GROUP_SIZE = 16
+# Kernel params are limited to 4KB
+MAX_GROUP_PARAMS = 256
+
+
+def _max_num_elements(op: Operator) -> int:
+    num_elements = 1
+    for dim in op._attrs["output_accessors"][0].original_shapes:
+        num_elements *= dim.upper_bound()
+    return num_elements
+
+
+def _num_params(op: Operator) -> int:
+    # pointers, plus n_elements and the block range
+    return len(op._attrs["inputs"]) + len(op._attrs["outputs"]) + 2
+
+
+def _is_candidate(op: Operator) -> bool:
+    if op._attrs["op"] != "fused_elementwise":
+        return False
+    if any(t.dtype() not in ("float16", "bfloat16") for t in op._attrs["outputs"]):
+        return False
+    if _max_num_elements(op) > MAX_SEGMENT_ELEMENTS:
+        return False
+    # keep ops which can be constant folded on their own
+    return not transform_utils.can_be_constant_folded(op._attrs["outputs"])
+
+
+def _get_ancestors(sorted_ops: List[Operator]) -> Dict[Operator, int]:
+    """Returns the ancestors of each op as a bitmask, where bit i stands for
+    sorted_ops[i]."""
+    bits = {op: 1 << idx for idx, op in enumerate(sorted_ops)}
+    ancestors = {}
+    for op in sorted_ops:
+        mask = 0
+        for tensor in op._attrs["inputs"]:
+            for src_op in tensor._attrs["src_ops"]:
+                mask |= ancestors[src_op] | bits[src_op]
+        ancestors[op] = mask
+    return ancestors
+
+
+class _Group:
+    def __init__(self, op: Operator, bit: int) -> None:
+        self.ops = [op]
+        self.mask = bit
+        self.num_elements = _max_num_elements(op)
+        self.num_params = _num_params(op)
+
+    def fits(self, op: Operator) -> bool:
+        return (
+            len(self.ops) < MAX_GROUP_SIZE
+            and self.num_elements + _max_num_elements(op) <= MAX_GROUP_ELEMENTS
+            and self.num_params + _num_params(op) <= MAX_GROUP_PARAMS
+        )
+
+
+def _group_fused_elementwise_ops(sorted_graph: List[Tensor]) -> List[List[Operator]]:
+    """Greedily groups fused_elementwise ops in topological order.
+
+    An op joins the first group it fits in which is not reachable from it
+    and from which it is not reachable. Reachability is tracked on the graph
+    where every group is contracted into a single node: when an op joins a
+    group, all descendants of either become descendants of both. This keeps
+    the graph acyclic, which checking ops pairwise does not, e.g. for
+    groups {A, D} and {B, C} with edges A -> B and C -> D.
+    """
+    sorted_ops = graph_utils.get_sorted_ops(sorted_graph)
+    ancestors = _get_ancestors(sorted_ops)
+    bits = {op: 1 << idx for idx, op in enumerate(sorted_ops)}
+
+    groups = []
+    for op in sorted_ops:
+        if not _is_candidate(op):
+            continue
+        bit = bits[op]
+        for group in groups:
+            group_ancestors = ancestors[group.ops[0]]
+            if (
+                ancestors[op] & group.mask
+                or group_ancestors & bit
+                or not group.fits(op)
+            ):
+                continue
+            new_ancestors = group_ancestors | ancestors[op]
+            new_mask = group.mask | bit
+            for other, mask in ancestors.items():
+                if mask & new_mask:
+                    ancestors[other] = mask | new_mask | new_ancestors
+            for member in group.ops + [op]:
+                ancestors[member] = new_ancestors
+            group.ops.append(op)
+            group.mask = new_mask
+            group.num_elements += _max_num_elements(op)
+            group.num_params += _num_params(op)
+            break
+        else:
+            groups.append(_Group(op, bit))
+    return [group.ops for group in groups if len(group.ops) > 1]
+
+
+def fuse_group_elementwise(
+    sorted_graph: List[Tensor], workdir: str = None
+) -> List[Tensor]:
+    """Horizontal fusion of fused_elementwise ops. Groups of small,
+    mutually independent fused_elementwise ops are replaced with a
+    group_fused_elementwise op, which launches a single kernel for the whole
+    group, see _group_fused_elementwise_ops.
+
+    This pass needs to run after all passes which transform
+    fused_elementwise ops. It is enabled by the fuse_group_elementwise
+    kwarg of the cuda target.
+
+    Parameters
+    ----------
+    sorted_graph : List[Tensor]
+        Input graph
+    workdir : str, optional
+        working dir, by default None
+
+    Returns
+    -------
+    List[Tensor]
+        New graph after fusion
+    """
+    from ...backend.target import Target
+
+    target = Target.current()
+    if target.name() != "cuda" or "fuse_group_elementwise" not in target._kwargs:
+        return sorted_graph
+
+    groups = _group_fused_elementwise_ops(sorted_graph)
+    if not groups:
+        return sorted_graph
+    for group in groups:
+        logger.debug(
+            __file__,
+            "group_fused_elementwise: {}".format([op._attrs["name"] for op in group]),
+        )
+        group_fused_elementwise(group)
+
+    sorted_graph = toposort(sorted_graph)
+    return transform_utils.sanitize_sorted_graph(sorted_graph)
@@ -15,12 +15,27 @@
 """
 Fuse GEMM with elementwise operations
 """
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 
-from ..base import Tensor
+from ...utils.graph_utils import get_sorted_ops
+from ..base import Operator, Tensor
 from ..ops.common import elementwise
 from ..ops.common.epilogue import FuncEnum
-from ..ops.gemm_universal import gemm_rcr, gemm_rcr_bias, gemm_rcr_bias_swish
+from ..ops.gemm_universal import (
+    gemm_rcr,
+    gemm_rcr_bias,
+    gemm_rcr_bias_elementwise,
+    gemm_rcr_bias_swish,
+)
+from ..ops.gemm_universal.epilogue_expr import (
+    apply,
+    const,
+    D0,
+    D1,
+    EpilogueExpr,
+    split_epilogue,
+    X,
+)
 
 from .fuse_mm_elementwise_patterns import get_patterns
 from .fuse_utils import (
@@ -28,6 +43,7 @@ from .fuse_utils import (
     is_elementwise_type,
     transform_simple_fusion_patterns,
 )
+from .toposort import toposort
 from .transform_utils import (
     copy_tensor_attributes,
     remove_dst_op_from_tensor,
@@ -36,6 +52,9 @@ from .transform_utils import (
     sanitize_sorted_graph,
 )
 
+# Max number of elementwise ops fused into a gemm_rcr_bias_elementwise.
+MAX_EPILOGUE_OPS = 16
+
 # pylint: disable=C0103,C0415,W0612
 
 
@@ -184,6 +203,162 @@ def _transform_gemm_bias(sorted_graph: List[Tensor]) -> List[Tensor]:
     return transform_simple_fusion_patterns(sorted_graph, gemm_rcr_bias_patterns)
 
 
+def _specialized_chains() -> Set[Tuple[FuncEnum, ...]]:
+    """Returns the elementwise chains after gemm_rcr_bias which have
+    specialized ops in get_patterns()."""
+    chains = set()
+    for pattern, _ in get_patterns():
+        if pattern[0]._attrs["op"] == "gemm_rcr_bias":
+            chains.add(tuple(op._attrs["func"] for op in pattern[1:]))
+    return chains
+
+
+def _chain_funcs(x: Tensor, ops: List[Operator]) -> Optional[Tuple[FuncEnum, ...]]:
+    """Returns the funcs of ops if they form a simple chain starting at x,
+    i.e. one which get_patterns() can match."""
+    prev = x
+    for op in ops:
+        if len(prev._attrs["dst_ops"]) != 1 or prev not in op._attrs["inputs"]:
+            return None
+        prev = op._attrs["outputs"][0]
+    return tuple(op._attrs["func"] for op in ops)
+
+
+def _is_epilogue_op(op: Operator, x: Tensor) -> bool:
+    if op._attrs["op"] != "elementwise" or len(op._attrs["outputs"]) != 1:
+        return False
+    output = op._attrs["outputs"][0]
+    return output.shape() == x.shape() and output.dtype() == x.dtype()
+
+
+def _is_closed(x: Tensor, ops: List[Operator]) -> bool:
+    """Returns whether all tensors computed by x and ops, except the last
+    one, are only used by ops."""
+    op_set = set(ops)
+    for tensor in [x] + [op._attrs["outputs"][0] for op in ops[:-1]]:
+        if tensor._attrs["is_output"]:
+            return False
+        if not tensor._attrs["dst_ops"] <= op_set:
+            return False
+    return True
+
+
+def _split_sources(
+    expr: EpilogueExpr, sources: List[Tensor]
+) -> Optional[Tuple[EpilogueExpr, List[Tensor]]]:
+    """Returns the expression and a copy of the sources in an order which
+    split_epilogue() accepts, or None."""
+    if split_epilogue(expr) is not None:
+        return expr, list(sources)
+    if len(sources) == 2:
+        swapped = expr.substitute({D0: D1, D1: D0})
+        if split_epilogue(swapped) is not None:
+            return swapped, sources[::-1]
+    return None
+
+
+def _collect_epilogue(
+    x: Tensor, op_order: Dict[Operator, int]
+) -> Optional[Tuple[List[Operator], List[Tensor], EpilogueExpr]]:
+    """Collects the largest elementwise DAG fed by x which fits into the
+    broadcast epilogue: it has a single output, reads at most two sources
+    of the same shape as x, besides scalar constants, and can be split by
+    split_epilogue().
+
+    Returns
+    -------
+    Optional[Tuple[List[Operator], List[Tensor], EpilogueExpr]]
+        The elementwise ops in topological order, the sources and the
+        expression over X, D0 and D1, or None.
+    """
+    exprs = {x: X}
+    sources = []
+    ops = []
+    best = None
+    candidates = set(x._attrs["dst_ops"])
+    while candidates and len(ops) < MAX_EPILOGUE_OPS:
+        op = min(candidates, key=lambda op: op_order[op])
+        candidates.remove(op)
+        if not _is_epilogue_op(op, x):
+            continue
+        new_sources = []
+        for tensor in op._attrs["inputs"]:
+            if tensor not in exprs and tensor not in new_sources:
+                new_sources.append(tensor)
+        if len(sources) + len(new_sources) > 2 or any(
+            t.shape() != x.shape() or t.dtype() != x.dtype() for t in new_sources
+        ):
+            continue
+        for tensor in new_sources:
+            exprs[tensor] = [D0, D1][len(sources)]
+            sources.append(tensor)
+        args = [
+            exprs[arg] if arg in exprs else const(arg._attrs["value"])
+            for arg in op._attrs["args"]
+        ]
+        output = op._attrs["outputs"][0]
+        exprs[output] = apply(op._attrs["func"], *args)
+        ops.append(op)
+        candidates.update(output._attrs["dst_ops"])
+
+        if _is_closed(x, ops):
+            split = _split_sources(exprs[output], sources)
+            if split is not None:
+                best = (list(ops), split[1], split[0])
+
+    if best is None or _chain_funcs(x, best[0]) in _specialized_chains():
+        # leave it to the specialized op
+        return None
+    return best
+
+
+def _fuse_gemm_rcr_bias_elementwise(sorted_graph: List[Tensor]) -> List[Tensor]:
+    """Fuses gemm_rcr_bias with the elementwise DAG fed by its output into a
+    gemm_rcr_bias_elementwise, which generates the DAG as a custom
+    epilogue. Chains which have specialized ops in get_patterns() are left
+    to _transform_mm_elementwise().
+    """
+    from ...backend.target import Target
+
+    if Target.current().name() != "cuda":
+        return sorted_graph
+
+    op_order = {op: idx for idx, op in enumerate(get_sorted_ops(sorted_graph))}
+    new_tensors = {}
+    for gemm_op in op_order:
+        if gemm_op._attrs["op"] != "gemm_rcr_bias":
+            continue
+        x = gemm_op._attrs["outputs"][0]
+        # the broadcast epilogue kernels are float16 only
+        if x.dtype() != "float16":
+            continue
+        epilogue = _collect_epilogue(x, op_order)
+        if epilogue is None:
+            continue
+        ops, sources, expr = epilogue
+        gemm_inputs = list(gemm_op._attrs["inputs"])
+        valid, _ = gemm_rcr_bias_elementwise.is_valid_inputs(*gemm_inputs, *sources)
+        if not valid:
+            continue
+
+        remove_dst_op_from_tensor(gemm_inputs, gemm_op)
+        for op in ops:
+            for tensor in op._attrs["inputs"]:
+                tensor._attrs["dst_ops"].discard(op)
+        output = ops[-1]._attrs["outputs"][0]
+        new_tensor = gemm_rcr_bias_elementwise(expr)(*gemm_inputs, *sources)
+        copy_tensor_attributes(new_tensor, output)
+        replace_tensor(output, new_tensor)
+        new_tensors[output] = new_tensor
+
+    if not new_tensors:
+        return sorted_graph
+    sorted_graph = [new_tensors.get(tensor, tensor) for tensor in sorted_graph]
+    # sources of the new ops might come after them
+    output_tensors = [tensor for tensor in sorted_graph if tensor._attrs["is_output"]]
+    return sanitize_sorted_graph(toposort(output_tensors))
+
+
 def _transform_mm_elementwise(sorted_graph: List[Tensor]) -> List[Tensor]:
     fusion_patterns = get_patterns()
 
@@ -210,6 +385,7 @@ def fuse_mm_elementwise(
     funcs = [
         _fuse_bmm_mul_or_div_alpha,
         _transform_gemm_bias,
+        _fuse_gemm_rcr_bias_elementwise,
         _transform_mm_elementwise,
         _fuse_gemm_rcr_bias_swish,
     ]
@@ -124,17 +124,22 @@ def _find_fusable_elementwise_ops(op: Operator) -> Set[Operator]:
 
 def _fuse_elementwise(sorted_graph: List[Tensor]) -> List[Tensor]:
     disjoint_set = SimpleDisjointSet()
+    # topological position of each elementwise op
+    op_order: Dict[Operator, int] = {}
     for tensor in sorted_graph:
         src_ops = tensor._attrs["src_ops"]
         if src_ops is None or len(src_ops) != 1:
             continue
         src_op = list(src_ops)[0]
         if src_op._attrs["op"] == "elementwise":
+            op_order.setdefault(src_op, len(op_order))
             disjoint_set.add(src_op, _find_fusable_elementwise_ops(src_op))
 
     to_be_fused_op_groups = disjoint_set.get_node_groups()
     for ops in to_be_fused_op_groups:
-        fused_elementwise(ops)
+        # Merged groups are not in a deterministic order. Keep fused ops
+        # of identical subgraphs identical, so that refine_graph can dedup them.
+        fused_elementwise(sorted(ops, key=op_order.get))
 
     sorted_graph = toposort(sorted_graph)
     return transform_utils.sanitize_sorted_graph(sorted_graph)
@@ -16,24 +16,30 @@
 Applies graph transformations.
 """
 
-from typing import List
+from typing import Callable, List, Optional
 
-from ...utils import graph_utils
 from ..base import Tensor
 from .apply_padding import apply_padding
 from .fuse_conv_elementwise import fuse_conv_elementwise
+from .fuse_group_elementwise import fuse_group_elementwise
 from .fuse_group_ops import fuse_group_ops
 from .fuse_mm_elementwise import fuse_mm_elementwise
 from .fuse_ops import fuse_ops
 from .fuse_parallel_gemms import fuse_parallel_gemms
 from .fuse_permute_bmm import fuse_permute_bmm
+from .pass_manager import GraphPass, PassManager, SANITIZED_INVARIANTS
+from .quantize_gemm_weights import quantize_gemm_weights
 from .transform_memory_ops import transform_memory_ops
 from .transform_odd_alignment import transform_odd_alignment
 from .transform_special_ops import transform_special_ops
 from .transform_strided_ops import transform_strided_ops
 
 
-def optimize_graph(sorted_graph: List[Tensor], workdir: str) -> List[Tensor]:
+def optimize_graph(
+    sorted_graph: List[Tensor],
+    workdir: str,
+    after_pass: Optional[Callable[[str, List[Tensor]], None]] = None,
+) -> List[Tensor]:
     """Applies graph optimizations, including
 
     - fuse permute and bmm
@@ -47,6 +53,13 @@ def optimize_graph(sorted_graph: List[Tensor], workdir: str) -> List[Tensor]:
     - transform strided ops
     - transform memory ops
     - apply padding
+    - quantize constant gemm weights to int8, if enabled by the target
+    - fuse independent elementwise ops horizontally
+
+    Passes run under a PassManager, see pass_manager.py. Outside of debug
+    mode, params are only marked once all passes are done, and the graph is
+    neither validated nor dumped to workdir. In debug mode, the graph is
+    validated after every sub-pass and dumped after every pass.
 
     Parameters
     ----------
@@ -54,6 +67,8 @@ def optimize_graph(sorted_graph: List[Tensor], workdir: str) -> List[Tensor]:
         Input graph
     workdir : str
         working directory
+    after_pass : Callable[[str, List[Tensor]], None], optional
+        Called after every pass, see PassManager
 
     Returns
     -------
@@ -61,7 +76,23 @@ def optimize_graph(sorted_graph: List[Tensor], workdir: str) -> List[Tensor]:
         Fused graph
     """
 
-    funcs = [
+    # Every pass still keeps the graph sorted, named and free of unused ops
+    # with sanitize_sorted_graph() after each of its sub-passes, which later
+    # sub-passes rely on, so the manager never has to restore these. The
+    # passes do not read is_param, so marking params is deferred until all
+    # passes are done. check_graph_validity() only runs in debug mode.
+    requires = SANITIZED_INVARIANTS
+    preserves = SANITIZED_INVARIANTS
+    passes = [
+        GraphPass(func, requires=requires, preserves=preserves)
+        for func in optimize_graph_passes()
+    ]
+    return PassManager(passes, after_pass=after_pass).run(sorted_graph, workdir)
+
+
+def optimize_graph_passes() -> List[Callable[[List[Tensor], str], List[Tensor]]]:
+    """Returns the passes of optimize_graph(), in order."""
+    return [
         fuse_permute_bmm,
         transform_odd_alignment,
         fuse_conv_elementwise,
@@ -78,10 +109,9 @@ def optimize_graph(sorted_graph: List[Tensor], workdir: str) -> List[Tensor]:
         apply_padding,
         transform_strided_ops,
         transform_memory_ops,
+        # gemm_rcr* ops are matched by name in the passes above, so their
+        # weight-only int8 versions are only created once they are done
+        quantize_gemm_weights,
+        # needs to be the last pass which touches FusedElementwise ops
+        fuse_group_elementwise,
     ]
-
-    for func in funcs:
-        sorted_graph = func(sorted_graph, workdir)
-        graph_utils.dump_graph_debug_str_to_file(sorted_graph, workdir, func.__name__)
-
-    return sorted_graph
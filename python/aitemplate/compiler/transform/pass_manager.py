@@ -0,0 +1,218 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+A pass manager which runs graph passes and restores graph invariants
+only when a pass invalidated them.
+"""
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, FrozenSet, List, Optional
+
+from ...utils import compile_profiler, graph_utils, logger
+from ...utils.markdown_table import markdownTable
+from ..base import Tensor
+from . import transform_utils
+from .mark_param_tensor import mark_param_tensor
+from .name_graph import name_graph
+from .remove_unused_ops import remove_unused_ops
+from .toposort import toposort
+
+# pylint: disable=C0103
+
+
+class GraphInvariant(Enum):
+    """Properties of a sorted graph which passes rely on."""
+
+    # Tensors are in topological order.
+    SORTED = 1
+    # All tensors, ops and dims have names.
+    NAMED = 2
+    # Removed ops are not left in dst_ops of tensors.
+    NO_UNUSED_OPS = 3
+    # Constant tensors are marked as params.
+    PARAMS_MARKED = 4
+
+
+ALL_INVARIANTS = frozenset(GraphInvariant)
+
+# Invariants restored by transform_utils.sanitize_sorted_graph() when it
+# runs under a PassManager. Passes which end with it preserve these.
+SANITIZED_INVARIANTS = frozenset(
+    {
+        GraphInvariant.SORTED,
+        GraphInvariant.NAMED,
+        GraphInvariant.NO_UNUSED_OPS,
+    }
+)
+
+
+@dataclass
+class GraphPass:
+    """A graph pass, called as func(sorted_graph, workdir), which returns the
+    new sorted graph.
+
+    requires are the invariants the pass relies on, and preserves are the
+    invariants which still hold after the pass, given they held before.
+    """
+
+    func: Callable[[List[Tensor], str], List[Tensor]]
+    requires: FrozenSet[GraphInvariant] = ALL_INVARIANTS
+    preserves: FrozenSet[GraphInvariant] = frozenset()
+    name: Optional[str] = None
+
+    def __post_init__(self):
+        if self.name is None:
+            self.name = self.func.__name__
+
+
+@dataclass
+class PassTiming:
+    name: str
+    # seconds spent in the pass
+    run_time: float
+    # seconds spent restoring invariants required by the pass
+    restore_time: float
+
+
+def _restore_invariants(
+    sorted_graph: List[Tensor], invariants: FrozenSet[GraphInvariant]
+) -> List[Tensor]:
+    if GraphInvariant.SORTED in invariants:
+        sorted_graph = toposort(sorted_graph)
+    if GraphInvariant.NO_UNUSED_OPS in invariants:
+        remove_unused_ops(sorted_graph)
+    if GraphInvariant.NAMED in invariants:
+        name_graph(sorted_graph)
+    if GraphInvariant.PARAMS_MARKED in invariants:
+        mark_param_tensor(sorted_graph)
+    return sorted_graph
+
+
+class PassManager:
+    """Runs graph passes in order.
+
+    Invariants a pass does not preserve are restored right before the next
+    pass which requires them, or when all passes are done.
+
+    Outside of validate mode, passes run with transform_utils.deferred_checks(),
+    i.e. their sub-passes neither mark params nor validate the graph. Graph
+    validation and graph dumps only run in debug mode, i.e. if LOGLEVEL is
+    DEBUG, unless validate and dump_graph are set explicitly.
+    """
+
+    def __init__(
+        self,
+        passes: List[GraphPass],
+        validate: Optional[bool] = None,
+        dump_graph: Optional[bool] = None,
+        after_pass: Optional[Callable[[str, List[Tensor]], None]] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        passes : List[GraphPass]
+            Passes to run, in order.
+        validate : bool, optional
+            Whether to check graph validity after every pass and sub-pass.
+        dump_graph : bool, optional
+            Whether to dump the graph to the workdir after every pass.
+        after_pass : Callable[[str, List[Tensor]], None], optional
+            Called with the name of every pass and the graph it returned, e.g.
+            to check the graph with aitemplate.testing.graph_interpreter.
+        """
+        self._passes = passes
+        self._validate = logger.is_debug() if validate is None else validate
+        self._dump_graph = logger.is_debug() if dump_graph is None else dump_graph
+        self._after_pass = after_pass
+        self.timings: List[PassTiming] = []
+
+    def run(self, sorted_graph: List[Tensor], workdir: str) -> List[Tensor]:
+        """Runs all passes on sorted_graph, which must satisfy all invariants.
+
+        Parameters
+        ----------
+        sorted_graph : List[Tensor]
+            Input graph
+        workdir : str
+            working directory
+
+        Returns
+        -------
+        List[Tensor]
+            The transformed graph, which satisfies all invariants.
+        """
+        self.timings = []
+        invalid = frozenset()
+        for graph_pass in self._passes:
+            with compile_profiler.stage(graph_pass.name):
+                start = time.perf_counter()
+                with compile_profiler.stage("restore invariants"):
+                    sorted_graph = _restore_invariants(
+                        sorted_graph, invalid & graph_pass.requires
+                    )
+                invalid = invalid - graph_pass.requires
+                restore_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                if self._validate:
+                    sorted_graph = graph_pass.func(sorted_graph, workdir)
+                else:
+                    with transform_utils.deferred_checks():
+                        sorted_graph = graph_pass.func(sorted_graph, workdir)
+                invalid = invalid | (ALL_INVARIANTS - graph_pass.preserves)
+                run_time = time.perf_counter() - start
+                self.timings.append(PassTiming(graph_pass.name, run_time, restore_time))
+
+                if self._validate:
+                    transform_utils.check_graph_validity(sorted_graph, raiseError=True)
+                if self._dump_graph:
+                    graph_utils.dump_graph_debug_str_to_file(
+                        sorted_graph, workdir, graph_pass.name
+                    )
+                if self._after_pass is not None:
+                    self._after_pass(graph_pass.name, sorted_graph)
+
+        start = time.perf_counter()
+        with compile_profiler.stage("restore invariants"):
+            sorted_graph = _restore_invariants(sorted_graph, invalid)
+        self.timings.append(
+            PassTiming("restore invariants", 0.0, time.perf_counter() - start)
+        )
+        logger.info(__file__, f"pass timings:\n{self.timing_report()}")
+        return sorted_graph
+
+    def timing_report(self) -> str:
+        """Returns a markdown table with the timings of the last run."""
+        rows = [
+            {
+                "pass": timing.name,
+                "run (ms)": round(timing.run_time * 1000, 2),
+                "restore (ms)": round(timing.restore_time * 1000, 2),
+            }
+            for timing in self.timings
+        ]
+        rows.append(
+            {
+                "pass": "total",
+                "run (ms)": round(sum(t.run_time for t in self.timings) * 1000, 2),
+                "restore (ms)": round(
+                    sum(t.restore_time for t in self.timings) * 1000, 2
+                ),
+            }
+        )
+        return (
+            markdownTable(rows).setParams(row_sep="markdown", quote=False).getMarkdown()
+        )
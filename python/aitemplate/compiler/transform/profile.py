@@ -20,6 +20,7 @@ from typing import List
 
 from ...backend import codegen
 from ..base import DynamicProfileStrategy, Tensor
+from ..profiling import profile_ops, ProfiledOperator
 
 # pylint: disable=C0103,W0613,W0102
 
@@ -53,20 +54,34 @@ def profile(
     profiler_dir = os.path.join(workdir)
     codegen.gen_profiler(sorted_graph, profiler_dir, dynamic_profiling_strategy)
     profiled = {}
+    duplicates = []
     for node in sorted_graph:
         for func in node.src_ops():
             func_name = func._attrs["name"]
             if func_name in profiled:
-                paths = func._attrs["exec_path"].keys()
-                for path in paths:
-                    func._attrs["exec_path"][path] = profiled[func_name]._attrs[
-                        "exec_path"
-                    ][path]
+                duplicates.append(func)
                 continue
             if func._attrs["has_profiler"]:
-                func.profile(
-                    workdir=profiler_dir,
-                    devices=devices,
-                    dynamic_profiling_strategy=dynamic_profiling_strategy,
-                )
                 profiled[func_name] = func
+
+    # all profiled ops share the profile cache lookups and a single runner
+    profile_ops(
+        [func for func in profiled.values() if isinstance(func, ProfiledOperator)],
+        workdir=profiler_dir,
+        devices=devices,
+        dynamic_profiling_strategy=dynamic_profiling_strategy,
+    )
+    for func in profiled.values():
+        if not isinstance(func, ProfiledOperator):
+            func.profile(
+                workdir=profiler_dir,
+                devices=devices,
+                dynamic_profiling_strategy=dynamic_profiling_strategy,
+            )
+
+    for func in duplicates:
+        paths = func._attrs["exec_path"].keys()
+        for path in paths:
+            func._attrs["exec_path"][path] = profiled[func._attrs["name"]]._attrs[
+                "exec_path"
+            ][path]
@@ -0,0 +1,132 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Replace gemms with constant weights by weight-only int8 gemms.
+"""
+from typing import List
+
+import numpy as np
+
+from ...utils import logger
+from ...utils.quantization import pack_int8_weight, quantize_int8_per_channel
+from ..base import _NumpyConstantTensorData, Operator, Tensor
+from ..ops.gemm_special import gemm_rcr_bias_weight_int8, gemm_rcr_weight_int8
+from .transform_utils import (
+    copy_tensor_attributes,
+    remove_dst_op_from_tensor,
+    replace_tensor,
+    sanitize_sorted_graph,
+)
+
+_WEIGHT_INT8_OPS = {
+    "gemm_rcr": gemm_rcr_weight_int8,
+    "gemm_rcr_bias": gemm_rcr_bias_weight_int8,
+}
+
+
+def _is_candidate(op: Operator) -> bool:
+    if op._attrs["op"] not in _WEIGHT_INT8_OPS:
+        return False
+    a, b = op._attrs["inputs"][:2]
+    if a.dtype() != "float16" or b.dtype() != "float16":
+        return False
+    # the weight must be bound at compile time, and only be read by this op
+    if (
+        b._attrs["data"] is None
+        or b.src_ops()
+        or b._attrs["is_output"]
+        or len(b.dst_ops()) != 1
+    ):
+        return False
+    if op._attrs["alpha"] != 1.0:
+        return False
+    # the kernels read contiguous A and write contiguous C
+    accessors = op._attrs["input_accessors"][:1] + op._attrs["output_accessors"]
+    if any(accessor.is_from_strided_tensor for accessor in accessors):
+        return False
+    return gemm_rcr_weight_int8.is_valid_shape(a, b)
+
+
+def _quantize_op(op: Operator) -> List[Tensor]:
+    inputs = op._attrs["inputs"]
+    a, b = inputs[:2]
+    name = b._attrs["name"]
+    shape = b._attrs["shape"]
+    weight = np.frombuffer(b._attrs["data"].to_bytes(), dtype=np.float16)
+    qweight, scales = quantize_int8_per_channel(
+        weight.reshape([dim.value() for dim in shape])
+    )
+
+    packed_weight = Tensor(shape=shape, dtype="int8", name=f"{name}_int8")
+    packed_weight._bind_data(_NumpyConstantTensorData(pack_int8_weight(qweight)))
+    scale = Tensor(shape=shape[:1], dtype="float16", name=f"{name}_scale")
+    scale._bind_data(_NumpyConstantTensorData(scales))
+
+    old_output = op._attrs["outputs"][0]
+    new_op = _WEIGHT_INT8_OPS[op._attrs["op"]]()
+    new_output = new_op(a, packed_weight, scale, *inputs[2:])
+    copy_tensor_attributes(new_output, old_output)
+    remove_dst_op_from_tensor(inputs, op)
+    replace_tensor(old_output, new_output)
+    return [packed_weight, scale, new_output]
+
+
+def quantize_gemm_weights(
+    sorted_graph: List[Tensor], workdir: str = None
+) -> List[Tensor]:
+    """Replaces gemm_rcr and gemm_rcr_bias ops by their weight-only int8
+    versions, gemm_rcr_weight_int8 and gemm_rcr_bias_weight_int8. Weights
+    are quantized per output channel and packed at compile time, see
+    aitemplate.utils.quantization, which halves their memory. Scales are
+    stored as new constants.
+
+    Only weights which are bound at compile time, i.e. passed as constants
+    to compile_model, are quantized. The pass is enabled by the
+    weight_only_int8 kwarg of the cuda target. Quantization loses precision,
+    and the int8 kernels are meant for memory-bound gemms with small M.
+
+    Parameters
+    ----------
+    sorted_graph : List[Tensor]
+        Input graph
+    workdir : str, optional
+        working dir, by default None
+
+    Returns
+    -------
+    List[Tensor]
+        Transformed graph
+    """
+    from ...backend.target import Target
+
+    target = Target.current()
+    if target.name() != "cuda" or not target._kwargs.get("weight_only_int8", False):
+        return sorted_graph
+
+    new_sorted_graph = []
+    transformed = False
+    for tensor in sorted_graph:
+        src_ops = tensor.src_ops()
+        if len(src_ops) == 1 and _is_candidate(next(iter(src_ops))):
+            op = next(iter(src_ops))
+            logger.debug(__file__, f"quantize weights of {op._attrs['name']}")
+            new_sorted_graph.extend(_quantize_op(op))
+            transformed = True
+        else:
+            new_sorted_graph.append(tensor)
+
+    if not transformed:
+        return sorted_graph
+    return sanitize_sorted_graph(new_sorted_graph)
@@ -15,12 +15,20 @@
 """
 Graph pass to dedup operators with same signatures.
 """
-from typing import List
+import dataclasses
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
 
 from ...utils import logger
 from ...utils.graph_utils import get_sorted_ops
+from ...utils.markdown_table import markdownTable
 
-from ..base import Operator, Tensor
+from ..base import IntImm, IntVar, Operator, Tensor
+from ...backend.common.tensor_accessor_codegen import (
+    find_max_alignment_for_accessor,
+)
+from ..tensor_accessor import TensorAccessor
 
 # pylint: disable=C0103
 
@@ -66,19 +74,24 @@ def check_inputs_outputs(key: str, o1: Operator, o2: Operator):
     return True
 
 
-def check_fused_elementwise_ops(o1: Operator, o2: Operator):
-    ops1 = o1._attrs["elementwise_ops"]
-    ops2 = o2._attrs["elementwise_ops"]
+# Accessors of fused_elementwise ops, whose offsets are passed at runtime.
+FUSED_ELEMENTWISE_ACCESSOR_KEYS = {
+    "input_accessors",
+    "output_accessors",
+}
 
-    # Allow single input to simply it
-    if len(o1._attrs["inputs"]) != 1:
-        return False
 
-    # Disallow multiple ops
-    if len(ops1) != len(ops2) or len(ops1) != 1:
-        return False
+def _special_keys(op: Operator):
+    if op._attrs["op"] == "fused_elementwise":
+        return SPECIAL_CHECK_FUNC_KEYS | FUSED_ELEMENTWISE_ACCESSOR_KEYS
+    return SPECIAL_CHECK_FUNC_KEYS
 
-    return same_function_type(ops1[0], ops2[0])
+
+def check_fused_elementwise_ops(o1: Operator, o2: Operator):
+    try:
+        return fused_elementwise_signature(o1) == fused_elementwise_signature(o2)
+    except _Unhashable:
+        return False
 
 
 def same_function_type(o1: Operator, o2: Operator):
@@ -94,10 +107,11 @@ def same_function_type(o1: Operator, o2: Operator):
         return False
 
     # check general attrs
+    special_keys = _special_keys(o1)
     for key in keys:
         if key not in o2._attrs:
             return False
-        if key not in SPECIAL_CHECK_FUNC_KEYS:
+        if key not in special_keys:
             if o1._attrs[key] != o2._attrs[key]:
                 return False
 
@@ -124,16 +138,269 @@ def same_function_type(o1: Operator, o2: Operator):
     return True
 
 
-def refine_graph(sorted_graph: List[Tensor]):
+class _Unhashable(Exception):
+    """Raised for attrs which cannot be turned into a signature."""
+
+
+class _Tag:
+    """Tags canonical forms of containers so that e.g. a list and a tuple
+    with the same items get different signatures."""
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def __repr__(self) -> str:
+        return self._name
+
+
+_LIST = _Tag("list")
+_DICT = _Tag("dict")
+_ORDERED_DICT = _Tag("OrderedDict")
+_SET = _Tag("set")
+_INT_VAR = _Tag("IntVar")
+_DATACLASS = _Tag("dataclass")
+_ACCESSOR = _Tag("TensorAccessor")
+
+
+def _canonical(value: Any) -> Hashable:
+    """Returns a hashable form of an attr value. Two values have equal
+    canonical forms iff they compare equal."""
+    if isinstance(value, IntImm):
+        # IntImm compares equal to its int value
+        return value.value()
+    if isinstance(value, IntVar):
+        return (_INT_VAR, value._attrs["name"], tuple(value._attrs["values"]))
+    if isinstance(value, (Tensor, Operator)):
+        # compared by identity
+        return value
+    if isinstance(value, TensorAccessor):
+        return (_ACCESSOR, _canonical(vars(value)))
+    if isinstance(value, list):
+        return (_LIST, tuple(_canonical(v) for v in value))
+    if isinstance(value, tuple):
+        return tuple(_canonical(v) for v in value)
+    if isinstance(value, OrderedDict):
+        return (_ORDERED_DICT, tuple((k, _canonical(v)) for k, v in value.items()))
+    if isinstance(value, dict):
+        return (_DICT, frozenset((k, _canonical(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return (_SET, frozenset(_canonical(v) for v in value))
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        fields = dataclasses.fields(value)
+        return (
+            _DATACLASS,
+            type(value),
+            tuple(_canonical(getattr(value, f.name)) for f in fields),
+        )
+    try:
+        hash(value)
+    except TypeError as error:
+        raise _Unhashable(str(error)) from error
+    return value
+
+
+def _tensor_signature(tensor: Tensor) -> Hashable:
+    """Signature of the properties compared by same_tensor_type."""
+    return (
+        tensor.dtype(),
+        _canonical(tensor._attrs["value"]),
+        tuple(_canonical(dim) for dim in tensor.shape()),
+    )
+
+
+def _tensors_signature(tensors: Optional[List[Tensor]]) -> Hashable:
+    if tensors is None:
+        return None
+    return tuple(_tensor_signature(tensor) for tensor in tensors)
+
+
+def _accessor_signature(accessor: TensorAccessor) -> Hashable:
+    """Signature of an accessor whose offset is applied at runtime. Only the
+    alignment implied by the offset matters for codegen."""
+    fields = dict(vars(accessor))
+    fields["offset"] = find_max_alignment_for_accessor(accessor)
+    return (_ACCESSOR, _canonical(fields))
+
+
+def _elementwise_dag_signature(op: Operator) -> Hashable:
+    """Signature of the elementwise ops of a fused_elementwise op.
+
+    Elementwise ops are numbered in the order they are reached from the
+    outputs, and their args refer to inputs by position, so the signature
+    does not depend on the order of elementwise_ops or on tensor identities.
+    """
+    input_indices = {
+        tensor: idx for idx, tensor in enumerate(op._attrs["original_inputs"])
+    }
+    producers = {}
+    for elementwise_op in op._attrs["elementwise_ops"]:
+        for tensor in elementwise_op._attrs["outputs"]:
+            producers[tensor] = elementwise_op
+
+    node_indices: Dict[Operator, int] = {}
+    nodes = []
+
+    def visit(elementwise_op: Operator) -> int:
+        if elementwise_op in node_indices:
+            return node_indices[elementwise_op]
+        args = []
+        for arg in elementwise_op._attrs["args"]:
+            if arg in input_indices:
+                args.append(("input", input_indices[arg]))
+            elif arg.is_a_const_num():
+                args.append(("const", _canonical(arg._attrs["value"])))
+            elif arg in producers:
+                args.append(("op", visit(producers[arg])))
+            else:
+                raise _Unhashable(f"Cannot find the source of arg {arg}")
+        node_indices[elementwise_op] = len(nodes)
+        nodes.append((elementwise_op._attrs["func"], tuple(args)))
+        return node_indices[elementwise_op]
+
+    outputs = []
+    for tensor in op._attrs["original_outputs"]:
+        if tensor not in producers:
+            raise _Unhashable(f"Cannot find the source of output {tensor}")
+        outputs.append(visit(producers[tensor]))
+    return (tuple(nodes), tuple(outputs))
+
+
+def fused_elementwise_signature(op: Operator) -> Hashable:
+    """Returns the signature of a fused_elementwise op, which covers its
+    elementwise op DAG and the accessors of its inputs and outputs.
+
+    Fused ops with equal signatures generate the same kernel, up to the
+    accessor offsets which are applied by the caller.
+
+    Parameters
+    ----------
+    op : Operator
+        A fused_elementwise operator.
+
+    Returns
+    -------
+    Hashable
+        The signature.
+
+    Raises
+    ------
+    _Unhashable
+        If an attr value of op has no hashable form.
+    """
+    return (
+        _elementwise_dag_signature(op),
+        tuple(_accessor_signature(a) for a in op._attrs["input_accessors"]),
+        tuple(_accessor_signature(a) for a in op._attrs["output_accessors"]),
+    )
+
+
+def op_signature(op: Operator) -> Optional[Hashable]:
+    """Returns a hashable signature of op. Two ops have equal signatures iff
+    same_function_type() holds for them, so ops with equal signatures can
+    share a single function.
+
+    The signature consists of the op type, all non-special attrs, the types
+    of input tensors and, for fused_elementwise ops, the
+    fused_elementwise_signature().
+
+    Parameters
+    ----------
+    op : Operator
+        The operator.
+
+    Returns
+    -------
+    Optional[Hashable]
+        The signature, None if op cannot be deduped with any other op.
+
+    Raises
+    ------
+    _Unhashable
+        If an attr value of op has no hashable form.
+    """
+    attrs = op._attrs
+    keys = tuple(sorted(attrs.keys()))
+    # ban group gemm ops
+    if "unique_workspace" in attrs:
+        return None
+
+    signature = [attrs["op"], keys]
+    special_keys = _special_keys(op)
+    for key in keys:
+        if key not in special_keys:
+            signature.append(_canonical(attrs[key]))
+    signature.append(_tensors_signature(attrs["inputs"]))
+
+    # for fused_elementwise ops
+    if attrs["op"] == "fused_elementwise":
+        try:
+            signature.append(fused_elementwise_signature(op))
+        except _Unhashable:
+            return None
+
+    for key in ("original_inputs", "original_outputs", "args"):
+        if key in attrs:
+            signature.append(_tensors_signature(attrs[key]))
+    return tuple(signature)
+
+
+def translation_unit_report(
+    sorted_ops: List[Operator], original_names: List[str]
+) -> str:
+    """Returns a markdown table with the number of generated functions, i.e.
+    translation units, per op type before and after dedup.
+
+    Parameters
+    ----------
+    sorted_ops : List[Operator]
+        Ops of the refined graph
+    original_names : List[str]
+        Names of sorted_ops before dedup
+
+    Returns
+    -------
+    str
+        The report.
+    """
+    before: Dict[str, set] = {}
+    after: Dict[str, set] = {}
+    for op, original_name in zip(sorted_ops, original_names):
+        before.setdefault(op._attrs["op"], set()).add(original_name)
+        after.setdefault(op._attrs["op"], set()).add(op._attrs["name"])
+    rows = [
+        {"op": op_type, "before": len(before[op_type]), "after": len(names)}
+        for op_type, names in sorted(
+            after.items(), key=lambda item: (-len(before[item[0]]), item[0])
+        )
+    ]
+    rows.append(
+        {
+            "op": "total",
+            "before": sum(len(names) for names in before.values()),
+            "after": sum(len(names) for names in after.values()),
+        }
+    )
+    return markdownTable(rows).setParams(row_sep="markdown", quote=False).getMarkdown()
+
+
+def refine_graph(sorted_graph: List[Tensor], workdir: str = None):
     """Graph pass to dedup operators with same signatures.
 
     Parameters
     ----------
     sorted_graph : List[Tensor]
         Input graph
+    workdir : str, optional
+        If set, a translation_unit_report() is written to
+        workdir/refine_graph_report.md
     """
     sorted_ops = get_sorted_ops(sorted_graph)
+    original_names = [op._attrs["name"] for op in sorted_ops]
 
+    # signature -> index of the kept op in exist_func
+    signature_index: Dict[Hashable, int] = {}
+    # kept ops with unhashable attrs, compared one by one
+    unindexed_funcs: List[int] = []
     exist_func = []
     refined_ops = 0
     total_ops = len(sorted_ops)
@@ -141,19 +408,49 @@ def refine_graph(sorted_graph: List[Tensor]):
     refined_ops_set = set()
 
     for func in sorted_ops:
-        found = False
-        for f in reversed(exist_func):
-            if same_function_type(f, func):
-                func._attrs["name"] = f._attrs["name"]
-                found = True
-                refined_ops += 1
-                break
-        if not found:
-            exist_func.append(func)
-        if found:
+        try:
+            signature = op_signature(func)
+            indexed = True
+        except _Unhashable:
+            signature = None
+            indexed = False
+
+        candidates = []
+        if not indexed:
+            candidates = [
+                idx for idx, f in enumerate(exist_func) if same_function_type(f, func)
+            ]
+        elif signature is not None:
+            if signature in signature_index:
+                candidates.append(signature_index[signature])
+            candidates.extend(
+                idx
+                for idx in unindexed_funcs
+                if same_function_type(exist_func[idx], func)
+            )
+
+        if len(candidates) > 0:
+            # the most recently kept matching op, as in a reversed scan
+            f = exist_func[max(candidates)]
+            func._attrs["name"] = f._attrs["name"]
+            refined_ops += 1
             refined_ops_set.add(func._attrs["op"])
+            continue
+
+        if signature is not None:
+            signature_index[signature] = len(exist_func)
+        elif not indexed:
+            unindexed_funcs.append(len(exist_func))
+        exist_func.append(func)
 
     logger.debug(__file__, f"refined ops: {refined_ops_set}")
     logger.info(
         __file__, f"reduced unique ops from {total_ops} to {total_ops - refined_ops}"
     )
+    if total_ops == 0:
+        return
+    report = translation_unit_report(sorted_ops, original_names)
+    logger.debug(__file__, f"translation units:\n{report}")
+    if workdir is not None:
+        with open(os.path.join(workdir, "refine_graph_report.md"), "w") as f:
+            f.write(report + "\n")
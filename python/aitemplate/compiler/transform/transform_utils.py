@@ -17,6 +17,7 @@ Util functions for graph transformations.
 """
 
 from collections import deque
+from contextlib import contextmanager
 from typing import Dict, List, Union
 
 from ...utils import graph_utils, logger
@@ -248,6 +249,24 @@ def remove_tensor_from_sorted_graph(tensor: Tensor) -> None:
     tensor._attrs["is_output"] = False
 
 
+# Set while a PassManager runs a pass, see deferred_checks().
+_defer_checks = False
+
+
+@contextmanager
+def deferred_checks():
+    """Within this context, sanitize_sorted_graph() skips marking params and
+    checking graph validity. The PassManager restores both once a pass is
+    done instead of after every sub-pass."""
+    global _defer_checks
+    prev = _defer_checks
+    _defer_checks = True
+    try:
+        yield
+    finally:
+        _defer_checks = prev
+
+
 def sanitize_sorted_graph(sorted_graph: List[Tensor]) -> List[Tensor]:
     """
     Removes tensors whose src_op and dst_ops are empty.
@@ -267,9 +286,10 @@ def sanitize_sorted_graph(sorted_graph: List[Tensor]) -> List[Tensor]:
         or tensor._attrs["is_output"]
     ]
     name_graph(new_sorted_graph)
-    mark_param_tensor(new_sorted_graph)
     remove_unused_ops(new_sorted_graph)
-    check_graph_validity(new_sorted_graph, raiseError=True)
+    if not _defer_checks:
+        mark_param_tensor(new_sorted_graph)
+        check_graph_validity(new_sorted_graph, raiseError=True)
     return new_sorted_graph
 
 
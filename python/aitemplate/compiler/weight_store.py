@@ -0,0 +1,132 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+A weight store shared by several compiled models, e.g. the modules of a
+pipeline, or variants of the same graph compiled for different batch sizes.
+
+Models compiled with compile_model(..., weight_store=store) do not embed their
+constants. Instead, each constant is appended to the store file, unless the
+store already has a constant with the same name and contents, and the model
+refers to it by its offset in the file. At runtime, the file is uploaded once
+into device memory with SharedWeights, and bound to each model with
+Model.set_shared_weights.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, NamedTuple, Tuple
+
+from ..utils import logger
+
+# Offsets of constants in the store, like device allocations.
+WEIGHT_STORE_ALIGNMENT = 256
+
+
+class WeightStoreEntry(NamedTuple):
+    """A constant in a weight store."""
+
+    name: str
+    sha256: str
+    offset: int
+    num_bytes: int
+
+
+class WeightStore:
+    """
+    The constants of several models in one file, at path. Its index, which
+    maps the name and the content hash of each constant to its offset, is
+    saved next to it, at path + ".json".
+
+    The store is append-only, so that the offsets of the models which were
+    compiled with it stay valid when more models are compiled with it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + ".json"
+        self._entries: Dict[Tuple[str, str], WeightStoreEntry] = {}
+        self._size = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                index = json.load(f)
+            for entry in index["constants"]:
+                entry = WeightStoreEntry(**entry)
+                self._entries[(entry.name, entry.sha256)] = entry
+            self._size = index["size"]
+            if os.path.getsize(path) < self._size:
+                raise RuntimeError(
+                    f"Weight store {path} is smaller than its index, which expects "
+                    f"{self._size} bytes"
+                )
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            open(path, "wb").close()
+        # entries added since the last save
+        self._num_added = 0
+        self._num_reused = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """The size of the store file, in bytes."""
+        return self._size
+
+    def add(self, name: str, data: bytes) -> int:
+        """
+        Returns the offset of the constant with the given name and contents,
+        which is appended to the store if it is not in it yet.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        entry = self._entries.get((name, sha256))
+        if entry is not None:
+            self._num_reused += 1
+            return entry.offset
+
+        offset = (
+            (self._size + WEIGHT_STORE_ALIGNMENT - 1)
+            // WEIGHT_STORE_ALIGNMENT
+            * WEIGHT_STORE_ALIGNMENT
+        )
+        with open(self.path, "r+b") as f:
+            f.seek(self._size)
+            f.write(bytes(offset - self._size))
+            f.write(data)
+        self._size = offset + len(data)
+        self._entries[(name, sha256)] = WeightStoreEntry(
+            name, sha256, offset, len(data)
+        )
+        self._num_added += 1
+        return offset
+
+    def save(self) -> None:
+        """Saves the index, after the constants of a model were added."""
+        with open(self.index_path, "w") as f:
+            json.dump(
+                {
+                    "size": self._size,
+                    "constants": [entry._asdict() for entry in self._entries.values()],
+                },
+                f,
+            )
+        logger.info(
+            __name__,
+            f"Weight store {self.path}: {self._num_added} constants added, "
+            f"{self._num_reused} reused, {len(self)} constants and "
+            f"{self._size} bytes in total",
+        )
+        self._num_added = 0
+        self._num_reused = 0
@@ -0,0 +1,708 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+A reference interpreter, which runs a graph of Tensors and Operators on the
+host with NumPy, without compiling it.
+
+It runs graphs before and after graph passes alike: fused ops, e.g.
+fused_elementwise or gemm_rcr_bias_relu, and the tensor accessors which
+passes set up to fuse strided ops, e.g. slices or concatenations, are
+interpreted as well. So the outputs of a graph can be checked after each
+pass of optimize_graph on CPU, see PassChecker:
+
+    graph = transform.toposort(outputs)
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    checker = PassChecker(graph, {"x": x})
+    graph = transform.optimize_graph(graph, workdir, after_pass=checker)
+
+Floating-point tensors are computed in float32, whatever their dtype, so the
+outputs are close to, but not bitwise equal to, the outputs of compiled
+models. Ops which are not supported raise NotImplementedError.
+"""
+import math
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..compiler.base import IntImm, IntVar, IntVarTensor, Operator, Tensor
+from ..compiler.ops.common.epilogue import FuncEnum
+from ..compiler.tensor_accessor import TensorAccessor
+
+# pylint: disable=C0103
+
+_NUMPY_DTYPES = {
+    "float16": np.float32,
+    "bfloat16": np.float32,
+    "float32": np.float32,
+    "float": np.float32,
+    "int8": np.int8,
+    "int32": np.int32,
+    "int": np.int32,
+    "int64": np.int64,
+    "bool": np.bool_,
+}
+
+
+def _numpy_dtype(dtype: str):
+    if dtype not in _NUMPY_DTYPES:
+        raise NotImplementedError(f"Unsupported dtype {dtype}")
+    return _NUMPY_DTYPES[dtype]
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # does not overflow, unlike 1 / (1 + exp(-x))
+    return 0.5 * (np.tanh(0.5 * x) + 1)
+
+
+def _erf(x: np.ndarray) -> np.ndarray:
+    # Abramowitz and Stegun 7.1.26, with an absolute error below 1.5e-7
+    t = 1 / (1 + 0.3275911 * np.abs(x))
+    poly = t * (
+        0.254829592
+        + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429)))
+    )
+    return np.sign(x) * (1 - poly * np.exp(-x * x))
+
+
+def _gelu(x: np.ndarray) -> np.ndarray:
+    return 0.5 * x * (1 + _erf(x / math.sqrt(2)))
+
+
+def _fast_gelu(x: np.ndarray) -> np.ndarray:
+    return 0.5 * x * (1 + np.tanh(math.sqrt(2 / math.pi) * (x + 0.044715 * x**3)))
+
+
+def _hardswish(x: np.ndarray) -> np.ndarray:
+    return x * np.clip(x + 3, 0, 6) / 6
+
+
+def _relu(x: np.ndarray) -> np.ndarray:
+    # NaN is mapped to 0, like the device function
+    return np.where(x > 0, x, 0).astype(x.dtype, copy=False)
+
+
+def _softmax(x: np.ndarray, axis: int) -> np.ndarray:
+    e = np.exp(x - np.max(x, axis=axis, keepdims=True))
+    return e / np.sum(e, axis=axis, keepdims=True)
+
+
+_FUNCS: Dict[FuncEnum, Callable[..., np.ndarray]] = {
+    FuncEnum.ADD: np.add,
+    FuncEnum.SUB: np.subtract,
+    FuncEnum.MUL: np.multiply,
+    FuncEnum.DIV: np.divide,
+    FuncEnum.TANH: np.tanh,
+    FuncEnum.COS: np.cos,
+    FuncEnum.SIN: np.sin,
+    FuncEnum.SIGN: np.sign,
+    FuncEnum.ABS: np.abs,
+    FuncEnum.LOGE: np.log,
+    FuncEnum.EXP: np.exp,
+    FuncEnum.SQRT: np.sqrt,
+    FuncEnum.MAX: np.maximum,
+    FuncEnum.MIN: np.minimum,
+    FuncEnum.SIGMOID: _sigmoid,
+    FuncEnum.LRELU: lambda x, slope: np.where(x > 0, x, x * slope),
+    FuncEnum.HARDTANH: np.clip,
+    FuncEnum.RELU: _relu,
+    FuncEnum.NAN_TO_NUM: lambda x, nan, posinf, neginf: np.nan_to_num(
+        x, nan=nan, posinf=posinf, neginf=neginf
+    ),
+    FuncEnum.CLAMP_NAN_TO_NUM: lambda x, lo, hi, nan: np.where(
+        np.isnan(x), nan, np.clip(x, lo, hi)
+    ),
+    FuncEnum.SILU: lambda x: x * _sigmoid(x),
+}
+
+
+def _apply_func(func: FuncEnum, *args) -> np.ndarray:
+    if func not in _FUNCS:
+        raise NotImplementedError(f"Unsupported elementwise func {func}")
+    with np.errstate(all="ignore"):
+        return np.asarray(_FUNCS[func](*args))
+
+
+# Kernels of ops, by op name, see _kernel.
+_KERNELS: Dict[str, Callable[["_Interpreter", Operator], None]] = {}
+
+
+def _kernel(*names: str):
+    def register(func):
+        for name in names:
+            _KERNELS[name] = func
+        return func
+
+    return register
+
+
+class _Interpreter:
+    def __init__(
+        self, inputs: Dict[str, np.ndarray], constants: Dict[str, np.ndarray]
+    ) -> None:
+        self._inputs = inputs
+        self._constants = constants
+        self._values: Dict[Tensor, np.ndarray] = {}
+        # values of dynamic dims, by name
+        self._dims: Dict[str, int] = {}
+
+    def run(self, graph: List[Tensor]) -> Dict[str, np.ndarray]:
+        outputs = [tensor for tensor in graph if tensor._attrs["is_output"]]
+        if len(outputs) == 0:
+            raise ValueError("The graph has no outputs")
+        for op in _schedule(outputs):
+            for tensor in op._attrs["inputs"]:
+                if not isinstance(tensor, IntVarTensor):
+                    self._value(tensor)
+            name = op._attrs["op"]
+            if name in _KERNELS:
+                _KERNELS[name](self, op)
+            elif _GEMM_PATTERN.match(name):
+                _gemm(self, op)
+            elif _CONV2D_PATTERN.match(name):
+                _conv2d(self, op)
+            else:
+                raise NotImplementedError(
+                    f"Op {name} ({op._attrs['name']}) is not supported by the "
+                    "interpreter"
+                )
+        return {tensor._attrs["name"]: self._value(tensor) for tensor in outputs}
+
+    def _bind_dims(self, shape: Sequence[IntVar], values: Sequence[int]) -> None:
+        for dim, value in zip(shape, values):
+            if isinstance(dim, IntImm):
+                if dim.value() != value:
+                    raise ValueError(
+                        f"Expected {dim.value()} for a static dim, got {value}"
+                    )
+            else:
+                self._dims.setdefault(dim._attrs["name"], value)
+
+    def _shape(self, shape: Sequence[IntVar], numel: Optional[int] = None):
+        """Returns the concrete shape, where unknown dims are inferred from
+        numel."""
+        res = []
+        for dim in shape:
+            if isinstance(dim, IntImm):
+                res.append(dim.value())
+            else:
+                res.append(self._dims.get(dim._attrs["name"], -1))
+        if res.count(-1) == 0:
+            return tuple(res)
+        if res.count(-1) > 1 or numel is None:
+            raise RuntimeError(f"Cannot infer the values of dynamic dims in {shape}")
+        known = math.prod(d for d in res if d != -1)
+        res[res.index(-1)] = numel // known if known else 0
+        return tuple(res)
+
+    def _value(self, tensor: Tensor) -> np.ndarray:
+        if tensor in self._values:
+            return self._values[tensor]
+        name = tensor._attrs["name"]
+        dtype = _numpy_dtype(tensor._attrs["dtype"])
+        if tensor._attrs["is_input"]:
+            if name not in self._inputs:
+                raise ValueError(f"Missing input {name}")
+            value = np.asarray(self._inputs[name]).astype(dtype)
+        elif tensor._attrs["data"] is not None:
+            data = tensor._attrs["data"]
+            raw = data.to_bytes()
+            if data.dtype == "bfloat16":
+                bits = np.frombuffer(raw, dtype=np.uint16).astype(np.uint32) << 16
+                value = bits.view(np.float32)
+            else:
+                value = np.frombuffer(raw, dtype=data.dtype).astype(dtype)
+            value = value.reshape(self._shape(tensor._attrs["shape"], value.size))
+        elif name in self._constants:
+            value = np.asarray(self._constants[name]).astype(dtype)
+        elif tensor.is_a_const_num():
+            value = np.asarray(tensor._attrs["value"], dtype=dtype)
+        else:
+            raise RuntimeError(f"Tensor {name} has no value")
+        if value.ndim != len(tensor._attrs["shape"]):
+            raise ValueError(
+                f"Expected {len(tensor._attrs['shape'])} dims for {name}, got "
+                f"shape {value.shape}"
+            )
+        self._bind_dims(tensor._attrs["shape"], value.shape)
+        self._values[tensor] = value
+        return value
+
+    def read(self, op: Operator, idx: int) -> np.ndarray:
+        """Returns the idx-th input of op, through its accessor."""
+        value = self._value(op._attrs["inputs"][idx])
+        accessors = op._attrs.get("input_accessors") or []
+        if idx >= len(accessors):
+            return value
+        accessor = accessors[idx]
+        if accessor.stride_dim is not None:
+            value = value.reshape(-1, accessor.actual_total_elements_from_stride_dim)
+            value = value[
+                :,
+                accessor.offset : accessor.offset
+                + accessor.original_total_elements_from_stride_dim,
+            ]
+        return value.reshape(self._shape(accessor.original_shapes, value.size))
+
+    def write(self, op: Operator, idx: int, value: np.ndarray) -> None:
+        """Sets the idx-th output of op, through its accessor."""
+        tensor = op._attrs["outputs"][idx]
+        value = np.asarray(value).astype(_numpy_dtype(tensor._attrs["dtype"]))
+        accessors = op._attrs.get("output_accessors") or []
+        accessor: Optional[TensorAccessor] = (
+            accessors[idx] if idx < len(accessors) else None
+        )
+        if accessor is not None:
+            self._bind_dims(accessor.original_shapes, value.shape)
+        else:
+            self._bind_dims(tensor._attrs["shape"], value.shape)
+        if accessor is None or accessor.stride_dim is None:
+            self._values[tensor] = value.reshape(
+                self._shape(tensor._attrs["shape"], value.size)
+            )
+            return
+        num_rows = value.size // max(
+            accessor.original_total_elements_from_stride_dim, 1
+        )
+        buf = self.buffer(
+            tensor, num_rows * accessor.actual_total_elements_from_stride_dim
+        )
+        rows = buf.reshape(-1, accessor.actual_total_elements_from_stride_dim)
+        view = rows[
+            :,
+            accessor.offset : accessor.offset
+            + accessor.original_total_elements_from_stride_dim,
+        ]
+        view[...] = value.reshape(view.shape)
+
+    def buffer(self, tensor: Tensor, numel: int) -> np.ndarray:
+        """Returns the value of tensor, which ops write to in parts."""
+        if tensor not in self._values:
+            self._values[tensor] = np.zeros(
+                self._shape(tensor._attrs["shape"], numel),
+                dtype=_numpy_dtype(tensor._attrs["dtype"]),
+            )
+        return self._values[tensor]
+
+    def shape(self, tensor: Tensor):
+        return self._shape(tensor._attrs["shape"])
+
+
+def _schedule(outputs: List[Tensor]) -> List[Operator]:
+    """Returns the ops the outputs depend on, in dependency order. The graph
+    does not need to be sorted, and ops which were removed from it, but are
+    still referenced by stale tensors, are not visited."""
+    ops = []
+    visited = set()
+    stack = [(tensor, False) for tensor in reversed(outputs)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            if isinstance(node, Operator):
+                ops.append(node)
+            continue
+        if node in visited:
+            continue
+        visited.add(node)
+        stack.append((node, True))
+        if isinstance(node, Operator):
+            children = node._attrs["inputs"]
+        elif isinstance(node, IntVarTensor):
+            children = []
+        else:
+            children = node._attrs["src_ops"]
+        for child in children:
+            if child not in visited:
+                stack.append((child, False))
+    return ops
+
+
+@_kernel("elementwise")
+def _elementwise(interp: _Interpreter, op: Operator) -> None:
+    args = [interp._value(arg) for arg in op._attrs["args"]]
+    interp.write(op, 0, _apply_func(op._attrs["func"], *args))
+
+
+@_kernel("fused_elementwise")
+def _fused_elementwise(interp: _Interpreter, op: Operator) -> None:
+    env = {
+        tensor: interp.read(op, i)
+        for i, tensor in enumerate(op._attrs["original_inputs"])
+    }
+
+    def arg_value(tensor):
+        if tensor.is_a_const_num():
+            return np.float32(tensor._attrs["value"])
+        return env[tensor]
+
+    pending = list(op._attrs["elementwise_ops"])
+    while pending:
+        ready = [
+            elementwise
+            for elementwise in pending
+            if all(
+                arg.is_a_const_num() or arg in env for arg in elementwise._attrs["args"]
+            )
+        ]
+        if not ready:
+            raise RuntimeError(f"Cyclic elementwise ops in {op._attrs['name']}")
+        for elementwise in ready:
+            args = [arg_value(arg) for arg in elementwise._attrs["args"]]
+            env[elementwise._attrs["outputs"][0]] = _apply_func(
+                elementwise._attrs["func"], *args
+            )
+            pending.remove(elementwise)
+    for i, tensor in enumerate(op._attrs["original_outputs"]):
+        interp.write(op, i, env[tensor])
+
+
+@_kernel("group_fused_elementwise")
+def _group_fused_elementwise(interp: _Interpreter, op: Operator) -> None:
+    for fused_op in op._attrs["fused_elementwise_ops"]:
+        _fused_elementwise(interp, fused_op)
+
+
+# gemm and bmm ops with row- or column-major A and B, and row-major C,
+# followed by their epilogue, e.g. gemm_rcr_bias_add_relu
+_GEMM_PATTERN = re.compile(r"^(gemm|bmm)_([rc])([rc])r(?:_(\w+))?$")
+
+# Longest first, so that fast_gelu is not parsed as gelu.
+_EPILOGUE_TOKENS = [
+    "elementwise",
+    "fast_gelu",
+    "hardswish",
+    "sigmoid",
+    "softmax",
+    "swish",
+    "bias",
+    "gelu",
+    "relu",
+    "tanh",
+    "add",
+    "mul",
+]
+
+_EPILOGUE_ACTIVATIONS = {
+    "fast_gelu": _fast_gelu,
+    "gelu": _gelu,
+    "hardswish": _hardswish,
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "swish": lambda x: x * _sigmoid(x),
+    "tanh": np.tanh,
+    "softmax": lambda x: _softmax(x, -1),
+}
+
+
+def _parse_epilogue(name: str, epilogue: Optional[str]) -> List[str]:
+    tokens = []
+    while epilogue:
+        for token in _EPILOGUE_TOKENS:
+            if epilogue == token or epilogue.startswith(token + "_"):
+                tokens.append(token)
+                epilogue = epilogue[len(token) + 1 :]
+                break
+        else:
+            raise NotImplementedError(f"Op {name} is not supported by the interpreter")
+    return tokens
+
+
+def _eval_epilogue_expr(expr, leaves: Dict[str, np.ndarray]) -> np.ndarray:
+    if expr.leaf is not None:
+        return leaves[expr.leaf]
+    if expr.func is None:
+        return np.float32(expr.value)
+    args = [_eval_epilogue_expr(arg, leaves) for arg in expr.args]
+    return _apply_func(expr.func, *args)
+
+
+def _gemm(interp: _Interpreter, op: Operator) -> None:
+    name = op._attrs["op"]
+    _, a_layout, b_layout, epilogue = _GEMM_PATTERN.match(name).groups()
+    tokens = _parse_epilogue(name, epilogue)
+    a = interp.read(op, 0)
+    b = interp.read(op, 1)
+    if a_layout == "c":
+        a = np.swapaxes(a, -1, -2)
+    if b_layout == "c":
+        b = np.swapaxes(b, -1, -2)
+    y = np.matmul(a, b) * np.float32(op._attrs.get("alpha", 1.0))
+
+    num_inputs = len(op._attrs["inputs"])
+    next_input = 2
+    for token in tokens:
+        if token in ("bias", "add", "mul"):
+            operand = interp.read(op, next_input)
+            next_input += 1
+            y = y * operand if token == "mul" else y + operand
+        elif token == "elementwise":
+            leaves = {"x": y}
+            for i in range(next_input, num_inputs):
+                leaves[f"d{i - next_input}"] = interp.read(op, i)
+            y = _eval_epilogue_expr(op._attrs["epilogue_expr"], leaves)
+        else:
+            with np.errstate(all="ignore"):
+                y = _EPILOGUE_ACTIVATIONS[token](y)
+    interp.write(op, 0, y)
+
+
+# conv2d ops with NHWC inputs and KRSC weights, followed by their epilogue,
+# e.g. conv2d_bias_add_relu
+_CONV2D_PATTERN = re.compile(
+    r"^conv2d(_bias)?(_add)?(?:_(identity|relu|sigmoid|hardswish))?(_few_channels)?$"
+)
+
+
+def _pair(value) -> Sequence[int]:
+    if isinstance(value, (list, tuple)):
+        return value
+    return (value, value)
+
+
+def _conv2d_nhwc(
+    x: np.ndarray, w: np.ndarray, stride, pad, dilate, group: int
+) -> np.ndarray:
+    stride_h, stride_w = _pair(stride)
+    pad_h, pad_w = _pair(pad)
+    dilate_h, dilate_w = _pair(dilate)
+    k, r, s, _ = w.shape
+    x = np.pad(x, ((0, 0), (pad_h, pad_h), (pad_w, pad_w), (0, 0)))
+    window = ((r - 1) * dilate_h + 1, (s - 1) * dilate_w + 1)
+    # [N, HO, WO, C, window_h, window_w]
+    patches = np.lib.stride_tricks.sliding_window_view(x, window, axis=(1, 2))
+    patches = patches[:, ::stride_h, ::stride_w, :, ::dilate_h, ::dilate_w]
+    c_per_group = x.shape[3] // group
+    k_per_group = k // group
+    outputs = []
+    for g in range(group):
+        c_slice = slice(g * c_per_group, (g + 1) * c_per_group)
+        k_slice = slice(g * k_per_group, (g + 1) * k_per_group)
+        outputs.append(
+            np.einsum(
+                "nhwcrs,krsc->nhwk",
+                patches[:, :, :, c_slice],
+                w[k_slice],
+                optimize=True,
+            )
+        )
+    return np.concatenate(outputs, axis=-1)
+
+
+def _conv2d(interp: _Interpreter, op: Operator) -> None:
+    has_bias, has_add, activation, _ = _CONV2D_PATTERN.match(op._attrs["op"]).groups()
+    x = interp.read(op, 0)
+    w = interp._value(op._attrs["inputs"][1])
+    if w.shape[3] != x.shape[3] // op._attrs["group"]:
+        # few_channels convs pad the input channels
+        x = np.pad(x, ((0, 0), (0, 0), (0, 0), (0, w.shape[3] - x.shape[3])))
+    y = _conv2d_nhwc(
+        x,
+        w,
+        op._attrs["stride"],
+        op._attrs["pad"],
+        op._attrs["dilate"],
+        op._attrs["group"],
+    )
+    if has_bias:
+        y = y + interp._value(op._attrs["inputs"][2])
+    if has_add:
+        y = y + interp._value(op._attrs["inputs"][3])
+    if activation is not None and activation != "identity":
+        y = _EPILOGUE_ACTIVATIONS[activation](y)
+    interp.write(op, 0, y)
+
+
+@_kernel("softmax")
+def _softmax_op(interp: _Interpreter, op: Operator) -> None:
+    interp.write(op, 0, _softmax(interp.read(op, 0), op._attrs["dim"]))
+
+
+def _layernorm_value(interp: _Interpreter, op: Operator) -> np.ndarray:
+    x = interp.read(op, 0)
+    axes = tuple(range(-len(op._attrs["normalized_shape"]), 0))
+    mean = np.mean(x, axis=axes, keepdims=True)
+    var = np.var(x, axis=axes, keepdims=True)
+    y = (x - mean) / np.sqrt(var + np.float32(op._attrs["eps"]))
+    next_input = 1
+    if op._attrs["gamma_constant"] is None:
+        y = y * interp._value(op._attrs["inputs"][next_input])
+        next_input += 1
+    else:
+        y = y * np.float32(op._attrs["gamma_constant"])
+    if op._attrs["beta_constant"] is None:
+        y = y + interp._value(op._attrs["inputs"][next_input])
+    else:
+        y = y + np.float32(op._attrs["beta_constant"])
+    return y
+
+
+@_kernel("layernorm")
+def _layernorm(interp: _Interpreter, op: Operator) -> None:
+    interp.write(op, 0, _layernorm_value(interp, op))
+
+
+@_kernel("layernorm_sigmoid_mul")
+def _layernorm_sigmoid_mul(interp: _Interpreter, op: Operator) -> None:
+    y = _sigmoid(_layernorm_value(interp, op))
+    interp.write(op, 0, y * interp.read(op, 0))
+
+
+@_kernel("reduce_sum", "reduce_mean", "var", "vector_norm")
+def _reduce(interp: _Interpreter, op: Operator) -> None:
+    name = op._attrs["op"]
+    x = interp.read(op, 0)
+    axis = tuple(op._attrs["reduction_axes"])
+    keepdims = op._attrs["keepdim"]
+    if name == "reduce_sum":
+        y = np.sum(x, axis=axis, keepdims=keepdims)
+    elif name == "reduce_mean":
+        y = np.mean(x, axis=axis, keepdims=keepdims)
+    elif name == "var":
+        ddof = 1 if op._attrs["unbiased"] else 0
+        with np.errstate(all="ignore"):
+            y = np.var(x, axis=axis, keepdims=keepdims, ddof=ddof)
+    else:
+        ord_kind = float(op._attrs["ord_kind"])
+        y = np.linalg.norm(x, ord=ord_kind, axis=axis[0], keepdims=keepdims)
+    interp.write(op, 0, y)
+
+
+@_kernel("reshape", "flatten", "squeeze", "unsqueeze")
+def _view(interp: _Interpreter, op: Operator) -> None:
+    x = interp.read(op, 0)
+    output = op._attrs["outputs"][0]
+    interp.write(op, 0, x.reshape(interp._shape(output._attrs["shape"], x.size)))
+
+
+@_kernel("permute021", "permute102", "permute210")
+def _permute(interp: _Interpreter, op: Operator) -> None:
+    axes = [int(i) for i in op._attrs["op"][len("permute") :]]
+    interp.write(op, 0, np.transpose(interp.read(op, 0), axes))
+
+
+@_kernel("concatenate")
+def _concatenate(interp: _Interpreter, op: Operator) -> None:
+    dim = op._attrs["concat_dim"]
+    output = op._attrs["outputs"][0]
+    # Inputs whose mask is False were written to the output by their
+    # producers, see transform_strided_ops.
+    values = {}
+    next_input = 0
+    for tensor, mask in zip(op._attrs["original_inputs"], op._attrs["input_masks"]):
+        if mask:
+            values[tensor] = interp.read(op, next_input)
+            next_input += 1
+    shapes = [
+        values[tensor].shape if tensor in values else interp.shape(tensor)
+        for tensor in op._attrs["original_inputs"]
+    ]
+    out_shape = list(shapes[0])
+    out_shape[dim] = sum(shape[dim] for shape in shapes)
+    buf = interp.buffer(output, math.prod(out_shape))
+    offset = 0
+    for tensor, shape in zip(op._attrs["original_inputs"], shapes):
+        if tensor in values:
+            index = [slice(None)] * buf.ndim
+            index[dim] = slice(offset, offset + shape[dim])
+            buf[tuple(index)] = values[tensor]
+        offset += shape[dim]
+
+
+@_kernel("split")
+def _split(interp: _Interpreter, op: Operator) -> None:
+    x = interp.read(op, 0)
+    indices = np.cumsum(op._attrs["split_sizes"])[:-1]
+    for i, y in enumerate(np.split(x, indices, axis=op._attrs["split_dim"])):
+        interp.write(op, i, y)
+
+
+@_kernel("dynamic_slice")
+def _dynamic_slice(interp: _Interpreter, op: Operator) -> None:
+    x = interp.read(op, 0)
+    index = tuple(
+        slice(start, end)
+        for start, end in zip(op._attrs["start_indices"], op._attrs["end_indices"])
+    )
+    interp.write(op, 0, x[index])
+
+
+def run_graph(
+    graph: List[Tensor],
+    inputs: Dict[str, np.ndarray],
+    constants: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, np.ndarray]:
+    """Runs a graph with NumPy.
+
+    Parameters
+    ----------
+    graph : List[Tensor]
+        The tensors of the graph, e.g. the sorted graph of a pass. Only the
+        outputs are used, and the ops they depend on are run in dependency
+        order, so the graph does not need to be sorted.
+    inputs : Dict[str, np.ndarray]
+        Values of the inputs, by name.
+    constants : Dict[str, np.ndarray], optional
+        Values of the constants which are not bound to data, by name.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Values of the outputs, by name. Floating-point outputs are float32.
+    """
+    return _Interpreter(inputs, constants or {}).run(graph)
+
+
+class PassChecker:
+    """Checks that graph passes keep the outputs of a graph, when called after
+    each pass, e.g. with optimize_graph(..., after_pass=checker).
+
+    The reference outputs are computed when the checker is created, so it
+    must be created before the passes run.
+    """
+
+    def __init__(
+        self,
+        graph: List[Tensor],
+        inputs: Dict[str, np.ndarray],
+        constants: Optional[Dict[str, np.ndarray]] = None,
+        rtol: float = 1e-4,
+        atol: float = 1e-4,
+    ) -> None:
+        self._inputs = inputs
+        self._constants = constants
+        self._rtol = rtol
+        self._atol = atol
+        self.reference = run_graph(graph, inputs, constants)
+        # names of the passes checked so far
+        self.passes: List[str] = []
+
+    def __call__(self, pass_name: str, graph: List[Tensor]) -> None:
+        outputs = run_graph(graph, self._inputs, self._constants)
+        if outputs.keys() != self.reference.keys():
+            raise AssertionError(
+                f"Pass {pass_name} changed the outputs of the graph from "
+                f"{sorted(self.reference)} to {sorted(outputs)}"
+            )
+        for name, expected in self.reference.items():
+            try:
+                np.testing.assert_allclose(
+                    outputs[name], expected, rtol=self._rtol, atol=self._atol
+                )
+            except AssertionError as e:
+                raise AssertionError(
+                    f"Pass {pass_name} changed the value of output {name}: {e}"
+                ) from e
+        self.passes.append(pass_name)
@@ -0,0 +1,503 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Build the runtime (Model, ModelContainer and model_interface) on the host,
+against static/include/host_device_functions.h, so that the runtime and its
+Python bindings can be tested and benchmarked without a GPU.
+
+The model is a chain of host kernels, each of which adds a bias constant to
+its input, i.e. y = x + num_kernels * bias for an input x of shape
+[batch, hidden] with a dynamic batch. The model sources are rendered from the
+same templates as compiled models.
+
+The model may also have unbound constants c_0, c_1, ... of shape [hidden],
+which have to be set with Model.set_constant. Kernel i adds c_i instead of
+bias if it exists.
+
+With profile_ops, the kernels can be timed with Model.profile_ops; kernel i is
+the op host_add_bias_i.
+
+With a weight_store, the bias is stored in it instead of the library, and must
+be bound with Model.set_shared_weights.
+"""
+import os
+import shutil
+import subprocess
+from typing import Dict, List, Optional
+
+import jinja2
+import numpy as np
+
+from ..backend.codegen import dtype_to_enumerator, set_value
+from ..backend.main_templates import MODEL_CONTAINER_TEMPLATE, MODEL_TEMPLATE
+from ..backend.target import AIT_STATIC_FILES_PATH
+from ..compiler.weight_store import WeightStore
+from ..utils import logger
+
+KERNEL_NAME = "host_add_bias"
+
+KERNEL_DECL = f"""
+void {KERNEL_NAME}(
+  const float*,
+  const float*,
+  float*,
+  int64_t*,
+  int64_t,
+  ait::StreamType
+);
+"""
+
+KERNEL_SRC = f"""
+#include <cstdint>
+#include "device_functions-generated.h"
+
+void {KERNEL_NAME}(
+    const float* input,
+    const float* bias,
+    float* output,
+    int64_t* batch,
+    int64_t hidden,
+    ait::StreamType stream) {{
+  ait::LaunchHostKernel(stream, [=]() {{
+    for (int64_t i = 0; i < *batch; ++i) {{
+      for (int64_t j = 0; j < hidden; ++j) {{
+        output[i * hidden + j] = input[i * hidden + j] + bias[j];
+      }}
+    }}
+  }});
+}}
+"""
+
+KERNEL_CALL_TEMPLATE = jinja2.Template(
+    """
+{{indent}}{{func_name}}(
+{{indent}}    {{input}},
+{{indent}}    {{bias}},
+{{indent}}    {{output}},
+{{indent}}    &batch,
+{{indent}}    hidden,
+{{indent}}    stream
+{{indent}});
+"""
+)
+
+DTYPE = "float32"
+ITEMSIZE = 4
+
+
+def _tensor_slice(name: str, blob_name: str, offset: int, indent="    ") -> str:
+    ptr = f"{blob_name} + {offset}"
+    return f"{indent}{name} = reinterpret_cast<decltype({name})>({ptr});"
+
+
+def _ptr_decl(name: str) -> str:
+    return f"   float* {name} {{nullptr}};"
+
+
+def _var_decl(name: str, value: int = 0) -> str:
+    return f"   int64_t {name} {{ {value} }};"
+
+
+def gen_host_model_sources(
+    num_kernels: int,
+    hidden: int,
+    max_batch: int,
+    num_unbound_constants: int = 0,
+    profile_ops: bool = False,
+    weight_store: Optional[WeightStore] = None,
+) -> Dict[str, str]:
+    """Renders the sources of the host model.
+
+    Parameters
+    ----------
+    num_kernels : int
+        Number of kernels in the chain, must be positive
+    hidden : int
+        Static dim of the input and output
+    max_batch : int
+        Upper bound of the dynamic batch dim
+    num_unbound_constants : int, optional
+        Number of unbound constants, by default 0
+    profile_ops : bool, optional
+        Whether the kernels can be profiled, by default False
+    weight_store : Optional[WeightStore], optional
+        Store the bias in this weight store, by default None
+
+    Returns
+    -------
+    Dict[str, str]
+        Map from file name to contents, in the layout of compiled models.
+    """
+    if num_kernels <= 0:
+        raise ValueError(f"num_kernels must be positive, but got {num_kernels}")
+    tensor_bytes = max_batch * hidden * ITEMSIZE
+    intermediates = [f"t_{i}" for i in range(num_kernels - 1)]
+    names = ["x"] + intermediates + ["y"]
+
+    constants = [f"c_{i}" for i in range(num_unbound_constants)]
+    func_seq = [
+        KERNEL_CALL_TEMPLATE.render(
+            func_name=KERNEL_NAME,
+            input=src,
+            output=dst,
+            bias=constants[i] if i < num_unbound_constants else "bias",
+            indent="    ",
+        )
+        for i, (src, dst) in enumerate(zip(names[:-1], names[1:]))
+    ]
+    # intermediates alternate between two slices of the blob
+    tensor_slice = [
+        _tensor_slice(name, "blob_ptr", (i % 2) * tensor_bytes)
+        for i, name in enumerate(intermediates)
+    ]
+    set_inputs = [
+        set_value(name, f"static_cast<decltype({name})>(params[{idx}].ptr)")
+        for idx, name in enumerate(["x", "y"])
+    ]
+    set_inputs += [
+        f"    if ({name} == nullptr) {{\n"
+        f'      throw std::runtime_error("Constant {name} was not set!");\n'
+        "    }"
+        for name in constants
+    ]
+    bias_bytes = hidden * ITEMSIZE
+    if weight_store is None:
+        set_up_constants = [_tensor_slice("bias", "constants", 0)]
+        set_up_shared_weights = []
+        owned_constants = [f'ConstantInfo{{"bias", 0, 0, {bias_bytes}}}']
+        shared_weights_size = 0
+    else:
+        offset = weight_store.add("bias", np.ones(hidden, dtype=DTYPE).tobytes())
+        weight_store.save()
+        set_up_constants = []
+        set_up_shared_weights = [_tensor_slice("bias", "shared_weights", offset)]
+        owned_constants = []
+        shared_weights_size = offset + bias_bytes
+    set_up_constants += [
+        set_value(
+            f'constant_name_to_ptr_["{name}"]',
+            f"const_cast<const void**>(reinterpret_cast<void**>(&{name}))",
+        )
+        for name in constants
+    ]
+    param_names = ["x", "y"] + constants
+    max_param_shapes = [f"{{{max_batch}, {hidden}}}"] * 2
+    max_param_shapes += [f"{{{hidden}}}"] * num_unbound_constants
+    param_dims = [
+        f"ParamDim(1, {max_batch}, &batch)",
+        f"ParamDim({hidden}, {hidden}, &hidden)",
+    ]
+    param_shape = f"{{{', '.join(param_dims)}}}"
+    op_infos = []
+    if profile_ops:
+        op_infos = [(f"{KERNEL_NAME}_{i}", KERNEL_NAME) for i in range(num_kernels)]
+    model_def = MODEL_TEMPLATE.render(
+        function_decl=KERNEL_DECL,
+        set_inputs="\n".join(set_inputs),
+        tensor_slice="\n".join(tensor_slice),
+        tensor_map_set="",
+        set_up_constants="\n".join(set_up_constants),
+        device_to_device_copies="",
+        set_up_param_dynamic_shapes="\n".join(
+            set_value(f"params[{idx}].shape_ptrs", param_shape) for idx in range(2)
+        ),
+        function_seq=func_seq,
+        set_up_shared_weights="\n".join(set_up_shared_weights),
+        tensor_decl="\n".join(_ptr_decl(name) for name in ["bias"] + constants + names),
+        dim_decl="\n".join([_var_decl("batch"), _var_decl("hidden", hidden)]),
+        function_state="",
+        target_has_graph_mode="true",
+        unique_workspace_size=0,
+        profile_ops=profile_ops,
+        op_infos=op_infos,
+    )
+
+    model_container_base = MODEL_CONTAINER_TEMPLATE.render(
+        blob_size=2 * tensor_bytes,
+        workspace_size=0,
+        num_inputs=1,
+        num_outputs=1,
+        param_size=bias_bytes if weight_store is None else 0,
+        shared_weights_size=shared_weights_size,
+        set_up_constant_names="\n".join(
+            set_value(f'unbound_constant_name_to_idx_["{name}"]', idx)
+            for idx, name in enumerate(constants)
+        ),
+        set_up_param_dtypes="\n".join(
+            set_value(f"param_dtypes_[{idx}]", dtype_to_enumerator(DTYPE))
+            for idx in range(len(param_names))
+        ),
+        set_up_output_shapes="\n".join(
+            set_value(f"max_param_shapes_[{idx}]", shape)
+            for idx, shape in enumerate(max_param_shapes)
+        ),
+        set_up_param_names="\n".join(
+            set_value(f"param_names_[{idx}]", f'"{name}"')
+            for idx, name in enumerate(param_names)
+        ),
+        num_constants=len(owned_constants),
+        num_unbound_constants=num_unbound_constants,
+        owned_constants_init=",".join(owned_constants),
+    )
+    return {
+        "device_functions-generated.h": '#include "host_device_functions.h"',
+        "model-generated.h": model_def,
+        "model_container_base.cpp": model_container_base,
+        "host_kernels.cpp": KERNEL_SRC,
+    }
+
+
+def _run(cmd: List[str], cwd: str) -> None:
+    logger.debug(__name__, " ".join(cmd))
+    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stderr}")
+
+
+_OPTIONS = ["-std=c++17", "-O2", "-fPIC", "-fvisibility=hidden"]
+_LINK_OPTIONS = ["-Wl,-z,noexecstack", "-lpthread"]
+
+
+def _build_objs(
+    workdir: str,
+    num_kernels: int,
+    hidden: int,
+    max_batch: int,
+    num_unbound_constants: int,
+    cc: str,
+    profile_ops: bool = False,
+    weight_store: Optional[WeightStore] = None,
+) -> List[str]:
+    if shutil.which(cc) is None:
+        raise RuntimeError(f"Can't build the host model, {cc} is not available")
+    os.makedirs(workdir, exist_ok=True)
+    sources = []
+    for fname, contents in gen_host_model_sources(
+        num_kernels,
+        hidden,
+        max_batch,
+        num_unbound_constants,
+        profile_ops,
+        weight_store,
+    ).items():
+        with open(os.path.join(workdir, fname), "w") as f:
+            f.write(contents)
+        if fname.endswith(".cpp"):
+            sources.append(fname)
+    csrc = os.path.join(AIT_STATIC_FILES_PATH, "csrc")
+    sources += [
+        os.path.join(csrc, fname)
+        for fname in ("model_container.cpp", "model_interface.cpp", "utility.cpp")
+    ]
+
+    # constants are linked into the library, as in compiled models
+    bias = np.ones(hidden if weight_store is None else 0, dtype=DTYPE)
+    bias.tofile(os.path.join(workdir, "constants.bin"))
+    _run(["ld", "-r", "-b", "binary", "-o", "constants.obj", "constants.bin"], workdir)
+
+    includes = ["-I" + os.path.join(AIT_STATIC_FILES_PATH, "include"), "-I."]
+    objs = ["constants.obj"]
+    for src in sources:
+        obj = os.path.splitext(os.path.basename(src))[0] + ".obj"
+        _run([cc] + _OPTIONS + includes + ["-c", "-o", obj, src], workdir)
+        objs.append(obj)
+    return objs
+
+
+def build_host_model(
+    workdir: str,
+    num_kernels: int = 8,
+    hidden: int = 256,
+    max_batch: int = 64,
+    num_unbound_constants: int = 0,
+    cc: str = "g++",
+    profile_ops: bool = False,
+    weight_store: Optional[WeightStore] = None,
+) -> str:
+    """Builds the host model into workdir/host_model.so, which can be loaded
+    with aitemplate.compiler.Model. All bias values are 1.
+
+    Parameters
+    ----------
+    workdir : str
+        Directory of the sources and the library
+    num_kernels : int, optional
+        Number of kernels in the chain, by default 8
+    hidden : int, optional
+        Static dim of the input and output, by default 256
+    max_batch : int, optional
+        Upper bound of the dynamic batch dim, by default 64
+    num_unbound_constants : int, optional
+        Number of unbound constants c_0, c_1, ..., by default 0
+    cc : str, optional
+        C++ compiler, by default g++
+    profile_ops : bool, optional
+        Whether the kernels can be profiled with Model.profile_ops, by
+        default False
+    weight_store : Optional[WeightStore], optional
+        Store the bias in this weight store instead of the library, by default
+        None
+
+    Returns
+    -------
+    str
+        Path of the library
+    """
+    objs = _build_objs(
+        workdir,
+        num_kernels,
+        hidden,
+        max_batch,
+        num_unbound_constants,
+        cc,
+        profile_ops,
+        weight_store,
+    )
+    link_options = ["-shared", "-o", "host_model.so"] + _LINK_OPTIONS
+    _run([cc] + _OPTIONS + objs + link_options, workdir)
+    return os.path.join(workdir, "host_model.so")
+
+
+POOL_BENCHMARK_TEMPLATE = jinja2.Template(
+    """
+#include <atomic>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <memory>
+#include <thread>
+#include <vector>
+
+#include "model_container.h"
+
+// Usage: pool_benchmark num_runtimes num_threads count caller_affinity
+// Every thread calls ModelContainer::Run count times with batch 1.
+int main(int argc, char** argv) {
+  if (argc != 5) {
+    std::fprintf(stderr, "Expected 4 arguments, got %d\\n", argc - 1);
+    return 1;
+  }
+  const size_t num_runtimes = std::strtoul(argv[1], nullptr, 10);
+  const size_t num_threads = std::strtoul(argv[2], nullptr, 10);
+  const size_t count = std::strtoul(argv[3], nullptr, 10);
+  std::unique_ptr<ait::ModelContainer> container(
+      ait::CreateModelContainer(num_runtimes));
+  container->SetCallerAffinity(std::atoi(argv[4]) != 0);
+
+  std::atomic<bool> start{false};
+  auto thread_func = [&]() {
+    std::vector<float> x({{hidden}}, 1.f);
+    std::vector<float> y({{hidden}}, 0.f);
+    const int64_t shape[] = {1, {{hidden}}};
+    AITData input(x.data(), {shape, 2}, AITemplateDtype::kFloat);
+    AITData output(y.data(), {shape, 2}, AITemplateDtype::kFloat);
+    while (!start.load()) {
+      std::this_thread::yield();
+    }
+    for (size_t i = 0; i < count; ++i) {
+      container->Run(
+          &input,
+          1,
+          &output,
+          1,
+          /*stream=*/nullptr,
+          /*sync=*/true,
+          /*graph_mode=*/false,
+          /*output_shapes_out=*/nullptr);
+    }
+  };
+
+  std::vector<std::thread> threads;
+  for (size_t i = 0; i < num_threads; ++i) {
+    threads.emplace_back(thread_func);
+  }
+  auto begin = std::chrono::steady_clock::now();
+  start = true;
+  for (auto& thread : threads) {
+    thread.join();
+  }
+  std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - begin;
+  std::printf("%.1f\\n", num_threads * count / elapsed.count());
+  return 0;
+}
+"""
+)
+
+
+def build_pool_benchmark(
+    workdir: str, num_kernels: int = 8, hidden: int = 256, cc: str = "g++"
+) -> str:
+    """Builds workdir/pool_benchmark, an executable which measures the
+    throughput of ModelContainer::Run on the host model when called from
+    several threads, see run_pool_benchmark.
+
+    Parameters
+    ----------
+    workdir : str
+        Directory of the sources and the executable
+    num_kernels : int, optional
+        Number of kernels in the chain, by default 8
+    hidden : int, optional
+        Static dim of the input and output, by default 256
+    cc : str, optional
+        C++ compiler, by default g++
+
+    Returns
+    -------
+    str
+        Path of the executable
+    """
+    objs = _build_objs(workdir, num_kernels, hidden, 1, 0, cc)
+    with open(os.path.join(workdir, "pool_benchmark.cpp"), "w") as f:
+        f.write(POOL_BENCHMARK_TEMPLATE.render(hidden=hidden))
+    includes = ["-I" + os.path.join(AIT_STATIC_FILES_PATH, "include"), "-I."]
+    cmd = [cc] + _OPTIONS + includes + ["-o", "pool_benchmark", "pool_benchmark.cpp"]
+    _run(cmd + objs + _LINK_OPTIONS, workdir)
+    return os.path.join(workdir, "pool_benchmark")
+
+
+def run_pool_benchmark(
+    path: str,
+    num_runtimes: int,
+    num_threads: int,
+    count: int = 10000,
+    caller_affinity: bool = False,
+) -> float:
+    """Runs the executable built by build_pool_benchmark.
+
+    Parameters
+    ----------
+    path : str
+        Path of the executable
+    num_runtimes : int
+        Number of runtimes of the ModelContainer
+    num_threads : int
+        Number of threads calling Run concurrently
+    count : int, optional
+        Number of runs per thread, by default 10000
+    caller_affinity : bool, optional
+        See Model.set_caller_affinity, by default False
+
+    Returns
+    -------
+    float
+        Runs per second, over all threads
+    """
+    args = [path] + [str(arg) for arg in (num_runtimes, num_threads, count)]
+    args.append("1" if caller_affinity else "0")
+    result = subprocess.run(args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1])
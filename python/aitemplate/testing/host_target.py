@@ -0,0 +1,44 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+A host-only target for unit tests which run graph passes, generate code or
+run profilers without a GPU.
+"""
+from ..backend.target import Target
+
+
+class HostTarget(Target):
+    """A CUDA target without a GPU or a CUDA toolchain. It is enough to run
+    graph passes and to generate code, but not to build it.
+
+    kwargs are the target kwargs, e.g. weight_only_int8=True.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(static_files_path="")
+        self._target_type = 1
+        self._arch = "80"
+        self._kwargs = kwargs
+
+    def name(self):
+        return "cuda"
+
+    def dev_select_flag(self):
+        return "CUDA_VISIBLE_DEVICES"
+
+
+def host_target(**kwargs) -> HostTarget:
+    """Returns a HostTarget, to enter with a with statement."""
+    return HostTarget(**kwargs)
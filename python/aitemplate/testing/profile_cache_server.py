@@ -0,0 +1,92 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+A minimal in-memory remote profile store, which serves the requests of
+aitemplate.backend.remote_profile_cache.RemoteProfileCache, for tests.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+from ..backend.profiler_cache import is_faster_record
+
+# pylint: disable=C0103,W0622
+
+
+class _ProfileCacheRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length).decode("utf-8"))
+        server = self.server
+        with server.lock:
+            if self.path.endswith("/lookup"):
+                server.num_lookups += 1
+                records = {
+                    key: server.records[key]
+                    for key in payload["keys"]
+                    if key in server.records
+                }
+                response = {"records": records}
+            elif self.path.endswith("/records"):
+                stored = 0
+                for key, record in payload["records"].items():
+                    old = server.records.get(key, None)
+                    if old is None or is_faster_record(record, old):
+                        server.records[key] = record
+                        stored += 1
+                response = {"stored": stored}
+            else:
+                self.send_error(404)
+                return
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class ProfileCacheServer(ThreadingHTTPServer):
+    """A minimal in-memory remote profile store.
+
+    Conflicting records of the same key keep the fastest duration.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), _ProfileCacheRequestHandler)
+        self.lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.num_lookups = 0
+        self._thread = None
+
+    @property
+    def uri(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        """Serves requests in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
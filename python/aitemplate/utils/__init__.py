@@ -16,9 +16,11 @@
 # flake8: noqa
 
 from . import (
+    compile_profiler,
     graph_utils,
     logger,
     markdown_table,
+    quantization,
     shape_utils,
     tensor_utils,
     torch_utils,
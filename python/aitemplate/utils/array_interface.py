@@ -0,0 +1,340 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Functions for working with arrays of other frameworks (CuPy, JAX, PyTorch,
+NumPy, ...) without copies, through DLPack, __cuda_array_interface__ or
+__array_interface__. None of these frameworks is a dependency.
+"""
+import ctypes
+import enum
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class DLDeviceType(enum.IntEnum):
+    """Device types of DLPack, see dlpack.h."""
+
+    CPU = 1
+    CUDA = 2
+    CUDA_HOST = 3
+    ROCM = 10
+    ROCM_HOST = 11
+    CUDA_MANAGED = 13
+
+
+# Memory which can't be accessed by kernels.
+HOST_DEVICE_TYPES = (DLDeviceType.CPU,)
+
+
+class ArrayInfo(NamedTuple):
+    """
+    The memory of an array: its address, shape and dtype, and the DLPack
+    device it lives on.
+    """
+
+    data_ptr: int
+    shape: List[int]
+    dtype: str
+    device_type: int
+    device_id: int
+    readonly: bool = False
+
+    @property
+    def on_host(self) -> bool:
+        return self.device_type in HOST_DEVICE_TYPES
+
+
+class _DLDevice(ctypes.Structure):
+    _fields_ = [("device_type", ctypes.c_int), ("device_id", ctypes.c_int)]
+
+
+class _DLDataType(ctypes.Structure):
+    _fields_ = [
+        ("code", ctypes.c_uint8),
+        ("bits", ctypes.c_uint8),
+        ("lanes", ctypes.c_uint16),
+    ]
+
+
+class _DLTensor(ctypes.Structure):
+    _fields_ = [
+        ("data", ctypes.c_void_p),
+        ("device", _DLDevice),
+        ("ndim", ctypes.c_int),
+        ("dtype", _DLDataType),
+        ("shape", ctypes.POINTER(ctypes.c_int64)),
+        ("strides", ctypes.POINTER(ctypes.c_int64)),
+        ("byte_offset", ctypes.c_uint64),
+    ]
+
+
+_DLManagedTensorDeleter = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+
+
+class _DLManagedTensor(ctypes.Structure):
+    _fields_ = [
+        ("dl_tensor", _DLTensor),
+        ("manager_ctx", ctypes.c_void_p),
+        ("deleter", _DLManagedTensorDeleter),
+    ]
+
+
+# (type code, bits) of DLDataType
+_DLPACK_DTYPES: Dict[Tuple[int, int], str] = {
+    (2, 16): "float16",
+    (4, 16): "bfloat16",
+    (2, 32): "float32",
+    (0, 32): "int32",
+    (0, 64): "int64",
+    (0, 8): "int8",
+}
+_DTYPE_TO_DLPACK = {dtype: code_bits for code_bits, dtype in _DLPACK_DTYPES.items()}
+
+# typestr of the array interfaces, without the byte order
+_TYPESTR_DTYPES: Dict[str, str] = {
+    "f2": "float16",
+    "f4": "float32",
+    "i4": "int32",
+    "i8": "int64",
+    "i1": "int8",
+}
+_DTYPE_TO_TYPESTR = {dtype: "<" + typestr for typestr, dtype in _TYPESTR_DTYPES.items()}
+_DTYPE_TO_TYPESTR["int8"] = "|i1"
+
+_DLTENSOR_NAME = b"dltensor"
+
+_PyCapsule_Destructor = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+_PyCapsule_New = ctypes.PYFUNCTYPE(
+    ctypes.py_object, ctypes.c_void_p, ctypes.c_char_p, _PyCapsule_Destructor
+)(("PyCapsule_New", ctypes.pythonapi))
+_PyCapsule_GetPointer = ctypes.PYFUNCTYPE(
+    ctypes.c_void_p, ctypes.py_object, ctypes.c_char_p
+)(("PyCapsule_GetPointer", ctypes.pythonapi))
+# for the capsule destructor, which gets a borrowed PyObject*
+_PyCapsule_IsValidRaw = ctypes.PYFUNCTYPE(
+    ctypes.c_int, ctypes.c_void_p, ctypes.c_char_p
+)(("PyCapsule_IsValid", ctypes.pythonapi))
+_PyCapsule_GetPointerRaw = ctypes.PYFUNCTYPE(
+    ctypes.c_void_p, ctypes.c_void_p, ctypes.c_char_p
+)(("PyCapsule_GetPointer", ctypes.pythonapi))
+
+
+def _is_c_contiguous(shape: List[int], strides: Optional[List[int]], itemsize: int):
+    if strides is None:
+        return True
+    expected = itemsize
+    for dim, stride in reversed(list(zip(shape, strides))):
+        # strides of size 1 dims don't matter
+        if dim != 1 and stride != expected:
+            return False
+        expected *= dim
+    return True
+
+
+def _info_from_interface(interface: Dict[str, Any], device_type: int) -> ArrayInfo:
+    typestr = interface["typestr"]
+    dtype = _TYPESTR_DTYPES.get(typestr[1:])
+    if dtype is None or typestr[0] == ">":
+        raise ValueError(f"Got unsupported array typestr {typestr}")
+    if interface.get("mask") is not None:
+        raise ValueError("Masked arrays are not supported")
+    shape = list(interface["shape"])
+    if not _is_c_contiguous(shape, interface.get("strides"), int(typestr[2:])):
+        raise ValueError("Array must be contiguous")
+    data_ptr, readonly = interface["data"]
+    return ArrayInfo(data_ptr or 0, shape, dtype, device_type, 0, readonly)
+
+
+def _info_from_dlpack(obj: Any, stream: Optional[int]) -> ArrayInfo:
+    if stream is None:
+        capsule = obj.__dlpack__()
+    else:
+        capsule = obj.__dlpack__(stream=stream)
+    # The capsule is not consumed, its destructor gives the tensor back to the
+    # producer. obj keeps the memory alive.
+    managed = _DLManagedTensor.from_address(
+        _PyCapsule_GetPointer(capsule, _DLTENSOR_NAME)
+    )
+    tensor = managed.dl_tensor
+    if tensor.dtype.lanes != 1:
+        raise ValueError("Vectorized DLPack dtypes are not supported")
+    dtype = _DLPACK_DTYPES.get((tensor.dtype.code, tensor.dtype.bits))
+    if dtype is None:
+        raise ValueError(
+            f"Got unsupported DLPack dtype (code={tensor.dtype.code}, "
+            f"bits={tensor.dtype.bits})"
+        )
+    shape = tensor.shape[: tensor.ndim]
+    strides = tensor.strides[: tensor.ndim] if tensor.strides else None
+    if not _is_c_contiguous(shape, strides, 1):
+        # DLPack strides are in elements
+        raise ValueError("Array must be contiguous")
+    return ArrayInfo(
+        (tensor.data or 0) + tensor.byte_offset,
+        shape,
+        dtype,
+        tensor.device.device_type,
+        tensor.device.device_id,
+    )
+
+
+def get_array_info(obj: Any, stream: Optional[int] = None) -> ArrayInfo:
+    """Returns the memory of a contiguous array, which exposes
+    __cuda_array_interface__, __array_interface__ or DLPack, in this order of
+    preference.
+
+    Parameters
+    ----------
+    obj : Any
+        The array, e.g. a CuPy, JAX, PyTorch or NumPy array
+    stream : Optional[int], optional
+        Stream the array will be used on, which is passed to __dlpack__ if it
+        is not None, by default None
+
+    Returns
+    -------
+    ArrayInfo
+        The memory of the array. It is only valid while obj is alive.
+    """
+    interface = getattr(obj, "__cuda_array_interface__", None)
+    if interface is not None:
+        info = _info_from_interface(interface, DLDeviceType.CUDA)
+        # __cuda_array_interface__ doesn't include the device
+        if hasattr(obj, "__dlpack_device__"):
+            device_type, device_id = obj.__dlpack_device__()
+            info = info._replace(device_type=device_type, device_id=device_id)
+        return info
+    interface = getattr(obj, "__array_interface__", None)
+    if interface is not None:
+        return _info_from_interface(interface, DLDeviceType.CPU)
+    if hasattr(obj, "__dlpack__"):
+        return _info_from_dlpack(obj, stream)
+    raise TypeError(
+        f"{type(obj).__name__} supports neither DLPack, __cuda_array_interface__ "
+        "nor __array_interface__"
+    )
+
+
+# Memory of the DLManagedTensors exported by DLPackArray.__dlpack__ which have
+# not been deleted yet, by address.
+_EXPORTED_TENSORS: Dict[int, Tuple[Any, ...]] = {}
+
+
+@_DLManagedTensorDeleter
+def _delete_managed_tensor(address):
+    _EXPORTED_TENSORS.pop(address, None)
+
+
+@_PyCapsule_Destructor
+def _destroy_capsule(capsule):
+    # only called if the capsule was not consumed
+    if _PyCapsule_IsValidRaw(capsule, _DLTENSOR_NAME):
+        _delete_managed_tensor(_PyCapsule_GetPointerRaw(capsule, _DLTENSOR_NAME))
+
+
+class DLPackArray:
+    """
+    Array in memory owned by someone else, e.g. an output of
+    Model.run_with_arrays, which can be imported by other frameworks without
+    a copy: through DLPack (e.g. torch.from_dlpack, cupy.from_dlpack,
+    jax.dlpack.from_dlpack or numpy.from_dlpack), __cuda_array_interface__
+    if it's on a CUDA device or __array_interface__ if it's on the host.
+
+    owner keeps the memory alive; it's referenced by this array, and by the
+    DLPack tensors exported from it.
+    """
+
+    def __init__(
+        self,
+        data_ptr: int,
+        shape: List[int],
+        dtype: str,
+        device_type: int = DLDeviceType.CUDA,
+        device_id: int = 0,
+        owner: Any = None,
+    ):
+        if dtype not in _DTYPE_TO_DLPACK:
+            raise ValueError(f"Got unsupported dtype {dtype}")
+        self.data_ptr = data_ptr
+        self.shape = list(shape)
+        self.dtype = dtype
+        self.device_type = device_type
+        self.device_id = device_id
+        self.owner = owner
+
+    @classmethod
+    def from_array_info(cls, info: ArrayInfo, owner: Any = None) -> "DLPackArray":
+        return cls(
+            info.data_ptr,
+            info.shape,
+            info.dtype,
+            info.device_type,
+            info.device_id,
+            owner,
+        )
+
+    @property
+    def on_host(self) -> bool:
+        return self.device_type in HOST_DEVICE_TYPES
+
+    def _interface(self) -> Dict[str, Any]:
+        return {
+            "shape": tuple(self.shape),
+            "typestr": _DTYPE_TO_TYPESTR[self.dtype],
+            "data": (self.data_ptr, False),
+            "strides": None,
+            "version": 3,
+        }
+
+    @property
+    def __cuda_array_interface__(self) -> Dict[str, Any]:
+        if self.device_type != DLDeviceType.CUDA or self.dtype == "bfloat16":
+            raise AttributeError("__cuda_array_interface__")
+        return self._interface()
+
+    @property
+    def __array_interface__(self) -> Dict[str, Any]:
+        if not self.on_host or self.dtype == "bfloat16":
+            raise AttributeError("__array_interface__")
+        return self._interface()
+
+    def __dlpack_device__(self) -> Tuple[int, int]:
+        return (int(self.device_type), self.device_id)
+
+    def __dlpack__(self, stream: Optional[int] = None, **kwargs):
+        """
+        Returns a DLPack capsule of this array. Since Model.run_with_arrays
+        synchronizes or runs on the caller's stream, stream is ignored.
+        """
+        ndim = len(self.shape)
+        shape = (ctypes.c_int64 * ndim)(*self.shape)
+        managed = _DLManagedTensor()
+        tensor = managed.dl_tensor
+        tensor.data = self.data_ptr
+        tensor.device = _DLDevice(int(self.device_type), self.device_id)
+        tensor.ndim = ndim
+        code, bits = _DTYPE_TO_DLPACK[self.dtype]
+        tensor.dtype = _DLDataType(code, bits, 1)
+        tensor.shape = shape
+        tensor.byte_offset = 0
+        managed.deleter = _delete_managed_tensor
+        address = ctypes.addressof(managed)
+        _EXPORTED_TENSORS[address] = (managed, shape, self.owner)
+        return _PyCapsule_New(address, _DLTENSOR_NAME, _destroy_capsule)
+
+    def __repr__(self) -> str:
+        return (
+            f"DLPackArray(data_ptr={self.data_ptr:#x}, shape={self.shape}, "
+            f"dtype={self.dtype}, device=({self.device_type}, {self.device_id}))"
+        )
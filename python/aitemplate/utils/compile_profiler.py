@@ -0,0 +1,332 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Compile-time profiler: hierarchical timings and memory usage of compile
+stages and graph passes, and timings of Builder tasks.
+
+The trace is saved in the Chrome trace event format, which can be opened
+in chrome://tracing or https://ui.perfetto.dev.
+"""
+from __future__ import annotations
+
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from . import logger
+from .markdown_table import markdownTable
+
+# pylint: disable=C0103
+
+CURRENT_PROFILER = None
+
+# Chrome trace thread ids: stages run on the main thread, Builder tasks on
+# one lane per builder job.
+_STAGE_TID = 0
+_BUILD_TID_OFFSET = 1
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # peak rss, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _peak_rss_bytes() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class StageRecord:
+    name: str
+    depth: int
+    # seconds since the profiler started
+    start: float
+    end: float = 0.0
+    # rss in bytes at the start and end of the stage
+    start_rss: int = 0
+    end_rss: int = 0
+    # peak rss in bytes of the process at the end of the stage
+    peak_rss: int = 0
+    children_time: float = 0.0
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def self_time(self) -> float:
+        return self.duration - self.children_time
+
+
+@dataclass
+class BuildTaskRecord:
+    name: str
+    # seconds since the profiler started
+    queued: float
+    start: float
+    end: float
+    lane: int = 0
+    cache_hit: bool = False
+    failed: bool = False
+
+    @property
+    def queue_wait(self) -> float:
+        return self.start - self.queued
+
+    @property
+    def compile_time(self) -> float:
+        return self.end - self.start
+
+
+class CompileProfiler:
+    """Collects compile stages and Builder tasks while it is the current
+    profiler, i.e. within its context.
+
+    Example
+    -------
+    .. highlight:: python
+    .. code-block:: python
+
+        with CompileProfiler() as profiler:
+            with compile_profiler.stage("codegen"):
+                ...
+        profiler.save(os.path.join(workdir, "compile_profile.json"))
+        print(profiler.summary_table())
+    """
+
+    def __init__(self) -> None:
+        self._origin = time.time()
+        self._stack: List[StageRecord] = []
+        self.stages: List[StageRecord] = []
+        self.build_tasks: List[BuildTaskRecord] = []
+
+    def __enter__(self) -> CompileProfiler:
+        global CURRENT_PROFILER
+        if CURRENT_PROFILER is not None:
+            raise RuntimeError("CompileProfiler has been set.")
+        CURRENT_PROFILER = self
+        return self
+
+    def __exit__(self, ptype, value, trace) -> None:
+        global CURRENT_PROFILER
+        CURRENT_PROFILER = None
+
+    def _now(self) -> float:
+        return time.time() - self._origin
+
+    @contextmanager
+    def stage(self, name: str, **kwargs):
+        """Records the time and memory usage of a stage. Stages may nest."""
+        record = StageRecord(
+            name=name,
+            depth=len(self._stack),
+            start=self._now(),
+            start_rss=_rss_bytes(),
+            args=kwargs,
+        )
+        self.stages.append(record)
+        self._stack.append(record)
+        try:
+            yield record
+        finally:
+            self._stack.pop()
+            record.end = self._now()
+            record.end_rss = _rss_bytes()
+            record.peak_rss = _peak_rss_bytes()
+            if self._stack:
+                self._stack[-1].children_time += record.duration
+
+    def add_build_task(
+        self,
+        name: str,
+        queued: float,
+        start: float,
+        end: float,
+        lane: int = 0,
+        cache_hit: bool = False,
+        failed: bool = False,
+    ) -> None:
+        """Records a Builder task, given wall clock timestamps as of
+        time.time()."""
+        self.build_tasks.append(
+            BuildTaskRecord(
+                name=name,
+                queued=queued - self._origin,
+                start=start - self._origin,
+                end=end - self._origin,
+                lane=lane,
+                cache_hit=cache_hit,
+                failed=failed,
+            )
+        )
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Returns the trace as a Chrome trace event JSON object."""
+        pid = os.getpid()
+        events = []
+        for record in self.stages:
+            args = {
+                "self_ms": round(record.self_time * 1000, 3),
+                "rss_delta_mb": round((record.end_rss - record.start_rss) / 2**20, 3),
+                "peak_rss_mb": round(record.peak_rss / 2**20, 3),
+            }
+            args.update(record.args)
+            events.append(
+                {
+                    "name": record.name,
+                    "cat": "stage",
+                    "ph": "X",
+                    "ts": record.start * 1e6,
+                    "dur": record.duration * 1e6,
+                    "pid": pid,
+                    "tid": _STAGE_TID,
+                    "args": args,
+                }
+            )
+        for task in self.build_tasks:
+            events.append(
+                {
+                    "name": os.path.basename(task.name),
+                    "cat": "build",
+                    "ph": "X",
+                    "ts": task.start * 1e6,
+                    "dur": task.compile_time * 1e6,
+                    "pid": pid,
+                    "tid": _BUILD_TID_OFFSET + task.lane,
+                    "args": {
+                        "path": task.name,
+                        "queue_wait_ms": round(task.queue_wait * 1000, 3),
+                        "cache_hit": task.cache_hit,
+                        "failed": task.failed,
+                    },
+                }
+            )
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": _STAGE_TID,
+                "args": {"name": "compile stages"},
+            }
+        )
+        for lane in sorted({task.lane for task in self.build_tasks}):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": _BUILD_TID_OFFSET + lane,
+                    "args": {"name": f"builder {lane}"},
+                }
+            )
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "buildSummary": self.build_summary(),
+        }
+
+    def save(self, path: str) -> None:
+        """Saves the trace as a Chrome trace JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+        logger.info(__name__, f"Saved compile profile to {path}")
+
+    def build_summary(self) -> Dict[str, Any]:
+        """Returns aggregate statistics of Builder tasks."""
+        hits = [task for task in self.build_tasks if task.cache_hit]
+        built = [task for task in self.build_tasks if not task.cache_hit]
+        slowest = max(built, key=lambda task: task.compile_time, default=None)
+        return {
+            "num_tasks": len(self.build_tasks),
+            "num_cache_hits": len(hits),
+            "num_failed": sum(task.failed for task in self.build_tasks),
+            "total_compile_sec": round(sum(t.compile_time for t in built), 3),
+            "max_queue_wait_sec": round(
+                max((t.queue_wait for t in built), default=0.0), 3
+            ),
+            "slowest_task": slowest.name if slowest is not None else None,
+            "slowest_task_sec": (
+                round(slowest.compile_time, 3) if slowest is not None else 0.0
+            ),
+        }
+
+    def summary_table(self) -> str:
+        """Returns a markdown table of all stages, indented by nesting
+        level, followed by a summary of Builder tasks."""
+        if not self.stages:
+            return ""
+        rows = [
+            {
+                "stage": ". " * record.depth + record.name,
+                "time (s)": round(record.duration, 3),
+                "self (s)": round(record.self_time, 3),
+                "rss delta (MB)": round(
+                    (record.end_rss - record.start_rss) / 2**20, 1
+                ),
+                "peak rss (MB)": round(record.peak_rss / 2**20, 1),
+            }
+            for record in self.stages
+        ]
+        table = (
+            markdownTable(rows)
+            .setParams(row_sep="markdown", quote=False, float_rounding=None)
+            .getMarkdown()
+        )
+        if not self.build_tasks:
+            return table
+        summary = self.build_summary()
+        return (
+            f"{table}\n\n"
+            f"build tasks: {summary['num_tasks']}, "
+            f"cache hits: {summary['num_cache_hits']}, "
+            f"failed: {summary['num_failed']}, "
+            f"total compile time: {summary['total_compile_sec']}s, "
+            f"max queue wait: {summary['max_queue_wait_sec']}s, "
+            f"slowest: {summary['slowest_task']} "
+            f"({summary['slowest_task_sec']}s)"
+        )
+
+
+def current() -> Optional[CompileProfiler]:
+    """Returns the current CompileProfiler, or None."""
+    return CURRENT_PROFILER
+
+
+@contextmanager
+def stage(name: str, **kwargs):
+    """Records a stage with the current CompileProfiler, if there is one."""
+    if CURRENT_PROFILER is None:
+        yield None
+        return
+    with CURRENT_PROFILER.stage(name, **kwargs) as record:
+        yield record
+
+
+def add_build_task(name: str, queued: float, start: float, end: float, **kwargs):
+    """Records a Builder task with the current CompileProfiler, if there is
+    one. See CompileProfiler.add_build_task()."""
+    if CURRENT_PROFILER is not None:
+        CURRENT_PROFILER.add_build_task(name, queued, start, end, **kwargs)
@@ -15,7 +15,7 @@
 import os
 from typing import Any, List
 
-from aitemplate.utils import logger
+from aitemplate.utils import compile_profiler, logger
 
 
 def get_sorted_ops(tensors) -> List[Any]:
@@ -66,9 +66,10 @@ def dump_graph_debug_str_to_file(tensors, workdir, name):
     prefix = os.path.join(workdir, name)
     graph_path = prefix + "_graph.txt"
     pseudo_code_path = prefix + "_pseudo_code.txt"
-    with open(graph_path, "w") as f:
-        f.write(sorted_graph_debug_str(tensors))
-        logger.info(__file__, f"Dumped {name} graph to {graph_path}")
-    with open(pseudo_code_path, "w") as f:
-        f.write(sorted_graph_pseudo_code(tensors))
-        logger.info(__file__, f"Dumped {name} pseudo code to {pseudo_code_path}")
+    with compile_profiler.stage("dump_graph", graph=name):
+        with open(graph_path, "w") as f:
+            f.write(sorted_graph_debug_str(tensors))
+            logger.info(__file__, f"Dumped {name} graph to {graph_path}")
+        with open(pseudo_code_path, "w") as f:
+            f.write(sorted_graph_pseudo_code(tensors))
+            logger.info(__file__, f"Dumped {name} pseudo code to {pseudo_code_path}")
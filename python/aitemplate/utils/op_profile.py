@@ -0,0 +1,126 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Per-op timings of a model compiled with profile_ops, see Model.profile_ops.
+
+The timeline can be saved in the Chrome trace event format, which can be
+opened in chrome://tracing or https://ui.perfetto.dev.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, NamedTuple
+
+import numpy as np
+
+from . import logger
+
+# pylint: disable=C0103
+
+
+class OpTiming(NamedTuple):
+    """Statistics of the time of one op over all profiled runs."""
+
+    name: str
+    op: str
+    mean_ms: float
+    min_ms: float
+    max_ms: float
+    # share of the summed mean times of all ops
+    fraction: float
+
+
+@dataclass
+class OpProfile:
+    """
+    The timeline of the ops of a model in each profiled run.
+
+    names: the unique name of each op, in launch order.
+    ops: the type of each op, e.g. gemm_rcr_bias.
+    start_ms: [num_runs, num_ops] start of each op, in milliseconds since
+        the first op of the run started.
+    duration_ms: [num_runs, num_ops] time of each op, in milliseconds, until
+        the next op started.
+    """
+
+    names: List[str]
+    ops: List[str]
+    start_ms: np.ndarray
+    duration_ms: np.ndarray
+
+    def summary(self) -> List[OpTiming]:
+        """Returns the statistics of each op, in launch order."""
+        if len(self.duration_ms) == 0:
+            return []
+        means = self.duration_ms.mean(axis=0)
+        total = means.sum()
+        return [
+            OpTiming(
+                name=name,
+                op=op,
+                mean_ms=float(means[i]),
+                min_ms=float(self.duration_ms[:, i].min()),
+                max_ms=float(self.duration_ms[:, i].max()),
+                fraction=float(means[i] / total) if total > 0 else 0.0,
+            )
+            for i, (name, op) in enumerate(zip(self.names, self.ops))
+        ]
+
+    def slowest(self, n: int = 10) -> List[OpTiming]:
+        """Returns the statistics of the n ops with the highest mean time."""
+        return sorted(self.summary(), key=lambda t: t.mean_ms, reverse=True)[:n]
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Returns the timeline as a Chrome trace event JSON object, with the
+        runs laid out one after another."""
+        pid = os.getpid()
+        events = []
+        run_offset_ms = 0.0
+        for run, (starts, durations) in enumerate(zip(self.start_ms, self.duration_ms)):
+            for name, op, start, duration in zip(
+                self.names, self.ops, starts, durations
+            ):
+                events.append(
+                    {
+                        "name": name,
+                        "cat": op,
+                        "ph": "X",
+                        "ts": (run_offset_ms + float(start)) * 1000,
+                        "dur": float(duration) * 1000,
+                        "pid": pid,
+                        "tid": 0,
+                        "args": {"op": op, "run": run},
+                    }
+                )
+            if len(starts) > 0:
+                run_offset_ms += float(starts[-1] + durations[-1])
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": 0,
+                "args": {"name": "model ops"},
+            }
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str) -> None:
+        """Saves the timeline as a Chrome trace JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+        logger.info(__name__, f"Saved op profile to {path}")
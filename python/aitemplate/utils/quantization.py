@@ -0,0 +1,101 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Weight-only int8 quantization of gemm weights.
+
+Weights are quantized symmetrically with one scale per output channel, i.e.
+per row of a [N, K] gemm_rcr weight:
+
+    weight[n, k] ~= scales[n] * qweight[n, k], qweight in [-127, 127]
+
+and then packed into the layout read by the gemm_rcr_weight_int8 kernels,
+see pack_int8_weight.
+"""
+from typing import Tuple
+
+import numpy as np
+
+INT8_MAX = 127
+# Packed weights are offset by 128 to be stored as uint8
+INT8_PACK_OFFSET = 128
+# Bytes of each group of 4 weights are stored in this order, so that a single
+# byte permutation yields the half2 of weights (0, 1), and another one the
+# half2 of weights (2, 3)
+INT8_PACK_ORDER = [0, 2, 1, 3]
+
+
+def quantize_int8_per_channel(weight: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantizes weight to int8 with a scale for every output channel.
+
+    Parameters
+    ----------
+    weight : np.ndarray
+        [N, K] weight
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The [N, K] int8 weight and [N] float16 scales. Scales are rounded to
+        float16 before quantizing, so that the kernels dequantize with the
+        same scales.
+    """
+    if weight.ndim != 2:
+        raise ValueError(f"Expected a 2D weight, got shape {weight.shape}")
+    weight = weight.astype(np.float32)
+    max_abs = np.abs(weight).max(axis=1, initial=0.0)
+    # all-zero channels quantize to zeros with any scale
+    scales = np.where(max_abs > 0, max_abs / INT8_MAX, 1.0).astype(np.float16)
+    qweight = np.rint(weight / scales.astype(np.float32)[:, None])
+    qweight = np.clip(qweight, -INT8_MAX, INT8_MAX).astype(np.int8)
+    return qweight, scales
+
+
+def dequantize_int8_per_channel(qweight: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Inverse of quantize_int8_per_channel, returns the float32 weight."""
+    return qweight.astype(np.float32) * scales.astype(np.float32)[:, None]
+
+
+def pack_int8_weight(qweight: np.ndarray) -> np.ndarray:
+    """Packs a [N, K] int8 weight for the gemm_rcr_weight_int8 kernels.
+
+    Weights are offset to uint8 and the bytes of each group of 4 weights
+    along K are reordered by INT8_PACK_ORDER. This lets the kernels convert
+    4 weights to half with two byte permutations and a subtraction, instead
+    of four int-to-float conversions.
+
+    Parameters
+    ----------
+    qweight : np.ndarray
+        [N, K] int8 weight, where K is a multiple of 4
+
+    Returns
+    -------
+    np.ndarray
+        [N, K] packed weight, stored as int8
+    """
+    n, k = qweight.shape
+    if k % len(INT8_PACK_ORDER) != 0:
+        raise ValueError(f"K must be a multiple of {len(INT8_PACK_ORDER)}, got {k}")
+    packed = (qweight.astype(np.int16) + INT8_PACK_OFFSET).astype(np.uint8)
+    packed = packed.reshape(n, -1, len(INT8_PACK_ORDER))[:, :, INT8_PACK_ORDER]
+    return np.ascontiguousarray(packed.reshape(n, k)).view(np.int8)
+
+
+def unpack_int8_weight(packed: np.ndarray) -> np.ndarray:
+    """Inverse of pack_int8_weight."""
+    n, k = packed.shape
+    unpacked = packed.view(np.uint8).reshape(n, -1, len(INT8_PACK_ORDER))
+    unpacked = unpacked[:, :, np.argsort(INT8_PACK_ORDER)].reshape(n, k)
+    return (unpacked.astype(np.int16) - INT8_PACK_OFFSET).astype(np.int8)
@@ -16,7 +16,10 @@
 Util functions to handle shapes.
 """
 
-from typing import List
+from typing import Callable, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aitemplate.compiler.base import IntVar
 
 
 def gen_int_var(values: List[int], name: str = None):
@@ -42,6 +45,64 @@ def gen_int_var_min_max(values: List[int], name: str = None):
     return gen_int_var([min(values), max(values)], name=name)
 
 
+def infer_shape_per_dim(
+    x_shape: List["IntVar"],
+    infer_shape: Callable[[List[int]], List[int]],
+    dim_sources: List[Optional[int]],
+) -> List["IntVar"]:
+    """
+    Infers an output shape from the shape function infer_shape of concrete
+    values, for shape functions where every output dim depends on at most a
+    single input dim.
+
+    infer_shape is run once for every value of every dynamic input dim, with
+    the other dims at their first value, instead of once for every
+    combination of values. Output dims which equal their input dim for all
+    of its values reuse the input dim.
+
+    Parameters
+    ----------
+    x_shape : List[IntVar]
+        Input shape
+    infer_shape : Callable[[List[int]], List[int]]
+        Returns the output shape for concrete input dims
+    dim_sources : List[Optional[int]]
+        For every output dim, the index of the input dim it depends on, or
+        None if it is static
+
+    Returns
+    -------
+    List[IntVar]
+        Output shape
+    """
+    from aitemplate.compiler.base import IntImm
+
+    base_shape = [dim._attrs["values"][0] for dim in x_shape]
+    base_output = infer_shape(base_shape)
+    output_values = [{value} for value in base_output]
+    is_identity = [
+        source is not None and base_output[idx] == base_shape[source]
+        for idx, source in enumerate(dim_sources)
+    ]
+    for source in sorted({source for source in dim_sources if source is not None}):
+        for value in x_shape[source]._attrs["values"][1:]:
+            shape = list(base_shape)
+            shape[source] = value
+            output = infer_shape(shape)
+            for idx, dim_source in enumerate(dim_sources):
+                if dim_source == source:
+                    output_values[idx].add(output[idx])
+                    is_identity[idx] &= output[idx] == value
+
+    output_shape = []
+    for idx, source in enumerate(dim_sources):
+        if is_identity[idx] and not isinstance(x_shape[source], IntImm):
+            output_shape.append(x_shape[source])
+        else:
+            output_shape.append(gen_int_var(sorted(output_values[idx])))
+    return output_shape
+
+
 def get_broadcast_max_shape(shape1, shape2):
     """
     Checks whether two inputs shapes are broadcastable, and if yes, also returns the result broadcast shape.
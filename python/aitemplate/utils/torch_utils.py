@@ -27,9 +27,11 @@ def torch_dtype_to_string(dtype):
 
     dtype_to_str = {
         torch.float16: "float16",
+        torch.bfloat16: "bfloat16",
         torch.float32: "float32",
         torch.int32: "int32",
         torch.int64: "int64",
+        torch.int8: "int8",
     }
     if dtype not in dtype_to_str:
         raise ValueError(
@@ -19,6 +19,16 @@
 
 namespace ait {
 
+namespace {
+// The runtime each thread used last, see ModelContainer::SetCallerAffinity.
+// Only one container is remembered per thread.
+struct AffinityHint {
+  const ModelContainer* container = nullptr;
+  size_t runtime = 0;
+};
+thread_local AffinityHint affinity_hint;
+} // namespace
+
 ModelContainer::ModelContainer(
     size_t num_models,
     size_t blob_size,
@@ -26,19 +36,26 @@ ModelContainer::ModelContainer(
     size_t num_inputs,
     size_t num_outputs,
     size_t num_unbound_constants,
-    size_t params_size)
+    size_t params_size,
+    size_t shared_weights_size)
     : ModelContainerBase(
           num_inputs,
           num_outputs,
           num_unbound_constants,
           params_size),
+      runtime_states_(num_models),
+      staging_pool_(
+          std::vector<size_t>(
+              max_param_storage_bytes_.begin() + num_inputs,
+              max_param_storage_bytes_.begin() + num_inputs + num_outputs),
+          num_models),
+      shared_weights_size_(shared_weights_size),
       num_inputs_(num_inputs),
       num_outputs_(num_outputs) {
   if (num_models == 0) {
     throw std::runtime_error("Number of models must be positive");
   }
   models_.reserve(num_models);
-  available_models_.reserve(num_models);
 
   for (size_t i = 0; i < num_models; ++i) {
     models_.emplace_back(
@@ -48,7 +65,7 @@ ModelContainer::ModelContainer(
         num_outputs,
         num_unbound_constants,
         static_cast<uint8_t*>(constants_.get()));
-    available_models_.push_back(&models_.back());
+    runtime_states_[i] = kAvailable;
   }
 }
 
@@ -66,8 +83,7 @@ void ModelContainer::Run(
     PrepareForRun(model, inputs, num_inputs, outputs, num_outputs);
     model->Run(stream, graph_mode);
   } catch (...) {
-    std::lock_guard lk(models_mutex_);
-    available_models_.push_back(model);
+    ReleaseModel(model, /*pending=*/false);
     throw;
   }
 
@@ -78,11 +94,7 @@ void ModelContainer::Run(
     }
   }
 
-  {
-    std::lock_guard lk(models_mutex_);
-    pending_models_.push_back(model);
-  }
-  pending_models_available_.notify_one();
+  ReleaseModel(model, /*pending=*/true);
   if (sync) {
     StreamSynchronize(stream);
   }
@@ -96,22 +108,110 @@ void ModelContainer::RunWithOutputsOnHost(
     StreamType stream,
     bool graph_mode,
     int64_t** output_shapes_out) {
-  std::vector<std::pair<GPUPtr, size_t>> owned_outputs_ptrs;
-  std::vector<AITData> owned_outputs;
-  owned_outputs_ptrs.reserve(num_outputs);
-  owned_outputs.reserve(num_outputs);
+  if (num_outputs > 0 && outputs == nullptr) {
+    throw std::runtime_error("outputs cannot be null");
+  }
+  std::vector<void*> host_outputs(num_outputs);
+  for (size_t i = 0; i < num_outputs; ++i) {
+    ValidateDtype(outputs[i].dtype, i + num_inputs_);
+    host_outputs[i] = outputs[i].ptr;
+  }
+
+  auto* staging = staging_pool_.Acquire(/*pinned=*/false);
+  try {
+    RunWithStagedOutputs(
+        inputs,
+        num_inputs,
+        host_outputs.data(),
+        num_outputs,
+        staging,
+        stream,
+        graph_mode,
+        output_shapes_out);
+  } catch (...) {
+    staging_pool_.Release(staging, /*reuse=*/false);
+    throw;
+  }
+  staging_pool_.Release(staging);
+}
+
+StagingBuffers* ModelContainer::RunWithPinnedOutputs(
+    const AITData* inputs,
+    size_t num_inputs,
+    AITData* outputs_out,
+    size_t num_outputs,
+    StreamType stream,
+    bool graph_mode,
+    int64_t** output_shapes_out) {
+  if (num_outputs > 0 && outputs_out == nullptr) {
+    throw std::runtime_error("outputs_out cannot be null");
+  }
+  auto* staging = staging_pool_.Acquire(/*pinned=*/true);
+  try {
+    std::vector<void*> host_outputs(num_outputs);
+    for (size_t i = 0; i < num_outputs && i < num_outputs_; ++i) {
+      host_outputs[i] = staging->host[i].get();
+    }
+    RunWithStagedOutputs(
+        inputs,
+        num_inputs,
+        host_outputs.data(),
+        num_outputs,
+        staging,
+        stream,
+        graph_mode,
+        output_shapes_out);
+    for (size_t i = 0; i < num_outputs; ++i) {
+      outputs_out[i] =
+          AITData(host_outputs[i], MaxOutputShape(i), OutputDtype(i));
+    }
+  } catch (...) {
+    staging_pool_.Release(staging, /*reuse=*/false);
+    throw;
+  }
+  return staging;
+}
+
+void ModelContainer::ReleaseStagingBuffers(StagingBuffers* buffers) {
+  staging_pool_.Release(buffers);
+}
+
+void ModelContainer::RunWithStagedOutputs(
+    const AITData* inputs,
+    size_t num_inputs,
+    void* const* host_outputs,
+    size_t num_outputs,
+    StagingBuffers* staging,
+    StreamType stream,
+    bool graph_mode,
+    int64_t** output_shapes_out) {
+  if (num_outputs != num_outputs_) {
+    auto msg = "Got wrong number of outputs; expected " +
+        std::to_string(num_outputs_) + ", got " + std::to_string(num_outputs);
+    throw std::runtime_error(std::move(msg));
+  }
+  // The actual output shapes are needed to copy only the valid bytes.
+  std::vector<std::vector<int64_t>> owned_output_shapes;
+  std::vector<int64_t*> output_shapes;
+  if (output_shapes_out == nullptr) {
+    owned_output_shapes.reserve(num_outputs);
+    for (size_t i = 0; i < num_outputs; ++i) {
+      owned_output_shapes.emplace_back(MaxOutputShape(i).size);
+      output_shapes.push_back(owned_output_shapes.back().data());
+    }
+    output_shapes_out = output_shapes.data();
+  }
+
+  std::vector<AITData> staged_outputs;
+  staged_outputs.reserve(num_outputs);
   for (size_t i = 0; i < num_outputs; ++i) {
-    size_t num_bytes = MaxOutputStorageBytes(i);
-    owned_outputs_ptrs.emplace_back(RAII_DeviceMalloc(num_bytes), num_bytes);
-    owned_outputs.emplace_back(
-        owned_outputs_ptrs.back().first.get(),
-        outputs[i].shape,
-        outputs[i].dtype);
+    staged_outputs.emplace_back(
+        staging->device[i].get(), MaxOutputShape(i), OutputDtype(i));
   }
 
   Run(inputs,
       num_inputs,
-      owned_outputs.data(),
+      staged_outputs.data(),
       num_outputs,
       stream,
       /*sync=*/false,
@@ -119,15 +219,69 @@ void ModelContainer::RunWithOutputsOnHost(
       output_shapes_out);
 
   for (size_t i = 0; i < num_outputs; ++i) {
-    auto& owned_output = owned_outputs_ptrs[i];
-    auto& ptr = owned_output.first;
-    auto num_bytes = owned_output.second;
-    DEVICE_CHECK(CopyToHost(outputs[i].ptr, ptr.get(), num_bytes, stream));
+    size_t num_bytes = AITemplateDtypeSizeBytes(OutputDtype(i));
+    for (size_t j = 0; j < MaxOutputShape(i).size; ++j) {
+      num_bytes *= output_shapes_out[i][j];
+    }
+    DEVICE_CHECK(CopyToHost(
+        host_outputs[i], staging->device[i].get(), num_bytes, stream));
   }
 
   DEVICE_CHECK(StreamSynchronize(stream));
 }
 
+void ModelContainer::ProfileOps(
+    const AITData* inputs,
+    size_t num_inputs,
+    AITData* outputs,
+    size_t num_outputs,
+    StreamType stream,
+    size_t count,
+    float* start_ms_out,
+    float* duration_ms_out,
+    int64_t** output_shapes_out) {
+  const size_t num_ops = NumOps();
+  if (num_ops == 0) {
+    throw std::runtime_error(
+        "The model has no ops to profile; compile it with profile_ops=True");
+  }
+  if (count > 0 && (start_ms_out == nullptr || duration_ms_out == nullptr)) {
+    throw std::runtime_error("start_ms_out and duration_ms_out cannot be null");
+  }
+  auto* model = GetAvailableModel();
+  auto* profiler = model->GetOpProfiler();
+  try {
+    PrepareForRun(model, inputs, num_inputs, outputs, num_outputs);
+    profiler->SetEnabled(true);
+    for (size_t i = 0; i < count; ++i) {
+      model->Run(stream, /*graph_mode=*/false);
+      profiler->GetTimings(
+          start_ms_out + i * num_ops, duration_ms_out + i * num_ops);
+    }
+  } catch (...) {
+    profiler->SetEnabled(false);
+    ReleaseModel(model, /*pending=*/false);
+    throw;
+  }
+  profiler->SetEnabled(false);
+
+  if (output_shapes_out) {
+    for (size_t i = 0; i < num_outputs; ++i) {
+      model->GetOutputShape(i, output_shapes_out[i]);
+    }
+  }
+  ReleaseModel(model, /*pending=*/true);
+  DEVICE_CHECK(StreamSynchronize(stream));
+}
+
+size_t ModelContainer::NumOps() const {
+  return Model::NumProfiledOps();
+}
+
+const OpInfo& ModelContainer::GetOpInfo(size_t op_idx) const {
+  return Model::GetOpInfo(op_idx);
+}
+
 float ModelContainer::Benchmark(
     const AITData* inputs,
     size_t num_inputs,
@@ -256,12 +410,14 @@ float ModelContainer::Benchmark(
   return max_time / total_num_iters;
 }
 
-void ModelContainer::SetConstant(const char* name, const AITData& tensor) {
+size_t ModelContainer::ValidateConstant(
+    const char* name,
+    const AITData& tensor) {
   auto it = unbound_constant_name_to_idx_.find(name);
   if (it == unbound_constant_name_to_idx_.end()) {
     // TODO make this an exception after we fix the CMF benchmarks
     LOG(ERROR) << "Constant " << name << " not found";
-    return;
+    return num_params_;
   }
   auto constant_idx = it->second + num_inputs_ + num_outputs_;
   ValidateDtype(tensor.dtype, constant_idx);
@@ -278,13 +434,123 @@ void ModelContainer::SetConstant(const char* name, const AITData& tensor) {
         " but got " + std::to_string(actual_num_bytes) +
         ". Check that the provided tensor's shape is correct.");
   }
+  return constant_idx;
+}
 
+void ModelContainer::SetConstant(const char* name, const AITData& tensor) {
+  if (ValidateConstant(name, tensor) == num_params_) {
+    return;
+  }
   auto* src = tensor.ptr;
   for (auto& model : models_) {
     model.SetConstant(name, src);
   }
 }
 
+void ModelContainer::SetManyConstants(
+    const char** names,
+    const AITData* tensors,
+    size_t num_tensors) {
+  // validate everything first, so that nothing is set if a tensor is invalid
+  std::vector<size_t> constant_indices(num_tensors);
+  for (size_t i = 0; i < num_tensors; ++i) {
+    constant_indices[i] = ValidateConstant(names[i], tensors[i]);
+  }
+  for (auto& model : models_) {
+    for (size_t i = 0; i < num_tensors; ++i) {
+      if (constant_indices[i] != num_params_) {
+        model.SetConstant(names[i], tensors[i].ptr);
+      }
+    }
+  }
+}
+
+void ModelContainer::UploadManyConstants(
+    const char** names,
+    const AITData* tensors,
+    size_t num_tensors,
+    StreamType stream,
+    bool sync) {
+  std::vector<size_t> constant_indices(num_tensors);
+  for (size_t i = 0; i < num_tensors; ++i) {
+    constant_indices[i] = ValidateConstant(names[i], tensors[i]);
+  }
+  if (uploaded_constants_ == nullptr) {
+    AllocateUploadedConstants();
+  }
+
+  auto* uploaded_constants = static_cast<uint8_t*>(uploaded_constants_.get());
+  for (size_t i = 0; i < num_tensors; ++i) {
+    const auto constant_idx = constant_indices[i];
+    if (constant_idx == num_params_) {
+      continue;
+    }
+    auto* dst = uploaded_constants +
+        uploaded_constant_offsets_[constant_idx - num_inputs_ - num_outputs_];
+    DEVICE_CHECK(CopyToDevice(
+        dst, tensors[i].ptr, max_param_storage_bytes_[constant_idx], stream));
+    for (auto& model : models_) {
+      model.SetConstant(names[i], dst);
+    }
+  }
+  if (sync) {
+    DEVICE_CHECK(StreamSynchronize(stream));
+  }
+}
+
+void ModelContainer::SetSharedWeights(void* weights, size_t num_bytes) {
+  if (shared_weights_size_ == 0) {
+    throw std::runtime_error(
+        "The model was not compiled with a weight store, or has no constants "
+        "in it");
+  }
+  if (weights == nullptr) {
+    throw std::runtime_error("weights cannot be null");
+  }
+  if (num_bytes < shared_weights_size_) {
+    throw std::runtime_error(
+        "The shared weights have " + std::to_string(num_bytes) +
+        " bytes, but the model was compiled with a weight store of " +
+        std::to_string(shared_weights_size_) + " bytes");
+  }
+  shared_weights_ = weights;
+  for (auto& model : models_) {
+    model.SetSharedWeights(static_cast<uint8_t*>(weights));
+  }
+}
+
+void ModelContainer::AllocateUploadedConstants() {
+  // aligned like device allocations
+  constexpr size_t kAlignment = 256;
+  const size_t num_unbound_constants = num_params_ - num_inputs_ - num_outputs_;
+  uploaded_constant_offsets_.resize(num_unbound_constants);
+  size_t size = 0;
+  for (size_t i = 0; i < num_unbound_constants; ++i) {
+    uploaded_constant_offsets_[i] = size;
+    const auto num_bytes = max_param_storage_bytes_[i + num_inputs_ + num_outputs_];
+    size += (num_bytes + kAlignment - 1) / kAlignment * kAlignment;
+  }
+  uploaded_constants_ = RAII_DeviceMalloc(size);
+}
+
+void ModelContainer::SetGraphCacheCapacity(size_t capacity) {
+  for (auto& model : models_) {
+    model.GetGraphCache().SetCapacity(capacity);
+  }
+}
+
+size_t ModelContainer::GetGraphCacheCapacity() {
+  return models_.front().GetGraphCache().Capacity();
+}
+
+AITemplateGraphCacheStats ModelContainer::GetGraphCacheStats() {
+  AITemplateGraphCacheStats stats;
+  for (auto& model : models_) {
+    model.GetGraphCache().AccumulateStats(&stats);
+  }
+  return stats;
+}
+
 size_t ModelContainer::NumInputs() const {
   return num_inputs_;
 }
@@ -329,6 +595,11 @@ void ModelContainer::PrepareForRun(
     size_t num_inputs,
     AITData* outputs,
     size_t num_outputs) {
+  if (shared_weights_size_ > 0 && shared_weights_ == nullptr) {
+    throw std::runtime_error(
+        "The model was compiled with a weight store, its weights must be set "
+        "with SetSharedWeights before running it");
+  }
   if (num_inputs != num_inputs_) {
     auto msg = "Got wrong number of inputs; expected " +
         std::to_string(num_inputs_) + ", got " + std::to_string(num_inputs);
@@ -359,45 +630,119 @@ void ModelContainer::PrepareForRun(
 }
 
 Model* ModelContainer::GetAvailableModel() {
-  std::unique_lock lk(models_mutex_);
-  if (available_models_.empty()) {
-    ReclaimFinishedModels(lk);
+  const size_t num_runtimes = models_.size();
+  const size_t first = FirstRuntimeToTry();
+  while (true) {
+    auto idx = TryAcquireRuntime(first);
+    if (idx == num_runtimes) {
+      // None of the runtimes has finished; wait for the one launched first.
+      idx = AcquireOldestPendingRuntime();
+    }
+    if (idx < num_runtimes) {
+      if (caller_affinity_.load(std::memory_order_relaxed)) {
+        affinity_hint = AffinityHint{this, idx};
+      }
+      return &models_[idx];
+    }
+
+    // All runtimes are owned by other callers; wait until one is released.
+    num_waiters_.fetch_add(1);
+    {
+      std::unique_lock lk(models_mutex_);
+      model_released_.wait(lk, [this]() { return AnyRuntimeReleased(); });
+    }
+    num_waiters_.fetch_sub(1);
   }
-  auto* result = available_models_.back();
-  available_models_.pop_back();
-  return result;
 }
 
-void ModelContainer::ReclaimFinishedModels(std::unique_lock<std::mutex>& lk) {
-  // Put any complete models at the end
-  auto it = std::stable_partition(
-      pending_models_.begin(), pending_models_.end(), [](Model* m) {
-        return m->IsPending();
-      });
+void ModelContainer::ReleaseModel(Model* model, bool pending) {
+  auto& state = runtime_states_[model - models_.data()];
+  if (pending) {
+    state = (num_launches_.fetch_add(1) << kRuntimeStateBits) | kPending;
+  } else {
+    state = (state.load() & ~kRuntimeStateMask) | kAvailable;
+  }
+  if (num_waiters_.load() > 0) {
+    // Synchronizes with waiters which checked the states before they waited.
+    { std::lock_guard lk(models_mutex_); }
+    model_released_.notify_all();
+  }
+}
 
-  if (it != pending_models_.end()) {
-    // Move all available models to the pool.
-    available_models_.insert(
-        available_models_.end(), it, pending_models_.end());
-    pending_models_.erase(it, pending_models_.end());
-    return;
+size_t ModelContainer::TryAcquireRuntime(size_t first) {
+  const size_t num_runtimes = models_.size();
+  for (size_t i = 0; i < num_runtimes; ++i) {
+    const size_t idx = (first + i) % num_runtimes;
+    auto& state = runtime_states_[idx];
+    uint64_t current = state.load();
+    switch (current & kRuntimeStateMask) {
+      case kRunning:
+        continue;
+      case kPending:
+        // Unlike waiting for the oldest launch, this picks up any runtime
+        // which has finished.
+        if (models_[idx].IsPending()) {
+          continue;
+        }
+        break;
+      default:
+        break;
+    }
+    // Fails if another thread took or relaunched the runtime in the meantime.
+    if (state.compare_exchange_strong(
+            current, (current & ~kRuntimeStateMask) | kRunning)) {
+      return idx;
+    }
   }
+  return num_runtimes;
+}
 
-  pending_models_available_.wait(
-      lk, [this]() { return !pending_models_.empty(); });
-  // There are no available workspaces! We have to wait on one.
-  auto* model = pending_models_.front();
-  pending_models_.pop_front();
-  lk.unlock();
-  try {
-    model->WaitForCompletion();
-  } catch (...) {
-    lk.lock();
-    available_models_.push_back(model);
-    throw;
+size_t ModelContainer::AcquireOldestPendingRuntime() {
+  const size_t num_runtimes = models_.size();
+  while (true) {
+    size_t oldest = num_runtimes;
+    uint64_t oldest_state = 0;
+    for (size_t idx = 0; idx < num_runtimes; ++idx) {
+      uint64_t current = runtime_states_[idx].load();
+      if ((current & kRuntimeStateMask) == kPending &&
+          (oldest == num_runtimes || current < oldest_state)) {
+        oldest = idx;
+        oldest_state = current;
+      }
+    }
+    if (oldest == num_runtimes) {
+      return num_runtimes;
+    }
+    if (!runtime_states_[oldest].compare_exchange_strong(
+            oldest_state, (oldest_state & ~kRuntimeStateMask) | kRunning)) {
+      continue;
+    }
+    try {
+      models_[oldest].WaitForCompletion();
+    } catch (...) {
+      ReleaseModel(&models_[oldest], /*pending=*/false);
+      throw;
+    }
+    return oldest;
+  }
+}
+
+bool ModelContainer::AnyRuntimeReleased() const {
+  return std::any_of(
+      runtime_states_.begin(), runtime_states_.end(), [](const auto& state) {
+        return (state.load() & kRuntimeStateMask) != kRunning;
+      });
+}
+
+size_t ModelContainer::FirstRuntimeToTry() {
+  const size_t num_runtimes = models_.size();
+  if (caller_affinity_.load(std::memory_order_relaxed) &&
+      affinity_hint.container == this) {
+    return affinity_hint.runtime % num_runtimes;
   }
-  lk.lock();
-  available_models_.push_back(model);
+  // Spread callers over the runtimes, so that they don't all contend for the
+  // first one.
+  return next_runtime_.fetch_add(1, std::memory_order_relaxed) % num_runtimes;
 }
 
 void ModelContainer::ValidateDtype(AITemplateDtype dtype, size_t idx) const {
@@ -415,6 +760,10 @@ void ModelContainer::ValidateDtype(AITemplateDtype dtype, size_t idx) const {
           return "kInt";
         case AITemplateDtype::kLong:
           return "kLong";
+        case AITemplateDtype::kBFloat16:
+          return "kBFloat16";
+        case AITemplateDtype::kInt8:
+          return "kInt8";
         default:
           return "unknown";
       }
@@ -446,8 +795,7 @@ float ModelContainer::BenchmarkImpl(
       model->Run(stream, graph_mode);
     }
   } catch (...) {
-    std::lock_guard lk(models_mutex_);
-    available_models_.push_back(model);
+    ReleaseModel(model, /*pending=*/false);
     throw;
   }
   if (output_shapes_out) {
@@ -458,11 +806,7 @@ float ModelContainer::BenchmarkImpl(
   }
   // Push the model back into the pool before synchronizing the event
   // to exercise the concurrency code
-  {
-    std::lock_guard lk(models_mutex_);
-    pending_models_.push_back(model);
-  }
-  pending_models_available_.notify_one();
+  ReleaseModel(model, /*pending=*/true);
 
   DEVICE_CHECK(EventRecord(end_event.get(), stream));
   DEVICE_CHECK(EventSynchronize(end_event.get()));
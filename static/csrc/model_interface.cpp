@@ -76,6 +76,58 @@ AITemplateError AITemplateModelContainerSetConstant(
   CONVERT_EXCEPTION_TO_ERROR_CODE({ m->SetConstant(name, *tensor); })
 }
 
+AITemplateError AITemplateModelContainerSetManyConstants(
+    AITemplateModelHandle handle,
+    const char** names,
+    const AITData* tensors,
+    size_t num_tensors) {
+  RETURN_ERROR_IF_NULL(handle)
+  if (num_tensors > 0) {
+    RETURN_ERROR_IF_NULL(names)
+    RETURN_ERROR_IF_NULL(tensors)
+  }
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE(
+      { m->SetManyConstants(names, tensors, num_tensors); })
+}
+
+AITemplateError AITemplateModelContainerUploadManyConstants(
+    AITemplateModelHandle handle,
+    const char** names,
+    const AITData* tensors,
+    size_t num_tensors,
+    AITemplateStreamHandle stream_handle,
+    bool sync) {
+  RETURN_ERROR_IF_NULL(handle)
+  if (num_tensors > 0) {
+    RETURN_ERROR_IF_NULL(names)
+    RETURN_ERROR_IF_NULL(tensors)
+  }
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  auto stream = reinterpret_cast<ait::StreamType>(stream_handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE(
+      { m->UploadManyConstants(names, tensors, num_tensors, stream, sync); })
+}
+
+AITemplateError AITemplateModelContainerSetSharedWeights(
+    AITemplateModelHandle handle,
+    void* weights,
+    size_t num_bytes) {
+  RETURN_ERROR_IF_NULL(handle)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({ m->SetSharedWeights(weights, num_bytes); })
+}
+
+AITemplateError AITemplateModelContainerGetSharedWeightsSize(
+    AITemplateModelHandle handle,
+    size_t* num_bytes_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(num_bytes_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE(
+      { *num_bytes_out = m->SharedWeightsSize(); })
+}
+
 AITemplateError AITemplateModelContainerRun(
     AITemplateModelHandle handle,
     const AITData* inputs,
@@ -126,6 +178,44 @@ AITemplateError AITemplateModelContainerRunWithOutputsOnHost(
   })
 }
 
+AITemplateError AITemplateModelContainerRunWithPinnedOutputs(
+    AITemplateModelHandle handle,
+    const AITData* inputs,
+    size_t num_inputs,
+    AITData* outputs_out,
+    size_t num_outputs,
+    AITemplateStreamHandle stream_handle,
+    bool graph_mode,
+    int64_t** output_shapes_out,
+    AITemplateStagingBuffersHandle* buffers_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(buffers_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  auto stream = reinterpret_cast<ait::StreamType>(stream_handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({
+    auto* buffers = m->RunWithPinnedOutputs(
+        inputs,
+        num_inputs,
+        outputs_out,
+        num_outputs,
+        stream,
+        graph_mode,
+        output_shapes_out);
+    *buffers_out = reinterpret_cast<AITemplateStagingBuffersHandle>(buffers);
+  })
+}
+
+AITemplateError AITemplateModelContainerReleaseStagingBuffers(
+    AITemplateModelHandle handle,
+    AITemplateStagingBuffersHandle buffers) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(buffers)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({
+    m->ReleaseStagingBuffers(reinterpret_cast<ait::StagingBuffers*>(buffers));
+  })
+}
+
 AITemplateError AITemplateModelContainerBenchmark(
     AITemplateModelHandle handle,
     const AITData* inputs,
@@ -158,6 +248,59 @@ AITemplateError AITemplateModelContainerBenchmark(
   })
 }
 
+AITemplateError AITemplateModelContainerProfileOps(
+    AITemplateModelHandle handle,
+    const AITData* inputs,
+    size_t num_inputs,
+    AITData* outputs,
+    size_t num_outputs,
+    AITemplateStreamHandle stream_handle,
+    size_t count,
+    float* start_ms_out,
+    float* duration_ms_out,
+    int64_t** output_shapes_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  auto stream = reinterpret_cast<ait::StreamType>(stream_handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({
+    m->ProfileOps(
+        inputs,
+        num_inputs,
+        outputs,
+        num_outputs,
+        stream,
+        count,
+        start_ms_out,
+        duration_ms_out,
+        output_shapes_out);
+  })
+}
+
+AITemplateError AITemplateModelContainerGetNumOps(
+    AITemplateModelHandle handle,
+    size_t* num_ops_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(num_ops_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({ *num_ops_out = m->NumOps(); })
+}
+
+AITemplateError AITemplateModelContainerGetOpInfo(
+    AITemplateModelHandle handle,
+    size_t op_idx,
+    const char** name_out,
+    const char** op_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(name_out)
+  RETURN_ERROR_IF_NULL(op_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({
+    const auto& info = m->GetOpInfo(op_idx);
+    *name_out = info.name;
+    *op_out = info.op;
+  })
+}
+
 AITemplateError AITemplateModelContainerGetNumInputs(
     AITemplateModelHandle handle,
     size_t* num_inputs_out) {
@@ -226,4 +369,66 @@ AITemplateError AITemplateModelContainerGetNumRuntimes(
   auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
   CONVERT_EXCEPTION_TO_ERROR_CODE({ *num_runtimes_out = m->GetNumRuntimes(); })
 }
+
+AITemplateError AITemplateModelContainerSetCallerAffinity(
+    AITemplateModelHandle handle,
+    bool enabled) {
+  RETURN_ERROR_IF_NULL(handle)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({ m->SetCallerAffinity(enabled); })
+}
+
+AITemplateError AITemplateModelContainerSetGraphCacheCapacity(
+    AITemplateModelHandle handle,
+    size_t capacity) {
+  RETURN_ERROR_IF_NULL(handle)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({ m->SetGraphCacheCapacity(capacity); })
+}
+
+AITemplateError AITemplateModelContainerGetGraphCacheCapacity(
+    AITemplateModelHandle handle,
+    size_t* capacity_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(capacity_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE(
+      { *capacity_out = m->GetGraphCacheCapacity(); })
+}
+
+AITemplateError AITemplateModelContainerGetGraphCacheStats(
+    AITemplateModelHandle handle,
+    AITemplateGraphCacheStats* stats_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(stats_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({ *stats_out = m->GetGraphCacheStats(); })
+}
+
+AITemplateError AITemplateModelContainerSetStagingPoolCapacity(
+    AITemplateModelHandle handle,
+    size_t capacity) {
+  RETURN_ERROR_IF_NULL(handle)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({ m->SetStagingPoolCapacity(capacity); })
+}
+
+AITemplateError AITemplateModelContainerGetStagingPoolCapacity(
+    AITemplateModelHandle handle,
+    size_t* capacity_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(capacity_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE(
+      { *capacity_out = m->GetStagingPoolCapacity(); })
+}
+
+AITemplateError AITemplateModelContainerGetStagingPoolStats(
+    AITemplateModelHandle handle,
+    AITemplateStagingPoolStats* stats_out) {
+  RETURN_ERROR_IF_NULL(handle)
+  RETURN_ERROR_IF_NULL(stats_out)
+  auto* m = reinterpret_cast<ait::ModelContainer*>(handle);
+  CONVERT_EXCEPTION_TO_ERROR_CODE({ *stats_out = m->GetStagingPoolStats(); })
+}
 } // extern "C"
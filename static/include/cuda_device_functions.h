@@ -130,6 +130,15 @@ inline DeviceError DeviceMallocAsync(
   return cudaMallocAsync(dst, size, stream);
 }
 
+// Page-locked host memory, which can be copied to and from asynchronously.
+inline DeviceError HostMalloc(Handle* dst, size_t size) {
+  return cudaMallocHost(dst, size);
+}
+
+inline DeviceError FreeHostMemory(Handle src) {
+  return cudaFreeHost(src);
+}
+
 inline DeviceError GetDeviceSuccess() {
   return cudaSuccess;
 }
@@ -0,0 +1,204 @@
+//  Copyright (c) Meta Platforms, Inc. and affiliates.
+//
+//  Licensed under the Apache License, Version 2.0 (the "License");
+//  you may not use this file except in compliance with the License.
+//  You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+//  Unless required by applicable law or agreed to in writing, software
+//  distributed under the License is distributed on an "AS IS" BASIS,
+//  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+//  See the License for the specific language governing permissions and
+//  limitations under the License.
+//
+#pragma once
+
+#include <atomic>
+#include <cstdint>
+#include <functional>
+#include <list>
+#include <stdexcept>
+#include <unordered_map>
+#include <vector>
+
+#include "device_functions-generated.h"
+#include "model_interface.h"
+
+namespace ait {
+
+// LRU cache of the instantiated graphs of one Model, keyed by the values of
+// its input dims. Each entry also remembers the I/O pointers the graph was
+// captured with, since those are baked into the graph: a lookup with the same
+// dims but other pointers still finds the entry, but the caller has to
+// recapture and update the graph exec in place, which is much cheaper than
+// instantiating a new one.
+//
+// Only the thread which owns the Model may call Acquire. The statistics,
+// SetCapacity and Invalidate may be used from any thread.
+class GraphCache {
+ public:
+  using Key = std::vector<int64_t>;
+
+  struct Entry {
+    Key key;
+    // nullptr if the entry is new, otherwise the graph exec of an evicted
+    // entry which should be updated with the new graph.
+    GraphExecType graph_exec = nullptr;
+    // The I/O pointers the graph was captured with.
+    std::vector<void*> ptrs;
+    // The values of the output dims after the captured run, which are not
+    // recomputed when the graph is relaunched.
+    std::vector<int64_t> output_dims;
+    // False until the caller captured the graph for this key.
+    bool captured = false;
+  };
+
+  explicit GraphCache(size_t capacity = kDefaultCapacity) {
+    SetCapacity(capacity);
+  }
+
+  ~GraphCache() {
+    Clear();
+  }
+
+  GraphCache(const GraphCache&) = delete;
+  GraphCache& operator=(const GraphCache&) = delete;
+
+  // Returns the entry for key, and makes it the most recently used one. On a
+  // miss, the least recently used entry is evicted if the cache is full, and
+  // the returned entry (with captured = false) takes over its graph exec.
+  Entry& Acquire(const Key& key) {
+    if (invalidated_.exchange(false)) {
+      Clear();
+    }
+    auto it = index_.find(key);
+    if (it != index_.end()) {
+      entries_.splice(entries_.begin(), entries_, it->second);
+      return entries_.front();
+    }
+
+    const size_t capacity = capacity_;
+    // the capacity may have been lowered since the last lookup
+    Trim(capacity);
+    GraphExecType graph_exec = nullptr;
+    if (entries_.size() == capacity) {
+      auto& lru = entries_.back();
+      graph_exec = lru.graph_exec;
+      index_.erase(lru.key);
+      entries_.pop_back();
+      evictions_++;
+    }
+    entries_.emplace_front();
+    auto& entry = entries_.front();
+    entry.key = key;
+    entry.graph_exec = graph_exec;
+    index_.emplace(entry.key, entries_.begin());
+    size_ = entries_.size();
+    return entry;
+  }
+
+  // Drops the graph of an entry whose capture or update failed.
+  void Erase(Entry& entry) {
+    if (entry.graph_exec != nullptr) {
+      GraphExecDestroy(entry.graph_exec);
+    }
+    auto it = index_.find(entry.key);
+    if (it != index_.end()) {
+      entries_.erase(it->second);
+      index_.erase(it);
+    }
+    size_ = entries_.size();
+  }
+
+  void RecordHit() {
+    hits_++;
+  }
+
+  void RecordMiss() {
+    misses_++;
+  }
+
+  void RecordUpdate() {
+    updates_++;
+  }
+
+  void SetCapacity(size_t capacity) {
+    if (capacity == 0) {
+      throw std::invalid_argument("The graph cache capacity must be positive");
+    }
+    capacity_ = capacity;
+  }
+
+  size_t Capacity() const {
+    return capacity_;
+  }
+
+  // Drops all entries before the next lookup, e.g. because a constant which
+  // is baked into the graphs has changed.
+  void Invalidate() {
+    invalidated_ = true;
+  }
+
+  // Adds the statistics of this cache to stats.
+  void AccumulateStats(AITemplateGraphCacheStats* stats) const {
+    stats->hits += hits_;
+    stats->misses += misses_;
+    stats->updates += updates_;
+    stats->evictions += evictions_;
+    stats->size += size_;
+  }
+
+  static constexpr size_t kDefaultCapacity = 8;
+
+ private:
+  struct KeyHash {
+    size_t operator()(const Key& key) const {
+      size_t seed = key.size();
+      for (auto value : key) {
+        seed ^= std::hash<int64_t>()(value) + 0x9e3779b9 + (seed << 6) +
+            (seed >> 2);
+      }
+      return seed;
+    }
+  };
+
+  // Evicts the least recently used entries until at most size are left.
+  void Trim(size_t size) {
+    while (entries_.size() > size) {
+      auto& lru = entries_.back();
+      if (lru.graph_exec != nullptr) {
+        GraphExecDestroy(lru.graph_exec);
+      }
+      index_.erase(lru.key);
+      entries_.pop_back();
+      evictions_++;
+    }
+  }
+
+  void Clear() {
+    for (auto& entry : entries_) {
+      if (entry.graph_exec != nullptr) {
+        GraphExecDestroy(entry.graph_exec);
+      }
+    }
+    entries_.clear();
+    index_.clear();
+    size_ = 0;
+  }
+
+  // Most recently used first.
+  std::list<Entry> entries_;
+  std::unordered_map<Key, std::list<Entry>::iterator, KeyHash> index_;
+
+  std::atomic<size_t> capacity_;
+  std::atomic<bool> invalidated_{false};
+
+  std::atomic<uint64_t> hits_{0};
+  std::atomic<uint64_t> misses_{0};
+  std::atomic<uint64_t> updates_{0};
+  std::atomic<uint64_t> evictions_{0};
+  std::atomic<size_t> size_{0};
+};
+
+} // namespace ait
@@ -0,0 +1,341 @@
+//  Copyright (c) Meta Platforms, Inc. and affiliates.
+//
+//  Licensed under the Apache License, Version 2.0 (the "License");
+//  you may not use this file except in compliance with the License.
+//  You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+//  Unless required by applicable law or agreed to in writing, software
+//  distributed under the License is distributed on an "AS IS" BASIS,
+//  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+//  See the License for the specific language governing permissions and
+//  limitations under the License.
+//
+#pragma once
+
+// Host implementation of the device functions, so that the runtime
+// (Model, ModelContainer and model_interface) can be built with a plain C++
+// compiler and exercised without a GPU, e.g. to benchmark the dispatch
+// overhead of the runtime itself.
+//
+// "Device" memory is host memory and all work runs on the calling thread:
+// kernels, which are launched with LaunchHostKernel, and copies finish
+// before the launching call returns, so events are always ready. Streams
+// only carry state for graph capture, which records launches into a graph
+// instead of running them.
+
+#include <chrono>
+#include <cstdlib>
+#include <cstring>
+#include <functional>
+#include <string>
+#include <thread>
+#include <utility>
+#include <vector>
+
+namespace ait {
+
+enum HostError : int {
+  hostSuccess = 0,
+  hostErrorInvalidValue = 1,
+  hostErrorMemoryAllocation = 2,
+  hostErrorNotReady = 3,
+  hostErrorStreamCapture = 4,
+};
+
+struct HostDeviceProp {
+  char name[256];
+  size_t totalGlobalMem;
+  int multiProcessorCount;
+};
+
+struct HostGraph {
+  std::vector<std::function<void()>> nodes;
+};
+
+struct HostStream {
+  bool capturing = false;
+  HostGraph captured;
+};
+
+struct HostEvent {
+  std::chrono::steady_clock::time_point time;
+};
+
+using DeviceError = HostError;
+using DevicePropertyType = HostDeviceProp;
+using StreamType = HostStream*;
+using EventType = HostEvent*;
+using GraphType = HostGraph*;
+using GraphExecType = HostGraph*;
+using Handle = void*;
+
+namespace host {
+
+// Like cudaMalloc, allocations are aligned to 256 bytes.
+constexpr size_t kAlignment = 256;
+
+inline DeviceError& LastError() {
+  thread_local DeviceError last_error = hostSuccess;
+  return last_error;
+}
+
+inline DeviceError SetLastError(DeviceError err) {
+  if (err != hostSuccess) {
+    LastError() = err;
+  }
+  return err;
+}
+
+// Runs the given work, or records it if the stream is being captured.
+inline DeviceError Enqueue(StreamType stream, std::function<void()> work) {
+  if (stream != nullptr && stream->capturing) {
+    stream->captured.nodes.push_back(std::move(work));
+  } else {
+    work();
+  }
+  return hostSuccess;
+}
+
+inline DeviceError Copy(
+    Handle dst,
+    const void* src,
+    size_t size,
+    StreamType stream) {
+  if (size == 0) {
+    return hostSuccess;
+  }
+  if (dst == nullptr || src == nullptr) {
+    return SetLastError(hostErrorInvalidValue);
+  }
+  return Enqueue(stream, [=]() { std::memcpy(dst, src, size); });
+}
+
+} // namespace host
+
+// Launches a host kernel, i.e. any callable, on the given stream.
+template <typename Kernel>
+inline DeviceError LaunchHostKernel(StreamType stream, Kernel&& kernel) {
+  return host::Enqueue(stream, std::forward<Kernel>(kernel));
+}
+
+inline DeviceError GetDevice(int* device_idx) {
+  *device_idx = 0;
+  return hostSuccess;
+}
+
+inline DeviceError GetDeviceProperties(
+    DevicePropertyType* prop,
+    int /*device_idx*/) {
+  *prop = HostDeviceProp{};
+  std::strncpy(prop->name, "host", sizeof(prop->name) - 1);
+  prop->multiProcessorCount =
+      static_cast<int>(std::thread::hardware_concurrency());
+  return hostSuccess;
+}
+
+inline DeviceError StreamCreate(
+    StreamType* stream,
+    bool /*non_blocking*/ = false) {
+  *stream = new HostStream();
+  return hostSuccess;
+}
+
+inline DeviceError StreamBeginCapture(
+    StreamType stream,
+    bool /*global*/ = true) {
+  // like the legacy default stream, the null stream can't be captured
+  if (stream == nullptr || stream->capturing) {
+    return host::SetLastError(hostErrorStreamCapture);
+  }
+  stream->capturing = true;
+  stream->captured.nodes.clear();
+  return hostSuccess;
+}
+
+inline DeviceError StreamEndCapture(StreamType stream, GraphType* graph) {
+  if (stream == nullptr || !stream->capturing) {
+    return host::SetLastError(hostErrorStreamCapture);
+  }
+  stream->capturing = false;
+  *graph = new HostGraph(std::move(stream->captured));
+  stream->captured.nodes.clear();
+  return hostSuccess;
+}
+
+inline DeviceError StreamDestroy(StreamType stream) {
+  delete stream;
+  return hostSuccess;
+}
+
+inline DeviceError GraphInstantiate(
+    GraphExecType* graph_exec,
+    GraphType graph) {
+  *graph_exec = new HostGraph(*graph);
+  return hostSuccess;
+}
+
+inline DeviceError GraphDestroy(GraphType graph) {
+  delete graph;
+  return hostSuccess;
+}
+
+inline DeviceError GraphExecUpdate(GraphExecType graph_exec, GraphType graph) {
+  graph_exec->nodes = graph->nodes;
+  return hostSuccess;
+}
+
+inline DeviceError GraphExecDestroy(GraphExecType graph_exec) {
+  delete graph_exec;
+  return hostSuccess;
+}
+
+inline DeviceError GraphExecLaunch(
+    GraphExecType graph_exec,
+    StreamType stream) {
+  for (const auto& node : graph_exec->nodes) {
+    host::Enqueue(stream, node);
+  }
+  return hostSuccess;
+}
+
+inline DeviceError CopyToDevice(
+    Handle dst,
+    const void* src,
+    size_t size,
+    StreamType stream = 0) {
+  return host::Copy(dst, src, size, stream);
+}
+
+inline DeviceError CopyToHost(
+    Handle dst,
+    const void* src,
+    size_t size,
+    StreamType stream = 0) {
+  return host::Copy(dst, src, size, stream);
+}
+
+inline DeviceError DeviceToDeviceCopy(
+    Handle dst,
+    const void* src,
+    size_t size,
+    StreamType stream = 0) {
+  return host::Copy(dst, src, size, stream);
+}
+
+inline DeviceError FreeDeviceMemory(Handle src) {
+  std::free(src);
+  return hostSuccess;
+}
+
+inline DeviceError FreeDeviceMemoryAsync(
+    Handle src,
+    StreamType /*stream*/ = 0) {
+  return FreeDeviceMemory(src);
+}
+
+inline DeviceError DeviceMalloc(Handle* dst, size_t size) {
+  if (size == 0) {
+    *dst = nullptr;
+    return hostSuccess;
+  }
+  size_t padded_size =
+      (size + host::kAlignment - 1) / host::kAlignment * host::kAlignment;
+  *dst = std::aligned_alloc(host::kAlignment, padded_size);
+  if (*dst == nullptr) {
+    return host::SetLastError(hostErrorMemoryAllocation);
+  }
+  return hostSuccess;
+}
+
+inline DeviceError DeviceMallocAsync(
+    Handle* dst,
+    size_t size,
+    StreamType /*stream*/ = 0) {
+  return DeviceMalloc(dst, size);
+}
+
+// All host memory is "pinned".
+inline DeviceError HostMalloc(Handle* dst, size_t size) {
+  return DeviceMalloc(dst, size);
+}
+
+inline DeviceError FreeHostMemory(Handle src) {
+  return FreeDeviceMemory(src);
+}
+
+inline DeviceError GetDeviceSuccess() {
+  return hostSuccess;
+}
+
+inline DeviceError DeviceMemset(Handle src, int value, size_t size) {
+  if (size > 0) {
+    std::memset(src, value, size);
+  }
+  return hostSuccess;
+}
+
+inline DeviceError GetLastError() {
+  return std::exchange(host::LastError(), hostSuccess);
+}
+
+inline const char* GetErrorString(DeviceError err) {
+  switch (err) {
+    case hostSuccess:
+      return "no error";
+    case hostErrorInvalidValue:
+      return "invalid argument";
+    case hostErrorMemoryAllocation:
+      return "out of memory";
+    case hostErrorNotReady:
+      return "device not ready";
+    case hostErrorStreamCapture:
+      return "operation not permitted when stream is capturing";
+    default:
+      return "unknown error";
+  }
+}
+
+inline std::string GetLastErrorString() {
+  return GetErrorString(GetLastError());
+}
+
+inline DeviceError StreamSynchronize(StreamType /*stream*/) {
+  return hostSuccess;
+}
+
+inline DeviceError CreateEvent(EventType* event) {
+  *event = new HostEvent();
+  return hostSuccess;
+}
+
+inline DeviceError DestroyEvent(EventType event) {
+  delete event;
+  return hostSuccess;
+}
+
+inline DeviceError EventRecord(EventType event, StreamType stream = 0) {
+  return host::Enqueue(
+      stream, [event]() { event->time = std::chrono::steady_clock::now(); });
+}
+
+inline DeviceError EventSynchronize(EventType /*event*/) {
+  return hostSuccess;
+}
+
+inline DeviceError EventElapsedTime(float* ms, EventType start, EventType end) {
+  *ms = std::chrono::duration<float, std::milli>(end->time - start->time)
+            .count();
+  return hostSuccess;
+}
+
+inline DeviceError QueryEvent(EventType /*event*/) {
+  return hostSuccess;
+}
+
+inline DeviceError GetDeviceNotReady() {
+  return hostErrorNotReady;
+}
+
+} // namespace ait
@@ -16,7 +16,9 @@
 
 #include "model-generated.h"
 #include "raii_wrapper.h"
+#include "staging_pool.h"
 
+#include <atomic>
 #include <condition_variable>
 #include <cstring>
 #include <future>
@@ -102,7 +104,8 @@ class ModelContainer : ModelContainerBase {
       size_t num_inputs,
       size_t num_outputs,
       size_t num_unbound_constants,
-      size_t params_size);
+      size_t params_size,
+      size_t shared_weights_size = 0);
 
   void Run(
       const AITData* inputs,
@@ -123,6 +126,21 @@ class ModelContainer : ModelContainerBase {
       bool graph_mode,
       int64_t** output_shapes_out);
 
+  // Like RunWithOutputsOnHost, but copies the outputs to pinned host buffers
+  // owned by the container, and fills outputs_out with them. The returned
+  // buffers must be given back with ReleaseStagingBuffers, and are not reused
+  // until then.
+  StagingBuffers* RunWithPinnedOutputs(
+      const AITData* inputs,
+      size_t num_inputs,
+      AITData* outputs_out,
+      size_t num_outputs,
+      StreamType stream,
+      bool graph_mode,
+      int64_t** output_shapes_out);
+
+  void ReleaseStagingBuffers(StagingBuffers* buffers);
+
   float Benchmark(
       const AITData* inputs,
       size_t num_inputs,
@@ -135,8 +153,62 @@ class ModelContainer : ModelContainerBase {
       bool use_unique_stream_per_thread,
       int64_t** output_shapes_out);
 
+  // Runs count times without graphs, and times each op of the model, which
+  // must have been compiled with profile_ops. The start and the duration of
+  // each op in each run, in milliseconds since the first op of the run
+  // started, are written to start_ms_out and duration_ms_out, which must hold
+  // count * NumOps() values each.
+  void ProfileOps(
+      const AITData* inputs,
+      size_t num_inputs,
+      AITData* outputs,
+      size_t num_outputs,
+      StreamType stream,
+      size_t count,
+      float* start_ms_out,
+      float* duration_ms_out,
+      int64_t** output_shapes_out);
+
+  // The number of ops which can be profiled, 0 unless the model was compiled
+  // with profile_ops.
+  size_t NumOps() const;
+  const OpInfo& GetOpInfo(size_t op_idx) const;
+
   void SetConstant(const char* name, const AITData& tensor);
 
+  // Like SetConstant for each of the num_tensors constants. All of them are
+  // validated first, so none is set if any of them is invalid.
+  void SetManyConstants(
+      const char** names,
+      const AITData* tensors,
+      size_t num_tensors);
+
+  // Copies the given constants from host memory into device memory owned by
+  // the container, and binds them in all runtimes, so that each constant is
+  // uploaded once. The copies run on the given stream, asynchronously if the
+  // host memory is pinned; unless sync is true, the host memory must stay
+  // valid until they have finished. Like SetConstant, this must not be called
+  // while runs are in flight.
+  void UploadManyConstants(
+      const char** names,
+      const AITData* tensors,
+      size_t num_tensors,
+      StreamType stream,
+      bool sync);
+
+  // Binds the constants of a model compiled with a WeightStore to the
+  // contents of the store in device memory, which must hold at least
+  // SharedWeightsSize() bytes. The memory is not owned by the container, and
+  // must stay valid while it is bound. Like SetConstant, this must not be
+  // called while runs are in flight.
+  void SetSharedWeights(void* weights, size_t num_bytes);
+
+  // The size of the weight store the model was compiled with, or 0 if its
+  // constants are embedded.
+  size_t SharedWeightsSize() const {
+    return shared_weights_size_;
+  }
+
   size_t NumInputs() const;
   size_t NumOutputs() const;
 
@@ -151,6 +223,32 @@ class ModelContainer : ModelContainerBase {
     return models_.size();
   }
 
+  // If enabled, each calling thread prefers the runtime it used last, e.g. so
+  // that a thread with a fixed input shape keeps reusing the same CUDA graph.
+  // Otherwise, calls are spread over the runtimes round robin. Disabled by
+  // default.
+  void SetCallerAffinity(bool enabled) {
+    caller_affinity_ = enabled;
+  }
+
+  // Sets the number of graphs each runtime caches for graph_mode runs.
+  void SetGraphCacheCapacity(size_t capacity);
+  size_t GetGraphCacheCapacity();
+  // Sums the statistics of the graph caches of all runtimes.
+  AITemplateGraphCacheStats GetGraphCacheStats();
+
+  // Sets the number of idle staging buffers kept for runs with outputs on the
+  // host, see StagingPool.
+  void SetStagingPoolCapacity(size_t capacity) {
+    staging_pool_.SetCapacity(capacity);
+  }
+  size_t GetStagingPoolCapacity() {
+    return staging_pool_.Capacity();
+  }
+  AITemplateStagingPoolStats GetStagingPoolStats() {
+    return staging_pool_.Stats();
+  }
+
  private:
   void PrepareForRun(
       Model* model,
@@ -159,9 +257,39 @@ class ModelContainer : ModelContainerBase {
       AITData* outputs,
       size_t num_outputs);
 
+  // Returns a runtime which is not running, blocking until one is available.
   Model* GetAvailableModel();
-  void ReclaimFinishedModels(std::unique_lock<std::mutex>& lk);
+  // Gives back a runtime returned by GetAvailableModel. If pending is true, the
+  // runtime has been launched, and can be reused once it has finished.
+  void ReleaseModel(Model* model, bool pending);
+  // Tries to take one of the runtimes which are available or have finished,
+  // polling them one by one from runtime first. Returns the index of the
+  // runtime, or models_.size() if none is available. Never blocks.
+  size_t TryAcquireRuntime(size_t first);
+  // Takes the pending runtime which was launched first, and waits for it to
+  // finish. Returns models_.size() if no runtime is pending.
+  size_t AcquireOldestPendingRuntime();
+  bool AnyRuntimeReleased() const;
+  size_t FirstRuntimeToTry();
   void ValidateDtype(AITemplateDtype dtype, size_t idx) const;
+  // Returns the index of the constant in the params, or num_params_ if there is
+  // no unbound constant with the given name. Throws if the tensor does not
+  // match the constant.
+  size_t ValidateConstant(const char* name, const AITData& tensor);
+  void AllocateUploadedConstants();
+  // Runs with the outputs in the device buffers of staging, and copies them
+  // to host_outputs, one pointer per output. Only the bytes of the actual
+  // output shapes are copied, asynchronously; the stream is synchronized
+  // before returning.
+  void RunWithStagedOutputs(
+      const AITData* inputs,
+      size_t num_inputs,
+      void* const* host_outputs,
+      size_t num_outputs,
+      StagingBuffers* staging,
+      StreamType stream,
+      bool graph_mode,
+      int64_t** output_shapes_out);
 
   float BenchmarkImpl(
       const AITData* inputs,
@@ -173,14 +301,46 @@ class ModelContainer : ModelContainerBase {
       size_t count,
       int64_t** output_shapes_out);
 
+  // Each runtime's state is a single atomic word: the RuntimeState in the low
+  // kRuntimeStateBits bits, and the index of its last launch in the others.
+  // Runtimes are acquired with a compare-and-swap on this word, so dispatch
+  // does not take a lock, and the launch index rules out ABA problems when a
+  // runtime is relaunched while another thread polls it.
+  enum RuntimeState : uint64_t {
+    // Free to use.
+    kAvailable = 0,
+    // Owned by a caller of GetAvailableModel.
+    kRunning = 1,
+    // Launched; free to use once its run has finished.
+    kPending = 2,
+  };
+  static constexpr uint64_t kRuntimeStateBits = 2;
+  static constexpr uint64_t kRuntimeStateMask = (1 << kRuntimeStateBits) - 1;
+
   std::vector<Model> models_;
-  std::vector<Model*> available_models_;
-  std::deque<Model*> pending_models_;
+  // The state of each runtime in models_, see RuntimeState.
+  std::vector<std::atomic<uint64_t>> runtime_states_;
+  std::atomic<uint64_t> num_launches_{0};
+  std::atomic<size_t> next_runtime_{0};
+  std::atomic<bool> caller_affinity_{false};
 
-  // Guards accesses to available/pending models.
+  // Only used to wait for a runtime when all of them are owned by callers,
+  // i.e. none of them can be reclaimed.
   std::mutex models_mutex_;
-  // Notified whenever a model is put into pending_models_.
-  std::condition_variable pending_models_available_;
+  std::condition_variable model_released_;
+  std::atomic<size_t> num_waiters_{0};
+
+  // Storage for the constants set with UploadManyConstants, allocated on the
+  // first call, and the offset of each unbound constant in it.
+  GPUPtr uploaded_constants_{nullptr, FreeDeviceMemory};
+  std::vector<size_t> uploaded_constant_offsets_;
+
+  // Scratch buffers of RunWithOutputsOnHost and RunWithPinnedOutputs.
+  StagingPool staging_pool_;
+
+  // See SetSharedWeights; nullptr until they are set.
+  size_t shared_weights_size_;
+  void* shared_weights_ = nullptr;
 
   size_t num_inputs_;
   size_t num_outputs_;
@@ -63,6 +63,8 @@ enum class AITemplateDtype {
   kFloat,
   kInt,
   kLong,
+  kBFloat16,
+  kInt8,
 };
 
 struct AITData {
@@ -89,11 +91,51 @@ inline size_t AITemplateDtypeSizeBytes(AITemplateDtype dtype) {
       return 4;
     case AITemplateDtype::kLong:
       return 8;
+    case AITemplateDtype::kBFloat16:
+      return 2;
+    case AITemplateDtype::kInt8:
+      return 1;
     case AITemplateDtype::kUnset:
       throw std::runtime_error("Unset dtype has no size!");
   }
 }
 
+// Statistics of the graph caches of all runtimes in a container, see
+// AITemplateModelContainerGetGraphCacheStats.
+struct AITemplateGraphCacheStats {
+  // graph_mode runs which relaunched a cached graph as is
+  uint64_t hits = 0;
+  // graph_mode runs which captured and instantiated a graph
+  uint64_t misses = 0;
+  // graph_mode runs with cached dims but new I/O pointers, which recaptured
+  // the graph and updated the cached graph exec
+  uint64_t updates = 0;
+  // cached graphs dropped to make room for others
+  uint64_t evictions = 0;
+  // number of cached graphs
+  size_t size = 0;
+};
+
+// Statistics of the staging buffers of a container, which hold the outputs
+// of runs with outputs on the host, see
+// AITemplateModelContainerGetStagingPoolStats.
+struct AITemplateStagingPoolStats {
+  // buffers allocated because none were idle
+  uint64_t allocations = 0;
+  // pinned host buffers allocated for buffers which had none
+  uint64_t pinned_allocations = 0;
+  // runs which reused idle buffers
+  uint64_t reuses = 0;
+  // buffers used by runs, or leased by
+  // AITemplateModelContainerRunWithPinnedOutputs
+  size_t in_use = 0;
+  // buffers kept for later runs
+  size_t idle = 0;
+};
+
+struct AITemplateStagingBuffersOpaque {};
+using AITemplateStagingBuffersHandle = AITemplateStagingBuffersOpaque*;
+
 struct AITemplateStreamOpaque {};
 using AITemplateStreamHandle = AITemplateStreamOpaque*;
 
@@ -110,6 +152,40 @@ AIT_EXPORT AITemplateError AITemplateModelContainerSetConstant(
     const char* name,
     const AITData* tensor);
 
+// Sets num_tensors constants in one call; names and tensors are parallel
+// arrays. Nothing is set if any of the tensors is invalid.
+AIT_EXPORT AITemplateError AITemplateModelContainerSetManyConstants(
+    AITemplateModelHandle handle,
+    const char** names,
+    const AITData* tensors,
+    size_t num_tensors);
+
+// Like AITemplateModelContainerSetManyConstants, but the tensors are in host
+// memory. They are copied on the given stream into device memory owned by the
+// container, which is shared by all runtimes. The copies are asynchronous if
+// the host memory is pinned; unless sync is true, it must stay valid until
+// they have finished.
+AIT_EXPORT AITemplateError AITemplateModelContainerUploadManyConstants(
+    AITemplateModelHandle handle,
+    const char** names,
+    const AITData* tensors,
+    size_t num_tensors,
+    AITemplateStreamHandle stream_handle,
+    bool sync);
+
+// Binds the constants of a model compiled with a WeightStore to the contents
+// of the store in device memory, see ModelContainer::SetSharedWeights.
+AIT_EXPORT AITemplateError AITemplateModelContainerSetSharedWeights(
+    AITemplateModelHandle handle,
+    void* weights,
+    size_t num_bytes);
+
+// The size of the weight store the model was compiled with, or 0 if its
+// constants are embedded in the library.
+AIT_EXPORT AITemplateError AITemplateModelContainerGetSharedWeightsSize(
+    AITemplateModelHandle handle,
+    size_t* num_bytes_out);
+
 AIT_EXPORT AITemplateError AITemplateModelContainerRun(
     AITemplateModelHandle handle,
     const AITData* inputs,
@@ -135,6 +211,26 @@ AIT_EXPORT AITemplateError AITemplateModelContainerRunWithOutputsOnHost(
     bool graph_mode,
     int64_t** output_shapes_out);
 
+// Like AITemplateModelContainerRunWithOutputsOnHost, but the outputs are
+// copied to pinned host buffers owned by the container, which are returned in
+// outputs_out, with the maximum shapes of the outputs. The buffers are leased
+// to the caller, and are not reused until they are given back with
+// AITemplateModelContainerReleaseStagingBuffers.
+AIT_EXPORT AITemplateError AITemplateModelContainerRunWithPinnedOutputs(
+    AITemplateModelHandle handle,
+    const AITData* inputs,
+    size_t num_inputs,
+    AITData* outputs_out,
+    size_t num_outputs,
+    AITemplateStreamHandle stream_handle,
+    bool graph_mode,
+    int64_t** output_shapes_out,
+    AITemplateStagingBuffersHandle* buffers_out);
+
+AIT_EXPORT AITemplateError AITemplateModelContainerReleaseStagingBuffers(
+    AITemplateModelHandle handle,
+    AITemplateStagingBuffersHandle buffers);
+
 AIT_EXPORT AITemplateError AITemplateModelContainerBenchmark(
     AITemplateModelHandle handle,
     const AITData* inputs,
@@ -149,6 +245,34 @@ AIT_EXPORT AITemplateError AITemplateModelContainerBenchmark(
     float* runtime_ms,
     int64_t** output_shapes_out);
 
+// Times each op of a model compiled with profile_ops, see
+// ModelContainer::ProfileOps. start_ms_out and duration_ms_out must hold
+// count * num_ops values each, see AITemplateModelContainerGetNumOps.
+AIT_EXPORT AITemplateError AITemplateModelContainerProfileOps(
+    AITemplateModelHandle handle,
+    const AITData* inputs,
+    size_t num_inputs,
+    AITData* outputs,
+    size_t num_outputs,
+    AITemplateStreamHandle stream_handle,
+    size_t count,
+    float* start_ms_out,
+    float* duration_ms_out,
+    int64_t** output_shapes_out);
+
+// The number of ops which can be profiled, 0 unless the model was compiled
+// with profile_ops.
+AIT_EXPORT AITemplateError AITemplateModelContainerGetNumOps(
+    AITemplateModelHandle handle,
+    size_t* num_ops_out);
+
+// The unique name and the type of an op, in launch order.
+AIT_EXPORT AITemplateError AITemplateModelContainerGetOpInfo(
+    AITemplateModelHandle handle,
+    size_t op_idx,
+    const char** name_out,
+    const char** op_out);
+
 AIT_EXPORT AITemplateError AITemplateModelContainerGetNumInputs(
     AITemplateModelHandle handle,
     size_t* num_inputs_out);
@@ -181,4 +305,39 @@ AIT_EXPORT AITemplateError AITemplateModelContainerGetNumRuntimes(
     AITemplateModelHandle handle,
     size_t* num_runtimes_out);
 
+// If enabled, each thread calling Run prefers the runtime it used last.
+// Disabled by default.
+AIT_EXPORT AITemplateError AITemplateModelContainerSetCallerAffinity(
+    AITemplateModelHandle handle,
+    bool enabled);
+
+// Sets the number of graphs each runtime caches for graph_mode runs, keyed by
+// the values of the dynamic input dims. Must be positive. Defaults to 8.
+AIT_EXPORT AITemplateError AITemplateModelContainerSetGraphCacheCapacity(
+    AITemplateModelHandle handle,
+    size_t capacity);
+
+AIT_EXPORT AITemplateError AITemplateModelContainerGetGraphCacheCapacity(
+    AITemplateModelHandle handle,
+    size_t* capacity_out);
+
+AIT_EXPORT AITemplateError AITemplateModelContainerGetGraphCacheStats(
+    AITemplateModelHandle handle,
+    AITemplateGraphCacheStats* stats_out);
+
+// Sets the number of staging buffers the container keeps for runs with
+// outputs on the host while they are idle. Defaults to the number of
+// runtimes.
+AIT_EXPORT AITemplateError AITemplateModelContainerSetStagingPoolCapacity(
+    AITemplateModelHandle handle,
+    size_t capacity);
+
+AIT_EXPORT AITemplateError AITemplateModelContainerGetStagingPoolCapacity(
+    AITemplateModelHandle handle,
+    size_t* capacity_out);
+
+AIT_EXPORT AITemplateError AITemplateModelContainerGetStagingPoolStats(
+    AITemplateModelHandle handle,
+    AITemplateStagingPoolStats* stats_out);
+
 } // extern "C"
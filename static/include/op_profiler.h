@@ -0,0 +1,76 @@
+//  Copyright (c) Meta Platforms, Inc. and affiliates.
+//
+//  Licensed under the Apache License, Version 2.0 (the "License");
+//  you may not use this file except in compliance with the License.
+//  You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+//  Unless required by applicable law or agreed to in writing, software
+//  distributed under the License is distributed on an "AS IS" BASIS,
+//  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+//  See the License for the specific language governing permissions and
+//  limitations under the License.
+//
+#pragma once
+
+#include <array>
+#include <vector>
+
+#include "device_functions-generated.h"
+#include "macros.h"
+#include "raii_wrapper.h"
+
+namespace ait {
+
+// An op of a Model compiled with profile_ops, in launch order.
+struct OpInfo {
+  // The unique name of the op.
+  const char* name;
+  // The type of the op, e.g. gemm_rcr_bias.
+  const char* op;
+};
+
+// Records an event before each op of a Model compiled with profile_ops, and
+// one after the last op, so that the time of each op can be measured. Events
+// are only recorded while enabled, so that regular runs are not slowed down.
+class OpProfiler {
+ public:
+  explicit OpProfiler(size_t num_ops) {
+    events_.reserve(num_ops + 1);
+    for (size_t i = 0; i <= num_ops; ++i) {
+      events_.push_back(RAII_CreateEvent());
+    }
+  }
+
+  void SetEnabled(bool enabled) {
+    enabled_ = enabled;
+  }
+
+  // Called by the Model before op idx is launched, and with idx = num_ops
+  // after the last one.
+  void Record(size_t idx, StreamType stream) {
+    if (enabled_) {
+      DEVICE_CHECK(EventRecord(events_[idx].get(), stream));
+    }
+  }
+
+  // Waits for the events of the last run, and writes the start and the
+  // duration of each of its ops, in milliseconds since the first op started.
+  void GetTimings(float* start_ms_out, float* duration_ms_out) {
+    DEVICE_CHECK(EventSynchronize(events_.back().get()));
+    const size_t num_ops = events_.size() - 1;
+    for (size_t i = 0; i < num_ops; ++i) {
+      DEVICE_CHECK(EventElapsedTime(
+          &start_ms_out[i], events_.front().get(), events_[i].get()));
+      DEVICE_CHECK(EventElapsedTime(
+          &duration_ms_out[i], events_[i].get(), events_[i + 1].get()));
+    }
+  }
+
+ private:
+  std::vector<EventPtr> events_;
+  bool enabled_ = false;
+};
+
+} // namespace ait
@@ -26,6 +26,9 @@ namespace ait {
 // to malloc/free are synchronous for simplicity.
 using GPUPtr = std::unique_ptr<void, decltype(&FreeDeviceMemory)>;
 
+// RAII wrapper for owned page-locked host memory.
+using PinnedHostPtr = std::unique_ptr<void, decltype(&FreeHostMemory)>;
+
 using StreamPtr = std::
     unique_ptr<std::remove_pointer<StreamType>::type, decltype(&StreamDestroy)>;
 
@@ -38,6 +41,12 @@ inline GPUPtr RAII_DeviceMalloc(size_t num_bytes) {
   return GPUPtr(output, FreeDeviceMemory);
 }
 
+inline PinnedHostPtr RAII_HostMalloc(size_t num_bytes) {
+  void* output;
+  DEVICE_CHECK(HostMalloc(&output, num_bytes));
+  return PinnedHostPtr(output, FreeHostMemory);
+}
+
 inline StreamPtr RAII_StreamCreate(bool non_blocking = false) {
   StreamType stream;
   DEVICE_CHECK(StreamCreate(&stream, non_blocking));
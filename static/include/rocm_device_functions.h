@@ -137,6 +137,15 @@ inline DeviceError DeviceMallocAsync(
   return hipMalloc(dst, size);
 }
 
+// Page-locked host memory, which can be copied to and from asynchronously.
+inline DeviceError HostMalloc(Handle* dst, size_t size) {
+  return hipHostMalloc(dst, size);
+}
+
+inline DeviceError FreeHostMemory(Handle src) {
+  return hipHostFree(src);
+}
+
 inline DeviceError GetDeviceSuccess() {
   return hipSuccess;
 }
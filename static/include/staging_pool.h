@@ -0,0 +1,153 @@
+//  Copyright (c) Meta Platforms, Inc. and affiliates.
+//
+//  Licensed under the Apache License, Version 2.0 (the "License");
+//  you may not use this file except in compliance with the License.
+//  You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+//  Unless required by applicable law or agreed to in writing, software
+//  distributed under the License is distributed on an "AS IS" BASIS,
+//  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+//  See the License for the specific language governing permissions and
+//  limitations under the License.
+//
+#pragma once
+
+#include <memory>
+#include <mutex>
+#include <stdexcept>
+#include <unordered_map>
+#include <vector>
+
+#include "model_interface.h"
+#include "raii_wrapper.h"
+
+namespace ait {
+
+// The scratch buffers of one run whose outputs go to the host: a device
+// buffer for each output, which the run writes to, and optionally a pinned
+// host buffer for each output, which the outputs are copied to
+// asynchronously. Both are indexed by output and sized by the maximum storage
+// bytes of the output.
+struct StagingBuffers {
+  std::vector<GPUPtr> device;
+  // Empty until the buffers are acquired with pinned = true.
+  std::vector<PinnedHostPtr> host;
+};
+
+// Pool of StagingBuffers, so that runs with outputs on the host don't
+// allocate device memory and pinned host memory on every call. Buffers are
+// reused most recently released first. At most Capacity() buffers are kept
+// while idle; more are allocated if needed, and freed when they are released.
+//
+// All methods are thread safe. The pool owns all buffers, including those
+// which are acquired when it is destroyed.
+class StagingPool {
+ public:
+  StagingPool(std::vector<size_t> output_bytes, size_t capacity)
+      : output_bytes_(std::move(output_bytes)) {
+    SetCapacity(capacity);
+  }
+
+  StagingPool(const StagingPool&) = delete;
+  StagingPool& operator=(const StagingPool&) = delete;
+
+  // Returns idle buffers, or allocates new ones if there are none. If pinned
+  // is true, the buffers include pinned host buffers.
+  StagingBuffers* Acquire(bool pinned) {
+    StagingBuffers* buffers = nullptr;
+    {
+      std::lock_guard<std::mutex> lk(mutex_);
+      if (!idle_.empty()) {
+        buffers = idle_.back();
+        idle_.pop_back();
+        stats_.reuses++;
+      }
+    }
+    if (buffers == nullptr) {
+      auto owned = std::make_unique<StagingBuffers>();
+      owned->device.reserve(output_bytes_.size());
+      for (auto num_bytes : output_bytes_) {
+        owned->device.push_back(RAII_DeviceMalloc(num_bytes));
+      }
+      buffers = owned.get();
+      std::lock_guard<std::mutex> lk(mutex_);
+      buffers_.emplace(buffers, std::move(owned));
+      stats_.allocations++;
+    }
+    if (pinned && buffers->host.empty()) {
+      try {
+        buffers->host.reserve(output_bytes_.size());
+        for (auto num_bytes : output_bytes_) {
+          buffers->host.push_back(RAII_HostMalloc(num_bytes));
+        }
+      } catch (...) {
+        buffers->host.clear();
+        Release(buffers);
+        throw;
+      }
+      std::lock_guard<std::mutex> lk(mutex_);
+      stats_.pinned_allocations++;
+    }
+    return buffers;
+  }
+
+  // Gives back buffers returned by Acquire. All work using them must have
+  // finished. If reuse is false, e.g. because a run using them failed, they
+  // are freed instead of being kept for later runs.
+  void Release(StagingBuffers* buffers, bool reuse = true) {
+    std::unique_ptr<StagingBuffers> freed;
+    std::lock_guard<std::mutex> lk(mutex_);
+    auto it = buffers_.find(buffers);
+    if (it == buffers_.end()) {
+      throw std::invalid_argument("Unknown staging buffers");
+    }
+    if (reuse && idle_.size() < capacity_) {
+      idle_.push_back(buffers);
+    } else {
+      // freed once the lock is released
+      freed = std::move(it->second);
+      buffers_.erase(it);
+    }
+  }
+
+  // Sets the number of buffers kept while idle, and frees those above it.
+  void SetCapacity(size_t capacity) {
+    std::vector<std::unique_ptr<StagingBuffers>> freed;
+    std::lock_guard<std::mutex> lk(mutex_);
+    capacity_ = capacity;
+    while (idle_.size() > capacity_) {
+      auto it = buffers_.find(idle_.front());
+      freed.push_back(std::move(it->second));
+      buffers_.erase(it);
+      idle_.erase(idle_.begin());
+    }
+  }
+
+  size_t Capacity() {
+    std::lock_guard<std::mutex> lk(mutex_);
+    return capacity_;
+  }
+
+  AITemplateStagingPoolStats Stats() {
+    std::lock_guard<std::mutex> lk(mutex_);
+    auto stats = stats_;
+    stats.idle = idle_.size();
+    stats.in_use = buffers_.size() - idle_.size();
+    return stats;
+  }
+
+ private:
+  const std::vector<size_t> output_bytes_;
+
+  std::mutex mutex_;
+  size_t capacity_;
+  std::unordered_map<StagingBuffers*, std::unique_ptr<StagingBuffers>>
+      buffers_;
+  // Most recently released last.
+  std::vector<StagingBuffers*> idle_;
+  AITemplateStagingPoolStats stats_;
+};
+
+} // namespace ait
@@ -0,0 +1,101 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import gc
+import unittest
+
+import numpy as np
+
+from aitemplate.utils import array_interface
+from aitemplate.utils.array_interface import DLDeviceType, DLPackArray, get_array_info
+
+
+class _DLPackOnly:
+    """Exposes only the DLPack protocol of an array."""
+
+    def __init__(self, array):
+        self._array = array
+
+    def __dlpack__(self, stream=None):
+        return self._array.__dlpack__(stream=stream)
+
+    def __dlpack_device__(self):
+        return self._array.__dlpack_device__()
+
+
+class ArrayInterfaceTestCase(unittest.TestCase):
+    def test_array_interface(self):
+        arr = np.arange(12, dtype=np.float16).reshape(3, 4)
+        info = get_array_info(arr)
+        self.assertEqual(info.data_ptr, arr.ctypes.data)
+        self.assertEqual(info.shape, [3, 4])
+        self.assertEqual(info.dtype, "float16")
+        self.assertEqual(info.device_type, DLDeviceType.CPU)
+        self.assertTrue(info.on_host)
+
+        with self.assertRaises(ValueError):
+            get_array_info(arr.T)
+        with self.assertRaises(ValueError):
+            get_array_info(arr.astype(np.float64))
+        # size 1 dims may have any stride
+        get_array_info(arr[1:2])
+        with self.assertRaises(TypeError):
+            get_array_info([1, 2, 3])
+
+    def test_dlpack(self):
+        arr = np.arange(24, dtype=np.int32).reshape(2, 3, 4)
+        info = get_array_info(_DLPackOnly(arr[1]))
+        self.assertEqual(info.data_ptr, arr[1].ctypes.data)
+        self.assertEqual(info.shape, [3, 4])
+        self.assertEqual(info.dtype, "int32")
+        self.assertEqual(info.device_type, DLDeviceType.CPU)
+        with self.assertRaises(ValueError):
+            get_array_info(_DLPackOnly(arr[:, 1]))
+
+    def test_export(self):
+        arr = np.arange(6, dtype=np.float32)
+        exported = DLPackArray(
+            arr.ctypes.data, [2, 3], "float32", DLDeviceType.CPU, owner=arr
+        )
+        self.assertEqual(exported.__dlpack_device__(), (DLDeviceType.CPU, 0))
+        self.assertFalse(hasattr(exported, "__cuda_array_interface__"))
+        del arr
+
+        # shares the memory
+        imported = np.from_dlpack(exported)
+        np.testing.assert_array_equal(imported, np.arange(6).reshape(2, 3))
+        np.asarray(exported)[0, 0] = 7
+        self.assertEqual(imported[0, 0], 7)
+
+        # the exported tensor keeps the memory alive
+        del exported
+        gc.collect()
+        np.testing.assert_array_equal(imported[1], [3, 4, 5])
+
+        # unconsumed capsules are deleted, too
+        capsule = DLPackArray(
+            imported.ctypes.data, [6], "float32", DLDeviceType.CPU
+        ).__dlpack__()
+        del capsule, imported
+        gc.collect()
+        self.assertEqual(array_interface._EXPORTED_TENSORS, {})
+
+        device_array = DLPackArray(1024, [2], "float16", DLDeviceType.CUDA, 1)
+        self.assertEqual(device_array.__dlpack_device__(), (DLDeviceType.CUDA, 1))
+        self.assertEqual(device_array.__cuda_array_interface__["data"], (1024, False))
+        self.assertFalse(hasattr(device_array, "__array_interface__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
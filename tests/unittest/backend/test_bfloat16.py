@@ -0,0 +1,137 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Codegen of bfloat16 graphs.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.backend import registry
+from aitemplate.backend.codegen import dtype_to_enumerator
+from aitemplate.backend.cuda.lib_template import ptr_decl
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.base import get_dtype_size
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils.graph_utils import get_sorted_ops
+
+
+def _input(name, shape=(8, 64)):
+    return Tensor(shape=list(shape), dtype="bfloat16", name=name, is_input=True)
+
+
+def _graph(output):
+    output._attrs["name"] = "y"
+    output._attrs["is_output"] = True
+    graph = transform.toposort([output])
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    return graph
+
+
+class BFloat16TestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def test_dtype(self):
+        self.assertEqual(get_dtype_size("bfloat16"), 2)
+        self.assertEqual(_input("x").size_bytes(), 8 * 64 * 2)
+        self.assertEqual(dtype_to_enumerator("bfloat16"), "AITemplateDtype::kBFloat16")
+        self.assertEqual(
+            ptr_decl("x", "bfloat16").strip(), "cutlass::bfloat16_t* x {nullptr};"
+        )
+
+    def test_output_dtype(self):
+        x = _input("x")
+        gamma = _input("gamma", shape=(64,))
+        beta = _input("beta", shape=(64,))
+        y = ops.elementwise(FuncEnum.TANH)(x)
+        self.assertEqual(y.dtype(), "bfloat16")
+        self.assertEqual((2.0 * y).dtype(), "bfloat16")
+        self.assertEqual(ops.softmax()(y, -1).dtype(), "bfloat16")
+        self.assertEqual(ops.layernorm()(x, gamma, beta, [64]).dtype(), "bfloat16")
+        w, bias = _input("w"), _input("bias", shape=(8,))
+        self.assertEqual(ops.gemm_rcr()(x, w).dtype(), "bfloat16")
+        self.assertEqual(ops.gemm_rcr_bias()(x, w, bias).dtype(), "bfloat16")
+
+    def _fused_elementwise(self, output):
+        graph = _graph(output)
+        with host_target():
+            graph = transform.fuse_ops(graph)
+            (op,) = get_sorted_ops(graph)
+            src = op.gen_function()
+            func_call = registry.get("cuda.fused_elementwise.func_call")(
+                op._attrs, indent="  "
+            )
+        return src, func_call
+
+    def test_elementwise(self):
+        x0, x1 = _input("x0"), _input("x1")
+        src, func_call = self._fused_elementwise(x0 * x1 + x0)
+        self.assertIn("const __nv_bfloat162* p_tmp_i0", src)
+        self.assertIn("__hadd2(__hmul2(", src)
+        self.assertIn("reinterpret_cast<__nv_bfloat16*>(x0)", func_call)
+
+        # there is no native bfloat16 tanh, it runs in float
+        x0, x1 = _input("x0"), _input("x1")
+        src, _ = self._fused_elementwise(ops.elementwise(FuncEnum.TANH)(x0) * x1)
+        self.assertIn(
+            "__hmul(__float2bfloat16_rn(tanh(__bfloat162float(p_tmp_i0[i]))),", src
+        )
+
+    def test_softmax(self):
+        graph = _graph(ops.softmax()(_input("x"), -1))
+        (op,) = get_sorted_ops(graph)
+        with host_target():
+            src = op.gen_function()
+            func_call = registry.get("cuda.softmax.func_call")(op._attrs)
+        self.assertIn("cutlass::bfloat16_t* input", src)
+        self.assertIn("softmaxBlockNocache<cutlass::bfloat16_t>", src)
+        self.assertNotIn("cutlass::half_t", src)
+        self.assertIn("reinterpret_cast<cutlass::bfloat16_t*>", func_call)
+
+    def test_layernorm(self):
+        x = _input("x")
+        gamma = _input("gamma", shape=(64,))
+        beta = _input("beta", shape=(64,))
+        graph = _graph(ops.layernorm()(x, gamma, beta, [64]))
+        (op,) = get_sorted_ops(graph)
+        with host_target():
+            src = op.gen_function()
+            func_call = registry.get("cuda.layernorm.func_call")(op._attrs)
+        self.assertIn("invokeLayernormSigmoidMul<__nv_bfloat16, float", src)
+        self.assertIn("reinterpret_cast<__nv_bfloat16*>(&(y->raw()))", func_call)
+
+    def test_gemm(self):
+        x, w = _input("x"), _input("w")
+        graph = _graph(ops.gemm_rcr()(x, w))
+        (op,) = get_sorted_ops(graph)
+        with host_target():
+            func_decl = registry.get("cuda.gemm_rcr.func_decl")(op._attrs)
+        self.assertIn("cutlass::bfloat16_t*", func_decl)
+        self.assertNotIn("cutlass::half_t", func_decl)
+
+
+if __name__ == "__main__":
+    unittest.main()
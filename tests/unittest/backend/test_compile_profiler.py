@@ -0,0 +1,147 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.backend.builder import Runner
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils import compile_profiler
+from aitemplate.utils.compile_profiler import CompileProfiler
+
+
+def _build_graph():
+    x = Tensor(shape=[16, 64], dtype="float16", name="x", is_input=True)
+    w = Tensor(shape=[64, 64], dtype="float16", name="w")
+    b = Tensor(shape=[64], dtype="float16", name="b")
+    y = ops.gemm_rcr_bias()(x, w, b)
+    y = ops.elementwise(FuncEnum.TANH)(y)
+    y = ops.elementwise(FuncEnum.ADD)(y, x)
+    y._attrs["name"] = "y"
+    y._attrs["is_output"] = True
+    graph = transform.toposort(y)
+    transform.remove_unused_ops(graph)
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    return graph
+
+
+class CompileProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def test_no_profiler(self):
+        self.assertIsNone(compile_profiler.current())
+        with compile_profiler.stage("stage") as record:
+            self.assertIsNone(record)
+        compile_profiler.add_build_task("task", 0.0, 0.0, 0.0)
+
+    def test_stages(self):
+        with host_target(), CompileProfiler() as profiler:
+            self.assertIs(compile_profiler.current(), profiler)
+            with self.assertRaises(RuntimeError):
+                with CompileProfiler():
+                    pass
+            graph = _build_graph()
+            with profiler.stage("optimize_graph"):
+                transform.optimize_graph(graph, self._tmp_dir.name)
+        self.assertIsNone(compile_profiler.current())
+
+        top = profiler.stages[0]
+        self.assertEqual((top.name, top.depth), ("optimize_graph", 0))
+        passes = [record for record in profiler.stages if record.depth == 1]
+        self.assertIn("fuse_ops", [record.name for record in passes])
+        self.assertEqual(passes[-1].name, "restore invariants")
+        for record in profiler.stages:
+            self.assertGreaterEqual(record.end, record.start)
+            self.assertGreaterEqual(record.self_time, -1e-9)
+        self.assertAlmostEqual(
+            top.children_time, sum(record.duration for record in passes)
+        )
+
+        table = profiler.summary_table()
+        self.assertIn("optimize_graph", table)
+        self.assertIn(". fuse_ops", table)
+
+    def test_build_tasks(self):
+        runner = Runner([0, 1], timeout=30)
+        with CompileProfiler() as profiler:
+            with profiler.stage("build_objs"):
+                for i in range(3):
+                    runner.push(i, "sleep 0.2", f"obj_{i}.o")
+                runner.push(3, "exit 1", "obj_3.o")
+                runner.join()
+                with self.assertRaises(RuntimeError):
+                    runner.pull()
+
+        tasks = {task.name: task for task in profiler.build_tasks}
+        self.assertEqual(sorted(tasks), ["obj_0.o", "obj_1.o", "obj_2.o", "obj_3.o"])
+        self.assertTrue(tasks["obj_3.o"].failed)
+        self.assertEqual({task.lane for task in tasks.values()}, {0, 1})
+        for task in tasks.values():
+            self.assertGreaterEqual(task.queue_wait, 0)
+            self.assertGreaterEqual(task.compile_time, 0)
+        # two of the sleeps run first, the others wait for a free builder
+        waits = sorted(task.queue_wait for task in tasks.values())
+        self.assertGreater(waits[-1], 0.15)
+        self.assertGreater(tasks["obj_0.o"].compile_time, 0.15)
+
+        summary = profiler.build_summary()
+        self.assertEqual(summary["num_tasks"], 4)
+        self.assertEqual(summary["num_failed"], 1)
+        self.assertIn("build tasks: 4", profiler.summary_table())
+
+    def test_chrome_trace(self):
+        path = os.path.join(self._tmp_dir.name, "compile_profile.json")
+        with CompileProfiler() as profiler:
+            with compile_profiler.stage("codegen"):
+                with compile_profiler.stage("gen_function_src", num_ops=3):
+                    pass
+            profiler.add_build_task("a/b.o", 1.0, 2.0, 3.0, lane=2)
+            profiler.add_build_task("a/c.o", 1.0, 1.0, 1.0, cache_hit=True)
+        profiler.save(path)
+
+        with open(path) as f:
+            trace = json.load(f)
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(
+            [e["name"] for e in events], ["codegen", "gen_function_src", "b.o", "c.o"]
+        )
+        codegen, gen_src, build, _ = events
+        self.assertEqual(gen_src["args"]["num_ops"], 3)
+        self.assertLessEqual(codegen["ts"], gen_src["ts"])
+        self.assertGreaterEqual(
+            codegen["ts"] + codegen["dur"], gen_src["ts"] + gen_src["dur"]
+        )
+        self.assertEqual(build["tid"], 3)
+        self.assertAlmostEqual(build["dur"], 1e6)
+        self.assertAlmostEqual(build["args"]["queue_wait_ms"], 1000.0)
+        self.assertEqual(trace["buildSummary"]["num_cache_hits"], 1)
+        self.assertEqual(trace["buildSummary"]["slowest_task"], "a/b.o")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,274 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Launch config selection of fused_elementwise kernels.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.backend import registry
+from aitemplate.backend.backend_spec import CUDASpec
+from aitemplate.backend.common import elementwise_common
+from aitemplate.backend.common.elementwise_common import LaunchConfig
+from aitemplate.backend.profiler_cache import ProfileCacheDB
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.frontend import IntVar, Tensor
+from aitemplate.testing.host_target import host_target, HostTarget
+from aitemplate.utils.graph_utils import get_sorted_ops
+
+# A fake compiler of profilers. The profiler of block256_vec2 is the fastest.
+FAKE_CC = """#!/bin/sh
+echo $2 >> $(dirname $0)/build.log
+if [ $(basename $2) = block256_vec2 ]; then TIME=0.5; else TIME=1.0; fi
+printf '#!/bin/sh\\necho TIME:%s\\necho WS:0\\n' $TIME > $2
+chmod +x $2
+"""
+
+
+class _FakeCCTarget(HostTarget):
+    """A host-only target, which builds profilers with FAKE_CC."""
+
+    def __init__(self, cc_path, **kwargs):
+        super().__init__(**kwargs)
+        self._cc_path = cc_path
+
+    def compile_cmd(self, executable=False):
+        return self._cc_path + " {src} {target}"
+
+
+def _fused_op(shape, func=FuncEnum.TANH):
+    x = Tensor(shape=shape, dtype="float16", name="x", is_input=True)
+    y = ops.elementwise(func)(x) * x
+    y._attrs["name"] = "y"
+    y._attrs["is_output"] = True
+    graph = transform.toposort([y])
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    graph = transform.fuse_ops(graph)
+    (op,) = get_sorted_ops(graph)
+    return graph, op
+
+
+class FusedElementwiseLaunchConfigTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def test_heuristics(self):
+        self.assertEqual(
+            LaunchConfig.from_name("block512_vec4_grid_stride"),
+            LaunchConfig(512, 4, True),
+        )
+        self.assertEqual(LaunchConfig(128, 2, False).name(), "block128_vec2")
+        self.assertEqual(
+            elementwise_common.heuristic_launch_config(1024),
+            elementwise_common.DEFAULT_LAUNCH_CONFIG,
+        )
+        self.assertTrue(elementwise_common.heuristic_launch_config(1 << 31).grid_stride)
+        self.assertEqual(elementwise_common.get_index_type(1 << 30), "int")
+        self.assertEqual(elementwise_common.get_index_type(1 << 31), "int64_t")
+        # grid-stride kernels are only profiled for large ops
+        self.assertFalse(
+            any(
+                launch_config.grid_stride
+                for launch_config in elementwise_common.launch_config_candidates(
+                    1 << 20
+                )
+            )
+        )
+        self.assertEqual(
+            elementwise_common.launch_config_candidates(1 << 32),
+            elementwise_common.LAUNCH_CONFIG_CANDIDATES,
+        )
+
+    def test_codegen(self):
+        with host_target():
+            _, op = _fused_op([1024, 64])
+            src = op.gen_function()
+            func_decl = registry.get("cuda.fused_elementwise.func_decl")(op._attrs)
+            self.assertIn("#define FUSED_ELE_THREAD_SIZE 256", src)
+            self.assertIn("const int N_VECTORS_PER_THREAD = 1;", src)
+            self.assertNotIn("grid_stride", src)
+            self.assertIn("int n_elements, cudaStream_t stream);", func_decl)
+
+            src = elementwise_common.fused_elementwise_gen_function(
+                op._attrs,
+                custom_libs="",
+                head_template="",
+                backend_spec=CUDASpec(),
+                launch_config=LaunchConfig(512, 4, True),
+            )
+            self.assertIn("#define FUSED_ELE_THREAD_SIZE 512", src)
+            self.assertIn("const int N_VECTORS_PER_THREAD = 4;", src)
+            self.assertIn("thread_idx += grid_stride", src)
+            self.assertIn("GRID_STRIDE_MAX_BLOCKS", src)
+
+    def test_int64_index(self):
+        batch = IntVar(values=[1, 1 << 16], name="batch")
+        with host_target():
+            _, op = _fused_op([batch, 1 << 16])
+            src = op.gen_function()
+            func_call = registry.get("cuda.fused_elementwise.func_call")(
+                op._attrs, indent="  "
+            )
+        self.assertIn("int64_t n_elements)", src)
+        self.assertIn("int64_t grid_size", src)
+        self.assertIn("thread_idx += grid_stride", src)
+        self.assertIn(f"int64_t {op._attrs['name']}_n_elements = batch", func_call)
+
+    def test_profile(self):
+        cc_path = os.path.join(self._tmp_dir.name, "cc.sh")
+        with open(cc_path, "w") as f:
+            f.write(FAKE_CC)
+        os.chmod(cc_path, 0o755)
+        log = os.path.join(self._tmp_dir.name, "build.log")
+        workdir = os.path.join(self._tmp_dir.name, "workdir")
+
+        # without the kwarg, there are no profilers
+        with _FakeCCTarget(cc_path):
+            graph, op = _fused_op([1024, 1024])
+            transform.profile(graph, workdir)
+            self.assertFalse(os.path.exists(log))
+            self.assertIn("N_VECTORS_PER_THREAD = 2;", op.gen_function())
+
+        with _FakeCCTarget(cc_path, profile_elementwise=True):
+            graph, op = _fused_op([1024, 64])
+            transform.profile(graph, workdir)
+            # no grid-stride profilers for 64K elements
+            with open(log) as f:
+                self.assertEqual(len(f.readlines()), 5)
+            self.assertEqual(
+                [item.algo for item in op._attrs["exec_path"].values()],
+                ["block256_vec2"],
+            )
+            self.assertIn("const int N_VECTORS_PER_THREAD = 2;", op.gen_function())
+
+        # the result is loaded from the profile cache
+        os.remove(log)
+        with _FakeCCTarget(cc_path, profile_elementwise=True):
+            graph, op = _fused_op([1024, 64])
+            transform.profile(graph, workdir)
+            self.assertFalse(os.path.exists(log))
+            self.assertEqual(
+                [item.algo for item in op._attrs["exec_path"].values()],
+                ["block256_vec2"],
+            )
+
+    def test_profile_cache(self):
+        db = ProfileCacheDB("cuda", path=os.path.join(self._tmp_dir.name, "cache.db"))
+        query = {
+            "dtype": "float16",
+            "read_t": "uint4",
+            "num_inputs": 1,
+            "num_outputs": 1,
+            "op_type": "fused_elementwise",
+            "device": "80",
+            "profiler_key": "key",
+            "exec_entry_sha1": "sha1",
+        }
+        self.assertIsNone(db.query("elementwise", query))
+        db.insert(
+            "elementwise",
+            {
+                **query,
+                "exec_entry": "n_elements == 65536",
+                "algo": "block256_vec2",
+                "workspace": 0,
+                "duration": 0.5,
+            },
+        )
+        self.assertEqual(db.query("elementwise", query), ("block256_vec2", 0))
+        self.assertIsNone(db.query("elementwise", {**query, "profiler_key": "other"}))
+        (record,) = db.export_records("elementwise")
+        self.assertEqual(record["algo"], "block256_vec2")
+
+    def test_profile_cache_migration(self):
+        path = os.path.join(self._tmp_dir.name, "cache.db")
+        con = sqlite3.connect(path)
+        # the table as created before profiler_key was added
+        con.execute(
+            """
+            CREATE TABLE cuda_elementwise (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              exec_entry VARCHAR(8192) NOT NULL,
+              exec_entry_sha1 VARCHAR(64) NOT NULL,
+              dtype VARCHAR(64) NOT NULL,
+              read_t VARCHAR(64) NOT NULL,
+              num_inputs INTEGER NOT NULL,
+              num_outputs INTEGER NOT NULL,
+              op_type VARCHAR(512) NOT NULL,
+              device VARCHAR(16) NOT NULL,
+              algo VARCHAR(512) NOT NULL,
+              workspace INTEGER DEFAULT 0,
+              duration FLOAT DEFAULT -1,
+              template_ver INTEGER NOT NULL DEFAULT 290,
+              created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+            );
+            """
+        )
+        con.execute(
+            "INSERT INTO cuda_elementwise (exec_entry, exec_entry_sha1, dtype, "
+            "read_t, num_inputs, num_outputs, op_type, device, algo) VALUES "
+            "('n_elements == 65536', 'sha1', 'float16', 'uint4', 1, 1, "
+            "'fused_elementwise', '80', 'block256_vec2');"
+        )
+        con.commit()
+        con.close()
+        db = ProfileCacheDB("cuda", path=path)
+        # rows without profiler_key match no fused function
+        (record,) = db.export_records("elementwise")
+        self.assertEqual(record["profiler_key"], "")
+
+    def test_profiler_key(self):
+        with host_target(profile_elementwise=True):
+            keys = []
+            for func in (FuncEnum.TANH, FuncEnum.TANH, FuncEnum.SIGMOID):
+                _, op = _fused_op([1024, 64], func)
+                op._init_profile(None)
+                keys.append(op._attrs["profiler_key"])
+        # the key doesn't depend on the name of the op
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+
+    def test_profile_different_functions(self):
+        cc_path = os.path.join(self._tmp_dir.name, "cc.sh")
+        with open(cc_path, "w") as f:
+            f.write(FAKE_CC)
+        os.chmod(cc_path, 0o755)
+        log = os.path.join(self._tmp_dir.name, "build.log")
+        workdir = os.path.join(self._tmp_dir.name, "workdir")
+
+        with _FakeCCTarget(cc_path, profile_elementwise=True):
+            graph, _ = _fused_op([1024, 64], FuncEnum.TANH)
+            transform.profile(graph, workdir)
+            # ops of the same size with different functions don't share
+            # their profilers nor their cache entries
+            graph, _ = _fused_op([1024, 64], FuncEnum.SIGMOID)
+            transform.profile(graph, workdir)
+            with open(log) as f:
+                self.assertEqual(len(f.readlines()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
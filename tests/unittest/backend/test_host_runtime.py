@@ -0,0 +1,446 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+The runtime built against host_device_functions.h, see
+aitemplate.testing.host_runtime.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from aitemplate.compiler import AITData, Model, SharedWeights, WeightStore
+from aitemplate.testing.host_runtime import (
+    build_host_model,
+    build_pool_benchmark,
+    run_pool_benchmark,
+)
+from aitemplate.utils.array_interface import DLDeviceType, DLPackArray
+
+NUM_KERNELS = 4
+HIDDEN = 64
+MAX_BATCH = 16
+
+
+@unittest.skipIf(shutil.which("g++") is None, "g++ is not available")
+class HostRuntimeTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._workdir = tempfile.TemporaryDirectory()
+        cls._lib_path = build_host_model(
+            cls._workdir.name,
+            num_kernels=NUM_KERNELS,
+            hidden=HIDDEN,
+            max_batch=MAX_BATCH,
+        )
+        # kernels 0 and 1 add c_0 and c_1 instead of the bias
+        cls._lib_path_with_constants = build_host_model(
+            os.path.join(cls._workdir.name, "constants"),
+            num_kernels=NUM_KERNELS,
+            hidden=HIDDEN,
+            max_batch=MAX_BATCH,
+            num_unbound_constants=2,
+        )
+        cls._lib_path_with_profiling = build_host_model(
+            os.path.join(cls._workdir.name, "profiling"),
+            num_kernels=NUM_KERNELS,
+            hidden=HIDDEN,
+            max_batch=MAX_BATCH,
+            profile_ops=True,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._workdir.cleanup()
+
+    def _run(self, module, batch, bias=NUM_KERNELS, **kwargs):
+        x = np.random.uniform(-1, 1, (batch, HIDDEN)).astype(np.float32)
+        y = module.numpy_to_ait_data(np.zeros((MAX_BATCH, HIDDEN), np.float32))
+        outputs = module.run({"x": module.numpy_to_ait_data(x)}, {"y": y}, **kwargs)
+        self.assertEqual(outputs["y"].shape, [batch, HIDDEN])
+        np.testing.assert_allclose(
+            module.ait_data_to_numpy(outputs["y"]), x + bias, rtol=1e-6
+        )
+
+    def test_run(self):
+        with Model(self._lib_path) as module:
+            self.assertEqual(module.get_output_maximum_shape("y"), [MAX_BATCH, HIDDEN])
+            for batch in (1, 7, MAX_BATCH):
+                self._run(module, batch)
+            with self.assertRaises(RuntimeError):
+                self._run(module, MAX_BATCH + 1)
+
+    def test_set_many_constants(self):
+        with Model(self._lib_path_with_constants, num_runtimes=2) as module:
+            with self.assertRaises(RuntimeError):
+                self._run(module, 1)
+
+            c_0 = module.numpy_to_ait_data(np.full(HIDDEN, 2, np.float32))
+            c_1 = module.numpy_to_ait_data(np.full(HIDDEN, 3, np.float32))
+            bad_c_1 = AITData(c_1.data_ptr, [HIDDEN + 1], "float32")
+            with self.assertRaises(RuntimeError):
+                module.set_many_constants({"c_0": c_0, "c_1": bad_c_1})
+            # nothing was set
+            with self.assertRaises(RuntimeError):
+                self._run(module, 1)
+
+            module.set_many_constants({"c_0": c_0, "c_1": c_1})
+            for _ in range(2):
+                self._run(module, 3, bias=2 + 3 + NUM_KERNELS - 2)
+            module.set_many_constants([("c_1", c_0)])
+            self._run(module, 3, bias=2 + 2 + NUM_KERNELS - 2)
+
+    def test_upload_many_constants(self):
+        with Model(self._lib_path_with_constants, num_runtimes=2) as module:
+            host_constants = {
+                "c_0": np.full(HIDDEN, 4, np.float32),
+                "c_1": np.full(HIDDEN, 5, np.float32),
+            }
+            module.upload_many_constants(
+                [
+                    (name, AITData(arr.ctypes.data, [HIDDEN], "float32"))
+                    for name, arr in host_constants.items()
+                ]
+            )
+            # the host memory isn't needed after a synchronous upload
+            for arr in host_constants.values():
+                arr.fill(0)
+            for _ in range(2):
+                self._run(module, 5, bias=4 + 5 + NUM_KERNELS - 2)
+
+            with self.assertRaises(RuntimeError):
+                module.upload_many_constants({"c_0": AITData(0, [HIDDEN], "float16")})
+
+    def test_run_with_arrays(self):
+        def device_array(arr):
+            # device memory of the host runtime is host memory
+            return DLPackArray(
+                arr.ctypes.data, arr.shape, str(arr.dtype), DLDeviceType.CUDA, owner=arr
+            )
+
+        with Model(self._lib_path) as module:
+            x = np.random.uniform(-1, 1, (MAX_BATCH, HIDDEN)).astype(np.float32)
+            y = np.zeros((MAX_BATCH, HIDDEN), np.float32)
+            inputs = {"x": device_array(x[:5])}
+            device_y = device_array(y)
+            for outputs in ({"y": device_y}, [y]):
+                y.fill(0)
+                results = module.run_with_arrays(inputs, outputs)
+                self.assertEqual(results["y"].shape, [5, HIDDEN])
+                self.assertEqual(results["y"].data_ptr, y.ctypes.data)
+                np.testing.assert_allclose(y[:5], x[:5] + NUM_KERNELS, rtol=1e-6)
+            # host outputs can be imported directly
+            np.testing.assert_array_equal(np.from_dlpack(results["y"]), y[:5])
+
+            # the conversions are cached until the arrays are collected
+            self.assertEqual(len(module._array_cache), 3)
+            del inputs, device_y
+            self.assertEqual(len(module._array_cache), 1)
+
+            with self.assertRaises(ValueError):
+                module.run_with_arrays([x[:5]], [y])
+            with self.assertRaises(ValueError):
+                readonly = y.copy()
+                readonly.flags.writeable = False
+                module.run_with_arrays([device_array(x)], [readonly])
+
+    def test_run_with_arrays_exports_every_run(self):
+        class DLPackOnly:
+            """Exposes an array through DLPack only, which may be replaced in
+            place, and records the streams it's exported on."""
+
+            def __init__(self, arr):
+                self.arr = arr
+                self.streams = []
+
+            def __dlpack_device__(self):
+                return self.arr.__dlpack_device__()
+
+            def __dlpack__(self, stream=None):
+                self.streams.append(stream)
+                return self.arr.__dlpack__(stream=stream)
+
+        def device_array(arr):
+            return DLPackArray(
+                arr.ctypes.data, arr.shape, str(arr.dtype), DLDeviceType.CUDA, owner=arr
+            )
+
+        with Model(self._lib_path) as module:
+            x = np.random.uniform(-1, 1, (MAX_BATCH, HIDDEN)).astype(np.float32)
+            y = np.zeros((MAX_BATCH, HIDDEN), np.float32)
+            inputs = [DLPackOnly(device_array(x[:5]))]
+            outputs = [DLPackOnly(device_array(y))]
+            for stream_ptr in (0, None):
+                module.run_with_arrays(inputs, outputs, stream_ptr=stream_ptr)
+            self.assertEqual(outputs[0].streams, [0, None])
+
+            # the array is resized in place
+            inputs[0].arr = device_array(x[:3])
+            y.fill(0)
+            results = module.run_with_arrays(inputs, outputs)
+            self.assertEqual(results["y"].shape, [3, HIDDEN])
+            np.testing.assert_allclose(y[:3], x[:3] + NUM_KERNELS, rtol=1e-6)
+            np.testing.assert_array_equal(y[3:], 0)
+
+    def test_staging_pool(self):
+        with Model(self._lib_path, num_runtimes=2) as module:
+            self.assertEqual(module.get_staging_pool_capacity(), 2)
+            x = np.random.uniform(-1, 1, (MAX_BATCH, HIDDEN)).astype(np.float32)
+            inputs = {"x": module.numpy_to_ait_data(x[:3])}
+            y = np.zeros((MAX_BATCH, HIDDEN), np.float32)
+            outputs = {"y": AITData(y.ctypes.data, [MAX_BATCH, HIDDEN], "float32")}
+            for graph_mode in (False, True):
+                results = module._run_with_outputs_on_host(
+                    inputs, outputs, graph_mode=graph_mode
+                )
+                self.assertEqual(results["y"].shape, [3, HIDDEN])
+                np.testing.assert_allclose(y[:3], x[:3] + NUM_KERNELS, rtol=1e-6)
+            # only the actual output is copied
+            self.assertFalse(y[3:].any())
+            stats = module.get_staging_pool_stats()
+            self.assertEqual(stats.allocations, 1)
+            self.assertEqual(stats.reuses, 1)
+            self.assertEqual(stats.pinned_allocations, 0)
+            self.assertEqual(stats.in_use, 0)
+            self.assertEqual(stats.idle, 1)
+
+            # the pinned outputs are leased until they are collected
+            pinned = [module.run_with_pinned_outputs(inputs)["y"] for _ in range(3)]
+            for arr in pinned:
+                self.assertEqual(arr.shape, (3, HIDDEN))
+                np.testing.assert_allclose(arr, x[:3] + NUM_KERNELS, rtol=1e-6)
+            stats = module.get_staging_pool_stats()
+            self.assertEqual(stats.allocations, 3)
+            self.assertEqual(stats.pinned_allocations, 3)
+            self.assertEqual(stats.in_use, 3)
+            # views of the outputs keep them leased, too
+            view = pinned[0][1:]
+            del pinned, arr
+            stats = module.get_staging_pool_stats()
+            self.assertEqual(stats.in_use, 1)
+            # at most capacity buffers are kept
+            self.assertEqual(stats.idle, 2)
+            del view
+            stats = module.get_staging_pool_stats()
+            self.assertEqual(stats.in_use, 0)
+            self.assertEqual(stats.idle, 2)
+
+            module.set_staging_pool_capacity(1)
+            stats = module.get_staging_pool_stats()
+            self.assertEqual(stats.idle, 1)
+            # the idle buffers already have pinned buffers
+            module.run_with_pinned_outputs(inputs)
+            stats = module.get_staging_pool_stats()
+            self.assertEqual(stats.allocations, 3)
+            self.assertEqual(stats.pinned_allocations, 3)
+
+    def test_ait_data_to_numpy_out(self):
+        with Model(self._lib_path) as module:
+            x = np.arange(12, dtype=np.float32)
+            data = module.numpy_to_ait_data(x)
+            out = np.zeros(16, np.float32)
+            arr = module.ait_data_to_numpy(data._replace(shape=[3, 4]), out=out)
+            self.assertEqual(arr.shape, (3, 4))
+            np.testing.assert_array_equal(out[:12], x)
+            self.assertTrue(np.shares_memory(arr, out))
+            for bad_out in (np.zeros(8, np.float32), np.zeros(12, np.float16)):
+                with self.assertRaises(ValueError):
+                    module.ait_data_to_numpy(data, out=bad_out)
+
+    def test_profile_ops(self):
+        x = np.random.uniform(-1, 1, (MAX_BATCH, HIDDEN)).astype(np.float32)
+        y = np.zeros((MAX_BATCH, HIDDEN), np.float32)
+        with Model(self._lib_path) as module:
+            self.assertEqual(module.get_op_infos(), [])
+            with self.assertRaises(RuntimeError):
+                module.profile_ops(
+                    [module.numpy_to_ait_data(x)], [module.numpy_to_ait_data(y)]
+                )
+
+        with Model(self._lib_path_with_profiling) as module:
+            names = [f"host_add_bias_{i}" for i in range(NUM_KERNELS)]
+            self.assertEqual(
+                module.get_op_infos(), [(name, "host_add_bias") for name in names]
+            )
+            inputs = {"x": module.numpy_to_ait_data(x[:5])}
+            outputs = {"y": module.numpy_to_ait_data(y)}
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                trace_path = os.path.join(tmp_dir, "trace.json")
+                profile = module.profile_ops(
+                    inputs, outputs, count=3, trace_path=trace_path
+                )
+                self.assertTrue(os.path.exists(trace_path))
+            self.assertEqual(profile.names, names)
+            self.assertEqual(profile.start_ms.shape, (3, NUM_KERNELS))
+            self.assertTrue((profile.duration_ms >= 0).all())
+            # the ops run one after another
+            np.testing.assert_allclose(
+                profile.start_ms[:, 1:],
+                profile.start_ms[:, :-1] + profile.duration_ms[:, :-1],
+                atol=1e-3,
+            )
+            self.assertEqual(len(profile.summary()), NUM_KERNELS)
+            np.testing.assert_allclose(
+                module.ait_data_to_numpy(outputs["y"])[:5],
+                x[:5] + NUM_KERNELS,
+                rtol=1e-6,
+            )
+
+            # regular runs are not timed
+            self._run(module, 3)
+            self._run(module, 3, graph_mode=True)
+
+    def test_shared_weights(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            store = WeightStore(os.path.join(workdir, "weights.bin"))
+            # two variants, which share the bias
+            lib_paths = [
+                build_host_model(
+                    os.path.join(workdir, str(num_kernels)),
+                    num_kernels=num_kernels,
+                    hidden=HIDDEN,
+                    max_batch=MAX_BATCH,
+                    weight_store=store,
+                )
+                for num_kernels in (2, NUM_KERNELS)
+            ]
+            self.assertEqual(len(store), 1)
+            self.assertEqual(store.size, HIDDEN * 4)
+
+            modules = [Model(lib_path, num_runtimes=2) for lib_path in lib_paths]
+            self.assertEqual(modules[0].get_shared_weights_size(), HIDDEN * 4)
+            with self.assertRaises(RuntimeError):
+                self._run(modules[0], 1, bias=2)
+
+            small_path = os.path.join(workdir, "small.bin")
+            np.ones(HIDDEN - 1, np.float32).tofile(small_path)
+            with self.assertRaises(RuntimeError):
+                modules[0].set_shared_weights(SharedWeights(small_path))
+
+            weights = SharedWeights(store.path)
+            for module in modules:
+                module.set_shared_weights(weights)
+            with Model(self._lib_path) as module:
+                self.assertEqual(module.get_shared_weights_size(), 0)
+                with self.assertRaises(RuntimeError):
+                    module.set_shared_weights(weights)
+
+            for module, bias in zip(modules, (2, NUM_KERNELS)):
+                self._run(module, 3, bias=bias)
+                self._run(module, 3, bias=bias, graph_mode=True)
+            # uploaded once, and kept alive by the other model
+            data_ptr = weights.data_ptr
+            modules[0].close()
+            del weights
+            self.assertEqual(modules[1]._shared_weights.data_ptr, data_ptr)
+            self._run(modules[1], MAX_BATCH, bias=NUM_KERNELS)
+            modules[1].close()
+
+    def test_graph_mode(self):
+        with Model(self._lib_path, num_runtimes=1) as module:
+            # the first run instantiates the graph, later runs update it
+            for batch in (3, 3, 9):
+                self._run(module, batch, graph_mode=True)
+
+    def test_graph_cache(self):
+        with Model(self._lib_path, num_runtimes=1) as module:
+            self.assertEqual(module.get_graph_cache_capacity(), 8)
+            module.set_graph_cache_capacity(2)
+            self.assertEqual(module.get_graph_cache_capacity(), 2)
+            with self.assertRaises(RuntimeError):
+                module.set_graph_cache_capacity(0)
+
+            # new output buffers for every run, so every run recaptures
+            for batch in (3, 5, 3, 5, 7, 3):
+                self._run(module, batch, graph_mode=True)
+            stats = module.get_graph_cache_stats()
+            self.assertEqual(stats.misses, 4)
+            self.assertEqual(stats.updates, 2)
+            self.assertEqual(stats.hits, 0)
+            # 7 evicts 3, then 3 evicts 5
+            self.assertEqual(stats.evictions, 2)
+            self.assertEqual(stats.size, 2)
+
+            x = np.random.uniform(-1, 1, (MAX_BATCH, HIDDEN)).astype(np.float32)
+            y = np.zeros((MAX_BATCH, HIDDEN), np.float32)
+            inputs = {
+                batch: {"x": module.numpy_to_ait_data(x[:batch])} for batch in (2, 9)
+            }
+            outputs = {"y": module.numpy_to_ait_data(y)}
+            for batch in (2, 9, 2, 9, 9):
+                results = module.run(inputs[batch], outputs, graph_mode=True)
+                # output dims are restored on a hit, since the shape inference
+                # is not rerun
+                self.assertEqual(results["y"].shape, [batch, HIDDEN])
+                np.testing.assert_allclose(
+                    module.ait_data_to_numpy(results["y"]),
+                    x[:batch] + NUM_KERNELS,
+                    rtol=1e-6,
+                )
+            stats = module.get_graph_cache_stats()
+            self.assertEqual(stats.misses, 6)
+            self.assertEqual(stats.hits, 3)
+            self.assertEqual(stats.size, 2)
+            self.assertAlmostEqual(stats.hit_rate, 3 / 11)
+
+            # lowering the capacity evicts on the next miss
+            module.set_graph_cache_capacity(1)
+            self._run(module, 4, graph_mode=True)
+            stats = module.get_graph_cache_stats()
+            self.assertEqual(stats.size, 1)
+            self.assertEqual(stats.evictions, 6)
+
+    def test_concurrent_runs(self):
+        for caller_affinity in (False, True):
+            with Model(self._lib_path, num_runtimes=2) as module:
+                module.set_caller_affinity(caller_affinity)
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    futures = [
+                        executor.submit(self._run, module, batch % MAX_BATCH + 1)
+                        for batch in range(32)
+                    ]
+                    for future in futures:
+                        future.result()
+
+    def test_pool_benchmark(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = build_pool_benchmark(workdir, num_kernels=2, hidden=HIDDEN)
+            # more threads than runtimes
+            for caller_affinity in (False, True):
+                runs_per_sec = run_pool_benchmark(path, 2, 8, 100, caller_affinity)
+                self.assertGreater(runs_per_sec, 0)
+
+    def test_benchmark(self):
+        with Model(self._lib_path, num_runtimes=2) as module:
+            x = np.ones((MAX_BATCH, HIDDEN), np.float32)
+            y = np.zeros((MAX_BATCH, HIDDEN), np.float32)
+            mean, _, outputs = module.benchmark(
+                {"x": module.numpy_to_ait_data(x)},
+                {"y": module.numpy_to_ait_data(y)},
+                count=10,
+                num_threads=4,
+                use_unique_stream_per_thread=True,
+            )
+            self.assertGreaterEqual(mean, 0)
+            np.testing.assert_array_equal(
+                module.ait_data_to_numpy(outputs["y"]), x + NUM_KERNELS
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
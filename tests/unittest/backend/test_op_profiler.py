@@ -0,0 +1,128 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Codegen of models compiled with profile_ops, and their op timelines.
+"""
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from aitemplate.backend.codegen import ModelContainerGenerator
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils.op_profile import OpProfile
+
+
+class OpProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def _gen_model_source(self, profile_ops):
+        with host_target():
+            x = Tensor(shape=[8, 64], dtype="float16", name="x", is_input=True)
+            y = ops.reduce_sum(dim=1)(ops.elementwise(FuncEnum.TANH)(x))
+            y._attrs["name"] = "y"
+            y._attrs["is_output"] = True
+            graph = transform.toposort([y])
+            transform.name_graph(graph)
+            transform.mark_param_tensor(graph)
+            graph = transform.fuse_ops(graph)
+            max_blob, max_constant_blob, workspace = transform.memory_planning(graph)
+            generator = ModelContainerGenerator(
+                max_blob,
+                max_constant_blob,
+                workspace,
+                num_inputs=1,
+                num_outputs=1,
+                constants_data_file=io.BytesIO(),
+                output_name_to_idx={"y": 0},
+                profile_ops=profile_ops,
+            )
+            for node in graph:
+                generator.append_tensor(node)
+            return generator.generate_source()["model-generated.h"]
+
+    def test_codegen(self):
+        src = self._gen_model_source(profile_ops=True)
+        run_impl = src[src.index("void RunImpl") : src.index("bool IsPending")]
+        # an event before each op, and one after the last
+        records = [
+            run_impl.index(f"op_profiler->Record({i}, stream);") for i in range(3)
+        ]
+        calls = [
+            run_impl.index("invoke_fused_elementwise"),
+            run_impl.index("reduce_sum_"),
+        ]
+        self.assertLess(records[0], calls[0])
+        self.assertLess(calls[0], records[1])
+        self.assertLess(records[1], calls[1])
+        self.assertLess(calls[1], records[2])
+        self.assertLess(records[2], run_impl.index("DeviceToDeviceCopies"))
+
+        self.assertIn("std::array<OpInfo, 2> op_infos", src)
+        self.assertRegex(src, r'OpInfo\{"fused_elementwise_\d+", "fused_elementwise"\}')
+        self.assertRegex(src, r'OpInfo\{"reduce_sum_\d+", "reduce_sum"\}')
+        self.assertIn("op_profiler = std::make_unique<OpProfiler>", src)
+
+        src = self._gen_model_source(profile_ops=False)
+        self.assertNotIn("op_profiler->Record", src)
+        self.assertNotIn("std::make_unique<OpProfiler>", src)
+        self.assertIn("std::array<OpInfo, 0> op_infos", src)
+
+    def test_op_profile(self):
+        profile = OpProfile(
+            names=["gemm_0", "softmax_1"],
+            ops=["gemm_rcr", "softmax"],
+            start_ms=np.array([[0, 3], [0, 1]], dtype=np.float32),
+            duration_ms=np.array([[3, 1], [1, 1]], dtype=np.float32),
+        )
+        gemm, softmax = profile.summary()
+        self.assertEqual(gemm.name, "gemm_0")
+        self.assertEqual(gemm.op, "gemm_rcr")
+        self.assertEqual((gemm.mean_ms, gemm.min_ms, gemm.max_ms), (2, 1, 3))
+        self.assertAlmostEqual(gemm.fraction, 2 / 3)
+        self.assertAlmostEqual(softmax.fraction, 1 / 3)
+        self.assertEqual([t.name for t in profile.slowest(1)], ["gemm_0"])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trace.json")
+            profile.save(path)
+            with open(path) as f:
+                trace = json.load(f)
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual([e["name"] for e in events], ["gemm_0", "softmax_1"] * 2)
+        # the second run starts where the first one ended
+        self.assertEqual(
+            [(e["ts"], e["dur"]) for e in events],
+            [(0, 3000), (3000, 1000), (4000, 1000), (5000, 1000)],
+        )
+        self.assertEqual(events[3]["args"], {"op": "softmax", "run": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
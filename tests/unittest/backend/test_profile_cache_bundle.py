@@ -0,0 +1,176 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import gzip
+import os
+import tempfile
+import unittest
+
+from aitemplate.backend.profile_cache_bundle import (
+    LayeredProfileCache,
+    main,
+    ProfileCacheBundle,
+)
+from aitemplate.backend.profiler_cache import ProfileCacheDB
+
+
+def _gemm_query(m, device="80"):
+    return {
+        "dtype_a": 1,
+        "dtype_b": 1,
+        "dtype_c": 1,
+        "dtype_acc": 1,
+        "major_a": 1,
+        "major_b": 1,
+        "major_c": 1,
+        "op_type": "gemm_rcr",
+        "device": device,
+        "epilogue": 1,
+        "pshape": "",
+        "exec_entry_sha1": f"sha1_{m}",
+    }
+
+
+def _gemm_record(m, algo, duration, device="80"):
+    record = _gemm_query(m, device)
+    record.update(
+        {
+            "exec_entry": f"M == {m} && N == 64 && K == 64",
+            "algo": algo,
+            "workspace": 0,
+            "split_k": 1,
+            "duration": duration,
+        }
+    )
+    return record
+
+
+def _norm_query(m):
+    return {
+        "dtype_in": 1,
+        "dtype_acc": 1,
+        "dtype_out": 1,
+        "rank": 2,
+        "op_type": "softmax",
+        "device": "80",
+        "exec_entry_sha1": f"sha1_{m}",
+    }
+
+
+class ProfileCacheBundleTestCase(unittest.TestCase):
+    def test_export_import(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = ProfileCacheDB("cuda", path=os.path.join(tmp_dir, "a.db"))
+            db.insert_gemm(_gemm_record(1, "algo_a", 0.5))
+            db.insert_gemm(_gemm_record(2, "algo_a", 0.5, device="90"))
+            record = _norm_query(1)
+            record.update({"exec_entry": "M == 1", "algo": "norm_a", "workspace": 0})
+            db.insert_normalization(record)
+
+            bundle_path = os.path.join(tmp_dir, "a.aitcache")
+            ProfileCacheBundle.from_db(db, device="80").save(bundle_path)
+            bundle = ProfileCacheBundle.load(bundle_path)
+            self.assertEqual(len(bundle), 2)
+            self.assertEqual(bundle.devices(), ["80"])
+            self.assertEqual(bundle.template_versions(), [290])
+
+            other = ProfileCacheDB("cuda", path=os.path.join(tmp_dir, "b.db"))
+            self.assertEqual(bundle.to_db(other), 2)
+            self.assertEqual(other.query_gemm(_gemm_query(1)), ("algo_a", 0, 1))
+            self.assertEqual(other.query_normalization(_norm_query(1)), ("norm_a", 0))
+            # importing again does not change anything
+            self.assertEqual(bundle.to_db(other), 0)
+            del db, other
+
+    def test_merge_keeps_fastest(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = ProfileCacheDB("cuda", path=os.path.join(tmp_dir, "a.db"))
+            db.insert_gemm(_gemm_record(1, "slow", 0.5))
+            db.insert_gemm(_gemm_record(2, "fast", 0.1))
+            bundle = ProfileCacheBundle.from_db(db)
+
+            other = ProfileCacheBundle("cuda")
+            other.add("gemm", _gemm_record(1, "fast", 0.2))
+            other.add("gemm", _gemm_record(2, "slow", 0.3))
+            other.add("gemm", _gemm_record(3, "unknown", -1))
+            self.assertEqual(bundle.merge(other), 2)
+            self.assertEqual(bundle.query("gemm", _gemm_query(1))[0], "fast")
+            self.assertEqual(bundle.query("gemm", _gemm_query(2))[0], "fast")
+            self.assertEqual(bundle.query("gemm", _gemm_query(3))[0], "unknown")
+
+            # merging into a local cache replaces slower records in place
+            self.assertEqual(bundle.to_db(db), 2)
+            self.assertEqual(db.query_gemm(_gemm_query(1))[0], "fast")
+            self.assertEqual(len(db.export_records("gemm")), 3)
+            del db
+
+    def test_corrupted_bundle(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bundle = ProfileCacheBundle("cuda")
+            bundle.add("gemm", _gemm_record(1, "algo_a", 0.5))
+            path = os.path.join(tmp_dir, "a.aitcache")
+            bundle.save(path)
+            with gzip.open(path, "rt") as f:
+                content = f.read()
+            with gzip.open(path, "wt") as f:
+                f.write(content.replace("algo_a", "algo_b"))
+            with self.assertRaises(RuntimeError):
+                ProfileCacheBundle.load(path)
+
+    def test_layered_lookup(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = ProfileCacheDB("cuda", path=os.path.join(tmp_dir, "cuda.db"))
+            db.insert_gemm(_gemm_record(1, "local", 0.5))
+            first = ProfileCacheBundle("cuda")
+            first.add("gemm", _gemm_record(1, "first", 0.1))
+            first.add("gemm", _gemm_record(2, "first", 0.1))
+            second = ProfileCacheBundle("cuda")
+            second.add("gemm", _gemm_record(2, "second", 0.01))
+            second.add("gemm", _gemm_record(3, "second", 0.01))
+            cache = LayeredProfileCache(db, [first, second])
+            self.assertEqual(cache.query_gemm(_gemm_query(1))[0], "local")
+            self.assertEqual(cache.query_gemm(_gemm_query(2))[0], "first")
+            self.assertEqual(cache.query_gemm(_gemm_query(3))[0], "second")
+            self.assertIsNone(cache.query_gemm(_gemm_query(4)))
+            # bundles are read-only
+            cache.insert_gemm(_gemm_record(4, "local", 0.5))
+            self.assertEqual(cache.query_gemm(_gemm_query(4))[0], "local")
+            self.assertIsNone(first.query("gemm", _gemm_query(4)))
+            del cache, db
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for i, algo in enumerate(("a", "b")):
+                db_path = os.path.join(tmp_dir, f"host_{i}", "cuda.db")
+                os.makedirs(os.path.dirname(db_path))
+                db = ProfileCacheDB("cuda", path=db_path)
+                db.insert_gemm(_gemm_record(i, algo, 0.5))
+                db.insert_gemm(_gemm_record(2, algo, 0.5 - i * 0.1))
+                del db
+                paths.append(os.path.join(tmp_dir, f"{i}.aitcache"))
+                main(["export", db_path, paths[-1]])
+            merged = os.path.join(tmp_dir, "all.aitcache")
+            main(["merge", merged] + paths)
+            db_path = os.path.join(tmp_dir, "cuda.db")
+            main(["import", db_path, merged])
+            db = ProfileCacheDB("cuda", path=db_path)
+            self.assertEqual(db.query_gemm(_gemm_query(0))[0], "a")
+            self.assertEqual(db.query_gemm(_gemm_query(1))[0], "b")
+            self.assertEqual(db.query_gemm(_gemm_query(2))[0], "b")
+            del db
+
+
+if __name__ == "__main__":
+    unittest.main()
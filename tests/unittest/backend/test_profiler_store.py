@@ -0,0 +1,112 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import fcntl
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.backend.builder import Builder
+from aitemplate.backend.profiler_store import ProfilerStore
+
+
+class ProfilerStoreTestCase(unittest.TestCase):
+    def _write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def _gen_profilers(self, workdir, codes):
+        file_pairs = []
+        for name, code in codes.items():
+            src = os.path.join(workdir, "profiler", "gemm_rcr", name + ".cu")
+            self._write(src, code)
+            file_pairs.append(
+                (src, os.path.join(workdir, "profiler", "gemm_rcr", name))
+            )
+        return file_pairs
+
+    def test_build_profilers_across_workdirs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log = os.path.join(tmp_dir, "build.log")
+            # a fake compiler that records every build
+            cc_cmd = "cp {src} {target} && echo {src} >> " + log
+            codes = {"algo_0": "kernel 0", "algo_1": "kernel 1"}
+            env = {"PROFILER_STORE_DIR": os.path.join(tmp_dir, "store")}
+            with mock.patch.dict(os.environ, env):
+                for workdir in ("workdir_0", "workdir_1"):
+                    file_pairs = self._gen_profilers(
+                        os.path.join(tmp_dir, workdir), codes
+                    )
+                    Builder(n_jobs=2).build_profilers(file_pairs, cc_cmd)
+                    for src, obj in file_pairs:
+                        with open(src) as f_src, open(obj) as f_obj:
+                            self.assertEqual(f_src.read(), f_obj.read())
+
+                with open(log) as f:
+                    self.assertEqual(len(f.readlines()), 2)
+
+                # a different compile command is a different profiler
+                file_pairs = self._gen_profilers(
+                    os.path.join(tmp_dir, "workdir_2"), codes
+                )
+                Builder(n_jobs=2).build_profilers(file_pairs, cc_cmd + " # -O2")
+                with open(log) as f:
+                    self.assertEqual(len(f.readlines()), 4)
+
+    def test_lock(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = ProfilerStore(tmp_dir)
+            lock = store.try_lock("key")
+            self.assertIsNotNone(lock)
+            self.assertIsNone(store.try_lock("key"))
+            store.unlock(lock)
+            lock = store.try_lock("key")
+            self.assertIsNotNone(lock)
+            store.unlock(lock)
+
+    def test_gc(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = ProfilerStore(os.path.join(tmp_dir, "store"), max_size_bytes=10)
+            for i in range(4):
+                obj = os.path.join(tmp_dir, f"obj_{i}")
+                self._write(obj, "0123")
+                store.publish(f"key_{i}", obj)
+                os.utime(os.path.join(tmp_dir, "store", "objs", f"key_{i}"), (i, i))
+            self.assertEqual(store.size_bytes(), 16)
+            store.gc()
+            self.assertEqual(store.size_bytes(), 8)
+            out = os.path.join(tmp_dir, "out")
+            self.assertFalse(store.fetch("key_0", out))
+            self.assertFalse(store.fetch("key_1", out))
+            self.assertTrue(store.fetch("key_3", out))
+
+    def test_gc_keeps_locks(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = ProfilerStore(os.path.join(tmp_dir, "store"), max_size_bytes=0)
+            obj = os.path.join(tmp_dir, "obj")
+            self._write(obj, "0123")
+            store.publish("key", obj)
+            # a builder has opened the lock file, but not locked it yet
+            waiter = open(os.path.join(tmp_dir, "store", "locks", "key"), "a")
+            store.gc()
+            self.assertEqual(store.size_bytes(), 0)
+            fcntl.flock(waiter, fcntl.LOCK_EX)
+            self.assertIsNone(store.try_lock("key"))
+            store.unlock(waiter)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import socket
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from aitemplate.backend.profiler_cache import CacheMode, ProfileCacheDB
+from aitemplate.backend.remote_profile_cache import RemoteProfileCache
+from aitemplate.testing.profile_cache_server import ProfileCacheServer
+
+
+def _norm_query(m):
+    return {
+        "dtype_in": 1,
+        "dtype_acc": 1,
+        "dtype_out": 1,
+        "rank": 2,
+        "op_type": "softmax",
+        "device": "80",
+        "exec_entry_sha1": f"sha1_{m}",
+    }
+
+
+def _norm_record(m, algo, duration):
+    record = _norm_query(m)
+    record.update(
+        {
+            "exec_entry": f"M == {m}",
+            "algo": algo,
+            "workspace": 0,
+            "duration": duration,
+        }
+    )
+    return record
+
+
+class RemoteProfileCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self._server = ProfileCacheServer()
+        self._server.start()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._server.stop()
+        self._tmp_dir.cleanup()
+
+    def _remote_cache(self, name, uri=None, **kwargs):
+        local = ProfileCacheDB("cuda", path=os.path.join(self._tmp_dir.name, name))
+        if uri is None:
+            uri = self._server.uri
+        return local, RemoteProfileCache(local, uri, **kwargs)
+
+    def test_share_across_hosts(self):
+        _, cache_0 = self._remote_cache("host_0.db")
+        self.assertEqual(cache_0.mode, CacheMode.REMOTE)
+        cache_0.insert_normalization(_norm_record(1, "algo_a", 0.5))
+        cache_0.insert_normalization(_norm_record(2, "algo_b", 0.5))
+        # uploads are deferred until flush
+        self.assertEqual(len(self._server.records), 0)
+        cache_0.flush()
+        self.assertEqual(len(self._server.records), 2)
+
+        local_1, cache_1 = self._remote_cache("host_1.db")
+        cache_1.prefetch(
+            "normalization", [_norm_query(1), _norm_query(2), _norm_query(3)]
+        )
+        self.assertEqual(self._server.num_lookups, 1)
+        self.assertEqual(cache_1.query_normalization(_norm_query(1)), ("algo_a", 0))
+        self.assertEqual(cache_1.query_normalization(_norm_query(2)), ("algo_b", 0))
+        self.assertIsNone(cache_1.query_normalization(_norm_query(3)))
+        self.assertEqual(self._server.num_lookups, 1)
+        # remote results are written back to the local cache
+        self.assertEqual(local_1.query_normalization(_norm_query(1)), ("algo_a", 0))
+
+    def test_query_local_once(self):
+        local, cache = self._remote_cache("host_0.db")
+        with mock.patch.object(local, "query", wraps=local.query) as query:
+            self.assertIsNone(cache.query_normalization(_norm_query(1)))
+        # the local miss is looked up remotely, not locally again
+        self.assertEqual(query.call_count, 1)
+        self.assertEqual(self._server.num_lookups, 1)
+
+    def test_batched_upload(self):
+        _, cache = self._remote_cache("host_0.db", batch_size=2)
+        cache.insert_normalization(_norm_record(1, "algo_a", 0.5))
+        self.assertEqual(len(self._server.records), 0)
+        cache.insert_normalization(_norm_record(2, "algo_a", 0.5))
+        self.assertEqual(len(self._server.records), 2)
+
+    def test_keep_fastest(self):
+        _, cache_0 = self._remote_cache("host_0.db")
+        _, cache_1 = self._remote_cache("host_1.db")
+        cache_0.insert_normalization(_norm_record(1, "slow", 0.5))
+        cache_0.flush()
+        cache_1.insert_normalization(_norm_record(1, "fast", 0.1))
+        cache_1.flush()
+        cache_0.insert_normalization(_norm_record(1, "slow", 0.5))
+        cache_0.flush()
+        _, cache_2 = self._remote_cache("host_2.db")
+        self.assertEqual(cache_2.query_normalization(_norm_query(1)), ("fast", 0))
+
+    def test_timeout_falls_back_to_local(self):
+        # accepts connections but never answers
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            sock.listen()
+            uri = "http://127.0.0.1:{}".format(sock.getsockname()[1])
+            local, cache = self._remote_cache("host_0.db", uri=uri, timeout=0.2)
+            local.insert_normalization(_norm_record(1, "local", 0.5))
+            self.assertEqual(cache.query_normalization(_norm_query(1)), ("local", 0))
+            self.assertIsNone(cache.query_normalization(_norm_query(2)))
+
+            # the remote cache is not asked again
+            start = time.time()
+            self.assertIsNone(cache.query_normalization(_norm_query(3)))
+            cache.insert_normalization(_norm_record(3, "local", 0.5))
+            cache.flush()
+            self.assertLess(time.time() - start, 0.2)
+            self.assertEqual(cache.query_normalization(_norm_query(3)), ("local", 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,278 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Overhead of the runtime itself, measured with tiny host kernels, see
+aitemplate.testing.host_runtime. Runs without a GPU.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from aitemplate.compiler import AITData, Model
+from aitemplate.testing.host_runtime import (
+    build_host_model,
+    build_pool_benchmark,
+    run_pool_benchmark,
+)
+from aitemplate.utils.array_interface import DLPackArray
+
+LOGGER = logging.getLogger(__name__)
+
+HIDDEN = 8
+MAX_BATCH = 1
+
+
+@unittest.skipIf(shutil.which("g++") is None, "g++ is not available")
+class TestHostRuntimeBenchmark(unittest.TestCase):
+    def _log(self, results):
+        LOGGER.warning(
+            f"Benchmark results {json.dumps(results, separators=(',', ':'))}"
+        )
+
+    def _make_args(self, module):
+        x = np.ones((MAX_BATCH, HIDDEN), np.float32)
+        y = np.zeros((MAX_BATCH, HIDDEN), np.float32)
+        return (
+            {"x": module.numpy_to_ait_data(x)},
+            {"y": module.numpy_to_ait_data(y)},
+        )
+
+    def _benchmark_per_run_overhead(self, workdir, num_kernels, count=10000):
+        lib_path = build_host_model(
+            os.path.join(workdir, str(num_kernels)),
+            num_kernels=num_kernels,
+            hidden=HIDDEN,
+            max_batch=MAX_BATCH,
+        )
+        with Model(lib_path, num_runtimes=1) as module:
+            inputs, outputs = self._make_args(module)
+            results = {"num_kernels": num_kernels}
+            for graph_mode in (False, True):
+                mean, _, _ = module.benchmark(
+                    inputs, outputs, graph_mode=graph_mode, count=count
+                )
+                key = "graph_run_us" if graph_mode else "run_us"
+                results[key] = round(mean * 1000, 3)
+
+            # includes the Python bindings
+            start = time.perf_counter()
+            for _ in range(count):
+                module.run(inputs, outputs)
+            results["python_run_us"] = round(
+                (time.perf_counter() - start) / count * 1e6, 3
+            )
+
+            # zero-copy arrays, converted once
+            x = np.ones((MAX_BATCH, HIDDEN), np.float32)
+            array_inputs = [DLPackArray(x.ctypes.data, x.shape, "float32", owner=x)]
+            array_outputs = [np.zeros((MAX_BATCH, HIDDEN), np.float32)]
+            start = time.perf_counter()
+            for _ in range(count):
+                module.run_with_arrays(array_inputs, array_outputs)
+            results["python_run_with_arrays_us"] = round(
+                (time.perf_counter() - start) / count * 1e6, 3
+            )
+            self._log(results)
+        return lib_path
+
+    def _benchmark_throughput(self, lib_path, num_threads=8, count=10000):
+        for num_runtimes in (1, 2, 4, 8):
+            with Model(lib_path, num_runtimes=num_runtimes) as module:
+                inputs, outputs = self._make_args(module)
+                mean, _, _ = module.benchmark(
+                    inputs,
+                    outputs,
+                    count=count,
+                    num_threads=num_threads,
+                    use_unique_stream_per_thread=True,
+                )
+                self._log(
+                    {
+                        "num_runtimes": num_runtimes,
+                        "num_threads": num_threads,
+                        "runs_per_sec": round(1000 / mean) if mean > 0 else None,
+                    }
+                )
+
+    def test_pool_benchmark(self):
+        # every thread calls Run, so runtimes are acquired and released on
+        # every call
+        with tempfile.TemporaryDirectory() as workdir:
+            path = build_pool_benchmark(workdir, hidden=HIDDEN)
+            for num_runtimes in (1, 2, 4, 8):
+                for num_threads in (1, 4, 16):
+                    for caller_affinity in (False, True):
+                        runs_per_sec = run_pool_benchmark(
+                            path, num_runtimes, num_threads, 10000, caller_affinity
+                        )
+                        self._log(
+                            {
+                                "num_runtimes": num_runtimes,
+                                "num_threads": num_threads,
+                                "caller_affinity": caller_affinity,
+                                "runs_per_sec": round(runs_per_sec),
+                            }
+                        )
+
+    def test_graph_cache_benchmark(self, num_kernels=16, num_shapes=4, count=2000):
+        # graph_mode runs which cycle over a few input shapes
+        with tempfile.TemporaryDirectory() as workdir:
+            lib_path = build_host_model(
+                workdir, num_kernels=num_kernels, hidden=HIDDEN, max_batch=num_shapes
+            )
+            for capacity in (1, num_shapes):
+                with Model(lib_path, num_runtimes=1) as module:
+                    module.set_graph_cache_capacity(capacity)
+                    x = np.ones((num_shapes, HIDDEN), np.float32)
+                    y = np.zeros((num_shapes, HIDDEN), np.float32)
+                    inputs = [
+                        {"x": module.numpy_to_ait_data(x[:batch])}
+                        for batch in range(1, num_shapes + 1)
+                    ]
+                    outputs = {"y": module.numpy_to_ait_data(y)}
+                    start = time.perf_counter()
+                    for i in range(count):
+                        module.run(inputs[i % num_shapes], outputs, graph_mode=True)
+                    elapsed = time.perf_counter() - start
+                    self._log(
+                        {
+                            "num_kernels": num_kernels,
+                            "num_shapes": num_shapes,
+                            "graph_cache_capacity": capacity,
+                            "python_run_us": round(elapsed / count * 1e6, 3),
+                            "hit_rate": module.get_graph_cache_stats().hit_rate,
+                        }
+                    )
+
+    def test_set_constants_benchmark(self, num_constants=512, count=20):
+        # Python marshaling and dispatch of set_constant calls vs. one
+        # set_many_constants call
+        with tempfile.TemporaryDirectory() as workdir:
+            lib_path = build_host_model(
+                workdir,
+                num_kernels=1,
+                hidden=HIDDEN,
+                max_batch=MAX_BATCH,
+                num_unbound_constants=num_constants,
+            )
+            for num_runtimes in (1, 4):
+                with Model(lib_path, num_runtimes=num_runtimes) as module:
+                    arr = np.ones(HIDDEN, np.float32)
+                    tensor = module.numpy_to_ait_data(arr)
+                    constants = {f"c_{i}": tensor for i in range(num_constants)}
+                    results = {
+                        "num_constants": num_constants,
+                        "num_runtimes": num_runtimes,
+                    }
+
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        for name, tensor in constants.items():
+                            module.set_constant(name, tensor)
+                    results["set_constant_ms"] = round(
+                        (time.perf_counter() - start) / count * 1000, 3
+                    )
+
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        module.set_many_constants(constants)
+                    results["set_many_constants_ms"] = round(
+                        (time.perf_counter() - start) / count * 1000, 3
+                    )
+
+                    host_constants = {
+                        name: AITData(arr.ctypes.data, [HIDDEN], "float32")
+                        for name in constants
+                    }
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        module.upload_many_constants(host_constants)
+                    results["upload_many_constants_ms"] = round(
+                        (time.perf_counter() - start) / count * 1000, 3
+                    )
+                    self._log(results)
+
+    def test_outputs_on_host_benchmark(self, hidden=4096, max_batch=64, count=300):
+        # runs whose outputs are copied to the host, with the outputs sized for
+        # the largest batch
+        with tempfile.TemporaryDirectory() as workdir:
+            lib_path = build_host_model(
+                workdir, num_kernels=1, hidden=hidden, max_batch=max_batch
+            )
+            with Model(lib_path, num_runtimes=1) as module:
+                y = np.zeros((max_batch, hidden), np.float32)
+                outputs = [AITData(y.ctypes.data, list(y.shape), "float32")]
+                for batch in (1, max_batch):
+                    x = np.ones((batch, hidden), np.float32)
+                    inputs = [module.numpy_to_ait_data(x)]
+                    results = {"hidden": hidden, "batch": batch}
+
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        module._run_with_outputs_on_host(inputs, outputs)
+                    results["outputs_on_host_us"] = round(
+                        (time.perf_counter() - start) / count * 1e6, 3
+                    )
+
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        module.run_with_pinned_outputs(inputs)
+                    results["pinned_outputs_us"] = round(
+                        (time.perf_counter() - start) / count * 1e6, 3
+                    )
+                    self._log(results)
+
+    def test_profile_ops_benchmark(self, num_kernels=128, count=10000):
+        # regular runs of a model compiled with profile_ops, which only record
+        # events while profiling
+        with tempfile.TemporaryDirectory() as workdir:
+            for profile_ops in (False, True):
+                lib_path = build_host_model(
+                    os.path.join(workdir, str(profile_ops)),
+                    num_kernels=num_kernels,
+                    hidden=HIDDEN,
+                    max_batch=MAX_BATCH,
+                    profile_ops=profile_ops,
+                )
+                with Model(lib_path, num_runtimes=1) as module:
+                    inputs, outputs = self._make_args(module)
+                    mean, _, _ = module.benchmark(inputs, outputs, count=count)
+                    results = {
+                        "num_kernels": num_kernels,
+                        "profile_ops": profile_ops,
+                        "run_us": round(mean * 1000, 3),
+                    }
+                    if profile_ops:
+                        profile = module.profile_ops(inputs, outputs, count=100)
+                        results["profiled_run_us"] = round(
+                            float(profile.duration_ms.sum(axis=1).mean()) * 1000, 3
+                        )
+                    self._log(results)
+
+    def test_benchmark(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            for num_kernels in (1, 16, 128):
+                lib_path = self._benchmark_per_run_overhead(workdir, num_kernels)
+            self._benchmark_throughput(lib_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import json
+import logging
+import tempfile
+import time
+import unittest
+
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.base import IntVar
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.compiler.transform.optimize_graph import optimize_graph_passes
+from aitemplate.frontend import Tensor
+from aitemplate.testing import detect_target
+from aitemplate.utils import graph_utils
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _build_transformer(num_layers, hidden=256, seq_len=64):
+    batch_size = IntVar([1, 32], name="batch_size")
+    x = Tensor(shape=[batch_size, seq_len, hidden], name="x", is_input=True)
+    y = ops.reshape()(x, [-1, hidden])
+    for i in range(num_layers):
+
+        def weight(name, shape):
+            return Tensor(shape=shape, name=f"{name}_{i}")
+
+        qkv = ops.gemm_rcr_bias()(
+            y, weight("w_qkv", [3 * hidden, hidden]), weight("b_qkv", [3 * hidden])
+        )
+        q, k, v = ops.split()(qkv, hidden, dim=1)
+        q = ops.reshape()(q, [-1, seq_len, hidden])
+        k = ops.reshape()(k, [-1, seq_len, hidden])
+        v = ops.reshape()(v, [-1, seq_len, hidden])
+        scores = ops.elementwise(FuncEnum.MUL)(ops.bmm_rcr()(q, k), 0.125)
+        attn = ops.bmm_rrr()(ops.softmax()(scores, -1), v)
+        attn = ops.reshape()(attn, [-1, hidden])
+        out = ops.gemm_rcr_bias_add()(
+            attn, weight("w_o", [hidden, hidden]), weight("b_o", [hidden]), y
+        )
+        out = ops.layernorm()(
+            out, weight("gamma_1", [hidden]), weight("beta_1", [hidden]), [hidden]
+        )
+        h = ops.gemm_rcr_bias()(
+            out, weight("w_1", [4 * hidden, hidden]), weight("b_1", [4 * hidden])
+        )
+        h = ops.elementwise(FuncEnum.TANH)(h)
+        h = ops.gemm_rcr_bias_add()(
+            h, weight("w_2", [hidden, 4 * hidden]), weight("b_2", [hidden]), out
+        )
+        y = ops.layernorm()(
+            h, weight("gamma_2", [hidden]), weight("beta_2", [hidden]), [hidden]
+        )
+    y._attrs["name"] = "y"
+    y._attrs["is_output"] = True
+    return y
+
+
+def _legacy_optimize_graph(sorted_graph, workdir, dump_graph):
+    """optimize_graph before the PassManager: every sub-pass marks params and
+    validates the graph, and the graph is dumped after every pass."""
+    for func in optimize_graph_passes():
+        sorted_graph = func(sorted_graph, workdir)
+        if dump_graph:
+            graph_utils.dump_graph_debug_str_to_file(
+                sorted_graph, workdir, func.__name__
+            )
+    return sorted_graph
+
+
+class TestOptimizeGraphBenchmark(unittest.TestCase):
+    def _optimize_graph_time(self, num_layers, func):
+        aitemplate_logger = logging.getLogger("aitemplate")
+        level = aitemplate_logger.level
+        aitemplate_logger.setLevel(logging.INFO)
+        try:
+            with detect_target(), tempfile.TemporaryDirectory() as workdir:
+                graph = transform.toposort(_build_transformer(num_layers))
+                transform.remove_unused_ops(graph)
+                transform.remove_no_ops(graph)
+                transform.name_graph(graph)
+                transform.mark_param_tensor(graph)
+                start = time.perf_counter()
+                func(graph, workdir)
+                return time.perf_counter() - start
+        finally:
+            aitemplate_logger.setLevel(level)
+
+    @unittest.skipIf(detect_target().in_ci_env(), "don't run benchmark in CI")
+    def test_benchmark(self):
+        for num_layers in (12, 24, 48):
+            legacy_time = self._optimize_graph_time(
+                num_layers,
+                lambda g, w: _legacy_optimize_graph(g, w, dump_graph=True),
+            )
+            # isolates the deferred param marking and graph validation
+            legacy_no_dump_time = self._optimize_graph_time(
+                num_layers,
+                lambda g, w: _legacy_optimize_graph(g, w, dump_graph=False),
+            )
+            run_time = self._optimize_graph_time(num_layers, transform.optimize_graph)
+            benchmark_results = {
+                "num_layers": num_layers,
+                "optimize_graph_sec": round(run_time, 3),
+                "legacy_optimize_graph_sec": round(legacy_time, 3),
+                "legacy_no_dump_optimize_graph_sec": round(legacy_no_dump_time, 3),
+                "speedup": round(legacy_time / run_time, 1),
+                "speedup_no_dump": round(legacy_no_dump_time / run_time, 2),
+            }
+            LOGGER.warning(
+                f"Benchmark results {json.dumps(benchmark_results, separators=(',', ':'))}"
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
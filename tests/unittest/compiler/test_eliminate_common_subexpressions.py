@@ -0,0 +1,107 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import tempfile
+import unittest
+
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.frontend import Tensor
+from aitemplate.utils import graph_utils
+
+
+def _input(name, shape=(8, 16)):
+    return Tensor(shape=list(shape), dtype="float16", name=name, is_input=True)
+
+
+def _graph(outputs):
+    for i, output in enumerate(outputs):
+        output._attrs["name"] = f"y_{i}"
+        output._attrs["is_output"] = True
+    graph = transform.toposort(outputs)
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    return graph
+
+
+def _op_types(graph):
+    return sorted(op._attrs["op"] for op in graph_utils.get_sorted_ops(graph))
+
+
+class EliminateCommonSubexpressionsTestCase(unittest.TestCase):
+    def test_chain(self):
+        x = _input("x")
+        a = ops.elementwise(FuncEnum.TANH)(x) * 2.0
+        b = ops.elementwise(FuncEnum.TANH)(x) * 2.0
+        graph = _graph([a + b])
+        graph = transform.eliminate_common_subexpressions(graph)
+
+        self.assertEqual(_op_types(graph), ["elementwise"] * 3)
+        (add,) = graph[-1].src_ops()
+        self.assertIs(add._attrs["inputs"][0], add._attrs["inputs"][1])
+
+    def test_different_inputs(self):
+        x, y = _input("x"), _input("y")
+        outputs = [
+            (x - y) + (y - x),
+            (x * 2.0) + (x * 3.0),
+            ops.elementwise(FuncEnum.TANH)(x) + ops.elementwise(FuncEnum.SIGMOID)(x),
+        ]
+        graph = _graph(outputs)
+        num_ops = len(graph_utils.get_sorted_ops(graph))
+        new_graph = transform.eliminate_common_subexpressions(graph)
+        self.assertIs(new_graph, graph)
+        self.assertEqual(len(graph_utils.get_sorted_ops(new_graph)), num_ops)
+
+    def test_outputs(self):
+        x = _input("x")
+        graph = _graph([ops.softmax()(x, -1), ops.softmax()(x, -1)])
+        graph = transform.eliminate_common_subexpressions(graph)
+        self.assertEqual(_op_types(graph), ["softmax", "softmax"])
+
+        # the first op may be kept if its output is a model output
+        x = _input("x")
+        y = ops.softmax()(x, -1)
+        graph = _graph([y, ops.softmax()(x, -1) + 1.0])
+        graph = transform.eliminate_common_subexpressions(graph)
+        self.assertEqual(_op_types(graph), ["elementwise", "softmax"])
+        self.assertTrue(y._attrs["is_output"])
+
+    def test_views_and_report(self):
+        x = _input("x")
+        w = Tensor(shape=[16, 16], dtype="float16", name="w")
+        a = ops.gemm_rcr()(ops.reshape()(x, [2, 4, 16]), w)
+        b = ops.gemm_rcr()(ops.reshape()(x, [2, 4, 16]), w)
+        c = ops.permute021()(a)
+        d = ops.permute021()(b)
+        graph = _graph([c + d])
+        with tempfile.TemporaryDirectory() as workdir:
+            graph = transform.eliminate_common_subexpressions(graph, workdir)
+            path = os.path.join(workdir, "eliminate_common_subexpressions_report.md")
+            with open(path) as f:
+                report = "".join(f.read().split())
+
+        self.assertEqual(
+            _op_types(graph), ["elementwise", "gemm_rcr", "permute021", "reshape"]
+        )
+        # reshape outputs are views, only gemm and permute outputs are saved
+        size = 2 * 4 * 16 * 2
+        self.assertIn(f"|gemm_rcr|1|{size}|", report)
+        self.assertIn("|reshape|1|0|", report)
+        self.assertIn(f"|total|3|{2 * size}|", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
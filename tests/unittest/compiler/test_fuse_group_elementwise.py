@@ -0,0 +1,198 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import importlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.backend import registry
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils.graph_utils import get_sorted_ops
+
+# the module, which is shadowed by the pass in aitemplate.compiler.transform
+fuse_group_elementwise = importlib.import_module(
+    "aitemplate.compiler.transform.fuse_group_elementwise"
+)
+
+
+def _fuse(outputs, **kwargs):
+    for idx, output in enumerate(outputs):
+        output._attrs["name"] = f"output_{idx}"
+        output._attrs["is_output"] = True
+    graph = transform.toposort(outputs)
+    transform.remove_unused_ops(graph)
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    with host_target(**kwargs):
+        graph = transform.fuse_ops(graph)
+        graph = fuse_group_elementwise.fuse_group_elementwise(graph)
+    transform.name_graph(graph)
+    return graph
+
+
+def _input(idx, shape=(8, 64)):
+    return Tensor(shape=list(shape), dtype="float16", name=f"x{idx}", is_input=True)
+
+
+def _tanh(tensor):
+    return ops.elementwise(FuncEnum.TANH)(tensor)
+
+
+def _sigmoid(tensor):
+    return ops.elementwise(FuncEnum.SIGMOID)(tensor)
+
+
+def _check_order(test_case, graph):
+    """Checks that every op comes after the ops it depends on."""
+    seen = set()
+    for op in get_sorted_ops(graph):
+        for tensor in op._attrs["inputs"]:
+            for src_op in tensor._attrs["src_ops"]:
+                test_case.assertIn(src_op, seen)
+        seen.add(op)
+
+
+class FuseGroupElementwiseTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def test_independent_ops(self):
+        x0, x1, x2 = _input(0), _input(1), _input(2)
+        graph = _fuse(
+            [_tanh(x0), _sigmoid(x1) * x1, x2 + x0], fuse_group_elementwise=True
+        )
+        sorted_ops = get_sorted_ops(graph)
+        self.assertEqual(len(sorted_ops), 1)
+        group = sorted_ops[0]
+        self.assertEqual(group._attrs["op"], "group_fused_elementwise")
+        self.assertEqual(len(group._attrs["fused_elementwise_ops"]), 3)
+        # x0 is read by two segments, but is a single input of the group
+        self.assertEqual(
+            [t._attrs["name"] for t in group._attrs["inputs"]], ["x0", "x1", "x2"]
+        )
+        self.assertEqual(
+            [t._attrs["name"] for t in group._attrs["outputs"]],
+            ["output_0", "output_1", "output_2"],
+        )
+        for tensor in group._attrs["outputs"]:
+            self.assertEqual(tensor._attrs["src_ops"], {group})
+        for tensor in group._attrs["inputs"]:
+            self.assertEqual(tensor._attrs["dst_ops"], {group})
+
+    def test_disabled(self):
+        graph = _fuse([_tanh(_input(0)), _tanh(_input(1))])
+        self.assertEqual(
+            [op._attrs["op"] for op in get_sorted_ops(graph)],
+            ["fused_elementwise", "fused_elementwise"],
+        )
+
+    def test_dependent_ops(self):
+        # per-branch ops before and after a softmax
+        outputs = []
+        for i in range(4):
+            y = _tanh(_input(i))
+            outputs.append(_sigmoid(ops.softmax()(y, -1)) * 2.0)
+        graph = _fuse(outputs, fuse_group_elementwise=True)
+        _check_order(self, graph)
+        sorted_ops = get_sorted_ops(graph)
+        self.assertEqual(
+            [op._attrs["op"] for op in sorted_ops],
+            ["group_fused_elementwise"] + ["softmax"] * 4 + ["group_fused_elementwise"],
+        )
+        for group in (sorted_ops[0], sorted_ops[-1]):
+            self.assertEqual(len(group._attrs["fused_elementwise_ops"]), 4)
+
+    def test_no_cycles(self):
+        # with groups of 2, greedy grouping could pair a tanh of one branch
+        # with a sigmoid of another branch
+        outputs = []
+        for i in range(3):
+            y = _tanh(_input(i))
+            outputs.append(_sigmoid(ops.softmax()(y, -1)))
+        with mock.patch.object(fuse_group_elementwise, "MAX_GROUP_SIZE", 2):
+            graph = _fuse(outputs, fuse_group_elementwise=True)
+        _check_order(self, graph)
+        sorted_ops = get_sorted_ops(graph)
+        self.assertEqual(len(sorted_ops), 7)
+        for op in sorted_ops:
+            if op._attrs["op"] != "group_fused_elementwise":
+                continue
+            funcs = {
+                elementwise_op._attrs["func"]
+                for fused_op in op._attrs["fused_elementwise_ops"]
+                for elementwise_op in fused_op._attrs["elementwise_ops"]
+            }
+            self.assertEqual(len(funcs), 1)
+
+    def test_cost_limits(self):
+        small = [_tanh(_input(i)) for i in range(3)]
+        large = [_tanh(_input(i + 3, shape=(1024, 1024))) for i in range(2)]
+        graph = _fuse(small + large, fuse_group_elementwise=True)
+        sorted_ops = get_sorted_ops(graph)
+        self.assertEqual(
+            sorted(op._attrs["op"] for op in sorted_ops),
+            ["fused_elementwise"] * 2 + ["group_fused_elementwise"],
+        )
+
+        small = [_tanh(_input(i, shape=(256, 1024))) for i in range(5)]
+        graph = _fuse(small, fuse_group_elementwise=True)
+        # at most MAX_GROUP_ELEMENTS per group
+        group, single = get_sorted_ops(graph)
+        self.assertEqual(len(group._attrs["fused_elementwise_ops"]), 4)
+        self.assertEqual(single._attrs["op"], "fused_elementwise")
+
+    def test_codegen(self):
+        x0, x1, x2 = _input(0), _input(1, shape=(5, 3)), _input(2, shape=(5, 3))
+        graph = _fuse([_tanh(x0), _sigmoid(x1) + x2], fuse_group_elementwise=True)
+        (group,) = get_sorted_ops(graph)
+        self.assertEqual(group._attrs["op"], "group_fused_elementwise")
+        name = group._attrs["name"]
+        with host_target():
+            func_call = registry.get("cuda.group_fused_elementwise.func_call")(
+                group._attrs, indent="    "
+            )
+            func_decl = registry.get("cuda.group_fused_elementwise.func_decl")(
+                group._attrs
+            )
+            src = group.gen_function()
+        # a single launch for all segments
+        self.assertEqual(func_call.count("invoke_"), 1)
+        self.assertIn(f"int {name}_n_elements1 = 5 * 3;", func_call)
+        self.assertIn(f"void invoke_{name}(", func_decl)
+        self.assertEqual(src.count("__global__"), 1)
+        self.assertIn("namespace segment1 {", src)
+        self.assertIn("segment1::kernel(", src)
+        self.assertIn("bid - block_end0", src)
+        # segments have their own read types
+        self.assertIn(
+            "const int N_ELEMENTS_PER_THREAD = sizeof(uint4) / sizeof(half);", src
+        )
+        self.assertIn(
+            "const int N_ELEMENTS_PER_THREAD = sizeof(half) / sizeof(half);", src
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.backend.cuda.gemm_universal import (
+    common_bias_broadcast,
+    gemm_rcr_bias_elementwise,
+)
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.compiler.ops.gemm_universal.epilogue_expr import (
+    apply,
+    const,
+    D0,
+    D1,
+    S,
+    split_epilogue,
+    X,
+)
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils.graph_utils import get_sorted_ops
+
+
+def _tanh(tensor):
+    return ops.elementwise(FuncEnum.TANH)(tensor)
+
+
+class GemmEpilogueFusionTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+        self._target = host_target()
+        self._target.__enter__()
+
+    def tearDown(self):
+        self._target.__exit__(None, None, None)
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def _fuse(self, epilogue_func, dtype="float16"):
+        x = Tensor(shape=[16, 64], dtype=dtype, name="x", is_input=True)
+        w = Tensor(shape=[64, 64], dtype=dtype, name="w")
+        b = Tensor(shape=[64], dtype=dtype, name="b")
+        d0 = Tensor(shape=[16, 64], dtype=dtype, name="d0", is_input=True)
+        d1 = Tensor(shape=[16, 64], dtype=dtype, name="d1", is_input=True)
+        outputs = epilogue_func(ops.gemm_rcr_bias()(x, w, b), d0, d1)
+        if not isinstance(outputs, list):
+            outputs = [outputs]
+        for idx, output in enumerate(outputs):
+            output._attrs["name"] = f"output_{idx}"
+            output._attrs["is_output"] = True
+        graph = transform.toposort(outputs)
+        transform.remove_unused_ops(graph)
+        transform.name_graph(graph)
+        transform.mark_param_tensor(graph)
+        graph = transform.fuse_mm_elementwise(graph)
+        return get_sorted_ops(graph)
+
+    def test_split_epilogue(self):
+        tanh_x = apply(FuncEnum.TANH, X)
+        # a source-free stage1 ignores d0
+        self.assertEqual(split_epilogue(tanh_x), (tanh_x, None))
+        self.assertIsNone(split_epilogue(apply(FuncEnum.MUL, tanh_x, D1)))
+        self.assertEqual(
+            split_epilogue(apply(FuncEnum.MUL, tanh_x, D0)),
+            (apply(FuncEnum.MUL, tanh_x, D0), None),
+        )
+        stage1 = apply(FuncEnum.MUL, tanh_x, D0)
+        expr = apply(FuncEnum.ADD, stage1, apply(FuncEnum.MUL, D1, const(2.0)))
+        self.assertEqual(
+            split_epilogue(expr),
+            (stage1, apply(FuncEnum.ADD, S, apply(FuncEnum.MUL, D1, const(2.0)))),
+        )
+        # x is used after d1
+        expr = apply(FuncEnum.MUL, apply(FuncEnum.ADD, stage1, D1), X)
+        self.assertIsNone(split_epilogue(expr))
+
+    def test_fuse_one_source(self):
+        sorted_ops = self._fuse(lambda y, d0, d1: _tanh(y) * d0)
+        self.assertEqual(len(sorted_ops), 1)
+        op = sorted_ops[0]
+        self.assertEqual(op._attrs["op"], "gemm_rcr_bias_elementwise")
+        self.assertEqual(op._attrs["num_sources"], 1)
+        self.assertEqual(str(op._attrs["epilogue_expr"]), "MUL(TANH(x), d0)")
+        self.assertEqual(op._attrs["inputs"][3]._attrs["name"], "d0")
+        self.assertEqual(op._attrs["outputs"][0]._attrs["name"], "output_0")
+
+    def test_fuse_two_sources(self):
+        sorted_ops = self._fuse(lambda y, d0, d1: _tanh(y) * d0 * 2.0 + d1)
+        self.assertEqual(len(sorted_ops), 1)
+        op = sorted_ops[0]
+        self.assertEqual(op._attrs["op"], "gemm_rcr_bias_elementwise")
+        self.assertEqual(op._attrs["num_sources"], 2)
+        self.assertEqual(
+            [t._attrs["name"] for t in op._attrs["inputs"][3:]], ["d0", "d1"]
+        )
+        stage1, stage2 = op._attrs["epilogue_stages"]
+        self.assertEqual(str(stage1), "MUL(MUL(TANH(x), d0), 2.0)")
+        self.assertEqual(str(stage2), "ADD(s, d1)")
+
+    def test_fuse_no_source(self):
+        sorted_ops = self._fuse(lambda y, d0, d1: _tanh(y) * 0.5)
+        self.assertEqual(len(sorted_ops), 1)
+        op = sorted_ops[0]
+        self.assertEqual(op._attrs["op"], "gemm_rcr_bias_elementwise")
+        self.assertEqual(op._attrs["num_sources"], 0)
+        self.assertEqual(str(op._attrs["epilogue_expr"]), "MUL(TANH(x), 0.5)")
+        self.assertEqual(
+            [t._attrs["name"] for t in op._attrs["inputs"]], ["x", "w", "b"]
+        )
+        self.assertEqual(
+            gemm_rcr_bias_elementwise.functor_names(op._attrs),
+            (f"{op._attrs['name']}_binary_op1", None),
+        )
+
+        # the bias is read as d0, with a row stride of 0
+        op._attrs["split_k"] = 1
+        func_call = common_bias_broadcast.gen_function_call(op._attrs)
+        self.assertEqual(func_call.count("b,"), 2)
+        layout = mock.MagicMock(stride_c="N")
+        for has_d0, ldc1 in ((True, "N,"), (False, "0,")):
+            problem_args = [
+                line.strip()
+                for line in common_bias_broadcast.PROBLEM_ARGS_TEMPLATE.render(
+                    layout=layout, has_d0=has_d0, has_d1=False
+                ).splitlines()
+                if line.strip()
+            ]
+            ldc1_arg = problem_args[problem_args.index("input_b_stride,") + 1]
+            self.assertEqual(ldc1_arg.split()[-1], ldc1)
+
+    def test_source_computed_by_elementwise(self):
+        sorted_ops = self._fuse(
+            lambda y, d0, d1: (y + d0) * ops.elementwise(FuncEnum.SIGMOID)(d1)
+        )
+        self.assertEqual(
+            [op._attrs["op"] for op in sorted_ops],
+            ["elementwise", "gemm_rcr_bias_elementwise"],
+        )
+        self.assertEqual(
+            str(sorted_ops[1]._attrs["epilogue_expr"]), "MUL(ADD(x, d0), d1)"
+        )
+
+    def test_specialized_op_has_precedence(self):
+        sorted_ops = self._fuse(lambda y, d0, d1: y * d0 + d1)
+        self.assertEqual(
+            [op._attrs["op"] for op in sorted_ops], ["gemm_rcr_bias_mul_add"]
+        )
+        sorted_ops = self._fuse(lambda y, d0, d1: _tanh(y))
+        self.assertEqual([op._attrs["op"] for op in sorted_ops], ["gemm_rcr_bias_tanh"])
+
+    def test_no_fusion(self):
+        # cannot be split into the two stages of the epilogue
+        sorted_ops = self._fuse(lambda y, d0, d1: (y * d1 + d0) * y)
+        self.assertEqual(sorted_ops[0]._attrs["op"], "gemm_rcr_bias")
+        # an intermediate tensor is an output
+        sorted_ops = self._fuse(lambda y, d0, d1: [_tanh(y), _tanh(y) * d0])
+        self.assertNotIn(
+            "gemm_rcr_bias_elementwise", [op._attrs["op"] for op in sorted_ops]
+        )
+
+    def test_no_fusion_bfloat16(self):
+        # the broadcast epilogue kernels are float16 only
+        sorted_ops = self._fuse(lambda y, d0, d1: _tanh(y) * d0, dtype="bfloat16")
+        self.assertNotIn(
+            "gemm_rcr_bias_elementwise", [op._attrs["op"] for op in sorted_ops]
+        )
+
+    def test_partial_fusion(self):
+        # a third source doesn't fit, the largest valid prefix is fused
+        def epilogue(y, d0, d1):
+            d2 = Tensor(shape=[16, 64], dtype="float16", name="d2", is_input=True)
+            return (_tanh(y) * d0 + d1) * d2
+
+        sorted_ops = self._fuse(epilogue)
+        self.assertEqual(
+            [op._attrs["op"] for op in sorted_ops],
+            ["gemm_rcr_bias_elementwise", "elementwise"],
+        )
+        self.assertEqual(
+            str(sorted_ops[0]._attrs["epilogue_expr"]), "ADD(MUL(TANH(x), d0), d1)"
+        )
+
+    def test_partial_fusion_keeps_sources(self):
+        # the closed prefix reads d0 only, the longer DAG adding d1 is not
+        # closed as the prefix is an output
+        def epilogue(y, d0, d1):
+            m = _tanh(y) * d0
+            return [m, m + d1]
+
+        sorted_ops = self._fuse(epilogue)
+        self.assertEqual(
+            [op._attrs["op"] for op in sorted_ops],
+            ["gemm_rcr_bias_elementwise", "elementwise"],
+        )
+        op = sorted_ops[0]
+        self.assertEqual(str(op._attrs["epilogue_expr"]), "MUL(TANH(x), d0)")
+        self.assertEqual(op._attrs["num_sources"], 1)
+        self.assertEqual(
+            [t._attrs["name"] for t in op._attrs["inputs"]], ["x", "w", "b", "d0"]
+        )
+
+    def test_gen_functors(self):
+        sorted_ops = self._fuse(lambda y, d0, d1: (_tanh(y) * d0 + _tanh(y)) * d1)
+        op = sorted_ops[0]
+        name = op._attrs["name"]
+        self.assertEqual(
+            gemm_rcr_bias_elementwise.functor_names(op._attrs),
+            (f"{name}_binary_op1", f"{name}_binary_op2"),
+        )
+        src = gemm_rcr_bias_elementwise.gen_functors(op._attrs)
+        self.assertIn(f"struct {name}_binary_op1 {{", src)
+        self.assertIn(f"struct {name}_binary_op2<cutlass::Array<T, N>> {{", src)
+        # tanh(x) is computed once
+        self.assertEqual(src.count("tanh"), 1)
+        self.assertIn("float tmp_0 = __fmul_rn(s, d1);", src)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+The NumPy reference interpreter, and checks of graph passes with it.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.base import _NumpyConstantTensorData, IntVar
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.compiler.transform.pass_manager import GraphPass, PassManager
+from aitemplate.frontend import Tensor
+from aitemplate.testing.graph_interpreter import PassChecker, run_graph
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils import graph_utils
+
+
+def _sorted_graph(*outputs):
+    for i, output in enumerate(outputs):
+        output._attrs["name"] = f"y{i}"
+        output._attrs["is_output"] = True
+    graph = transform.toposort(list(outputs))
+    transform.remove_unused_ops(graph)
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    return graph
+
+
+def _randn(*shape):
+    return np.random.randn(*shape).astype(np.float32)
+
+
+class GraphInterpreterTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def _assert_close(self, actual, expected, tol=1e-4):
+        np.testing.assert_allclose(actual, np.asarray(expected), rtol=tol, atol=tol)
+
+    def test_ops(self):
+        x_pt = torch.randn(4, 8, 16)
+        w_pt = torch.randn(32, 16)
+        b_pt = torch.randn(32)
+        d_pt = torch.randn(4, 8, 32)
+        gamma_pt = torch.randn(32)
+
+        x = Tensor(shape=[4, 8, 16], dtype="float16", name="x", is_input=True)
+        w = Tensor(shape=[32, 16], dtype="float16", name="w")
+        b = Tensor(shape=[32], dtype="float16", name="b")
+        w._bind_data(_NumpyConstantTensorData(w_pt.numpy().astype(np.float16)))
+        b._bind_data(_NumpyConstantTensorData(b_pt.numpy().astype(np.float16)))
+        d = Tensor(shape=[4, 8, 32], dtype="float16", name="d", is_input=True)
+        gamma = Tensor(shape=[32], dtype="float16", name="gamma")
+
+        h = ops.gemm_rcr_bias_add_relu()(x, w, b, d)
+        h = ops.layernorm()(h, gamma, None, [32])
+        s = ops.softmax()(ops.bmm_rcr()(h, h), -1)
+        lo, hi = ops.split()(ops.permute021()(h), [12, 20], dim=1)
+        cat = ops.concatenate()([ops.reduce_mean(1, keepdim=True)(hi), lo], dim=1)
+        cat = ops.dynamic_slice()(cat, [0, 1, 2], [None, -1, None])
+        norm = ops.vector_norm(dim=2)(ops.reshape()(cat, [4, -1, 33]))
+        graph = _sorted_graph(s, cat, norm)
+
+        w16 = w_pt.half().float()
+        b16 = b_pt.half().float()
+        h_pt = torch.relu(x_pt @ w16.T + b16 + d_pt)
+        h_pt = torch.nn.functional.layer_norm(h_pt, [32], gamma_pt)
+        s_pt = torch.softmax(h_pt @ h_pt.transpose(1, 2), -1)
+        lo_pt, hi_pt = torch.split(h_pt.permute(0, 2, 1), [12, 20], dim=1)
+        cat_pt = torch.cat([hi_pt.mean(1, keepdim=True), lo_pt], dim=1)[:, 1:-1, 2:]
+        norm_pt = torch.linalg.vector_norm(cat_pt.reshape(4, -1, 33), dim=2)
+
+        outputs = run_graph(
+            graph,
+            {"x": x_pt.numpy(), "d": d_pt.numpy()},
+            constants={"gamma": gamma_pt.numpy()},
+        )
+        self.assertEqual(outputs["y0"].dtype, np.float32)
+        self._assert_close(outputs["y0"], s_pt)
+        self._assert_close(outputs["y1"], cat_pt)
+        self._assert_close(outputs["y2"], norm_pt)
+
+        with self.assertRaisesRegex(ValueError, "Missing input d"):
+            run_graph(graph, {"x": x_pt.numpy()}, {"gamma": gamma_pt.numpy()})
+        with self.assertRaisesRegex(RuntimeError, "gamma has no value"):
+            run_graph(graph, {"x": x_pt.numpy(), "d": d_pt.numpy()})
+
+    def test_conv2d(self):
+        x_pt = torch.randn(2, 9, 9, 8)
+        w_pt = torch.randn(16, 3, 3, 4)
+        b_pt = torch.randn(16)
+        r_pt = torch.randn(2, 5, 5, 16)
+
+        x = Tensor(shape=[2, 9, 9, 8], name="x", is_input=True)
+        w = Tensor(shape=[16, 3, 3, 4], name="w", is_input=True)
+        b = Tensor(shape=[16], name="b", is_input=True)
+        r = Tensor(shape=[2, 5, 5, 16], name="r", is_input=True)
+        y = ops.conv2d_bias_add_hardswish(stride=2, pad=2, dilate=2, group=2)(
+            x, w, b, r
+        )
+        graph = _sorted_graph(y)
+        outputs = run_graph(
+            graph,
+            {
+                "x": x_pt.numpy(),
+                "w": w_pt.numpy(),
+                "b": b_pt.numpy(),
+                "r": r_pt.numpy(),
+            },
+        )
+        y_pt = torch.nn.functional.conv2d(
+            x_pt.permute(0, 3, 1, 2),
+            w_pt.permute(0, 3, 1, 2),
+            b_pt,
+            stride=2,
+            padding=2,
+            dilation=2,
+            groups=2,
+        )
+        y_pt = torch.nn.functional.hardswish(y_pt.permute(0, 2, 3, 1) + r_pt)
+        self._assert_close(outputs["y0"], y_pt)
+
+    def _build_transformer(self, hidden=32, seq_len=8):
+        batch_size = IntVar([1, 8], name="batch_size")
+        x = Tensor(shape=[batch_size, seq_len, hidden], name="x", is_input=True)
+        constants = {}
+
+        def weight(name, shape):
+            constants[name] = _randn(*shape) * 0.1
+            return Tensor(shape=shape, name=name)
+
+        y = ops.reshape()(x, [-1, hidden])
+        qkv = ops.gemm_rcr_bias()(
+            y, weight("w_qkv", [3 * hidden, hidden]), weight("b_qkv", [3 * hidden])
+        )
+        q, k, v = ops.split()(qkv, hidden, dim=1)
+        q = ops.reshape()(q, [-1, seq_len, hidden])
+        k = ops.reshape()(k, [-1, seq_len, hidden])
+        v = ops.reshape()(v, [-1, seq_len, hidden])
+        scores = ops.elementwise(FuncEnum.MUL)(ops.bmm_rcr()(q, k), 0.125)
+        attn = ops.bmm_rrr()(ops.softmax()(scores, -1), v)
+        attn = ops.reshape()(attn, [-1, hidden])
+        out = ops.gemm_rcr_bias_add()(
+            attn, weight("w_o", [hidden, hidden]), weight("b_o", [hidden]), y
+        )
+        out = ops.layernorm()(
+            out, weight("gamma", [hidden]), weight("beta", [hidden]), [hidden]
+        )
+        h = ops.gemm_rcr_bias()(
+            out, weight("w_1", [hidden, hidden]), weight("b_1", [hidden])
+        )
+        h = ops.elementwise(FuncEnum.TANH)(h)
+        h = ops.elementwise(FuncEnum.ADD)(h, out)
+        y = ops.concatenate()([h, out], dim=1)
+        return _sorted_graph(y), constants
+
+    def test_optimize_graph(self):
+        with host_target():
+            graph, constants = self._build_transformer()
+            x = _randn(3, 8, 32)
+            checker = PassChecker(graph, {"x": x}, constants)
+            graph = transform.optimize_graph(
+                graph, self._tmp_dir.name, after_pass=checker
+            )
+        self.assertIn("fuse_mm_elementwise", checker.passes)
+        self.assertEqual(checker.passes[-1], "fuse_group_elementwise")
+        sorted_ops = {op._attrs["op"]: op for op in graph_utils.get_sorted_ops(graph)}
+        self.assertIn("gemm_rcr_bias_elementwise", sorted_ops)
+        # h is written into the output of the concatenation by the gemm
+        self.assertEqual(sorted_ops["concatenate"]._attrs["input_masks"], [False, True])
+
+        reference = checker.reference["y0"]
+        self.assertEqual(reference.shape, (24, 64))
+        # the interpreter matches a straightforward NumPy implementation
+        y = x.reshape(-1, 32)
+        qkv = y @ constants["w_qkv"].T + constants["b_qkv"]
+        q, k, v = (t.reshape(3, 8, 32) for t in np.split(qkv, 3, axis=1))
+        scores = q @ k.transpose(0, 2, 1) * 0.125
+        scores = np.exp(scores - scores.max(-1, keepdims=True))
+        attn = (scores / scores.sum(-1, keepdims=True)) @ v
+        out = attn.reshape(-1, 32) @ constants["w_o"].T + constants["b_o"] + y
+        mean = out.mean(-1, keepdims=True)
+        var = out.var(-1, keepdims=True)
+        out = (out - mean) / np.sqrt(var + 1e-5) * constants["gamma"]
+        out = out + constants["beta"]
+        h = np.tanh(out @ constants["w_1"].T + constants["b_1"]) + out
+        self._assert_close(reference, np.concatenate([h, out], axis=1))
+
+    def test_broken_pass(self):
+        def swap_tanh(sorted_graph, workdir):
+            for op in graph_utils.get_sorted_ops(sorted_graph):
+                for elementwise in op._attrs.get("elementwise_ops", []):
+                    if elementwise._attrs["func"] == FuncEnum.TANH:
+                        elementwise._attrs["func"] = FuncEnum.SIGMOID
+            return sorted_graph
+
+        with host_target():
+            graph, constants = self._build_transformer()
+            checker = PassChecker(graph, {"x": _randn(2, 8, 32)}, constants)
+            manager = PassManager(
+                [GraphPass(transform.fuse_ops), GraphPass(swap_tanh)],
+                after_pass=checker,
+            )
+            with self.assertRaisesRegex(AssertionError, "Pass swap_tanh changed"):
+                manager.run(graph, self._tmp_dir.name)
+        self.assertEqual(checker.passes, ["fuse_ops"])
+
+
+if __name__ == "__main__":
+    unittest.main()
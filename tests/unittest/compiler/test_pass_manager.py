@@ -0,0 +1,161 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.compiler.transform import pass_manager
+from aitemplate.compiler.transform.pass_manager import (
+    ALL_INVARIANTS,
+    GraphInvariant,
+    GraphPass,
+    PassManager,
+)
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils import graph_utils
+
+
+def _build_graph(num_layers=4, hidden=64):
+    x = Tensor(shape=[16, hidden], dtype="float16", name="x", is_input=True)
+    y = x
+    for i in range(num_layers):
+        w = Tensor(shape=[hidden, hidden], dtype="float16", name=f"w_{i}")
+        b = Tensor(shape=[hidden], dtype="float16", name=f"b_{i}")
+        h = ops.gemm_rcr_bias()(y, w, b)
+        h = ops.elementwise(FuncEnum.TANH)(h)
+        h = ops.elementwise(FuncEnum.ADD)(h, y)
+        y = ops.softmax()(h, -1)
+    y._attrs["name"] = "y"
+    y._attrs["is_output"] = True
+    graph = transform.toposort(y)
+    transform.remove_unused_ops(graph)
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    return graph
+
+
+def _identity(sorted_graph, workdir):
+    return sorted_graph
+
+
+def _break_graph(sorted_graph, workdir):
+    # the src op of the output no longer lists it as an output
+    output = sorted_graph[-1]
+    list(output.src_ops())[0]._attrs["outputs"] = []
+    return sorted_graph
+
+
+class PassManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def _run_optimize_graph(self, debug):
+        aitemplate_logger = logging.getLogger("aitemplate")
+        level = aitemplate_logger.level
+        aitemplate_logger.setLevel(logging.DEBUG if debug else logging.INFO)
+        try:
+            with host_target():
+                graph = _build_graph()
+                return transform.optimize_graph(graph, self._tmp_dir.name)
+        finally:
+            aitemplate_logger.setLevel(level)
+
+    def test_optimize_graph(self):
+        # debug mode validates and dumps the graph after every pass
+        debug_graph = self._run_optimize_graph(debug=True)
+        self.assertTrue(
+            os.path.exists(os.path.join(self._tmp_dir.name, "fuse_ops_graph.txt"))
+        )
+        graph = self._run_optimize_graph(debug=False)
+
+        for g in (debug_graph, graph):
+            self.assertTrue(transform.transform_utils.check_graph_validity(g))
+        self.assertEqual(
+            [op._attrs["op"] for op in graph_utils.get_sorted_ops(graph)],
+            [op._attrs["op"] for op in graph_utils.get_sorted_ops(debug_graph)],
+        )
+        self.assertEqual(
+            [t._attrs["is_param"] for t in graph],
+            [t._attrs["is_param"] for t in debug_graph],
+        )
+        # tanh + add is fused into the gemm epilogue
+        self.assertEqual(
+            [op._attrs["op"] for op in graph_utils.get_sorted_ops(graph)],
+            ["gemm_rcr_bias_elementwise", "softmax"] * 4,
+        )
+
+    def test_restore_invariants(self):
+        calls = []
+
+        def track(name, func):
+            def wrapper(sorted_graph):
+                calls.append(name)
+                return func(sorted_graph)
+
+            return mock.patch.object(pass_manager, name, wrapper)
+
+        passes = [
+            # invalidates all invariants
+            GraphPass(_identity, requires=frozenset(), name="a"),
+            GraphPass(
+                _identity,
+                requires=frozenset({GraphInvariant.NAMED}),
+                preserves=ALL_INVARIANTS,
+                name="b",
+            ),
+            GraphPass(
+                _identity,
+                requires=frozenset({GraphInvariant.NAMED}),
+                preserves=ALL_INVARIANTS,
+                name="c",
+            ),
+        ]
+        with host_target(), track("toposort", pass_manager.toposort), track(
+            "name_graph", pass_manager.name_graph
+        ), track("mark_param_tensor", pass_manager.mark_param_tensor):
+            manager = PassManager(passes, validate=False, dump_graph=False)
+            graph = manager.run(_build_graph(), self._tmp_dir.name)
+        self.assertTrue(transform.transform_utils.check_graph_validity(graph))
+        # names are restored before "b", the rest once all passes are done
+        self.assertEqual(calls, ["name_graph", "toposort", "mark_param_tensor"])
+        self.assertEqual(
+            [timing.name for timing in manager.timings],
+            ["a", "b", "c", "restore invariants"],
+        )
+        self.assertIn("total", manager.timing_report())
+
+    def test_validate(self):
+        passes = [GraphPass(_break_graph, requires=frozenset())]
+        with host_target():
+            PassManager(passes, validate=False).run(_build_graph(), self._tmp_dir.name)
+            with self.assertRaises(RuntimeError):
+                PassManager(passes, validate=True).run(
+                    _build_graph(), self._tmp_dir.name
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
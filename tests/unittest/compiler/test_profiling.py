@@ -0,0 +1,157 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from aitemplate.compiler.profiling import (
+    exec_key_sha1,
+    profile_ops,
+    ProfileCandidate,
+    ProfiledOperator,
+)
+from aitemplate.testing.host_target import host_target
+
+
+class _FakeNorm(ProfiledOperator):
+    """An op with two kernels whose profilers log every invocation."""
+
+    _profile_cache_class = "normalization"
+
+    def __init__(self, name, exec_keys, log, times=(0.5, 0.2)):
+        super().__init__()
+        self._attrs["op"] = "fake_norm"
+        self._attrs["name"] = name
+        self._attrs["exec_path"] = OrderedDict((key, None) for key in exec_keys)
+        self._attrs["workspace"] = 0
+        self._log = log
+        self._times = times
+
+    def _profile_query(self, exec_key):
+        return {
+            "dtype_in": 1,
+            "dtype_acc": 1,
+            "dtype_out": 1,
+            "rank": 2,
+            "op_type": self._attrs["op"],
+            "device": "80",
+            "exec_entry_sha1": exec_key_sha1(exec_key),
+        }
+
+    def _profile_record(self, exec_key, value):
+        record = self._profile_query(exec_key)
+        record["exec_entry"] = exec_key
+        record["algo"], record["workspace"] = value
+        return record
+
+    def _profile_candidates(self, profiler_prefix, exec_key, round_idx, results):
+        if round_idx > 0:
+            return []
+        return [
+            ProfileCandidate(
+                f"algo_{i}",
+                [
+                    "sh",
+                    "-c",
+                    f"echo {exec_key} >> {self._log}; echo TIME:{t} WS:{16 * i}",
+                ],
+            )
+            for i, t in enumerate(self._times)
+        ]
+
+    def _apply_profile_result(self, exec_key, value):
+        self._attrs["exec_path"][exec_key] = value[0]
+        self._attrs["workspace"] = max(self._attrs["workspace"], value[1])
+
+
+class _FakeTwoRound(_FakeNorm):
+    """An uncached op which refines the winner of its first round."""
+
+    _profile_cache_class = None
+
+    def _profile_query(self, exec_key):
+        return None
+
+    def _profile_candidates(self, profiler_prefix, exec_key, round_idx, results):
+        if round_idx == 0:
+            return super()._profile_candidates(
+                profiler_prefix, exec_key, round_idx, results
+            )
+        if round_idx > 1:
+            return []
+        best, _ = min(results, key=lambda x: x[1].duration)
+        return [
+            ProfileCandidate(
+                best.algo,
+                ["sh", "-c", f"echo {exec_key} >> {self._log}; echo TIME:0.1 WS:0"],
+                extra=(4,),
+            )
+        ]
+
+    def _apply_profile_result(self, exec_key, value):
+        self._attrs["exec_path"][exec_key] = value
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def _count_runs(self, log):
+        if not os.path.exists(log):
+            return 0
+        with open(log) as f:
+            return len(f.readlines())
+
+    def test_profile_dedupe_and_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log = os.path.join(tmp_dir, "profile.log")
+            env = {"CACHE_DIR": tmp_dir}
+            with mock.patch.dict(os.environ, env), host_target():
+                op_0 = _FakeNorm("op_0", ["M == 1", "M == 2"], log)
+                op_1 = _FakeNorm("op_1", ["M == 2", "M == 3"], log)
+                profile_ops([op_0, op_1], workdir=tmp_dir)
+                # 3 unique workloads x 2 kernels
+                self.assertEqual(self._count_runs(log), 6)
+                for op in (op_0, op_1):
+                    self.assertEqual(
+                        list(op._attrs["exec_path"].values()), ["algo_1", "algo_1"]
+                    )
+                    self.assertEqual(op._attrs["workspace"], 16)
+
+                # all results come from the cache now
+                op_2 = _FakeNorm("op_2", ["M == 1", "M == 3"], log)
+                self.assertFalse(op_2._should_build_profiler())
+                self.assertEqual(
+                    list(op_2._attrs["exec_path"].values()), ["algo_1", "algo_1"]
+                )
+                profile_ops([op_2], workdir=tmp_dir)
+                self.assertEqual(self._count_runs(log), 6)
+
+    def test_profile_rounds(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log = os.path.join(tmp_dir, "profile.log")
+            env = {"CACHE_DIR": tmp_dir}
+            with mock.patch.dict(os.environ, env), host_target():
+                op_0 = _FakeTwoRound("op_0", ["M == 1"], log, times=(0.2, 0.5))
+                op_1 = _FakeTwoRound("op_1", ["M == 1"], log)
+                op_0.profile(workdir=tmp_dir)
+                profile_ops([op_1], workdir=tmp_dir)
+                # uncached ops are not deduped with each other
+                self.assertEqual(self._count_runs(log), 6)
+                self.assertEqual(op_0._attrs["exec_path"]["M == 1"], ("algo_0", 0, 4))
+                self.assertEqual(op_1._attrs["exec_path"]["M == 1"], ("algo_1", 0, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.backend import registry
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.base import IntVar
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.compiler.transform.refine_graph import op_signature, same_function_type
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils import graph_utils
+
+
+def _legacy_refine_names(sorted_ops):
+    """Names assigned by the pairwise scan of refine_graph."""
+    names = {}
+    exist_func = []
+    for func in sorted_ops:
+        for f in reversed(exist_func):
+            if same_function_type(f, func):
+                names[func] = names[f]
+                break
+        else:
+            names[func] = func._attrs["name"]
+            exist_func.append(func)
+    return [names[func] for func in sorted_ops]
+
+
+def _transformer_like_graph():
+    batch = IntVar([1, 128], name="batch")
+    x = Tensor(shape=[batch, 64], dtype="float16", name="x", is_input=True)
+    y = x
+    for i in range(4):
+        w = Tensor(shape=[64, 64], dtype="float16", name=f"w_{i}")
+        b = Tensor(shape=[64], dtype="float16", name=f"b_{i}")
+        y = ops.gemm_rcr_bias()(y, w, b)
+        y = ops.elementwise(FuncEnum.TANH)(y)
+        y = ops.softmax()(y, -1)
+        y = ops.layernorm()(y, None, None, [64])
+    return [y]
+
+
+def _elementwise_graph():
+    xs = [
+        Tensor(shape=[10, 4], dtype="float16", name=f"x_{i}", is_input=True)
+        for i in range(3)
+    ]
+    y_0 = (xs[0] + xs[1]) * xs[2]
+    y_1 = (xs[0] + xs[2]) * xs[1]
+    y_2 = ops.elementwise(FuncEnum.SILU)(xs[0])
+    y_3 = ops.elementwise(FuncEnum.SILU)(xs[1])
+    y_4 = xs[0] / (xs[0] * xs[0])
+    y_5 = ops.elementwise(FuncEnum.SIGMOID)(xs[2])
+    return [y_0, y_1, y_2, y_3, y_4, y_5]
+
+
+def _fused_chain_graph():
+    x = Tensor(shape=[8, 64], dtype="float16", name="x", is_input=True)
+    y = x
+    for i in range(4):
+        b = Tensor(shape=[64], dtype="float16", name=f"b_{i}")
+        s = Tensor(shape=[8, 64], dtype="float16", name=f"s_{i}")
+        y = ops.elementwise(FuncEnum.TANH)((y + b) * s)
+        y = ops.softmax()(y, -1)
+    return [y]
+
+
+def _concat_graph():
+    xs = [
+        Tensor(shape=[8, 64], dtype="float16", name=f"x_{i}", is_input=True)
+        for i in range(3)
+    ]
+    ys = [ops.elementwise(FuncEnum.TANH)(x) for x in xs]
+    return [ops.concatenate()(ys, dim=1)]
+
+
+def _bmm_graph():
+    outputs = []
+    for i in range(3):
+        a = Tensor(shape=[2, 8, 16], dtype="float16", name=f"a_{i}", is_input=True)
+        b = Tensor(shape=[2, 16, 8], dtype="float16", name=f"b_{i}", is_input=True)
+        outputs.append(ops.bmm_rrr()(a, b))
+    c = Tensor(shape=[2, 8, 8], dtype="float16", name="c", is_input=True)
+    outputs.append(ops.bmm_rrr()(c, c))
+    return outputs
+
+
+class RefineGraphSignatureTestCase(unittest.TestCase):
+    def _optimized_ops(self, build_graph, workdir):
+        outputs = build_graph()
+        for i, y in enumerate(outputs):
+            y._attrs["name"] = f"y_{i}"
+            y._attrs["is_output"] = True
+        graph = transform.toposort(outputs)
+        transform.remove_unused_ops(graph)
+        transform.remove_no_ops(graph)
+        transform.name_graph(graph)
+        transform.mark_param_tensor(graph)
+        graph = transform.optimize_graph(graph, workdir)
+        transform.mark_special_views(graph)
+        return graph, graph_utils.get_sorted_ops(graph)
+
+    def _check_graph(self, build_graph, check_func=None):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch.dict(os.environ, {"CACHE_DIR": tmp_dir}), host_target():
+                graph, sorted_ops = self._optimized_ops(build_graph, tmp_dir)
+
+                for o1 in sorted_ops:
+                    for o2 in sorted_ops:
+                        sig_1 = op_signature(o1)
+                        same_sig = sig_1 is not None and sig_1 == op_signature(o2)
+                        self.assertEqual(same_sig, same_function_type(o1, o2))
+
+                expected = _legacy_refine_names(sorted_ops)
+                transform.refine_graph(graph, tmp_dir)
+                names = [op._attrs["name"] for op in sorted_ops]
+                self.assertEqual(names, expected)
+                if check_func is not None:
+                    check_func(sorted_ops, tmp_dir)
+                return names
+
+    def test_transformer_like_graph(self):
+        names = self._check_graph(_transformer_like_graph)
+        # gemm + bias + tanh, softmax and layernorm of every layer
+        self.assertEqual(len(names), 12)
+        self.assertEqual(len(set(names)), 3)
+
+    def test_elementwise_graph(self):
+        names = self._check_graph(_elementwise_graph)
+        self.assertEqual(names[2], names[3])
+
+    def test_fused_chain_graph(self):
+        def check_report(sorted_ops, workdir):
+            with open(os.path.join(workdir, "refine_graph_report.md")) as f:
+                report = f.read()
+            self.assertIn("|fused_elementwise|   4  |  1  |", report)
+            self.assertIn("|      total      |   8  |  2  |", report)
+
+        names = self._check_graph(_fused_chain_graph, check_report)
+        # each layer is a fused (y + b) * s -> tanh, and a softmax
+        self.assertEqual(len(names), 8)
+        self.assertEqual(len(set(names)), 2)
+
+    def test_accessor_offsets(self):
+        def check_call(sorted_ops, workdir):
+            func_call = registry.get("cuda.fused_elementwise.func_call")
+            offsets = []
+            for op in sorted_ops:
+                offset = op._attrs["output_accessors"][0].offset
+                offsets.append(offset)
+                output_ptr = "reinterpret_cast<half*>({})".format(
+                    op._attrs["outputs"][0]._attrs["name"]
+                )
+                if offset != 0:
+                    output_ptr += f" + {offset}"
+                self.assertIn(output_ptr, func_call(op._attrs, indent="    "))
+            self.assertEqual(sorted(offsets), [0, 64, 128])
+
+        # elementwise ops write into the concat output at different offsets
+        names = self._check_graph(_concat_graph, check_call)
+        self.assertEqual(len(names), 3)
+        self.assertEqual(len(set(names)), 1)
+
+    def test_bmm_graph(self):
+        names = self._check_graph(_bmm_graph)
+        self.assertEqual(names[:3], [names[0]] * 3)
+        self.assertNotEqual(names[3], names[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Symbolic dims, see DimExpr.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.base import DimExpr, IntImm, IntVar
+from aitemplate.compiler.ops.conv import conv2d
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+
+
+class DimExprTestCase(unittest.TestCase):
+    def test_algebra(self):
+        batch = IntVar([1, 64], "batch")
+        seq = IntVar([16, 512], "seq")
+        expr = batch * seq * 4
+        self.assertEqual(expr, seq * 2 * batch * 2)
+        self.assertEqual(hash(expr), hash(4 * seq * batch))
+        self.assertEqual(expr / batch / 4, seq.symbolic_value())
+        self.assertEqual(expr.free_dims(), [batch, seq])
+        self.assertEqual(expr.bounds(), (64, 131072))
+        self.assertTrue(expr.is_divisible_by(seq * 2))
+        self.assertFalse(expr.is_divisible_by(seq * 8))
+        self.assertFalse((batch / 2).is_integral())
+        self.assertTrue((IntImm(6) * IntImm(2) / 3).is_constant())
+        self.assertEqual((batch * 3).values(), [3, 192])
+
+    def test_to_int_var(self):
+        batch = IntVar([1, 64], "batch")
+        seq = IntVar([16, 512], "seq")
+        self.assertIs((batch * seq / seq).to_int_var(), batch)
+        self.assertEqual((IntImm(6) * 2).to_int_var().value(), 12)
+
+        dim = (batch * seq).to_int_var()
+        self.assertEqual(dim._attrs["values"], [16, 32768])
+        self.assertEqual(dim, (seq * batch).to_int_var())
+        self.assertEqual(hash(dim), hash((seq * batch).to_int_var()))
+        self.assertNotEqual(dim, (batch * seq * 2).to_int_var())
+        self.assertEqual(dim.symbolic_value() * 2 / seq, batch * 2)
+
+    def test_to_cpp(self):
+        batch = IntVar([1, 64], "batch")
+        seq = IntVar([16, 512], "seq")
+        names = {batch: "b", seq: "s"}
+        self.assertEqual((batch * seq * 64).to_cpp(names.get), "64 * b * s")
+        self.assertEqual((batch * seq / 2).to_cpp(names.get), "(b * s) / (2)")
+        self.assertEqual(DimExpr(8).to_cpp(names.get), "8")
+
+
+class SymbolicShapeInferenceTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def test_flatten_reshape(self):
+        batch = IntVar([1, 64], "batch")
+        seq = IntVar([16, 512], "seq")
+        x = Tensor([batch, seq, 64], name="x", is_input=True)
+        y = ops.flatten(0, 1)(x)
+        self.assertEqual(y.shape()[0].symbolic_value(), batch * seq)
+        self.assertEqual(y.shape()[0]._attrs["values"], [16, 32768])
+
+        # the other dynamic dim is recovered from the flattened one
+        z = ops.reshape()(y, [batch, -1, 64])
+        self.assertIs(z.shape()[0], batch)
+        self.assertIs(z.shape()[1], seq)
+
+        w = ops.reshape()(x, [batch, -1])
+        self.assertIs(w.shape()[0], batch)
+        self.assertEqual(w.shape()[1].symbolic_value(), seq * 64)
+
+        w._attrs["is_output"] = True
+        w._attrs["name"] = "w"
+        graph = transform.toposort([w, z])
+        transform.name_graph(graph)
+        with host_target():
+            flatten_src = next(iter(y.src_ops())).gen_function()
+            reshape_src = next(iter(w.src_ops())).gen_function()
+        self.assertIn("*out_0 = (*in_0) * (*in_1);", flatten_src)
+        self.assertIn("*out_1 = 64 * (*in_1);", reshape_src)
+
+    def test_reshape_fallback(self):
+        # divisibility can't be proven, the values are enumerated instead
+        batch = IntVar([2, 4], "batch")
+        x = Tensor([batch, 3], name="x", is_input=True)
+        y = ops.reshape()(x, [-1, 6])
+        self.assertEqual(y.shape()[0]._attrs["values"], [1, 2])
+        self.assertEqual(y.shape()[1].value(), 6)
+
+    def test_per_dim_inference(self):
+        values = list(range(1, 1001))
+        batch = IntVar(values, "batch")
+        height = IntVar([v + 16 for v in values], "height")
+        width = IntVar([v + 16 for v in values], "width")
+        x = Tensor([batch, height, width, 8], name="x", is_input=True)
+        op = ops.max_pool2d(2, 2, 0)
+        with mock.patch.object(op, "_infer_shape", wraps=op._infer_shape) as infer:
+            y = op(x)
+        # once per value of every dynamic dim, rather than their product
+        self.assertLessEqual(infer.call_count, 3 * len(values))
+        self.assertIs(y.shape()[0], batch)
+        self.assertEqual(y.shape()[1]._attrs["values"][-1], 508)
+        self.assertEqual(y.shape()[3].value(), 8)
+
+        x = Tensor([batch, 32, 32, 8], name="x", is_input=True)
+        w = Tensor([16, 3, 3, 8], name="w")
+        y = conv2d(stride=1, pad=1)(x, w)
+        self.assertIs(y.shape()[0], batch)
+        self.assertEqual([dim.value() for dim in y.shape()[1:]], [32, 32, 16])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Weight-only int8 quantization of gemms with constant weights.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from aitemplate.backend import registry
+from aitemplate.compiler import ops, transform
+from aitemplate.compiler.base import _NumpyConstantTensorData
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+from aitemplate.utils.graph_utils import get_sorted_ops
+from aitemplate.utils.quantization import (
+    dequantize_int8_per_channel,
+    pack_int8_weight,
+    quantize_int8_per_channel,
+    unpack_int8_weight,
+)
+
+M, N, K = 4, 16, 64
+
+
+def _constant(name, shape):
+    tensor = Tensor(shape=list(shape), dtype="float16", name=name)
+    data = np.random.uniform(-1, 1, shape).astype(np.float16)
+    tensor._bind_data(_NumpyConstantTensorData(data))
+    return tensor, data
+
+
+def _graph(output):
+    output._attrs["name"] = "y"
+    output._attrs["is_output"] = True
+    graph = transform.toposort([output])
+    transform.name_graph(graph)
+    transform.mark_param_tensor(graph)
+    return graph
+
+
+class QuantizationTestCase(unittest.TestCase):
+    def test_quantize(self):
+        weight = np.random.uniform(-2, 2, (N, K)).astype(np.float16)
+        weight[1] = 0
+        qweight, scales = quantize_int8_per_channel(weight)
+        self.assertEqual(qweight.dtype, np.int8)
+        self.assertEqual(scales.dtype, np.float16)
+        self.assertEqual(scales.shape, (N,))
+        self.assertEqual(np.abs(qweight).max(), 127)
+        self.assertFalse(qweight[1].any())
+
+        # rounding error is at most half a step per channel
+        error = np.abs(dequantize_int8_per_channel(qweight, scales) - weight)
+        bound = scales.astype(np.float32)[:, None] / 2 + 1e-3
+        self.assertTrue((error <= bound).all())
+
+    def test_pack(self):
+        qweight = np.random.randint(-127, 128, (N, K)).astype(np.int8)
+        packed = pack_int8_weight(qweight)
+        self.assertEqual(packed.dtype, np.int8)
+        self.assertEqual(packed.shape, (N, K))
+        np.testing.assert_array_equal(unpack_int8_weight(packed), qweight)
+
+        qweight = np.array([[-128 + 1, -1, 0, 127]], dtype=np.int8)
+        self.assertEqual(
+            pack_int8_weight(qweight).view(np.uint8).tolist(), [[1, 128, 127, 255]]
+        )
+        with self.assertRaises(ValueError):
+            pack_int8_weight(np.zeros((N, 6), dtype=np.int8))
+
+
+class QuantizeGemmWeightsTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def _check_quantized(self, graph, op_name, weight):
+        (op,) = get_sorted_ops(graph)
+        self.assertEqual(op._attrs["op"], op_name)
+        _, packed_weight, scale = op._attrs["inputs"][:3]
+        self.assertEqual(packed_weight.dtype(), "int8")
+        self.assertEqual(packed_weight.size_bytes(), N * K)
+        self.assertTrue(packed_weight._attrs["is_param"])
+        self.assertTrue(scale._attrs["is_param"])
+        self.assertNotIn("w", [tensor._attrs["name"] for tensor in graph])
+
+        packed = np.frombuffer(packed_weight._attrs["data"].to_bytes(), np.int8)
+        scales = np.frombuffer(scale._attrs["data"].to_bytes(), np.float16)
+        qweight = unpack_int8_weight(packed.reshape(N, K))
+        dequantized = dequantize_int8_per_channel(qweight, scales)
+        np.testing.assert_allclose(dequantized, weight, atol=1e-2)
+        return op
+
+    def test_gemm_rcr(self):
+        x = Tensor(shape=[M, K], dtype="float16", name="x", is_input=True)
+        w, weight = _constant("w", (N, K))
+        graph = _graph(ops.gemm_rcr()(x, w))
+        with host_target(weight_only_int8=True):
+            graph = transform.quantize_gemm_weights(graph)
+            transform.mark_param_tensor(graph)
+            op = self._check_quantized(graph, "gemm_rcr_weight_int8", weight)
+            src = op.gen_function()
+            func_decl = registry.get("cuda.gemm_rcr_weight_int8.func_decl")(op._attrs)
+        self.assertEqual(graph[-1]._attrs["name"], "y")
+        self.assertEqual([dim.value() for dim in graph[-1].shape()], [M, N])
+        self.assertIn("__byte_perm", src)
+        self.assertIn("gemm_rcr_weight_int8_kernel<false>", src)
+        self.assertIn("int8_t*", func_decl)
+
+    def test_gemm_rcr_bias(self):
+        x = Tensor(shape=[M, K], dtype="float16", name="x", is_input=True)
+        w, weight = _constant("w", (N, K))
+        bias, _ = _constant("bias", (N,))
+        graph = _graph(ops.gemm_rcr_bias()(x, w, bias))
+        with host_target(weight_only_int8=True):
+            graph = transform.quantize_gemm_weights(graph)
+            transform.mark_param_tensor(graph)
+            op = self._check_quantized(graph, "gemm_rcr_bias_weight_int8", weight)
+            self.assertIs(op._attrs["inputs"][3], bias)
+            src = op.gen_function()
+        self.assertIn("gemm_rcr_weight_int8_kernel<true>", src)
+
+    def test_not_quantized(self):
+        x = Tensor(shape=[M, K], dtype="float16", name="x", is_input=True)
+        w, _ = _constant("w", (N, K))
+        graph = _graph(ops.gemm_rcr()(x, w))
+        # disabled by default
+        with host_target():
+            graph = transform.quantize_gemm_weights(graph)
+        self.assertEqual(get_sorted_ops(graph)[0]._attrs["op"], "gemm_rcr")
+
+        # weights which are not bound at compile time are kept
+        x = Tensor(shape=[M, K], dtype="float16", name="x", is_input=True)
+        w = Tensor(shape=[N, K], dtype="float16", name="w", is_input=True)
+        graph = _graph(ops.gemm_rcr()(x, w))
+        with host_target(weight_only_int8=True):
+            graph = transform.quantize_gemm_weights(graph)
+        self.assertEqual(get_sorted_ops(graph)[0]._attrs["op"], "gemm_rcr")
+
+
+if __name__ == "__main__":
+    unittest.main()
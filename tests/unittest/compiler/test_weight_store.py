@@ -0,0 +1,130 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Weight stores shared by several models, and the codegen of models compiled
+with them.
+"""
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from aitemplate.backend.codegen import ModelContainerGenerator
+from aitemplate.backend.target import Target
+from aitemplate.compiler import ops, transform, WeightStore
+from aitemplate.compiler.base import _NumpyConstantTensorData
+from aitemplate.compiler.ops.common.epilogue import FuncEnum
+from aitemplate.compiler.weight_store import WEIGHT_STORE_ALIGNMENT
+from aitemplate.frontend import Tensor
+from aitemplate.testing.host_target import host_target
+
+
+class WeightStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+        self._path = os.path.join(self._tmp_dir.name, "store", "weights.bin")
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def test_weight_store(self):
+        store = WeightStore(self._path)
+        a = np.arange(10, dtype=np.float16).tobytes()
+        b = np.ones(3, dtype=np.float32).tobytes()
+        self.assertEqual(store.add("a", a), 0)
+        self.assertEqual(store.add("b", b), WEIGHT_STORE_ALIGNMENT)
+        # same name and contents
+        self.assertEqual(store.add("a", a), 0)
+        # same name, other contents
+        self.assertEqual(store.add("a", b), 2 * WEIGHT_STORE_ALIGNMENT)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.size, 2 * WEIGHT_STORE_ALIGNMENT + len(b))
+        store.save()
+
+        with open(self._path, "rb") as f:
+            data = f.read()
+        self.assertEqual(len(data), store.size)
+        self.assertEqual(data[: len(a)], a)
+        self.assertEqual(data[len(a) : WEIGHT_STORE_ALIGNMENT], bytes(236))
+        self.assertEqual(data[2 * WEIGHT_STORE_ALIGNMENT :], b)
+
+        # offsets are kept when more models are compiled with the store
+        store = WeightStore(self._path)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.add("b", b), WEIGHT_STORE_ALIGNMENT)
+        self.assertEqual(store.add("c", b), 3 * WEIGHT_STORE_ALIGNMENT)
+
+    def _gen_model_sources(self, batch, weight_store):
+        with host_target():
+            x = Tensor(shape=[batch, 64], dtype="float16", name="x", is_input=True)
+            w = Tensor(shape=[64], dtype="float16", name="w")
+            w._bind_data(_NumpyConstantTensorData(np.ones(64, dtype=np.float16)))
+            y = ops.elementwise(FuncEnum.ADD)(x, w)
+            y._attrs["name"] = "y"
+            y._attrs["is_output"] = True
+            graph = transform.toposort([y])
+            transform.name_graph(graph)
+            transform.mark_param_tensor(graph)
+            graph = transform.fuse_ops(graph)
+            max_blob, max_constant_blob, workspace = transform.memory_planning(graph)
+            generator = ModelContainerGenerator(
+                max_blob,
+                max_constant_blob,
+                workspace,
+                num_inputs=1,
+                num_outputs=1,
+                constants_data_file=io.BytesIO(),
+                output_name_to_idx={"y": 0},
+                weight_store=weight_store,
+            )
+            for node in graph:
+                generator.append_tensor(node)
+            src = generator.generate_source()
+            container_fname = f"model_container_base{Target.current().src_extension()}"
+            return src["model-generated.h"], src[container_fname]
+
+    def test_codegen(self):
+        store = WeightStore(self._path)
+        # two variants of the same graph
+        for batch in (1, 8):
+            model, container = self._gen_model_sources(batch, store)
+            set_shared_weights = model[model.index("void SetSharedWeights") :]
+            self.assertIn(
+                "w = reinterpret_cast<decltype(w)>(shared_weights + 0);",
+                set_shared_weights[: set_shared_weights.index("}")],
+            )
+            self.assertIn("std::array<ConstantInfo, 0> owned_constants", container)
+            # no constants blob, and a store of 128 bytes
+            self.assertRegex(
+                container, r"ModelContainer\(num_runtimes, (\d+, ){5}0, 128\);"
+            )
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.size, 128)
+
+        _, container = self._gen_model_sources(1, None)
+        self.assertIn("std::array<ConstantInfo, 1> owned_constants", container)
+        self.assertRegex(
+            container, r"ModelContainer\(num_runtimes, (\d+, ){5}128, 0\);"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
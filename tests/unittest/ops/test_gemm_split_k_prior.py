@@ -0,0 +1,252 @@
+#  Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from aitemplate.backend.profiler_cache import GEMM_INIT_TEMPLATE, ProfileCacheDB
+from aitemplate.backend.profiler_runner import ProfileResult
+from aitemplate.compiler import ops
+from aitemplate.compiler.ops.gemm_universal.split_k_prior import (
+    get_split_k_prior,
+    MIN_SAMPLES,
+    parse_exec_key,
+    shape_bucket,
+    SplitKPrior,
+)
+from aitemplate.testing.host_target import host_target
+
+
+def _gemm_record(m, n, k, split_k, op_type="gemm_rcr", split_k_profiled=1):
+    exec_entry = f"M == {m} && N == {n} && K == {k}"
+    return {
+        "exec_entry": exec_entry,
+        "exec_entry_sha1": str(hash(exec_entry)),
+        "dtype_a": 1,
+        "dtype_b": 1,
+        "dtype_c": 1,
+        "dtype_acc": 1,
+        "major_a": 1,
+        "major_b": 1,
+        "major_c": 1,
+        "op_type": op_type,
+        "epilogue": 1,
+        "pshape": "",
+        "device": "80",
+        "algo": "cutlass_algo",
+        "workspace": 0,
+        "split_k": split_k,
+        "split_k_profiled": split_k_profiled,
+    }
+
+
+class GemmSplitKPriorTestCase(unittest.TestCase):
+    def test_shape_bucket(self):
+        self.assertEqual(shape_bucket(128, 64, 4096), (8, 7, 13))
+        self.assertEqual(shape_bucket(128, 127, 4096), shape_bucket(255, 64, 5000))
+        self.assertNotEqual(shape_bucket(64, 128, 4096), shape_bucket(128, 64, 4096))
+
+    def test_parse_exec_key(self):
+        self.assertEqual(
+            parse_exec_key("M == 32 && N == 64 && K == 8192"),
+            {"M": 32, "N": 64, "K": 8192},
+        )
+        self.assertEqual(
+            parse_exec_key("B == 2 && M >= 1 && M <= 256 && N == 64 && K == 8192"),
+            {"B": 2, "M": 256, "N": 64, "K": 8192},
+        )
+
+    def test_prior_from_history(self):
+        history = [
+            (f"M == {32 + i} && N == 64 && K == 8192", 1) for i in range(MIN_SAMPLES)
+        ]
+        prior = SplitKPrior(history)
+        # split-k never won in this bucket
+        self.assertFalse(prior.may_win(40, 64, 8192))
+        # unknown buckets
+        self.assertTrue(prior.may_win(40, 64, 1024))
+        self.assertTrue(prior.may_win(40, 256, 8192))
+
+        prior.record(40, 64, 8192, 4)
+        self.assertTrue(prior.may_win(40, 64, 8192))
+
+    def test_prior_with_few_samples(self):
+        history = [("M == 64 && N == 64 && K == 8192", 1)] * (MIN_SAMPLES - 1)
+        prior = SplitKPrior(history)
+        self.assertTrue(prior.may_win(64, 64, 8192))
+
+    def test_split_k_history_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = ProfileCacheDB("cuda", path=os.path.join(tmp_dir, "cuda.db"))
+            db.insert_gemm(_gemm_record(64, 64, 8192, 1))
+            db.insert_gemm(_gemm_record(32, 64, 8192, 8))
+            db.insert_gemm(_gemm_record(32, 64, 8192, 1, op_type="gemm_rrr"))
+            # split-k was not profiled for this one
+            db.insert_gemm(_gemm_record(16, 64, 8192, 1, split_k_profiled=0))
+            history = db.query_gemm_split_k_history(
+                {"op_type": "gemm_rcr", "device": "80"}
+            )
+            self.assertEqual(
+                sorted(history),
+                [
+                    ("M == 32 && N == 64 && K == 8192", 8),
+                    ("M == 64 && N == 64 && K == 8192", 1),
+                ],
+            )
+            del db
+
+    def test_split_k_history_of_old_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cuda.db")
+            con = sqlite3.connect(path)
+            con.execute(
+                GEMM_INIT_TEMPLATE.render(dev="cuda").replace(
+                    "split_k_profiled INTEGER DEFAULT 1,", ""
+                )
+            )
+            con.close()
+            db = ProfileCacheDB("cuda", path=path)
+            db.insert_gemm(_gemm_record(64, 64, 8192, 1))
+            history = db.query_gemm_split_k_history(
+                {"op_type": "gemm_rcr", "device": "80"}
+            )
+            self.assertEqual(history, [("M == 64 && N == 64 && K == 8192", 1)])
+            del db
+
+
+def _op_instance():
+    """Stands in for a cutlass gemm instance in cache entries."""
+    operand = SimpleNamespace(
+        element=SimpleNamespace(value=1), layout=SimpleNamespace(value=1)
+    )
+    return SimpleNamespace(
+        A=operand,
+        B=operand,
+        C=operand,
+        accumulator_type=lambda: SimpleNamespace(value=1),
+        epilogue_functor=SimpleNamespace(value=1),
+    )
+
+
+class GemmSplitKSearchTestCase(unittest.TestCase):
+    """The two-stage split-k search of gemm profiling."""
+
+    _EXEC_KEY = "M == 64 && N == 64 && K == 2048"
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = mock.patch.dict(os.environ, {"CACHE_DIR": self._tmp_dir.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp_dir.cleanup()
+
+    def _gemm(self):
+        op = ops.gemm_rcr()
+        op._attrs["op_instance"] = {f"cfg{i}": _op_instance() for i in range(5)}
+        op._gen_profile_cmd = lambda prefix, cfg, exec_key: [cfg]
+        return op
+
+    def _profile(self, op):
+        """Runs the profiling rounds of op, where larger split_k and lower
+        config numbers are faster, and returns the candidates of each round
+        and the selected result."""
+        rounds = []
+        results = []
+        while True:
+            cands = op._profile_candidates("", self._EXEC_KEY, len(rounds), results)
+            if len(cands) == 0:
+                break
+            rounds.append(cands)
+            results += [
+                (cand, ProfileResult(1.0 / cand.extra[0] + int(cand.algo[3:]), 0))
+                for cand in cands
+            ]
+        return rounds, op._select_profile_result(self._EXEC_KEY, results)
+
+    def _insert_history(self, target, split_k):
+        for i in range(MIN_SAMPLES):
+            target.insert_profile_cache("gemm", _gemm_record(64 + i, 64, 2048, split_k))
+
+    def test_split_k_on_top_configs(self):
+        target = host_target()
+        with target:
+            op = self._gemm()
+            rounds, value = self._profile(op)
+            self.assertEqual(len(rounds), 2)
+            self.assertEqual([c.extra for c in rounds[0]], [(1,)] * 5)
+            # only the fastest configs are profiled with split_k > 1
+            self.assertEqual({c.algo for c in rounds[1]}, {"cfg0", "cfg1", "cfg2"})
+            self.assertTrue(all(c.extra[0] > 1 for c in rounds[1]))
+            self.assertEqual(value, ("cfg0", 0, max(c.extra[0] for c in rounds[1])))
+            record = op._profile_record(self._EXEC_KEY, value)
+            self.assertEqual(record["split_k_profiled"], 1)
+
+    def test_skip_split_k_never_wins(self):
+        target = host_target()
+        with target:
+            self._insert_history(target, split_k=1)
+            op = self._gemm()
+            rounds, value = self._profile(op)
+            # split-k never won for this bucket
+            self.assertEqual(len(rounds), 1)
+            self.assertEqual(value, ("cfg0", 0, 1))
+            record = op._profile_record(self._EXEC_KEY, value)
+            self.assertEqual(record["split_k_profiled"], 0)
+            # the skipped round is not counted against split-k
+            target.insert_profile_cache("gemm", record)
+            history = target.query_gemm_split_k_history(
+                {"op_type": "gemm_rcr", "device": "80"}
+            )
+            self.assertEqual(len(history), MIN_SAMPLES)
+
+            with mock.patch.dict(os.environ, {"FORCE_PROFILE": "1"}):
+                rounds, _ = self._profile(self._gemm())
+            self.assertEqual(len(rounds), 2)
+
+    def test_prior_sees_new_results(self):
+        target = host_target()
+        with target:
+            self._insert_history(target, split_k=1)
+            prior = get_split_k_prior(target, "gemm_rcr")
+            self.assertFalse(prior.may_win(64, 64, 2048))
+            with mock.patch.dict(os.environ, {"FORCE_PROFILE": "1"}):
+                op = self._gemm()
+                _, value = self._profile(op)
+            self.assertGreater(value[2], 1)
+            target.insert_profile_cache(
+                "gemm", op._profile_record(self._EXEC_KEY, value)
+            )
+            # split-k won with FORCE_PROFILE=1, so it is profiled again
+            rounds, _ = self._profile(self._gemm())
+            self.assertEqual(len(rounds), 2)
+
+    def test_split_k_searched_for_other_buckets(self):
+        target = host_target()
+        with target:
+            self._insert_history(target, split_k=1)
+            op = self._gemm()
+            exec_key = "M == 64 && N == 64 && K == 4096"
+            cands = op._profile_candidates("", exec_key, 0, [])
+            results = [(cand, ProfileResult(1.0, 0)) for cand in cands]
+            self.assertNotEqual(op._profile_candidates("", exec_key, 1, results), [])
+
+
+if __name__ == "__main__":
+    unittest.main()